@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Time the dashboard's event queries against a synthetic database.
+
+    python scripts/bench_dashboard.py build /tmp/bench.sqlite --rows 10000000
+    python scripts/bench_dashboard.py run /tmp/bench.sqlite --window all
+    python scripts/bench_dashboard.py zones /tmp/bench.sqlite --window 30d
+
+``build`` writes rows straight into ``events_data`` (about 78% token_count,
+5 models, 200 directories two levels under /home/user/projects, 2,000
+sources, one event every ~3 s from 2026-01-01) and then builds the indexes
+the store would. ``run`` issues the same query shapes as the KPI, token mix,
+cost and volume routes with no filter and with a model, directory or source
+filter, and prints the best of three runs in milliseconds per route.
+``zones`` times the same routes unfiltered with the plain capture-time range
+and with the zone map's rowid span added to it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from codex_usage_tracker.store import (  # noqa: E402
+    NORMALIZED_INDEX_DDL,
+    UsageStore,
+    time_range_sql,
+)
+
+START_MS = 1_767_225_600_000
+STEP_MS = 3_123
+BATCH = 1_000_000
+DAY_MS = 86_400_000
+
+ROUTES = {
+    "kpis": (
+        "SELECT SUM(total_tokens), SUM(input_tokens), SUM(output_tokens), "
+        "SUM(reasoning_output_tokens), SUM(cached_input_tokens), "
+        "SUM(COALESCE(input_tokens, 0) + COALESCE(cached_input_tokens, 0)) "
+        "FROM events_keyed {where}"
+    ),
+    "kpis_cost": (
+        "SELECT model, SUM(input_tokens), SUM(cached_input_tokens), SUM(output_tokens), "
+        "SUM(total_tokens) FROM events_keyed {where} GROUP BY model"
+    ),
+    "token_mix": (
+        "SELECT {bucket} AS bucket, SUM(input_tokens), SUM(cached_input_tokens), "
+        "SUM(output_tokens), SUM(reasoning_output_tokens) FROM events_keyed {where} "
+        "GROUP BY {group} ORDER BY bucket"
+    ),
+    "cost_timeseries": (
+        "SELECT {bucket} AS bucket, model, SUM(input_tokens), SUM(cached_input_tokens), "
+        "SUM(output_tokens) FROM events_keyed {where} GROUP BY {group}, model ORDER BY bucket"
+    ),
+    "volume_timeseries": (
+        "SELECT {bucket} AS bucket, SUM(total_tokens), COUNT(*), COUNT(DISTINCT session_id) "
+        "FROM events_keyed {where} GROUP BY {group} ORDER BY bucket"
+    ),
+}
+FILTERS = {
+    "none": "",
+    "model": "AND model IN (?)",
+    "directory": (
+        "AND directory_key IN (SELECT descendant_id FROM directory_tree "
+        "WHERE ancestor_id IN (SELECT id FROM dim_directory WHERE value IN (?)))"
+    ),
+    "source": "AND source IN (?)",
+}
+
+
+def build(path: Path, rows: int, timezone: str) -> None:
+    path.unlink(missing_ok=True)
+    store = UsageStore(path)
+    conn = store.conn
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = 'events_data' AND sql IS NOT NULL"
+    ).fetchall():
+        conn.execute(f"DROP INDEX {name}")
+    conn.executescript(
+        """
+        INSERT OR IGNORE INTO dim_event_type (id, value) VALUES
+            (1, 'token_count'), (2, 'turn_context'), (3, 'status_snapshot'),
+            (4, 'context_compacted');
+        INSERT OR IGNORE INTO dim_model (id, value) VALUES
+            (1, 'gpt-5'), (2, 'gpt-5-codex'), (3, 'gpt-5.1'), (4, 'o3'), (5, 'gpt-4.1');
+        WITH RECURSIVE k(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM k WHERE i < 200)
+        INSERT OR IGNORE INTO dim_directory (id, value)
+        SELECT i, '/home/user/projects/repo-' || (i % 20) || '/pkg-' || i FROM k;
+        WITH RECURSIVE k(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM k WHERE i < 50000)
+        INSERT OR IGNORE INTO dim_session (id, value)
+        SELECT i, lower(hex(randomblob(16))) FROM k;
+        WITH RECURSIVE k(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM k WHERE i < 2000)
+        INSERT OR IGNORE INTO sources (id, path)
+        SELECT i, '/home/user/.codex/sessions/rollout-' || i || '.jsonl' FROM k;
+        """
+    )
+    store.sync_directory_tree()
+    values = {
+        "captured_at_ms": f"{START_MS} + i * {STEP_MS}",
+        "utc_offset_minutes": "0",
+        "event_type_key": "1 + (i % 7 = 0) + (i % 11 = 0) * 2",
+        "total_tokens": "abs(random()) % 50000",
+        "input_tokens": "abs(random()) % 40000",
+        "cached_input_tokens": "abs(random()) % 30000",
+        "output_tokens": "abs(random()) % 5000",
+        "reasoning_output_tokens": "abs(random()) % 3000",
+        "context_used": "abs(random()) % 200000",
+        "context_total": "272000",
+        "context_percent_left": "(abs(random()) % 1000) / 10.0",
+        "model_key": "1 + i % 5",
+        "directory_key": "1 + (i / 5000) % 200",
+        "session_key": "1 + i / 200",
+        "source_id": "1 + (i / 5000) % 2000",
+    }
+    columns = ", ".join(values)
+    selected = ", ".join(values.values())
+    started = time.perf_counter()
+    for low in range(0, rows, BATCH):
+        high = min(low + BATCH, rows) - 1
+        conn.execute(
+            f"""
+            WITH RECURSIVE k(i) AS (SELECT {low} UNION ALL SELECT i + 1 FROM k WHERE i < {high})
+            INSERT INTO events_data ({columns}) SELECT {selected} FROM k
+            """
+        )
+        conn.commit()
+    for ddl in NORMALIZED_INDEX_DDL:
+        conn.execute(ddl)
+    store.extend_zone_map("events")
+    conn.commit()
+    store.set_bucket_timezone(timezone)
+    store.close()
+    print(
+        f"{path}: {rows:,} events in {time.perf_counter() - started:.0f}s, "
+        f"{path.stat().st_size / 1e6:,.0f} MB"
+    )
+
+
+def run(path: Path, window: str, repeat: int) -> None:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.execute("PRAGMA cache_size=-200000")
+    first, last = conn.execute("SELECT MIN(captured_at_ms), MAX(captured_at_ms) FROM events_data").fetchone()
+    if window == "all":
+        start, bucket, group = first, "strftime('%Y-%m-%dT00:00:00', local_hour / 24 * 86400, 'unixepoch')", "local_hour / 24"
+    else:
+        start = last - int(window.rstrip("d")) * DAY_MS
+        bucket, group = "strftime('%Y-%m-%dT%H:00:00', local_hour * 3600, 'unixepoch')", "local_hour"
+    filter_values = {
+        "model": conn.execute("SELECT value FROM dim_model ORDER BY id LIMIT 1").fetchone()[0],
+        "directory": conn.execute(
+            "SELECT value FROM dim_directory WHERE value LIKE '%/repo-1' LIMIT 1"
+        ).fetchone()[0],
+        "source": conn.execute("SELECT path FROM sources ORDER BY id LIMIT 1").fetchone()[0],
+    }
+    base = "WHERE event_type = 'token_count' AND captured_at_ms >= ? AND captured_at_ms <= ?"
+    print(f"{'route':18s}" + "".join(f"{name:>11s}" for name in FILTERS) + "  plan")
+    for route, template in ROUTES.items():
+        cells = []
+        for name, clause in FILTERS.items():
+            sql = template.format(where=f"{base} {clause}", bucket=bucket, group=group)
+            params = (start, last, *((filter_values[name],) if name in filter_values else ()))
+            best = float("inf")
+            for _ in range(repeat + 1):
+                began = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                best = min(best, time.perf_counter() - began)
+            cells.append(f"{best * 1000:9.0f}ms")
+        plan = "; ".join(
+            row[3]
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN " + template.format(where=base, bucket=bucket, group=group),
+                (start, last),
+            )
+            if "events_data" in row[3]
+        )
+        print(f"{route:18s}" + "".join(f"{cell:>11s}" for cell in cells) + f"  {plan}")
+    conn.close()
+
+
+def _best_ms(conn: sqlite3.Connection, sql: str, params: list[object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat + 1):
+        began = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - began)
+    return best * 1000
+
+
+def zones(path: Path, window: str, repeat: int) -> None:
+    store = UsageStore(path)
+    conn = store.conn
+    conn.execute("PRAGMA cache_size=-200000")
+    first, last = conn.execute("SELECT MIN(captured_at_ms), MAX(captured_at_ms) FROM events_data").fetchone()
+    start_ms = first if window == "all" else last - int(window.rstrip("d")) * DAY_MS
+    start, end = (
+        datetime.fromtimestamp(value / 1000, timezone.utc).isoformat() for value in (start_ms, last)
+    )
+    bucket, group = "strftime('%Y-%m-%dT%H:00:00', local_hour * 3600, 'unixepoch')", "local_hour"
+    span = store.zone_rowid_span("events", start, end)
+    clauses, params = time_range_sql("events", start, end)
+    variants = {"time": (clauses, params)}
+    if span is not None:
+        variants["time+span"] = ([*clauses, "id BETWEEN ? AND ?"], [*params, *span])
+    print(f"rowid span: {span}")
+    print(f"{'route':18s}" + "".join(f"{name:>11s}" for name in variants))
+    for route, template in ROUTES.items():
+        cells = []
+        for clauses, params in variants.values():
+            where = "WHERE event_type = 'token_count' AND " + " AND ".join(clauses)
+            sql = template.format(where=where, bucket=bucket, group=group)
+            cells.append(f"{_best_ms(conn, sql, params, repeat):9.0f}ms")
+        print(f"{route:18s}" + "".join(f"{cell:>11s}" for cell in cells))
+    store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Write a synthetic database")
+    build_parser.add_argument("db", type=Path)
+    build_parser.add_argument("--rows", type=int, default=10_000_000)
+    build_parser.add_argument("--timezone", default="Europe/Stockholm")
+    run_parser = commands.add_parser("run", help="Time the route queries")
+    run_parser.add_argument("db", type=Path)
+    run_parser.add_argument("--window", default="30d", help="'all' or a day count such as 30d")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    zones_parser = commands.add_parser("zones", help="Compare routes with and without zone map spans")
+    zones_parser.add_argument("db", type=Path)
+    zones_parser.add_argument("--window", default="30d", help="'all' or a day count such as 30d")
+    zones_parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if args.command == "build":
+        build(args.db, args.rows, args.timezone)
+    elif args.command == "zones":
+        zones(args.db, args.window, args.repeat)
+    else:
+        run(args.db, args.window, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,43 @@
+from __future__ import annotations
+
 import argparse
-import hashlib
 import json
 import os
-import socket
-import subprocess
 import sys
-import threading
 import time
-import webbrowser
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from datetime import datetime, time as dt_time, timedelta
 from pathlib import Path
-from typing import Callable, Dict, Iterable, Literal, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
 from zoneinfo import ZoneInfo
 
+from .compression import DEFAULT_COMPRESSION_LEVEL, DEFAULT_TRAINING_SAMPLES
 from .config import (
     DEFAULT_TIMEZONE,
     is_valid_timezone,
+    resolve_activity_occurrences,
+    resolve_status_snapshot,
     resolve_timezone,
-)
-from .hash_utils import compute_file_hash
-from .insights import (
-    compare_payload,
-    doctor_payload,
-    insight_payload,
-    session_insights,
+    resolve_timezone_name,
 )
 from .platform import default_config_path, default_db_path, default_rollouts_dir
-from .pricing_cli import (
-    pricing_status,
-    remove_pricing_override,
-    update_pricing_model,
-)
-from .report import (
-    PricingConfig,
-    aggregate,
-    compute_costs,
-    default_pricing,
-    export_events_csv,
-    export_events_json,
-    load_pricing_config,
-    parse_datetime,
-    parse_last,
-    render_csv,
-    render_json,
-    render_table,
-    to_local,
-)
-from .rollout import RolloutContext, iter_rollout_files, parse_rollout_line
-from .app_server import ingest_app_server_output
-from .parser import StatusCapture, map_limits, parse_token_usage_line
 from .store import (
+    EXPORT_TABLES,
+    EXPORT_TYPE_COLUMNS,
+    FTS_SYNC_BATCH,
+    LATEST_STATUS_SCOPE,
+    MESSAGE_REPRESENTATIONS,
     ActivityEvent,
     MessageEvent,
     SessionMeta,
@@ -59,8 +45,17 @@ from .store import (
     TurnContext,
     UsageEvent,
     UsageStore,
+    content_db_path,
+    remove_database_files,
 )
 
+if TYPE_CHECKING:
+    from .report import PricingConfig
+
+# Everything else (rollout parsing, reports, insights, pricing, columnar
+# export, thread pools) is imported inside the command that needs it so that
+# frequent commands like `status` start fast.
+
 try:
     import fcntl
 except ImportError:  # pragma: no cover - Windows fallback
@@ -121,8 +116,36 @@ LEAN_DROPPED_TOOL_TYPES = {
 }
 MAX_TOOL_PAYLOAD_CHARS = 4096
 MAX_TOOL_COMMAND_CHARS = 4096
+# A response_item message and its event_msg twin are logged within moments
+# of each other; identical text further apart is a genuine repeat.
+MESSAGE_PAIR_WINDOW_SECONDS = 5.0
 DEFAULT_INGEST_WORKERS = max(1, os.cpu_count() or 1)
+DEFAULT_MAX_STALENESS_SECONDS = 30.0
+COMMAND_NAMES = (
+    "report",
+    "export",
+    "status",
+    "profile",
+    "pricing",
+    "insight",
+    "sessions",
+    "search",
+    "fts",
+    "doctor",
+    "compare",
+    "ui",
+    "web",
+    "ingest-cli",
+    "ingest-app-server",
+    "watch",
+    "clear-db",
+    "purge-content",
+    "purge-payloads",
+    "vacuum",
+    "content",
+)
 _INGEST_LOCK_DEPTH = 0
+_LOCK_OWNER = "ingest"
 
 
 def _should_store_activity_event(event_type: str, ingest_mode: IngestMode) -> bool:
@@ -185,6 +208,9 @@ class ProgressPrinter:
 
 
 def _open_browser(url: str, delay: float = 0.8) -> None:
+    import threading
+    import webbrowser
+
     def _runner() -> None:
         time.sleep(delay)
         webbrowser.open(url)
@@ -193,6 +219,8 @@ def _open_browser(url: str, delay: float = 0.8) -> None:
 
 
 def _is_port_available(port: int, host: str = "127.0.0.1") -> bool:
+    import socket
+
     if port < 1 or port > 65535:
         return False
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
@@ -237,6 +265,8 @@ def _select_rollout_files(
     end: Optional[datetime],
     tz: ZoneInfo,
 ) -> Iterable[Tuple[Path, int, int, datetime]]:
+    from .rollout import iter_rollout_files
+
     for path in iter_rollout_files(root):
         try:
             stat = path.stat()
@@ -309,16 +339,59 @@ def _resolve_ingest_workers(workers: Optional[int]) -> int:
     return max(1, workers)
 
 
-def _acquire_ingestion_lock(db_path: Path):
+class IngestLockBusy(RuntimeError):
+    def __init__(self, holder: Optional[Dict[str, object]]) -> None:
+        super().__init__("Another process is ingesting")
+        self.holder = holder or {}
+
+
+def _ingestion_lock_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.name}.ingest.lock")
+
+
+def _read_lock_holder(handle) -> Dict[str, object]:
+    try:
+        handle.seek(0)
+        info = json.loads(handle.read() or "{}")
+    except (OSError, ValueError):
+        return {}
+    return info if isinstance(info, dict) else {}
+
+
+def _acquire_ingestion_lock(db_path: Path, blocking: bool = True):
+    """
+    Take the exclusive ingest lock and record who holds it.
+
+    With ``blocking=False`` this is a try-lock that raises ``IngestLockBusy``
+    (carrying the holder's pid, command, and start time) instead of waiting.
+    """
     global _INGEST_LOCK_DEPTH
     if _INGEST_LOCK_DEPTH > 0:
         _INGEST_LOCK_DEPTH += 1
         return None
-    lock_path = db_path.with_name(f"{db_path.name}.ingest.lock")
+    lock_path = _ingestion_lock_path(db_path)
     lock_path.parent.mkdir(parents=True, exist_ok=True)
-    handle = lock_path.open("a")
+    handle = lock_path.open("a+")
     if fcntl is not None:
-        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(handle.fileno(), flags)
+        except BlockingIOError:
+            holder = _read_lock_holder(handle)
+            handle.close()
+            raise IngestLockBusy(holder) from None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(
+        json.dumps(
+            {
+                "pid": os.getpid(),
+                "command": _LOCK_OWNER,
+                "started_at": time.time(),
+            }
+        )
+    )
+    handle.flush()
     _INGEST_LOCK_DEPTH = 1
     return handle
 
@@ -331,6 +404,111 @@ def _release_ingestion_lock(handle) -> None:
     _INGEST_LOCK_DEPTH = 0
     if handle is None:
         return
+    try:
+        handle.truncate(0)
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
+
+
+def _acquire_read_lock(db_path: Path, exclusive: bool = False):
+    """
+    Readers share ``<db>.read.lock``; commands that delete or rewrite the
+    database file (clear-db, vacuum) take it exclusively. Ingest never takes
+    it, so WAL readers keep running while rollouts are ingested.
+    """
+    lock_path = db_path.with_name(f"{db_path.name}.read.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = lock_path.open("a")
+    if fcntl is not None:
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(handle.fileno(), mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if exclusive:
+                sys.stderr.write("Waiting for running codex-track readers to finish...\n")
+                sys.stderr.flush()
+            fcntl.flock(handle.fileno(), mode)
+    return handle
+
+
+def _release_read_lock(handle) -> None:
+    if handle is None:
+        return
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
+
+
+def _format_age(seconds: float) -> str:
+    seconds = max(seconds, 0.0)
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def _report_busy_ingest(store: UsageStore, holder: Dict[str, object]) -> None:
+    now = time.time()
+    parts = [str(holder.get("command") or "unknown command")]
+    if holder.get("pid"):
+        parts.append(f"pid {holder['pid']}")
+    started_at = holder.get("started_at")
+    if isinstance(started_at, (int, float)):
+        parts.append(f"running {_format_age(now - started_at)}")
+    scan = store.last_rollout_scan()
+    scanned_at = scan.get("scanned_at") if scan else None
+    if isinstance(scanned_at, (int, float)):
+        freshness = f"data as of last scan {_format_age(now - scanned_at)} ago"
+    else:
+        freshness = "data from before any completed scan"
+    sys.stderr.write(
+        f"Ingest in progress ({', '.join(parts)}); showing committed {freshness}.\n"
+    )
+    sys.stderr.flush()
+
+
+def _watch_lock_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.name}.watch.lock")
+
+
+def _acquire_watch_lock(db_path: Path, rollouts_dir: Path, interval: float):
+    """
+    Hold ``<db>.watch.lock`` for the lifetime of ``watch``.
+
+    Read commands probe the lock to tell whether a live watcher keeps the
+    database fresh. Returns None if another watcher already holds it.
+    """
+    lock_path = _watch_lock_path(db_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = lock_path.open("a+")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(
+        json.dumps(
+            {
+                "pid": os.getpid(),
+                "rollouts": str(rollouts_dir.expanduser().resolve()),
+                "interval": interval,
+                "started_at": time.time(),
+            }
+        )
+    )
+    handle.flush()
+    return handle
+
+
+def _release_watch_lock(handle) -> None:
     try:
         if fcntl is not None:
             fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -338,6 +516,187 @@ def _release_ingestion_lock(handle) -> None:
         handle.close()
 
 
+def _live_watch_info(db_path: Path) -> Optional[Dict[str, object]]:
+    lock_path = _watch_lock_path(db_path)
+    if fcntl is None or not lock_path.exists():
+        return None
+    try:
+        with lock_path.open("r") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError:
+                handle.seek(0)
+                try:
+                    info = json.loads(handle.read() or "{}")
+                except ValueError:
+                    info = {}
+                return info if isinstance(info, dict) else {}
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        return None
+    return None
+
+
+def _record_rollout_scan(
+    store: UsageStore,
+    rollouts_dir: Path,
+    scanned_at: float,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    ingest_mode: IngestMode,
+) -> None:
+    """
+    Persist the scan watermark used by the freshness check.
+
+    ``covered_from`` is the oldest mtime for which every rollout is known to be
+    ingested. A scan that starts at or before the previous scan time extends
+    the previous coverage, which keeps incremental ``watch`` scans covering
+    everything the initial scan did. ``ingest_mode`` is recorded so that only a
+    sync in the same mode is skipped; coverage never carries across modes.
+    """
+    if end is not None:
+        return
+    rollouts = str(rollouts_dir.expanduser().resolve())
+    covered_from = start.timestamp() if start is not None else None
+    previous = store.last_rollout_scan()
+    if (
+        covered_from is not None
+        and previous
+        and previous.get("rollouts") == rollouts
+        and previous.get("ingest_mode") == ingest_mode
+        and isinstance(previous.get("scanned_at"), (int, float))
+        and covered_from <= previous["scanned_at"]
+    ):
+        previous_from = previous.get("covered_from")
+        covered_from = None if previous_from is None else min(covered_from, previous_from)
+    store.record_rollout_scan(
+        {
+            "rollouts": rollouts,
+            "scanned_at": scanned_at,
+            "covered_from": covered_from,
+            "ingest_mode": ingest_mode,
+        }
+    )
+
+
+STATUS_SNAPSHOT_FIELDS = (
+    "captured_at",
+    "captured_at_utc",
+    "event_type",
+    "model",
+    "directory",
+    "session_id",
+    "codex_version",
+    "total_tokens",
+    "input_tokens",
+    "cached_input_tokens",
+    "output_tokens",
+    "context_used",
+    "context_total",
+    "context_percent_left",
+    "limit_5h_percent_left",
+    "limit_5h_resets_at",
+    "limit_weekly_percent_left",
+    "limit_weekly_resets_at",
+    "rate_limit_plan_type",
+)
+
+
+def _status_snapshot_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.name}.status.json")
+
+
+def _write_status_snapshot(store: UsageStore) -> None:
+    """
+    Mirror the maintained latest-status rows into ``<db>.status.json`` so
+    prompt integrations can read them without opening SQLite.
+
+    Opt-in via ``"status_snapshot": true``; the file is replaced atomically and
+    only rewritten when its contents change.
+    """
+    if not resolve_status_snapshot(store.path):
+        return
+    payload: Dict[str, object] = {"latest": None, "plans": {}}
+    for scope_row in store.latest_status_scopes():
+        row = store.latest_status(scope_row["scope"])
+        if row is None:
+            continue
+        snapshot = {field: row[field] for field in STATUS_SNAPSHOT_FIELDS}
+        if scope_row["scope"] == LATEST_STATUS_SCOPE:
+            payload["latest"] = snapshot
+        else:
+            payload["plans"][scope_row["plan_type"]] = snapshot
+    text = json.dumps(payload, indent=2, sort_keys=True) + "\n"
+    path = _status_snapshot_path(store.path)
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return
+    except OSError:
+        pass
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        sys.stderr.write(f"Could not write status snapshot {path}: {exc}\n")
+
+
+def _sync_skip_reason(
+    args: argparse.Namespace,
+    store: UsageStore,
+    rollouts_dir: Path,
+    start: Optional[datetime],
+    ingest_mode: IngestMode,
+) -> Optional[str]:
+    if getattr(args, "no_sync", False):
+        return "--no-sync"
+    max_staleness = getattr(args, "max_staleness", None)
+    if max_staleness is None:
+        max_staleness = DEFAULT_MAX_STALENESS_SECONDS
+    if max_staleness <= 0:
+        return None
+    scan = store.last_rollout_scan()
+    if not scan or not store.ingest_version_current():
+        return None
+    rollouts = str(rollouts_dir.expanduser().resolve())
+    scanned_at = scan.get("scanned_at")
+    if scan.get("rollouts") != rollouts or not isinstance(scanned_at, (int, float)):
+        return None
+    if scan.get("ingest_mode") != ingest_mode:
+        # e.g. a --no-content or --no-payloads run after a full one.
+        return None
+    covered_from = scan.get("covered_from")
+    if covered_from is not None and (start is None or start.timestamp() < covered_from):
+        return None
+    age = max(time.time() - scanned_at, 0.0)
+    watch = _live_watch_info(store.path)
+    if watch is not None and watch.get("rollouts") == rollouts:
+        return f"watch is running (pid {watch.get('pid')}), last scan {age:.0f}s ago"
+    if age <= max_staleness:
+        return f"last scan {age:.0f}s ago"
+    return None
+
+
+def _parse_staleness(value: str) -> float:
+    text = value.strip().lower()
+    units = {"s": 1, "m": 60, "min": 60, "h": 3600}
+    for suffix in ("min", "s", "m", "h"):
+        if text.endswith(suffix):
+            number, factor = text[: -len(suffix)], units[suffix]
+            break
+    else:
+        number, factor = text, 1
+    try:
+        seconds = float(number) * factor
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid staleness '{value}' (expected e.g. 0, 30s, 5m, 1h)"
+        ) from None
+    if seconds < 0:
+        raise argparse.ArgumentTypeError("staleness cannot be negative")
+    return seconds
+
+
 def _parse_rollout_file(
     file_path: Path,
     mtime_ns: int,
@@ -348,12 +707,18 @@ def _parse_rollout_file(
     strict: bool,
     error_sample_limit: int,
 ) -> ParsedRolloutFile:
+    import hashlib
+
+    from .rollout import RolloutContext, parse_rollout_line
+
     tz = ZoneInfo(tz_name)
     parsed_file = ParsedRolloutFile(file_path=file_path, mtime_ns=mtime_ns, size=size)
     context = RolloutContext()
     session_meta_saved = False
     turn_counters: Dict[str, int] = {}
     message_counters: Dict[str, int] = {}
+    # (session, role, text digest) -> the stored message its twin would merge into
+    message_twins: Dict[Tuple[str, str, bytes], Tuple[MessageEvent, datetime]] = {}
     content_hash = hashlib.sha256()
 
     include_messages = ingest_mode == "full"
@@ -563,22 +928,40 @@ def _parse_rollout_file(
                 if parsed.messages and include_messages:
                     for message in parsed.messages:
                         message_key = context.session_id or f"file:{file_path}"
+                        representation = MESSAGE_REPRESENTATIONS.get(message.message_type, 0)
+                        twin_key = (
+                            message_key,
+                            message.role,
+                            hashlib.blake2b(message.message.encode("utf-8"), digest_size=16).digest(),
+                        )
+                        twin, twin_at = message_twins.get(twin_key, (None, None))
+                        if (
+                            twin is not None
+                            and representation
+                            and not twin.representations & representation
+                            and abs((message.captured_at_utc - twin_at).total_seconds())
+                            <= MESSAGE_PAIR_WINDOW_SECONDS
+                        ):
+                            twin.representations |= representation
+                            continue
                         ordinal = message_counters.get(message_key, 0)
                         message_counters[message_key] = ordinal + 1
-                        parsed_file.messages.append(
-                            MessageEvent(
-                                captured_at=message.captured_at_local.isoformat(),
-                                captured_at_utc=message.captured_at_utc.isoformat(),
-                                role=message.role,
-                                message_type=message.message_type,
-                                message=message.message,
-                                session_id=context.session_id,
-                                turn_index=turn_index,
-                                source=str(file_path),
-                                ordinal=ordinal,
-                                source_line=line_number,
-                            )
+                        event = MessageEvent(
+                            captured_at=message.captured_at_local.isoformat(),
+                            captured_at_utc=message.captured_at_utc.isoformat(),
+                            role=message.role,
+                            message_type=message.message_type,
+                            message=message.message,
+                            session_id=context.session_id,
+                            turn_index=turn_index,
+                            source=str(file_path),
+                            ordinal=ordinal,
+                            source_line=line_number,
+                            representations=representation,
                         )
+                        parsed_file.messages.append(event)
+                        if representation:
+                            message_twins[twin_key] = (event, message.captured_at_utc)
 
                 if parsed.tool_calls and include_tool_calls:
                     for tool_call in parsed.tool_calls:
@@ -643,10 +1026,15 @@ def _write_parsed_rollout(
     store: UsageStore,
     parsed: ParsedRolloutFile,
     cold_bulk: bool,
+    activity_occurrences: bool = False,
 ) -> int:
     rows = 0
+    # Commits are not atomic across the attached content file, so with the
+    # split layout the ingested mark commits after the rows: a crash in
+    # between leaves the file unmarked and the next ingest rewrites it.
+    mark_separately = store.content_schema != "main"
+    source = str(parsed.file_path)
     with store.transaction():
-        source = str(parsed.file_path)
         if not cold_bulk:
             store.delete_events_for_source(source, commit=False)
             store.delete_turns_for_source(source, commit=False)
@@ -656,19 +1044,43 @@ def _write_parsed_rollout(
             store.upsert_session(session, commit=False)
         rows += store.insert_events_bulk(parsed.events, commit=False)
         store.insert_turns_bulk(parsed.turns, commit=False)
-        rows += store.insert_activity_events_bulk(parsed.activity, commit=False)
+        rows += store.insert_activity_events_bulk(
+            parsed.activity, commit=False, occurrences=activity_occurrences
+        )
         rows += store.insert_messages_bulk(parsed.messages, commit=False)
         rows += store.insert_tool_calls_bulk(parsed.tool_calls, commit=False)
+        if not cold_bulk:
+            store.refresh_session_summary_for_source(
+                source,
+                [session.session_id for session in parsed.sessions],
+                commit=False,
+            )
+        if not mark_separately:
+            store.mark_file_ingested(
+                source,
+                parsed.mtime_ns,
+                parsed.size,
+                content_hash=parsed.content_hash,
+                commit=False,
+            )
+    if mark_separately:
         store.mark_file_ingested(
             source,
             parsed.mtime_ns,
             parsed.size,
             content_hash=parsed.content_hash,
-            commit=False,
         )
     return rows
 
 
+def _price_session_summary(store: UsageStore) -> None:
+    """Price rewritten session_summary rows; callers hold the ingest lock."""
+    from .insights import price_session_summary
+    from .report import load_pricing_config
+
+    price_session_summary(store, load_pricing_config(store.path)[0])
+
+
 def _ingest_rollouts_locked(
     path: Path,
     store: UsageStore,
@@ -684,12 +1096,15 @@ def _ingest_rollouts_locked(
     error_sample_limit: int = 5,
     workers: Optional[int] = None,
 ) -> IngestStats:
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
     store.ensure_ingest_version()
     stats = IngestStats()
     stats.started_at = time.time()
     files = list(_select_rollout_files(path, start, end, tz))
     stats.files_total = len(files)
     progress = ProgressPrinter(stats.files_total)
+    activity_occurrences = resolve_activity_occurrences(store.path)
 
     def _update_timing(current: int, file_path: Optional[Path]) -> None:
         now_ts = time.time()
@@ -725,7 +1140,9 @@ def _ingest_rollouts_locked(
     def _consume_parsed(parsed: ParsedRolloutFile, cold_bulk: bool) -> None:
         stats.lines += parsed.lines
         _merge_errors(parsed)
-        stats.events += _write_parsed_rollout(store, parsed, cold_bulk=cold_bulk)
+        stats.events += _write_parsed_rollout(
+            store, parsed, cold_bulk=cold_bulk, activity_occurrences=activity_occurrences
+        )
         stats.files_parsed += 1
         _update_timing(_completed_count(), parsed.file_path)
         progress.update(_completed_count(), stats, parsed.file_path)
@@ -755,6 +1172,7 @@ def _ingest_rollouts_locked(
         and start is None
         and end is None
         and store.ingestion_file_count() == 0
+        and not store.has_unmarked_rollout_rows()
     )
     worker_count = min(_resolve_ingest_workers(workers), len(files_to_parse) or 1)
     bulk_prepared = False
@@ -815,6 +1233,7 @@ def _ingest_rollouts_locked(
         if bulk_prepared:
             store.finish_bulk_load(include_messages=include_messages)
 
+    _price_session_summary(store)
     progress.finish()
     if progress_callback is not None:
         _update_timing(stats.files_total, None)
@@ -864,6 +1283,16 @@ def _ingest_rollouts_locked(
     return stats
 
 
+def _flush_fts_queue(store: UsageStore, idle: bool) -> None:
+    """
+    Apply deferred FTS changes once the queue is a full batch, or on a scan
+    that found nothing new, so ``watch`` indexes between bursts of writes.
+    """
+    pending = store.fts_pending_count()
+    if pending and (idle or pending >= FTS_SYNC_BATCH):
+        store.sync_fts()
+
+
 def ingest_rollouts(
     path: Path,
     store: UsageStore,
@@ -881,19 +1310,30 @@ def ingest_rollouts(
 ) -> IngestStats:
     lock_handle = _acquire_ingestion_lock(store.path)
     try:
-        return _ingest_rollouts_locked(
-            path,
-            store,
-            start,
-            end,
-            tz,
-            progress_callback=progress_callback,
-            verbose=verbose,
-            strict=strict,
-            ingest_mode=ingest_mode,
-            error_sample_limit=error_sample_limit,
-            workers=workers,
-        )
+        store.refresh_content_db()
+        # Bucket keys follow the configured zone, not a one-off --timezone;
+        # re-keying only here keeps it under the ingest lock.
+        store.set_bucket_timezone(resolve_timezone_name(store.path))
+        scanned_at = time.time()
+        with store.events_revision_scope():
+            stats = _ingest_rollouts_locked(
+                path,
+                store,
+                start,
+                end,
+                tz,
+                progress_callback=progress_callback,
+                verbose=verbose,
+                strict=strict,
+                ingest_mode=ingest_mode,
+                error_sample_limit=error_sample_limit,
+                workers=workers,
+            )
+        _record_rollout_scan(store, path, scanned_at, start, end, ingest_mode)
+        _flush_fts_queue(store, idle=stats.files_parsed == 0)
+        store.collect_payload_blobs()
+        _write_status_snapshot(store)
+        return stats
     finally:
         _release_ingestion_lock(lock_handle)
 
@@ -903,6 +1343,9 @@ def ingest_cli_output(
     store: UsageStore,
     tz: ZoneInfo,
 ) -> CliLogStats:
+    from .hash_utils import compute_file_hash
+    from .parser import StatusCapture, map_limits, parse_token_usage_line
+
     stats = CliLogStats()
     capture = StatusCapture()
     stat_info = None
@@ -985,6 +1428,7 @@ def ingest_cli_output(
         stats.lines = 0
         return stats
     stats.events += store.insert_events_bulk(pending_events)
+    store.refresh_session_summary_for_source(str(log_path))
     if stat_info is not None:
         if content_hash is None:
             try:
@@ -997,11 +1441,12 @@ def ingest_cli_output(
             stat_info.st_size,
             content_hash=content_hash,
         )
+    _write_status_snapshot(store)
     return stats
 
 
-def _load_usage_events(store: UsageStore) -> Iterable[Dict[str, object]]:
-    return [dict(row) for row in store.iter_usage_events()]
+def _load_usage_events(store: UsageStore) -> Iterator[Dict[str, object]]:
+    return (dict(row) for row in store.iter_usage_events())
 
 
 def _to_utc_iso(value: Optional[datetime]) -> Optional[str]:
@@ -1016,14 +1461,14 @@ def _load_usage_events_for_range(
     store: UsageStore,
     start: Optional[datetime],
     end: Optional[datetime],
-) -> list[Dict[str, object]]:
-    return [
+) -> Iterator[Dict[str, object]]:
+    return (
         dict(row)
         for row in store.iter_usage_events(
             start=_to_utc_iso(start),
             end=_to_utc_iso(end),
         )
-    ]
+    )
 
 
 def _filter_range(
@@ -1032,6 +1477,8 @@ def _filter_range(
     end: Optional[datetime],
     tz: ZoneInfo,
 ) -> Iterable[Dict[str, object]]:
+    from .report import parse_datetime, to_local
+
     filtered = []
     for event in events:
         captured_raw = event.get("captured_at_utc") or event.get("captured_at")
@@ -1104,19 +1551,28 @@ def _estimate_weekly_quota(
     pricing: Optional[PricingConfig] = None,
     tz: ZoneInfo = ZoneInfo(DEFAULT_TIMEZONE),
 ) -> Optional[Dict[str, object]]:
-    week_start, week_end = _last_completed_week(now)
-    events = _load_usage_events_for_range(store, week_start, week_end)
-    if not events:
-        return None
+    from .report import default_pricing, estimate_event_cost, pricing_fingerprint
 
-    total_tokens = sum(int(event.get("total_tokens") or 0) for event in events)
+    week_start, week_end = _last_completed_week(now)
     pricing = pricing if pricing is not None else default_pricing()
-    total_cost, _, _, _ = compute_costs(events, pricing)
-    if total_tokens <= 0:
-        return None
+    pricing_hash = pricing_fingerprint(pricing)
+    watermark = store.events_watermark(_to_utc_iso(week_start), _to_utc_iso(week_end))
+    cached = store.weekly_quota_for_week(week_start.isoformat())
+    if (
+        cached is not None
+        and cached["input_watermark"] == watermark
+        and cached["pricing_hash"] == pricing_hash
+    ):
+        return dict(cached)
 
+    total_tokens = 0
+    total_cost = 0.0
     used_percent_max = None
-    for event in events:
+    for event in _load_usage_events_for_range(store, week_start, week_end):
+        total_tokens += int(event.get("total_tokens") or 0)
+        cost = estimate_event_cost(event, pricing)
+        if cost is not None:
+            total_cost += cost
         percent_left = event.get("limit_weekly_percent_left")
         if percent_left is None:
             continue
@@ -1126,6 +1582,8 @@ def _estimate_weekly_quota(
             if used_percent_max is None
             else max(used_percent_max, used_percent)
         )
+    if total_tokens <= 0:
+        return None
 
     scale = 1.0
     if used_percent_max is not None and used_percent_max > 0:
@@ -1142,11 +1600,25 @@ def _estimate_weekly_quota(
         "observed_tokens": total_tokens,
         "observed_cost": total_cost,
         "computed_at": now.isoformat(),
+        "input_watermark": watermark,
+        "pricing_hash": pricing_hash,
     }
-    store.upsert_weekly_quota(**payload)
+    # Reports hold only the shared read lock; cache the estimate only when the
+    # caller also holds the ingest lock on a writable store.
+    if not store.read_only and _INGEST_LOCK_DEPTH > 0:
+        store.upsert_weekly_quota(**payload)
     return payload
 
 
+def _open_export_output(path: Path, compress: bool) -> TextIO:
+    import gzip
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return path.open("w", encoding="utf-8", newline="")
+
+
 def _format_int(value: Optional[object]) -> str:
     return f"{int(value or 0):,}"
 
@@ -1192,6 +1664,46 @@ def _print_status(row: Dict[str, object]) -> None:
         print(f"Weekly limit: {row.get('limit_weekly_percent_left')}% left{reset_text}")
 
 
+def _content_layout_info(store: UsageStore) -> Dict[str, object]:
+    def file_bytes(path: Path) -> int:
+        return sum(
+            candidate.stat().st_size
+            for candidate in (path, Path(f"{path}-wal"))
+            if candidate.exists()
+        )
+
+    content_path = content_db_path(store.path)
+    return {
+        "layout": store.content_layout(),
+        "path": str(store.path),
+        "main_bytes": file_bytes(store.path),
+        "content_path": str(content_path),
+        "content_bytes": file_bytes(content_path),
+    }
+
+
+def _print_compression(payload: Dict[str, object]) -> None:
+    state = "on" if payload["enabled"] else "off"
+    if payload["enabled"]:
+        state += (
+            f" ({payload['algorithm']} level {payload['level']}, "
+            f"{payload['dictionary_bytes']:,} byte dictionary)"
+        )
+    print(f"Compression: {state}")
+    for name, column in payload["columns"].items():
+        if not column["rows"]:
+            continue
+        print(
+            f"  {name}: {column['raw_bytes']:,} -> {column['stored_bytes']:,} bytes "
+            f"({column['compressed_rows']:,}/{column['rows']:,} rows compressed)"
+        )
+    if payload["ratio"]:
+        print(
+            f"  total: {payload['raw_bytes']:,} -> {payload['stored_bytes']:,} bytes, "
+            f"{payload['ratio']}x, {payload['saved_bytes']:,} bytes saved"
+        )
+
+
 def _profile_db(store: UsageStore) -> Dict[str, object]:
     conn = store.conn
     tables = [
@@ -1201,10 +1713,13 @@ def _profile_db(store: UsageStore) -> Dict[str, object]:
         "activity_events",
         "tool_calls",
         "messages",
+        "payload_blobs",
         "ingestion_files",
         "app_turns",
         "app_items",
         "weekly_quota_estimates",
+        "weekly_quota_history",
+        "latest_status",
     ]
     counts = {}
     for table in tables:
@@ -1226,6 +1741,22 @@ def _profile_db(store: UsageStore) -> Dict[str, object]:
             """
         ).fetchall():
             sizes.append({"name": row["name"], "bytes": int(row["bytes"] or 0)})
+        if store.content_schema != "main":
+            for row in conn.execute(
+                """
+                SELECT name, SUM(pgsize) AS bytes
+                FROM dbstat(?)
+                GROUP BY name
+                """,
+                (store.content_schema,),
+            ).fetchall():
+                sizes.append(
+                    {
+                        "name": f"{store.content_schema}.{row['name']}",
+                        "bytes": int(row["bytes"] or 0),
+                    }
+                )
+            sizes = sorted(sizes, key=lambda item: item["bytes"], reverse=True)[:25]
     except Exception:
         sizes = []
 
@@ -1268,6 +1799,9 @@ def _profile_db(store: UsageStore) -> Dict[str, object]:
         "schema_version": store._get_meta("schema_version"),
         "ingest_version": store._get_meta("ingest_version"),
         "storage_profile_version": store._get_meta("storage_profile_version"),
+        "content": _content_layout_info(store),
+        "compression": store.compression_profile(),
+        "payload_blobs": store.payload_blob_profile(),
         "counts": counts,
         "sizes": sizes,
         "ingestion": dict(ingestion) if ingestion else {},
@@ -1283,6 +1817,8 @@ def _parse_cli_range(
     default_last: Optional[str] = None,
     default_today: bool = False,
 ) -> Tuple[Optional[datetime], Optional[datetime]]:
+    from .report import parse_datetime, parse_last, to_local
+
     now = datetime.now(tz)
     has_explicit_range = bool(args.today or args.last or args.from_date or args.to_date)
     if not has_explicit_range and default_today:
@@ -1308,6 +1844,8 @@ def _parse_compare_ranges(
     args: argparse.Namespace,
     tz: ZoneInfo,
 ) -> Tuple[datetime, datetime, datetime, datetime]:
+    from .report import parse_datetime, to_local
+
     current_start, current_end = _parse_cli_range(args, tz, default_today=True)
     if current_start is None or current_end is None:
         raise ValueError("compare requires a bounded current range")
@@ -1406,6 +1944,37 @@ def _print_session_rows(title: str, rows: object, currency_label: str) -> None:
         )
 
 
+def _print_search(payload: Dict[str, object]) -> None:
+    rows = list(payload.get("rows") or [])
+    tools = payload.get("target") == "tools"
+    print(f"Search ({payload.get('mode')}): {payload.get('query')}")
+    if not rows:
+        print("  No matching tool calls." if tools else "  No matching messages.")
+    for row in rows:
+        snippet = " ".join(str(row.get("snippet") or "").split())
+        if tools:
+            turn = row.get("turn_index")
+            print(
+                "  "
+                f"{_truncate(row.get('captured_at_utc'), 20):<20}  "
+                f"{_truncate(row.get('session_id'), 12):<12}  "
+                f"{'turn ' + str(turn) if turn is not None else '-':<9}  "
+                f"{_truncate(row.get('tool_name') or row.get('tool_type'), 16):<16}  "
+                f"{_truncate(_directory_basename(row.get('cwd')), 16):<16}  "
+                f"{snippet}"
+            )
+            continue
+        print(
+            "  "
+            f"{_truncate(row.get('captured_at_utc'), 20):<20}  "
+            f"{_truncate(row.get('session_id'), 12):<12}  "
+            f"{_truncate(row.get('role'), 9):<9}  "
+            f"{snippet}"
+        )
+    if payload.get("next_offset") is not None:
+        print(f"More results: --offset {payload['next_offset']}")
+
+
 def _print_named_rows(
     title: str,
     rows: object,
@@ -1511,6 +2080,8 @@ def _print_doctor(payload: Dict[str, object]) -> None:
                     for name, value in timings.items()
                 )
             )
+        for issue in check.get("issues", ()):
+            print(f"  {issue['name']}: {issue['detail']}")
 
 
 def _print_pricing(payload: Dict[str, object]) -> None:
@@ -1554,9 +2125,19 @@ def _print_pricing(payload: Dict[str, object]) -> None:
         )
 
 
-def build_parser() -> argparse.ArgumentParser:
+def build_parser(argv: Optional[Sequence[str]] = None) -> argparse.ArgumentParser:
+    """
+    Build the CLI parser.
+
+    When ``argv`` names a known subcommand, only that subcommand's arguments
+    are registered; building all of them dominates startup for quick commands.
+    """
     parser = argparse.ArgumentParser(prog="codex-track")
     subparsers = parser.add_subparsers(dest="command", required=True)
+    selected = argv[0] if argv and argv[0] in COMMAND_NAMES else None
+
+    def wanted(name: str) -> bool:
+        return selected is None or selected == name
 
     def add_ingest_args(target: argparse.ArgumentParser) -> None:
         target.add_argument(
@@ -1595,6 +2176,22 @@ def build_parser() -> argparse.ArgumentParser:
             ),
         )
 
+    def add_sync_args(target: argparse.ArgumentParser) -> None:
+        target.add_argument(
+            "--no-sync",
+            action="store_true",
+            help="Answer from the database without scanning rollouts first",
+        )
+        target.add_argument(
+            "--max-staleness",
+            type=_parse_staleness,
+            default=None,
+            help=(
+                "Skip the rollout scan if the last one is newer than this "
+                f"(e.g. 0, 30s, 5m; default {DEFAULT_MAX_STALENESS_SECONDS:.0f}s)"
+            ),
+        )
+
     def add_range_args(target: argparse.ArgumentParser, *, help_prefix: str = "range") -> None:
         target.add_argument(
             "--last",
@@ -1616,64 +2213,115 @@ def build_parser() -> argparse.ArgumentParser:
             help=f"Timezone for {help_prefix}s (IANA name, default {DEFAULT_TIMEZONE})",
         )
 
-    report_parser = subparsers.add_parser("report", help="Aggregate usage reports")
-    report_parser.add_argument("--db", type=Path, default=None)
-    report_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(report_parser)
-    report_parser.add_argument(
-        "--last",
-        type=str,
-        default=None,
-        help="Relative range like 7d, 12h, 1m (month), 30min, or total",
-    )
-    report_parser.add_argument(
-        "--today",
-        action="store_true",
-        help="Use today's usage (midnight to now, local timezone)",
-    )
-    report_parser.add_argument("--from", dest="from_date", type=str, default=None)
-    report_parser.add_argument("--to", dest="to_date", type=str, default=None)
-    report_parser.add_argument(
-        "--timezone",
-        type=str,
-        default=None,
-        help=f"Timezone for report ranges (IANA name, default {DEFAULT_TIMEZONE})",
-    )
-    report_parser.add_argument(
-        "--group", choices=["day", "week", "month"], default="day"
-    )
-    report_parser.add_argument(
-        "--by", choices=["model", "directory", "session"], default=None
-    )
-    report_parser.add_argument(
-        "--format", choices=["table", "json", "csv"], default="table"
-    )
-
-    export_parser = subparsers.add_parser("export", help="Export raw events")
-    export_parser.add_argument("--db", type=Path, default=None)
-    export_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(export_parser)
-    export_parser.add_argument("--format", choices=["json", "csv"], default="json")
-    export_parser.add_argument("--out", type=Path, required=True)
+    if wanted("report"):
+        report_parser = subparsers.add_parser("report", help="Aggregate usage reports")
+        report_parser.add_argument("--db", type=Path, default=None)
+        report_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(report_parser)
+        add_sync_args(report_parser)
+        report_parser.add_argument(
+            "--last",
+            type=str,
+            default=None,
+            help="Relative range like 7d, 12h, 1m (month), 30min, or total",
+        )
+        report_parser.add_argument(
+            "--today",
+            action="store_true",
+            help="Use today's usage (midnight to now, local timezone)",
+        )
+        report_parser.add_argument("--from", dest="from_date", type=str, default=None)
+        report_parser.add_argument("--to", dest="to_date", type=str, default=None)
+        report_parser.add_argument(
+            "--timezone",
+            type=str,
+            default=None,
+            help=f"Timezone for report ranges (IANA name, default {DEFAULT_TIMEZONE})",
+        )
+        report_parser.add_argument(
+            "--group", choices=["day", "week", "month"], default="day"
+        )
+        report_parser.add_argument(
+            "--by", choices=["model", "directory", "session"], default=None
+        )
+        report_parser.add_argument(
+            "--depth",
+            type=int,
+            default=None,
+            help="With --by directory, roll directories up to this many path components",
+        )
+        report_parser.add_argument(
+            "--format", choices=["table", "json", "csv"], default="table"
+        )
 
-    status_parser = subparsers.add_parser(
-        "status", help="Show latest captured usage snapshot"
-    )
-    status_parser.add_argument("--db", type=Path, default=None)
-    status_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(status_parser)
+    if wanted("export"):
+        from .columnar import COLUMNAR_FORMATS, DEFAULT_ROW_GROUP_SIZE
+
+        export_parser = subparsers.add_parser("export", help="Export raw events")
+        export_parser.add_argument("--db", type=Path, default=None)
+        export_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(export_parser)
+        add_sync_args(export_parser)
+        add_range_args(export_parser, help_prefix="export range")
+        export_parser.add_argument(
+            "--format",
+            choices=["json", "csv", "ndjson", *COLUMNAR_FORMATS],
+            default="json",
+            help="Output format; arrow and parquet need pyarrow, npz has no extra dependencies",
+        )
+        export_parser.add_argument(
+            "--row-group-size",
+            type=int,
+            default=DEFAULT_ROW_GROUP_SIZE,
+            help=f"Rows per record batch/row group for columnar formats (default {DEFAULT_ROW_GROUP_SIZE})",
+        )
+        export_parser.add_argument(
+            "--table",
+            choices=list(EXPORT_TABLES),
+            default="events",
+            help="Table to export (default events)",
+        )
+        export_parser.add_argument(
+            "--event-type",
+            type=str,
+            default=None,
+            help="Only export rows of this event type (tool type for tool_calls, role for messages)",
+        )
+        export_parser.add_argument(
+            "--model",
+            type=str,
+            default=None,
+            help="Only export rows for this model",
+        )
+        export_parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Gzip-compress the output (implied when --out ends with .gz)",
+        )
+        export_parser.add_argument("--out", type=Path, required=True)
 
-    profile_parser = subparsers.add_parser(
-        "profile",
-        help="Inspect DB size, row counts, and ingestion/index profile",
-    )
-    profile_parser.add_argument("--db", type=Path, default=None)
-    profile_parser.add_argument("--format", choices=["json", "table"], default="table")
+    if wanted("status"):
+        status_parser = subparsers.add_parser(
+            "status", help="Show latest captured usage snapshot"
+        )
+        status_parser.add_argument("--db", type=Path, default=None)
+        status_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(status_parser)
+        add_sync_args(status_parser)
+
+    if wanted("profile"):
+        profile_parser = subparsers.add_parser(
+            "profile",
+            help="Inspect DB size, row counts, and ingestion/index profile",
+        )
+        profile_parser.add_argument("--db", type=Path, default=None)
+        profile_parser.add_argument("--format", choices=["json", "table"], default="table")
 
     def add_pricing_list_args(target: argparse.ArgumentParser) -> None:
         target.add_argument("--db", type=Path, default=None)
         target.add_argument("--rollouts", type=Path, default=None)
         add_ingest_args(target)
+        add_sync_args(target)
         add_range_args(target, help_prefix="pricing usage range")
         target.add_argument(
             "--used-only",
@@ -1682,103 +2330,178 @@ def build_parser() -> argparse.ArgumentParser:
         )
         target.add_argument("--json", dest="json_output", action="store_true")
 
-    pricing_parser = subparsers.add_parser(
-        "pricing",
-        help="Show and manage model cost rates used for cost tracking",
-    )
-    add_pricing_list_args(pricing_parser)
-    pricing_subparsers = pricing_parser.add_subparsers(
-        dest="pricing_command",
-        required=False,
-    )
-    pricing_list_parser = pricing_subparsers.add_parser(
-        "list",
-        help="Show effective model pricing and tracked cost totals",
-    )
-    add_pricing_list_args(pricing_list_parser)
+    if wanted("pricing"):
+        pricing_parser = subparsers.add_parser(
+            "pricing",
+            help="Show and manage model cost rates used for cost tracking",
+        )
+        add_pricing_list_args(pricing_parser)
+        pricing_subparsers = pricing_parser.add_subparsers(
+            dest="pricing_command",
+            required=False,
+        )
+        pricing_list_parser = pricing_subparsers.add_parser(
+            "list",
+            help="Show effective model pricing and tracked cost totals",
+        )
+        add_pricing_list_args(pricing_list_parser)
 
-    pricing_set_parser = pricing_subparsers.add_parser(
-        "set",
-        help="Add or update a model pricing override",
-    )
-    pricing_set_parser.add_argument("model")
-    pricing_set_parser.add_argument("--db", type=Path, default=None)
-    pricing_set_parser.add_argument("--input-rate", type=float, default=None)
-    pricing_set_parser.add_argument("--cached-input-rate", type=float, default=None)
-    pricing_set_parser.add_argument("--output-rate", type=float, default=None)
-    pricing_set_parser.add_argument("--per-unit", type=int, default=None)
-    pricing_set_parser.add_argument("--unit", type=str, default=None)
-    pricing_set_parser.add_argument("--currency-label", type=str, default=None)
-    pricing_set_parser.add_argument("--json", dest="json_output", action="store_true")
-
-    pricing_remove_parser = pricing_subparsers.add_parser(
-        "remove",
-        help="Remove a model pricing override and fall back to defaults if available",
-    )
-    pricing_remove_parser.add_argument("model")
-    pricing_remove_parser.add_argument("--db", type=Path, default=None)
-    pricing_remove_parser.add_argument("--json", dest="json_output", action="store_true")
+        pricing_set_parser = pricing_subparsers.add_parser(
+            "set",
+            help="Add or update a model pricing override",
+        )
+        pricing_set_parser.add_argument("model")
+        pricing_set_parser.add_argument("--db", type=Path, default=None)
+        pricing_set_parser.add_argument("--input-rate", type=float, default=None)
+        pricing_set_parser.add_argument("--cached-input-rate", type=float, default=None)
+        pricing_set_parser.add_argument("--output-rate", type=float, default=None)
+        pricing_set_parser.add_argument("--per-unit", type=int, default=None)
+        pricing_set_parser.add_argument("--unit", type=str, default=None)
+        pricing_set_parser.add_argument("--currency-label", type=str, default=None)
+        pricing_set_parser.add_argument("--json", dest="json_output", action="store_true")
+
+        pricing_remove_parser = pricing_subparsers.add_parser(
+            "remove",
+            help="Remove a model pricing override and fall back to defaults if available",
+        )
+        pricing_remove_parser.add_argument("model")
+        pricing_remove_parser.add_argument("--db", type=Path, default=None)
+        pricing_remove_parser.add_argument("--json", dest="json_output", action="store_true")
 
-    pricing_path_parser = pricing_subparsers.add_parser(
-        "path",
-        help="Print the pricing config path",
-    )
-    pricing_path_parser.add_argument("--db", type=Path, default=None)
+        pricing_path_parser = pricing_subparsers.add_parser(
+            "path",
+            help="Print the pricing config path",
+        )
+        pricing_path_parser.add_argument("--db", type=Path, default=None)
 
-    insight_parser = subparsers.add_parser(
-        "insight",
-        help="Show high-level usage, cost, session, and tool signals",
-    )
-    insight_parser.add_argument("--db", type=Path, default=None)
-    insight_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(insight_parser)
-    add_range_args(insight_parser, help_prefix="insight range")
-    insight_parser.add_argument("--limit", type=int, default=10)
-    insight_parser.add_argument("--json", dest="json_output", action="store_true")
-
-    sessions_parser = subparsers.add_parser(
-        "sessions",
-        help="List recent sessions or rank interesting sessions",
-    )
-    sessions_parser.add_argument("--db", type=Path, default=None)
-    sessions_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(sessions_parser)
-    add_range_args(sessions_parser, help_prefix="session range")
-    sessions_parser.add_argument("--interesting", action="store_true")
-    sessions_parser.add_argument("--limit", type=int, default=20)
-    sessions_parser.add_argument("--cwd", type=str, default=None)
-    sessions_parser.add_argument("--model", type=str, default=None)
-    sessions_parser.add_argument("--search", type=str, default=None)
-    sessions_parser.add_argument("--json", dest="json_output", action="store_true")
-
-    doctor_parser = subparsers.add_parser(
-        "doctor",
-        help="Check storage, FTS, indexes, row counts, and query timings",
-    )
-    doctor_parser.add_argument("--db", type=Path, default=None)
-    doctor_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(doctor_parser)
-    doctor_parser.add_argument("--sync", action="store_true")
-    doctor_parser.add_argument("--json", dest="json_output", action="store_true")
-
-    compare_parser = subparsers.add_parser(
-        "compare",
-        help="Compare usage, cost, sessions, and tool signals across two windows",
-    )
-    compare_parser.add_argument("--db", type=Path, default=None)
-    compare_parser.add_argument("--rollouts", type=Path, default=None)
-    add_ingest_args(compare_parser)
-    add_range_args(compare_parser, help_prefix="current range")
-    compare_parser.add_argument(
-        "--vs",
-        choices=["previous"],
-        default="previous",
-        help="Comparison strategy when --vs-from/--vs-to are omitted",
-    )
-    compare_parser.add_argument("--vs-from", dest="vs_from_date", type=str, default=None)
-    compare_parser.add_argument("--vs-to", dest="vs_to_date", type=str, default=None)
-    compare_parser.add_argument("--limit", type=int, default=10)
-    compare_parser.add_argument("--json", dest="json_output", action="store_true")
+    if wanted("insight"):
+        insight_parser = subparsers.add_parser(
+            "insight",
+            help="Show high-level usage, cost, session, and tool signals",
+        )
+        insight_parser.add_argument("--db", type=Path, default=None)
+        insight_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(insight_parser)
+        add_sync_args(insight_parser)
+        add_range_args(insight_parser, help_prefix="insight range")
+        insight_parser.add_argument("--limit", type=int, default=10)
+        insight_parser.add_argument("--json", dest="json_output", action="store_true")
+
+    if wanted("sessions"):
+        sessions_parser = subparsers.add_parser(
+            "sessions",
+            help="List recent sessions or rank interesting sessions",
+        )
+        sessions_parser.add_argument("--db", type=Path, default=None)
+        sessions_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(sessions_parser)
+        add_sync_args(sessions_parser)
+        add_range_args(sessions_parser, help_prefix="session range")
+        sessions_parser.add_argument("--interesting", action="store_true")
+        sessions_parser.add_argument("--limit", type=int, default=20)
+        sessions_parser.add_argument("--cwd", type=str, default=None)
+        sessions_parser.add_argument("--model", type=str, default=None)
+        sessions_parser.add_argument("--search", type=str, default=None)
+        sessions_parser.add_argument("--json", dest="json_output", action="store_true")
+
+    if wanted("search"):
+        from .search import DEFAULT_SEARCH_LIMIT, SEARCH_MODES
+
+        search_parser = subparsers.add_parser(
+            "search",
+            help="Search stored message text or tool call commands and payloads",
+        )
+        search_parser.add_argument("query")
+        search_parser.add_argument("--db", type=Path, default=None)
+        search_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(search_parser)
+        add_sync_args(search_parser)
+        search_parser.add_argument(
+            "--mode",
+            choices=SEARCH_MODES,
+            default="auto",
+            help="phrase uses the word index; substring needs `fts enable-substring`",
+        )
+        search_parser.add_argument(
+            "--tools",
+            action="store_true",
+            help="search tool call commands, inputs and outputs instead of messages",
+        )
+        search_parser.add_argument("--session", type=str, default=None)
+        search_parser.add_argument("--limit", type=int, default=DEFAULT_SEARCH_LIMIT)
+        search_parser.add_argument("--offset", type=int, default=0)
+        search_parser.add_argument("--json", dest="json_output", action="store_true")
+
+    if wanted("fts"):
+        fts_parser = subparsers.add_parser(
+            "fts",
+            help="Inspect and manage message and tool call search indexes",
+        )
+        fts_subparsers = fts_parser.add_subparsers(dest="fts_command", required=True)
+        fts_status_parser = fts_subparsers.add_parser(
+            "status",
+            help="Show which search indexes exist and how many changes are queued",
+        )
+        fts_status_parser.add_argument("--db", type=Path, default=None)
+        fts_status_parser.add_argument("--json", dest="json_output", action="store_true")
+        fts_enable_parser = fts_subparsers.add_parser(
+            "enable-substring",
+            help="Build the trigram index used for substring and identifier search",
+        )
+        fts_enable_parser.add_argument("--db", type=Path, default=None)
+        fts_disable_parser = fts_subparsers.add_parser(
+            "disable-substring",
+            help="Drop the trigram index",
+        )
+        fts_disable_parser.add_argument("--db", type=Path, default=None)
+        fts_sync_parser = fts_subparsers.add_parser(
+            "sync",
+            help="Apply queued message and tool call changes to the search indexes",
+        )
+        fts_sync_parser.add_argument("--db", type=Path, default=None)
+        fts_mode_parser = fts_subparsers.add_parser(
+            "mode",
+            help="Update search indexes per row (immediate) or in batches (deferred)",
+        )
+        fts_mode_parser.add_argument("mode", choices=["immediate", "deferred"])
+        fts_mode_parser.add_argument("--db", type=Path, default=None)
+
+    if wanted("doctor"):
+        doctor_parser = subparsers.add_parser(
+            "doctor",
+            help="Check storage, FTS, indexes, row counts, and query timings",
+        )
+        doctor_parser.add_argument("--db", type=Path, default=None)
+        doctor_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(doctor_parser)
+        doctor_parser.add_argument("--sync", action="store_true")
+        doctor_parser.add_argument(
+            "--query-plans",
+            action="store_true",
+            help="EXPLAIN the tracker's and dashboard's queries on this database and report full scans",
+        )
+        doctor_parser.add_argument("--json", dest="json_output", action="store_true")
+
+    if wanted("compare"):
+        compare_parser = subparsers.add_parser(
+            "compare",
+            help="Compare usage, cost, sessions, and tool signals across two windows",
+        )
+        compare_parser.add_argument("--db", type=Path, default=None)
+        compare_parser.add_argument("--rollouts", type=Path, default=None)
+        add_ingest_args(compare_parser)
+        add_sync_args(compare_parser)
+        add_range_args(compare_parser, help_prefix="current range")
+        compare_parser.add_argument(
+            "--vs",
+            choices=["previous"],
+            default="previous",
+            help="Comparison strategy when --vs-from/--vs-to are omitted",
+        )
+        compare_parser.add_argument("--vs-from", dest="vs_from_date", type=str, default=None)
+        compare_parser.add_argument("--vs-to", dest="vs_to_date", type=str, default=None)
+        compare_parser.add_argument("--limit", type=int, default=10)
+        compare_parser.add_argument("--json", dest="json_output", action="store_true")
 
     def add_ui_args(ui_subparser: argparse.ArgumentParser) -> None:
         ui_subparser.add_argument("--db", type=Path, default=None)
@@ -1786,95 +2509,140 @@ def build_parser() -> argparse.ArgumentParser:
         ui_subparser.add_argument("--port", type=int, default=None)
         ui_subparser.add_argument("--no-open", action="store_true")
 
-    ui_parser = subparsers.add_parser("ui", help="Launch the Next.js dashboard")
-    add_ui_args(ui_parser)
+    if wanted("ui"):
+        ui_parser = subparsers.add_parser("ui", help="Launch the Next.js dashboard")
+        add_ui_args(ui_parser)
 
-    web_parser = subparsers.add_parser(
-        "web", help="Launch the web dashboard (alias for ui)"
-    )
-    add_ui_args(web_parser)
+    if wanted("web"):
+        web_parser = subparsers.add_parser(
+            "web", help="Launch the web dashboard (alias for ui)"
+        )
+        add_ui_args(web_parser)
 
-    ingest_cli_parser = subparsers.add_parser(
-        "ingest-cli",
-        help="Ingest Codex CLI output logs for status snapshots",
-    )
-    ingest_cli_parser.add_argument("--db", type=Path, default=None)
-    ingest_cli_parser.add_argument(
-        "--log",
-        type=Path,
-        default=Path("-"),
-        help="Path to the CLI output log (use '-' for stdin)",
-    )
+    if wanted("ingest-cli"):
+        ingest_cli_parser = subparsers.add_parser(
+            "ingest-cli",
+            help="Ingest Codex CLI output logs for status snapshots",
+        )
+        ingest_cli_parser.add_argument("--db", type=Path, default=None)
+        ingest_cli_parser.add_argument(
+            "--log",
+            type=Path,
+            default=Path("-"),
+            help="Path to the CLI output log (use '-' for stdin)",
+        )
 
-    ingest_app_parser = subparsers.add_parser(
-        "ingest-app-server",
-        help="Ingest codex app-server JSON-RPC logs for timing metrics",
-    )
-    ingest_app_parser.add_argument("--db", type=Path, default=None)
-    ingest_app_parser.add_argument(
-        "--log",
-        type=Path,
-        default=Path("-"),
-        help="Path to the app-server JSON-RPC log (use '-' for stdin)",
-    )
+    if wanted("ingest-app-server"):
+        ingest_app_parser = subparsers.add_parser(
+            "ingest-app-server",
+            help="Ingest codex app-server JSON-RPC logs for timing metrics",
+        )
+        ingest_app_parser.add_argument("--db", type=Path, default=None)
+        ingest_app_parser.add_argument(
+            "--log",
+            type=Path,
+            default=Path("-"),
+            help="Path to the app-server JSON-RPC log (use '-' for stdin)",
+        )
 
-    watch_parser = subparsers.add_parser(
-        "watch",
-        help="Watch rollouts and auto-ingest new files",
-    )
-    watch_parser.add_argument("--db", type=Path, default=None)
-    watch_parser.add_argument("--rollouts", type=Path, default=None)
-    watch_parser.add_argument(
-        "--interval",
-        type=float,
-        default=30,
-        help="Polling interval in seconds",
-    )
-    add_ingest_args(watch_parser)
-    watch_parser.add_argument(
-        "--last",
-        type=str,
-        default=None,
-        help="Relative range like 7d, 12h, 1m (month), 30min, or total",
-    )
-    watch_parser.add_argument(
-        "--today",
-        action="store_true",
-        help="Use today's usage for the initial ingest (midnight to now)",
-    )
-    watch_parser.add_argument("--from", dest="from_date", type=str, default=None)
-    watch_parser.add_argument("--to", dest="to_date", type=str, default=None)
-    watch_parser.add_argument(
-        "--timezone",
-        type=str,
-        default=None,
-        help=f"Timezone for initial range (IANA name, default {DEFAULT_TIMEZONE})",
-    )
+    if wanted("watch"):
+        watch_parser = subparsers.add_parser(
+            "watch",
+            help="Watch rollouts and auto-ingest new files",
+        )
+        watch_parser.add_argument("--db", type=Path, default=None)
+        watch_parser.add_argument("--rollouts", type=Path, default=None)
+        watch_parser.add_argument(
+            "--interval",
+            type=float,
+            default=30,
+            help="Polling interval in seconds",
+        )
+        add_ingest_args(watch_parser)
+        watch_parser.add_argument(
+            "--last",
+            type=str,
+            default=None,
+            help="Relative range like 7d, 12h, 1m (month), 30min, or total",
+        )
+        watch_parser.add_argument(
+            "--today",
+            action="store_true",
+            help="Use today's usage for the initial ingest (midnight to now)",
+        )
+        watch_parser.add_argument("--from", dest="from_date", type=str, default=None)
+        watch_parser.add_argument("--to", dest="to_date", type=str, default=None)
+        watch_parser.add_argument(
+            "--timezone",
+            type=str,
+            default=None,
+            help=f"Timezone for initial range (IANA name, default {DEFAULT_TIMEZONE})",
+        )
 
-    clear_parser = subparsers.add_parser("clear-db", help="Delete the local usage DB")
-    clear_parser.add_argument("--db", type=Path, default=None)
-    clear_parser.add_argument("--yes", action="store_true")
+    if wanted("clear-db"):
+        clear_parser = subparsers.add_parser("clear-db", help="Delete the local usage DB")
+        clear_parser.add_argument("--db", type=Path, default=None)
+        clear_parser.add_argument("--yes", action="store_true")
 
-    purge_parser = subparsers.add_parser(
-        "purge-content",
-        help="Delete stored content messages and tool calls from the usage DB",
-    )
-    purge_parser.add_argument("--db", type=Path, default=None)
-    purge_parser.add_argument("--yes", action="store_true")
+    if wanted("purge-content"):
+        purge_parser = subparsers.add_parser(
+            "purge-content",
+            help="Delete stored content messages and tool calls from the usage DB",
+        )
+        purge_parser.add_argument("--db", type=Path, default=None)
+        purge_parser.add_argument("--yes", action="store_true")
 
-    purge_payloads_parser = subparsers.add_parser(
-        "purge-payloads",
-        help="Delete stored content messages and redact stored tool call payloads",
-    )
-    purge_payloads_parser.add_argument("--db", type=Path, default=None)
-    purge_payloads_parser.add_argument("--yes", action="store_true")
+    if wanted("purge-payloads"):
+        purge_payloads_parser = subparsers.add_parser(
+            "purge-payloads",
+            help="Delete stored content messages and redact stored tool call payloads",
+        )
+        purge_payloads_parser.add_argument("--db", type=Path, default=None)
+        purge_payloads_parser.add_argument("--yes", action="store_true")
 
-    vacuum_parser = subparsers.add_parser(
-        "vacuum",
-        help="Run VACUUM to reclaim DB space after deletes (can take a while)",
-    )
-    vacuum_parser.add_argument("--db", type=Path, default=None)
-    vacuum_parser.add_argument("--yes", action="store_true")
+    if wanted("vacuum"):
+        vacuum_parser = subparsers.add_parser(
+            "vacuum",
+            help="Run VACUUM to reclaim DB space after deletes (can take a while)",
+        )
+        vacuum_parser.add_argument("--db", type=Path, default=None)
+        vacuum_parser.add_argument("--yes", action="store_true")
+
+    if wanted("content"):
+        content_parser = subparsers.add_parser(
+            "content",
+            help="Keep messages and tool payloads in the main DB or a separate content DB",
+        )
+        content_subparsers = content_parser.add_subparsers(
+            dest="content_command", required=True
+        )
+        for name, help_text in (
+            ("status", "Show the content layout and file sizes"),
+            ("split", "Move messages and tool calls into <db>.content.db"),
+            ("merge", "Move messages and tool calls back into the main DB"),
+            ("compress", "Compress message text and tool payloads with a trained dictionary"),
+            ("decompress", "Store message text and tool payloads uncompressed again"),
+        ):
+            content_subparser = content_subparsers.add_parser(name, help=help_text)
+            content_subparser.add_argument("--db", type=Path, default=None)
+            if name == "compress":
+                content_subparser.add_argument(
+                    "--level",
+                    type=int,
+                    default=DEFAULT_COMPRESSION_LEVEL,
+                    help=f"zlib level 0-9 (default {DEFAULT_COMPRESSION_LEVEL})",
+                )
+                content_subparser.add_argument(
+                    "--samples",
+                    type=int,
+                    default=DEFAULT_TRAINING_SAMPLES,
+                    help="Newest values per column used to train the dictionary",
+                )
+                content_subparser.add_argument(
+                    "--retrain",
+                    action="store_true",
+                    help="Train a new dictionary and recompress rows that used an older one",
+                )
 
     return parser
 
@@ -1886,28 +2654,53 @@ def _ingest_for_range(
     end: Optional[datetime],
     tz: ZoneInfo,
     ingest_mode: IngestMode,
+    force: bool = False,
 ) -> None:
+    purge = None
     if ingest_mode == "none" and bool(getattr(args, "no_content", False)):
-        store.purge_content()
+        purge = store.purge_content
     elif ingest_mode == "redact_payloads" and bool(getattr(args, "no_payloads", False)):
-        store.purge_payloads()
+        purge = store.purge_payloads
+    if purge is not None:
+        lock_handle = _acquire_ingestion_lock(store.path)
+        try:
+            purge()
+            _price_session_summary(store)
+        finally:
+            _release_ingestion_lock(lock_handle)
     rollouts_dir = args.rollouts if args.rollouts else default_rollouts_dir()
-    ingest_rollouts(
-        rollouts_dir,
-        store,
-        start,
-        end,
-        tz,
-        verbose=args.verbose,
-        strict=args.strict,
-        ingest_mode=ingest_mode,
-        workers=getattr(args, "workers", None),
-    )
+    if not force:
+        reason = _sync_skip_reason(args, store, rollouts_dir, start, ingest_mode)
+        if reason is not None:
+            if args.verbose:
+                sys.stderr.write(f"Skipping rollout scan: {reason}\n")
+            return
+    try:
+        lock_handle = _acquire_ingestion_lock(store.path, blocking=force)
+    except IngestLockBusy as exc:
+        _report_busy_ingest(store, exc.holder)
+        return
+    try:
+        ingest_rollouts(
+            rollouts_dir,
+            store,
+            start,
+            end,
+            tz,
+            verbose=args.verbose,
+            strict=args.strict,
+            ingest_mode=ingest_mode,
+            workers=getattr(args, "workers", None),
+        )
+    finally:
+        _release_ingestion_lock(lock_handle)
 
 
 def _parse_initial_watch_range(
     args: argparse.Namespace, tz: ZoneInfo
 ) -> Tuple[Optional[datetime], Optional[datetime]]:
+    from .report import parse_datetime, parse_last, to_local
+
     now = datetime.now(tz)
     start = None
     end = None
@@ -1936,6 +2729,10 @@ def _run_watch(
 ) -> None:
     rollouts_dir = args.rollouts if args.rollouts else default_rollouts_dir()
     interval = max(1.0, float(args.interval))
+    watch_lock = _acquire_watch_lock(store.path, rollouts_dir, interval)
+    if watch_lock is None:
+        print(f"Another watch is already running for {store.path}.")
+        return
 
     print(
         f"Watching {rollouts_dir} every {interval:.0f}s. Press Ctrl+C to stop."
@@ -1964,19 +2761,39 @@ def _run_watch(
             time.sleep(interval)
     except KeyboardInterrupt:
         print("Stopping watch.")
+    finally:
+        _release_watch_lock(watch_lock)
+
+
+def _opens_read_only(args: argparse.Namespace, db_path: Path) -> bool:
+    if not db_path.exists():
+        return False
+    if args.command == "profile":
+        return True
+    if args.command == "doctor":
+        return not getattr(args, "sync", False)
+    return (
+        args.command == "status"
+        and getattr(args, "no_sync", False)
+        and not getattr(args, "no_content", False)
+        and not getattr(args, "no_payloads", False)
+    )
 
 
 def main() -> None:
-    parser = build_parser()
-    args = parser.parse_args()
+    argv = sys.argv[1:]
+    parser = build_parser(argv)
+    args = parser.parse_args(argv)
     db_path = args.db if getattr(args, "db", None) else default_db_path()
+    global _LOCK_OWNER
+    _LOCK_OWNER = f"codex-track {args.command}"
     command_lock = None
     pricing_reads_usage = args.command == "pricing" and getattr(args, "pricing_command", None) in (None, "list")
-    if args.command in {"report", "export", "status", "insight", "sessions", "compare"} or pricing_reads_usage or (
-        args.command == "doctor" and getattr(args, "sync", False)
-    ):
-        command_lock = _acquire_ingestion_lock(db_path)
-    store = UsageStore(db_path)
+    if args.command in {"report", "export", "status", "insight", "sessions", "search", "compare", "doctor"} or pricing_reads_usage:
+        command_lock = _acquire_read_lock(db_path)
+    elif args.command in {"clear-db", "vacuum", "purge-content"}:
+        command_lock = _acquire_read_lock(db_path, exclusive=True)
+    store = UsageStore(db_path, read_only=_opens_read_only(args, db_path))
     tz_override = getattr(args, "timezone", None)
     if tz_override:
         if not is_valid_timezone(tz_override):
@@ -1996,6 +2813,8 @@ def main() -> None:
         store.close()
         if path.exists():
             path.unlink()
+            _status_snapshot_path(path).unlink(missing_ok=True)
+            remove_database_files(content_db_path(path))
             print(f"Deleted {path}")
         else:
             print(f"No database found at {path}")
@@ -2013,6 +2832,20 @@ def main() -> None:
                 **payload
             )
         )
+        content = payload["content"]
+        if content["layout"] == "split":
+            print(
+                f"Content: split, main {content['main_bytes']:,} bytes, "
+                f"{content['content_path']} {content['content_bytes']:,} bytes"
+            )
+        _print_compression(payload["compression"])
+        blobs = payload["payload_blobs"]
+        if blobs["blobs"]:
+            print(
+                f"Payload blobs: {blobs['blobs']:,} unique, {blobs['references']:,} references, "
+                f"{blobs['referenced_chars']:,} -> {blobs['unique_chars']:,} chars "
+                f"({blobs['dedup_ratio']}x dedup)"
+            )
         print("Rows:")
         for name, count in payload["counts"].items():
             print(f"  {name}: {count:,}")
@@ -2030,14 +2863,98 @@ def main() -> None:
                 print(f"  {item['name']}: {item['bytes']:,} bytes")
         return
 
+    if args.command == "search":
+        from .search import SearchError, search_messages, search_tool_calls
+
+        if args.tools and args.mode == "substring":
+            store.close()
+            parser.error("--tools supports phrase search only")
+        try:
+            ingest_mode = _resolve_ingest_mode(args, db_path)
+        except ValueError as exc:
+            parser.error(str(exc))
+        _ingest_for_range(args, store, None, None, tz, ingest_mode)
+        highlight = ("<mark>", "</mark>") if args.json_output else ("[", "]")
+        try:
+            if args.tools:
+                payload = search_tool_calls(
+                    store,
+                    args.query,
+                    limit=args.limit,
+                    offset=args.offset,
+                    session_id=args.session,
+                    highlight=highlight,
+                )
+            else:
+                payload = search_messages(
+                    store,
+                    args.query,
+                    mode=args.mode,
+                    limit=args.limit,
+                    offset=args.offset,
+                    session_id=args.session,
+                    highlight=highlight,
+                )
+        except SearchError as exc:
+            store.close()
+            parser.error(str(exc))
+        store.close()
+        if args.json_output:
+            print(json.dumps(payload, indent=2))
+            return
+        _print_search(payload)
+        return
+
+    if args.command == "fts":
+        if args.fts_command == "enable-substring":
+            if not store.enable_substring_index():
+                store.close()
+                parser.error("This SQLite build has no FTS5 trigram tokenizer (needs 3.34+)")
+            store.close()
+            print("Substring index enabled.")
+            return
+        if args.fts_command == "disable-substring":
+            store.disable_substring_index()
+            store.close()
+            print("Substring index dropped.")
+            return
+        if args.fts_command == "sync":
+            lock_handle = _acquire_ingestion_lock(store.path)
+            try:
+                applied = store.sync_fts()
+            finally:
+                _release_ingestion_lock(lock_handle)
+                store.close()
+            print(f"Applied {applied} queued search index changes.")
+            return
+        if args.fts_command == "mode":
+            lock_handle = _acquire_ingestion_lock(store.path)
+            try:
+                store.set_fts_maintenance(args.mode)
+            finally:
+                _release_ingestion_lock(lock_handle)
+                store.close()
+            print(f"FTS maintenance: {args.mode}.")
+            return
+        payload = store.fts_status()
+        store.close()
+        if args.json_output:
+            print(json.dumps(payload, indent=2))
+            return
+        for name, value in payload.items():
+            print(f"{name}: {value}")
+        return
+
     if args.command == "doctor":
+        from .insights import doctor_payload
+
         if args.sync:
             try:
                 ingest_mode = _resolve_ingest_mode(args, db_path)
             except ValueError as exc:
                 parser.error(str(exc))
-            _ingest_for_range(args, store, None, None, tz, ingest_mode)
-        payload = doctor_payload(store)
+            _ingest_for_range(args, store, None, None, tz, ingest_mode, force=True)
+        payload = doctor_payload(store, query_plans=args.query_plans)
         store.close()
         if args.json_output:
             print(json.dumps(payload, indent=2))
@@ -2046,6 +2963,12 @@ def main() -> None:
         return
 
     if args.command == "pricing":
+        from .pricing_cli import (
+            pricing_status,
+            remove_pricing_override,
+            update_pricing_model,
+        )
+
         pricing_command = getattr(args, "pricing_command", None) or "list"
         if pricing_command == "path":
             print(default_config_path(db_path))
@@ -2126,7 +3049,12 @@ def main() -> None:
                 print("Aborted.")
                 store.close()
                 return
-        messages, tool_calls = store.purge_content()
+        lock_handle = _acquire_ingestion_lock(store.path)
+        try:
+            messages, tool_calls = store.purge_content(replace_file=True)
+            _price_session_summary(store)
+        finally:
+            _release_ingestion_lock(lock_handle)
         store.close()
         print(
             f"Purged {messages} content messages and {tool_calls} tool calls from {path}."
@@ -2144,7 +3072,12 @@ def main() -> None:
                 print("Aborted.")
                 store.close()
                 return
-        messages, tool_rows = store.purge_payloads()
+        lock_handle = _acquire_ingestion_lock(store.path)
+        try:
+            messages, tool_rows = store.purge_payloads()
+            _price_session_summary(store)
+        finally:
+            _release_ingestion_lock(lock_handle)
         store.close()
         print(
             f"Purged {messages} content messages and redacted payloads in {tool_rows} tool calls from {path}."
@@ -2166,7 +3099,73 @@ def main() -> None:
         print(f"Vacuum completed for {path}.")
         return
 
+    if args.command == "content":
+        if args.content_command in ("compress", "decompress"):
+            if args.content_command == "compress" and not 0 <= args.level <= 9:
+                parser.error("--level must be between 0 and 9")
+            lock_handle = _acquire_ingestion_lock(store.path)
+            try:
+                if args.content_command == "compress":
+                    compression = store.compress_payloads(
+                        level=args.level,
+                        samples=args.samples,
+                        retrain=bool(args.retrain),
+                    )
+                    rewritten = None
+                else:
+                    rewritten = store.decompress_payloads()
+                    compression = store.compression_profile()
+            finally:
+                _release_ingestion_lock(lock_handle)
+            store.close()
+            if rewritten is not None:
+                print(f"Decompressed {rewritten:,} values.")
+            _print_compression(compression)
+            print("Run `codex-track vacuum` to shrink the DB file(s).")
+            return
+        if args.content_command in ("split", "merge"):
+            lock_handle = _acquire_ingestion_lock(store.path)
+            try:
+                if args.content_command == "split":
+                    changed = store.split_content()
+                else:
+                    changed = store.merge_content()
+            finally:
+                _release_ingestion_lock(lock_handle)
+        payload = _content_layout_info(store)
+        compression = store.compression_profile()
+        store.close()
+        if args.content_command == "split":
+            print(
+                f"Moved content into {payload['content_path']}."
+                if changed
+                else "Content already lives in a separate DB."
+            )
+        elif args.content_command == "merge":
+            print(
+                f"Moved content back into {payload['path']}."
+                if changed
+                else "Content already lives in the main DB."
+            )
+        for name, value in payload.items():
+            print(f"{name}: {value}")
+        _print_compression(compression)
+        return
+
     if args.command == "report":
+        from .report import (
+            aggregate,
+            load_pricing_config,
+            parse_datetime,
+            parse_last,
+            render_csv,
+            render_json,
+            render_table,
+            to_local,
+        )
+
+        if args.depth is not None and (args.by != "directory" or args.depth < 0):
+            parser.error("--depth needs --by directory and a non-negative depth")
         now = datetime.now(tz)
         start = None
         end = None
@@ -2189,17 +3188,32 @@ def main() -> None:
             parser.error(str(exc))
         _ingest_for_range(args, store, start, end, tz, ingest_mode)
         pricing, currency_label = load_pricing_config(db_path)
-        weekly_quota = _estimate_weekly_quota(store, now, pricing, tz)
+        lock_handle = None
+        locked = False
+        if not store.read_only:
+            try:
+                lock_handle = _acquire_ingestion_lock(db_path, blocking=False)
+                locked = True
+            except IngestLockBusy:
+                pass
+        try:
+            weekly_quota = _estimate_weekly_quota(store, now, pricing, tz)
+        finally:
+            if locked:
+                _release_ingestion_lock(lock_handle)
         if weekly_quota is None:
             latest_quota = store.latest_weekly_quota()
             weekly_quota = dict(latest_quota) if latest_quota else None
         events = _load_usage_events_for_range(store, start, end)
-        rows = aggregate(events, args.group, args.by, pricing=pricing, tz=tz)
+        directories = store.directory_rollup(args.depth) if args.depth is not None else None
+        rows = aggregate(
+            events, args.group, args.by, pricing=pricing, tz=tz, directories=directories
+        )
         include_group = args.by is not None
         if args.format == "table":
             output = render_table(rows, include_group, currency_label)
             if weekly_quota and weekly_quota.get("quota_tokens"):
-                range_tokens = sum(int(event.get("total_tokens") or 0) for event in events)
+                range_tokens = sum(row.total_tokens for row in rows)
                 percent_used = (range_tokens / weekly_quota["quota_tokens"]) * 100.0
                 print(f"Weekly quota used: {percent_used:.1f}%")
         elif args.format == "json":
@@ -2211,6 +3225,9 @@ def main() -> None:
         return
 
     if args.command == "insight":
+        from .insights import insight_payload
+        from .report import load_pricing_config
+
         try:
             start, end = _parse_cli_range(args, tz, default_last="7d")
             ingest_mode = _resolve_ingest_mode(args, db_path)
@@ -2233,6 +3250,9 @@ def main() -> None:
         return
 
     if args.command == "sessions":
+        from .insights import session_insights
+        from .report import load_pricing_config
+
         try:
             start, end = _parse_cli_range(args, tz, default_last="7d")
             ingest_mode = _resolve_ingest_mode(args, db_path)
@@ -2260,6 +3280,9 @@ def main() -> None:
         return
 
     if args.command == "compare":
+        from .insights import compare_payload
+        from .report import load_pricing_config
+
         try:
             current_start, current_end, baseline_start, baseline_end = _parse_compare_ranges(args, tz)
             ingest_mode = _resolve_ingest_mode(args, db_path)
@@ -2286,17 +3309,71 @@ def main() -> None:
         return
 
     if args.command == "export":
+        from .columnar import (
+            COLUMNAR_FORMATS,
+            ColumnarExportError,
+            export_columnar,
+            pyarrow_available,
+        )
+        from .report import write_events_csv, write_events_json, write_events_ndjson
+
         try:
+            start, end = _parse_cli_range(args, tz)
             ingest_mode = _resolve_ingest_mode(args, db_path)
         except ValueError as exc:
             parser.error(str(exc))
-        _ingest_for_range(args, store, None, None, tz, ingest_mode)
-        rows = [dict(row) for row in store.iter_events()]
-        if args.format == "json":
-            output = export_events_json(rows)
-        else:
-            output = export_events_csv(rows)
-        args.out.write_text(output)
+        if args.event_type and args.table not in EXPORT_TYPE_COLUMNS:
+            parser.error(f"--event-type is not supported for --table {args.table}")
+        compress = args.gzip or args.out.suffix == ".gz"
+        if args.format in COLUMNAR_FORMATS:
+            if compress:
+                parser.error(f"--gzip is not supported with --format {args.format}")
+            if args.format != "npz" and not pyarrow_available():
+                parser.error(
+                    f"--format {args.format} requires pyarrow; install it or use --format npz"
+                )
+            if args.row_group_size < 1:
+                parser.error("--row-group-size must be at least 1")
+        _ingest_for_range(args, store, start, end, tz, ingest_mode)
+        if args.format in COLUMNAR_FORMATS:
+            try:
+                result = export_columnar(
+                    store,
+                    args.table,
+                    args.out,
+                    args.format,
+                    start=_to_utc_iso(start),
+                    end=_to_utc_iso(end),
+                    event_type=args.event_type,
+                    model=args.model,
+                    row_group_size=args.row_group_size,
+                )
+            except ColumnarExportError as exc:
+                store.close()
+                parser.error(str(exc))
+            print(
+                f"Exported {result.rows} {result.table} rows in "
+                f"{result.row_groups} row groups to {result.path}"
+            )
+            store.close()
+            return
+        rows = (
+            dict(row)
+            for row in store.iter_export_rows(
+                args.table,
+                start=_to_utc_iso(start),
+                end=_to_utc_iso(end),
+                event_type=args.event_type,
+                model=args.model,
+            )
+        )
+        with _open_export_output(args.out, compress) as handle:
+            if args.format == "json":
+                write_events_json(rows, handle)
+            elif args.format == "ndjson":
+                write_events_ndjson(rows, handle)
+            else:
+                write_events_csv(rows, handle)
         store.close()
         return
 
@@ -2316,7 +3393,12 @@ def main() -> None:
         return
 
     if args.command == "ingest-cli":
-        stats = ingest_cli_output(args.log, store, tz)
+        lock_handle = _acquire_ingestion_lock(store.path)
+        try:
+            stats = ingest_cli_output(args.log, store, tz)
+            _price_session_summary(store)
+        finally:
+            _release_ingestion_lock(lock_handle)
         store.close()
         print(
             f"Ingested {stats.lines} lines: {stats.status_snapshots} status snapshots, "
@@ -2325,7 +3407,14 @@ def main() -> None:
         return
 
     if args.command == "ingest-app-server":
-        stats = ingest_app_server_output(args.log, store, tz)
+        from .app_server import ingest_app_server_output
+
+        lock_handle = _acquire_ingestion_lock(store.path)
+        try:
+            stats = ingest_app_server_output(args.log, store, tz)
+            _price_session_summary(store)
+        finally:
+            _release_ingestion_lock(lock_handle)
         store.close()
         print(
             f"Ingested {stats.lines} lines: {stats.turns} turns, "
@@ -2347,6 +3436,8 @@ def main() -> None:
         return
 
     if args.command in ("ui", "web"):
+        import subprocess
+
         if args.db:
             os.environ["CODEX_USAGE_DB"] = str(args.db)
         if args.rollouts:
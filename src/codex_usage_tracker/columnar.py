@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import json
+import math
+import struct
+import sys
+import zipfile
+from array import array
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+from .store import UsageStore
+
+COLUMNAR_FORMATS = ("arrow", "parquet", "npz")
+DEFAULT_ROW_GROUP_SIZE = 65_536
+DICTIONARY_COLUMNS = frozenset(
+    {
+        "model",
+        "directory",
+        "cwd",
+        "session_id",
+        "event_type",
+        "tool_type",
+        "tool_name",
+        "role",
+        "message_type",
+        "source",
+        "rollout_source",
+    }
+)
+_NPY_DESCR = {
+    "int64": "<i8",
+    "int32": "<i4",
+    "float64": "<f8",
+    "bool": "|b1",
+    "uint8": "|u1",
+}
+_ARRAY_TYPECODES = {
+    "int64": "q",
+    "int32": "i",
+    "float64": "d",
+    "bool": "B",
+    "uint8": "B",
+}
+
+
+class ColumnarExportError(RuntimeError):
+    pass
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    kind: str  # int64, float64, string, or dictionary
+
+
+@dataclass
+class ColumnarExportResult:
+    path: Path
+    format: str
+    table: str
+    rows: int
+    row_groups: int
+
+
+def _load_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def pyarrow_available() -> bool:
+    return _load_pyarrow() is not None
+
+
+def _column_specs(store: UsageStore, table: str) -> list[ColumnSpec]:
+    specs = []
+    for name, declared in store.export_columns(table):
+        if name in DICTIONARY_COLUMNS:
+            kind = "dictionary"
+        elif "INT" in declared:
+            kind = "int64"
+        elif "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+            kind = "float64"
+        else:
+            kind = "string"
+        specs.append(ColumnSpec(name=name, kind=kind))
+    return specs
+
+
+def _coerce_int(value: object) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce_float(value: object) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce_text(value: object) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def _iter_row_groups(rows: Iterator[Sequence[object]], size: int) -> Iterator[list]:
+    while True:
+        group = list(islice(rows, size))
+        if not group:
+            return
+        yield group
+
+
+def _npy_header(kind: str, length: int) -> bytes:
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (
+        _NPY_DESCR[kind],
+        length,
+    )
+    # Pad so the data starts on a 64-byte boundary, as numpy itself does.
+    header += " " * ((-(len(header) + 11)) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _packed(kind: str, values: Sequence[object]) -> bytes:
+    packed = array(_ARRAY_TYPECODES[kind], values)
+    if sys.byteorder == "big" and packed.itemsize > 1:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _encode_strings(values: Sequence[Optional[str]]) -> tuple[bytes, list[int]]:
+    chunks = []
+    offsets = [0]
+    total = 0
+    for value in values:
+        if value is not None:
+            encoded = value.encode("utf-8")
+            chunks.append(encoded)
+            total += len(encoded)
+        offsets.append(total)
+    return b"".join(chunks), offsets
+
+
+class _NpzBundleWriter:
+    """
+    Write a zip of ``.npy`` arrays that ``numpy.load`` reads without pickling.
+
+    Every row group stores each column under ``rgNNNNN/<column>.<part>``. Text is
+    Arrow-style UTF-8 ``data`` plus int64 ``offsets``; nullable columns carry a
+    ``valid`` mask; dictionary columns store int32 ``codes`` (-1 for null) that
+    index the shared ``dict/<column>`` strings.
+    """
+
+    def __init__(self, path: Path, specs: list[ColumnSpec], dictionaries: dict[str, list[str]]):
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._specs = specs
+        self._dictionaries = dictionaries
+        self._lookups = {
+            name: {value: index for index, value in enumerate(values)}
+            for name, values in dictionaries.items()
+        }
+
+    def _write(self, name: str, kind: str, payload: bytes, length: int) -> None:
+        with self._zip.open(f"{name}.npy", "w", force_zip64=True) as handle:
+            handle.write(_npy_header(kind, length))
+            handle.write(payload)
+
+    def _write_strings(self, prefix: str, values: Sequence[Optional[str]]) -> None:
+        data, offsets = _encode_strings(values)
+        self._write(f"{prefix}.data", "uint8", data, len(data))
+        self._write(f"{prefix}.offsets", "int64", _packed("int64", offsets), len(offsets))
+
+    def write_group(self, index: int, rows: list[Sequence[object]]) -> None:
+        prefix = f"rg{index:05d}"
+        length = len(rows)
+        for position, spec in enumerate(self._specs):
+            name = f"{prefix}/{spec.name}"
+            raw = [row[position] for row in rows]
+            if spec.kind == "dictionary":
+                lookup = self._lookups[spec.name]
+                codes = [lookup.get(_coerce_text(value), -1) for value in raw]
+                self._write(f"{name}.codes", "int32", _packed("int32", codes), length)
+                continue
+            if spec.kind == "string":
+                values = [_coerce_text(value) for value in raw]
+                self._write_strings(name, values)
+            elif spec.kind == "int64":
+                values = [_coerce_int(value) for value in raw]
+                filled = [0 if value is None else value for value in values]
+                self._write(f"{name}.values", "int64", _packed("int64", filled), length)
+            else:
+                values = [_coerce_float(value) for value in raw]
+                filled = [math.nan if value is None else value for value in values]
+                self._write(f"{name}.values", "float64", _packed("float64", filled), length)
+            valid = [0 if value is None else 1 for value in values]
+            self._write(f"{name}.valid", "bool", _packed("bool", valid), length)
+
+    def close(self, table: str, rows: int, row_groups: int) -> None:
+        try:
+            for name, values in self._dictionaries.items():
+                self._write_strings(f"dict/{name}", values)
+            schema = json.dumps(
+                {
+                    "table": table,
+                    "rows": rows,
+                    "row_groups": row_groups,
+                    "columns": [{"name": spec.name, "type": spec.kind} for spec in self._specs],
+                },
+                ensure_ascii=True,
+            ).encode("ascii")
+            self._write("schema", "uint8", schema, len(schema))
+        finally:
+            self._zip.close()
+
+
+class _ArrowWriter:
+    def __init__(
+        self,
+        pa,
+        path: Path,
+        fmt: str,
+        specs: list[ColumnSpec],
+        dictionaries: dict[str, list[str]],
+    ):
+        self._pa = pa
+        self._specs = specs
+        self._lookups = {
+            name: {value: index for index, value in enumerate(values)}
+            for name, values in dictionaries.items()
+        }
+        self._dictionary_arrays = {
+            name: pa.array(values, type=pa.string())
+            for name, values in dictionaries.items()
+        }
+        self._schema = pa.schema(
+            [pa.field(spec.name, self._arrow_type(spec)) for spec in specs]
+        )
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self._schema)
+            self._parquet = True
+        else:
+            self._writer = pa.ipc.new_file(str(path), self._schema)
+            self._parquet = False
+
+    def _arrow_type(self, spec: ColumnSpec):
+        pa = self._pa
+        if spec.kind == "dictionary":
+            return pa.dictionary(pa.int32(), pa.string())
+        if spec.kind == "int64":
+            return pa.int64()
+        if spec.kind == "float64":
+            return pa.float64()
+        return pa.string()
+
+    def write_group(self, index: int, rows: list[Sequence[object]]) -> None:
+        pa = self._pa
+        arrays = []
+        for position, spec in enumerate(self._specs):
+            raw = [row[position] for row in rows]
+            if spec.kind == "dictionary":
+                lookup = self._lookups[spec.name]
+                codes = pa.array(
+                    [lookup.get(_coerce_text(value)) for value in raw],
+                    type=pa.int32(),
+                )
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(codes, self._dictionary_arrays[spec.name])
+                )
+            elif spec.kind == "int64":
+                arrays.append(pa.array([_coerce_int(value) for value in raw], type=pa.int64()))
+            elif spec.kind == "float64":
+                arrays.append(pa.array([_coerce_float(value) for value in raw], type=pa.float64()))
+            else:
+                arrays.append(pa.array([_coerce_text(value) for value in raw], type=pa.string()))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        if self._parquet:
+            self._writer.write_table(pa.Table.from_batches([batch], schema=self._schema))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self, table: str, rows: int, row_groups: int) -> None:
+        self._writer.close()
+
+
+def export_columnar(
+    store: UsageStore,
+    table: str,
+    out_path: Path,
+    fmt: str,
+    *,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    event_type: Optional[str] = None,
+    model: Optional[str] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> ColumnarExportResult:
+    """
+    Export one table as typed columns, one row group at a time.
+
+    Dictionaries are collected up front with ``SELECT DISTINCT`` so every row
+    group shares them and memory stays bounded by ``row_group_size``.
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ColumnarExportError(f"Unsupported columnar format: {fmt}")
+    pa = None
+    if fmt != "npz":
+        pa = _load_pyarrow()
+        if pa is None:
+            raise ColumnarExportError(
+                f"--format {fmt} requires pyarrow; install it or use --format npz"
+            )
+    row_group_size = max(int(row_group_size), 1)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    row_groups = 0
+    with store.transaction():
+        specs = _column_specs(store, table)
+        dictionaries = {
+            spec.name: [
+                _coerce_text(value)
+                for value in store.export_distinct_values(
+                    table, spec.name, start, end, event_type, model
+                )
+            ]
+            for spec in specs
+            if spec.kind == "dictionary"
+        }
+        if pa is None:
+            writer = _NpzBundleWriter(out_path, specs, dictionaries)
+        else:
+            writer = _ArrowWriter(pa, out_path, fmt, specs, dictionaries)
+        try:
+            source = store.iter_export_rows(
+                table,
+                start=start,
+                end=end,
+                event_type=event_type,
+                model=model,
+                batch_size=min(row_group_size, 10_000),
+            )
+            for group in _iter_row_groups(source, row_group_size):
+                writer.write_group(row_groups, group)
+                rows += len(group)
+                row_groups += 1
+        finally:
+            writer.close(table, rows, row_groups)
+    return ColumnarExportResult(
+        path=out_path,
+        format=fmt,
+        table=table,
+        rows=rows,
+        row_groups=row_groups,
+    )
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+COMPRESSION_ALGORITHM = "zlib"
+# zlib only looks back 32 KiB, so a larger preset dictionary is never used.
+DICTIONARY_SIZE = 32 * 1024
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_TRAINING_SAMPLES = 2_000
+# Below this the zlib header and checksum outweigh what a short text saves.
+MIN_COMPRESS_BYTES = 64
+_MIN_FRAGMENT = 4
+_MAX_FRAGMENT = 256
+# Compressed values are BLOBs: b"Z", little-endian dictionary id (0 = none),
+# then a zlib stream. Plain values stay TEXT, so both can share a column.
+_MAGIC = b"Z"
+_HEADER = struct.Struct("<cI")
+
+
+class CompressionError(ValueError):
+    pass
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Build a zlib preset dictionary from lines and words that recur across
+    ``samples``. Fragments are scored by how often they occur times their
+    length, and the most valuable ones go last, nearest to the data.
+    """
+    counts: Counter[bytes] = Counter()
+    for sample in samples:
+        fragments = set()
+        for line in sample.encode("utf-8").splitlines():
+            line = line.strip()
+            if _MIN_FRAGMENT * 2 <= len(line) <= _MAX_FRAGMENT:
+                fragments.add(line)
+            fragments.update(
+                word for word in line.split() if _MIN_FRAGMENT <= len(word) <= _MAX_FRAGMENT
+            )
+        counts.update(fragments)
+    ranked = sorted(
+        (
+            (count * len(fragment), fragment)
+            for fragment, count in counts.items()
+            if count > 1
+        ),
+        reverse=True,
+    )
+    chosen = []
+    total = 0
+    for _score, fragment in ranked:
+        if total + len(fragment) + 1 > size:
+            continue
+        chosen.append(fragment)
+        total += len(fragment) + 1
+    chosen.reverse()
+    return b"\n".join(chosen)
+
+
+def compress_text(
+    text: Optional[str],
+    dictionary_id: int,
+    dictionary: bytes,
+    level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> object:
+    """Return a compressed BLOB for ``text``, or ``text`` itself when that is not smaller."""
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return text
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level)
+        dictionary_id = 0
+    packed = _HEADER.pack(_MAGIC, dictionary_id) + compressor.compress(raw) + compressor.flush()
+    return packed if len(packed) < len(raw) else text
+
+
+def dictionary_id(value: object) -> Optional[int]:
+    """The dictionary a compressed value needs (0 for none), or None for plain values."""
+    if not isinstance(value, bytes) or len(value) < _HEADER.size or value[:1] != _MAGIC:
+        return None
+    return _HEADER.unpack_from(value)[1]
+
+
+def decompress_value(value: object, dictionary: bytes = b"") -> object:
+    """Inverse of :func:`compress_text`; plain values are returned unchanged."""
+    if dictionary_id(value) is None:
+        return value
+    try:
+        if dictionary:
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS, zdict=dictionary)
+        else:
+            decompressor = zlib.decompressobj()
+        raw = decompressor.decompress(value[_HEADER.size :]) + decompressor.flush()
+    except zlib.error as exc:
+        raise CompressionError(f"Corrupt compressed value: {exc}") from exc
+    return raw.decode("utf-8")
@@ -69,3 +69,22 @@ def resolve_timezone(
         return ZoneInfo(name)
     except ZoneInfoNotFoundError:
         return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def resolve_status_snapshot(db_path: Optional[Path] = None) -> bool:
+    """
+    Whether ingest should mirror the latest status into ``<db>.status.json``.
+
+    Off unless ``"status_snapshot": true`` is set in the config file.
+    """
+    return _load_config(db_path).get("status_snapshot") is True
+
+
+def resolve_activity_occurrences(db_path: Optional[Path] = None) -> bool:
+    """
+    Whether ingest keeps one ``activity_events`` row per activity occurrence.
+
+    Off unless ``"activity_occurrences": true`` is set in the config file;
+    the per-minute ``activity_counts`` are always kept.
+    """
+    return _load_config(db_path).get("activity_occurrences") is True
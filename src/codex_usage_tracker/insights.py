@@ -1,16 +1,29 @@
 from __future__ import annotations
 
+import json
 import sqlite3
 import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Iterable, Optional
 
-from .report import PricingConfig, estimate_event_cost
-from .store import UsageStore
+from .report import PricingConfig, estimate_event_cost, pricing_fingerprint
+from .search import matching_session_ids
+from .store import FTS_SYNC_BATCH, TOOL_SUCCESS_STATUSES, UsageStore
 
 
-SUCCESS_STATUSES = {"completed", "complete", "success", "succeeded", "ok"}
+SUCCESS_STATUSES = set(TOOL_SUCCESS_STATUSES)
+# Reference magnitudes at which a signal contributes half its weight. Scores
+# are absolute so they can be stored per session and ranked with an index.
+SCORE_SCALES = {
+    "estimated_cost": 5.0,
+    "total_tokens": 2_000_000,
+    "tool_issue_signals": 5,
+    "compactions": 2,
+    "duration_minutes": 60.0,
+    "messages": 100,
+    "tool_calls": 100,
+}
 
 
 def _range_clause(column: str, start: Optional[str], end: Optional[str]) -> tuple[str, list[str]]:
@@ -27,24 +40,26 @@ def _range_clause(column: str, start: Optional[str], end: Optional[str]) -> tupl
     return " AND " + " AND ".join(clauses), params
 
 
-def _where_range(column: str, start: Optional[str], end: Optional[str]) -> tuple[str, list[str]]:
-    suffix, params = _range_clause(column, start, end)
-    if not suffix:
+def _table_range_clause(
+    store: UsageStore, table: str, start: Optional[str], end: Optional[str]
+) -> tuple[str, list[object]]:
+    """Like :func:`_range_clause` on ``table``'s indexed capture time and zone map span."""
+    clauses, params = store.range_sql(table, start, end)
+    if not clauses:
         return "", params
-    return "WHERE " + suffix.removeprefix(" AND "), params
+    return " AND " + " AND ".join(clauses), params
 
 
 def _fetch_count(
     store: UsageStore,
     table: str,
-    column: str,
     start: Optional[str],
     end: Optional[str],
 ) -> int:
-    where, params = _where_range(column, start, end)
+    range_suffix, params = _table_range_clause(store, table, start, end)
     try:
         row = store.conn.execute(
-            f"SELECT COUNT(*) AS count FROM {table} {where}",
+            f"SELECT COUNT(*) AS count FROM {table} WHERE 1 = 1 {range_suffix}",
             params,
         ).fetchone()
     except sqlite3.Error:
@@ -97,6 +112,7 @@ def _base_session_rows(
     start: Optional[str],
     end: Optional[str],
     pricing: PricingConfig,
+    session_ids: Optional[Iterable[str]] = None,
 ) -> list[dict[str, object]]:
     sessions: dict[str, dict[str, object]] = {}
 
@@ -129,6 +145,22 @@ def _base_session_rows(
         return row
 
     range_suffix, range_params = _range_clause("captured_at_utc", start, end)
+    event_suffix, event_params = _table_range_clause(store, "events", start, end)
+    id_suffix = ""
+    id_params: list[str] = []
+    if session_ids is not None:
+        id_suffix = " AND session_id IN (SELECT value FROM json_each(?))"
+        id_params = [json.dumps(sorted(set(session_ids)))]
+    range_suffix += id_suffix
+    range_params = range_params + id_params
+    event_suffix += id_suffix
+    event_params = event_params + id_params
+    message_suffix, message_params = _table_range_clause(store, "messages", start, end)
+    message_suffix += id_suffix
+    message_params = message_params + id_params
+    tool_suffix, tool_params = _table_range_clause(store, "tool_calls", start, end)
+    tool_suffix += id_suffix
+    tool_params = tool_params + id_params
     token_rows = store.conn.execute(
         f"""
         SELECT session_id,
@@ -145,10 +177,10 @@ def _base_session_rows(
         FROM events
         WHERE event_type IN ('usage_line', 'token_count')
           AND session_id IS NOT NULL
-          {range_suffix}
+          {event_suffix}
         GROUP BY session_id
         """,
-        range_params,
+        event_params,
     ).fetchall()
     for token_row in token_rows:
         item = ensure(token_row["session_id"])
@@ -198,10 +230,10 @@ def _base_session_rows(
                COUNT(*) AS messages
         FROM messages
         WHERE session_id IS NOT NULL
-          {range_suffix}
+          {message_suffix}
         GROUP BY session_id
         """,
-        range_params,
+        message_params,
     ).fetchall()
     for message_row in message_rows:
         item = ensure(message_row["session_id"])
@@ -222,10 +254,10 @@ def _base_session_rows(
                SUM(CASE WHEN payload_truncated THEN 1 ELSE 0 END) AS payload_truncated
         FROM tool_calls
         WHERE session_id IS NOT NULL
-          {range_suffix}
+          {tool_suffix}
         GROUP BY session_id
         """,
-        status_params + range_params,
+        status_params + tool_params,
     ).fetchall()
     for tool_row in tool_rows:
         item = ensure(tool_row["session_id"])
@@ -243,10 +275,10 @@ def _base_session_rows(
         FROM events
         WHERE event_type = 'context_compacted'
           AND session_id IS NOT NULL
-          {range_suffix}
+          {event_suffix}
         GROUP BY session_id
         """,
-        range_params,
+        event_params,
     ).fetchall()
     for compaction_row in compaction_rows:
         item = ensure(compaction_row["session_id"])
@@ -256,6 +288,8 @@ def _base_session_rows(
     meta_range, meta_params = _range_clause(
         "COALESCE(session_timestamp_utc, captured_at_utc)", start, end
     )
+    meta_range += id_suffix
+    meta_params = meta_params + id_params
     meta_rows = store.conn.execute(
         f"""
         SELECT session_id,
@@ -288,9 +322,20 @@ def _apply_session_filters(
     cwd: Optional[str],
     model: Optional[str],
     search: Optional[str],
+    subtree: Optional[list[str]] = None,
 ) -> list[dict[str, object]]:
+    """
+    ``cwd`` keeps sessions in that directory or anywhere under it when it is
+    a known directory (``subtree``, from :meth:`UsageStore.directory_subtree`),
+    and falls back to a case-insensitive substring match otherwise.
+    """
     filtered = rows
-    if cwd:
+    if cwd and subtree is None:
+        subtree = store.directory_subtree(cwd)
+    if cwd and subtree is not None:
+        inside = set(subtree)
+        filtered = [row for row in filtered if row.get("cwd") in inside]
+    elif cwd:
         needle = cwd.lower()
         filtered = [
             row for row in filtered
@@ -303,7 +348,7 @@ def _apply_session_filters(
             if needle in str(row.get("model") or "").lower()
         ]
     if search:
-        matching = _matching_message_sessions(store, search)
+        matching = matching_session_ids(store, search)
         filtered = [
             row for row in filtered
             if row.get("session_id") in matching
@@ -311,72 +356,190 @@ def _apply_session_filters(
     return filtered
 
 
-def _matching_message_sessions(store: UsageStore, query: str) -> set[str]:
-    phrase = '"' + query.replace('"', '""') + '"'
-    try:
-        rows = store.conn.execute(
-            """
-            SELECT DISTINCT messages.session_id
-            FROM messages_fts
-            JOIN messages ON messages.id = messages_fts.rowid
-            WHERE messages_fts MATCH ?
-              AND messages.session_id IS NOT NULL
-            """,
-            (phrase,),
-        ).fetchall()
-    except sqlite3.Error:
-        rows = store.conn.execute(
-            """
-            SELECT DISTINCT session_id
-            FROM messages
-            WHERE content LIKE ?
-              AND session_id IS NOT NULL
-            """,
-            (f"%{query}%",),
-        ).fetchall()
-    return {
-        str(row["session_id"])
-        for row in rows
-        if row["session_id"]
-    }
+def _saturating(value: object, scale: float) -> float:
+    amount = float(value or 0.0)
+    if amount <= 0:
+        return 0.0
+    return amount / (amount + scale)
+
+
+def _session_score(row: dict[str, object]) -> float:
+    context_left = row.get("min_context_percent_left")
+    context_pressure = 0.0
+    if isinstance(context_left, (int, float)):
+        context_pressure = max(0.0, min((25.0 - float(context_left)) / 25.0, 1.0))
+    volume = (
+        _saturating(row.get("messages"), SCORE_SCALES["messages"])
+        + _saturating(row.get("tool_calls"), SCORE_SCALES["tool_calls"])
+    ) / 2.0
+    score = (
+        30.0 * _saturating(row.get("estimated_cost"), SCORE_SCALES["estimated_cost"])
+        + 20.0 * _saturating(row.get("total_tokens"), SCORE_SCALES["total_tokens"])
+        + 15.0 * _saturating(row.get("tool_issue_signals"), SCORE_SCALES["tool_issue_signals"])
+        + 12.0 * _saturating(row.get("compactions"), SCORE_SCALES["compactions"])
+        + 10.0 * _saturating(row.get("duration_minutes"), SCORE_SCALES["duration_minutes"])
+        + 8.0 * volume
+        + 5.0 * context_pressure
+    )
+    return round(score, 1)
 
 
 def _with_scores(rows: list[dict[str, object]]) -> list[dict[str, object]]:
-    if not rows:
-        return []
-    max_cost = max(float(row.get("estimated_cost") or 0.0) for row in rows) or 1.0
-    max_tokens = max(int(row.get("total_tokens") or 0) for row in rows) or 1
-    max_duration = max(float(row.get("duration_minutes") or 0.0) for row in rows) or 1.0
-    max_messages = max(int(row.get("messages") or 0) for row in rows) or 1
-    max_tools = max(int(row.get("tool_calls") or 0) for row in rows) or 1
-    max_issues = max(int(row.get("tool_issue_signals") or 0) for row in rows) or 1
-    max_compactions = max(int(row.get("compactions") or 0) for row in rows) or 1
-
     scored = []
     for row in rows:
-        context_left = row.get("min_context_percent_left")
-        context_pressure = 0.0
-        if isinstance(context_left, (int, float)):
-            context_pressure = max(0.0, min((25.0 - float(context_left)) / 25.0, 1.0))
-        volume = (
-            (int(row.get("messages") or 0) / max_messages)
-            + (int(row.get("tool_calls") or 0) / max_tools)
-        ) / 2.0
-        score = (
-            30.0 * (float(row.get("estimated_cost") or 0.0) / max_cost)
-            + 20.0 * (int(row.get("total_tokens") or 0) / max_tokens)
-            + 15.0 * (int(row.get("tool_issue_signals") or 0) / max_issues)
-            + 12.0 * (int(row.get("compactions") or 0) / max_compactions)
-            + 10.0 * (float(row.get("duration_minutes") or 0.0) / max_duration)
-            + 8.0 * volume
-            + 5.0 * context_pressure
-        )
         updated = dict(row)
-        updated["interesting_score"] = round(score, 1)
+        updated["interesting_score"] = _session_score(updated)
         scored.append(updated)
     return scored
 
 
+def _interesting_key(item: dict[str, object]) -> tuple[float, float, int]:
+    return (
+        float(item.get("interesting_score") or 0.0),
+        float(item.get("estimated_cost") or 0.0),
+        int(item.get("total_tokens") or 0),
+    )
+
+
+def price_session_summary(store: UsageStore, pricing: PricingConfig) -> None:
+    """
+    Fill cost, duration and score on ``session_summary`` rows rewritten since
+    the last call, or on every row when pricing changed. Ingest runs this
+    under its lock; read commands never write and aggregate live until the
+    summary is priced with their pricing.
+    """
+    pricing_hash = pricing_fingerprint(pricing)
+    if store.session_summary_pricing_hash() != pricing_hash:
+        store.reset_session_summary_pricing(pricing_hash)
+    pending = store.unpriced_session_summaries()
+    if not pending:
+        store.conn.commit()
+        return
+    updates = []
+    for row in pending:
+        item = dict(row)
+        item["duration_minutes"] = _duration_minutes(item["first_seen"], item["last_seen"])
+        item["estimated_cost"] = _cost_from_row(item, pricing)
+        updates.append(
+            (
+                item["duration_minutes"],
+                item["estimated_cost"],
+                _session_score(item),
+                pricing_hash,
+                item["session_id"],
+            )
+        )
+    store.update_session_scores(updates)
+
+
+def _summary_session_rows(
+    store: UsageStore,
+    start: Optional[str],
+    end: Optional[str],
+    pricing: PricingConfig,
+    *,
+    limit: int,
+    interesting: bool,
+    cwd: Optional[str],
+    model: Optional[str],
+    search: Optional[str],
+) -> Optional[list[dict[str, object]]]:
+    """
+    Rank sessions from ``session_summary``. Sessions that lie entirely inside
+    the range are read in index order until ``limit`` pass the filters; the
+    few that straddle a range edge are aggregated live over their in-range
+    rows, so results match the full per-table aggregation.
+    """
+    if not store.session_summary_is_priced(pricing_fingerprint(pricing)):
+        return None
+    matching = matching_session_ids(store, search) if search else None
+    subtree = store.directory_subtree(cwd) if cwd else None
+
+    def keep(rows: list[dict[str, object]]) -> list[dict[str, object]]:
+        rows = _apply_session_filters(store, rows, cwd, model, None, subtree)
+        if matching is not None:
+            rows = [row for row in rows if row.get("session_id") in matching]
+        return rows
+
+    inside = []
+    params: list[str] = []
+    if subtree is not None:
+        inside.append("cwd IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(subtree))
+    if start:
+        inside.append("first_seen >= ?")
+        params.append(start)
+    if end:
+        inside.append("last_seen <= ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(inside)}" if inside else ""
+    order = (
+        "interesting_score DESC, estimated_cost DESC, total_tokens DESC"
+        if interesting
+        else "last_seen DESC"
+    )
+    cursor = store.conn.execute(
+        f"SELECT * FROM session_summary {where} ORDER BY {order}",
+        params,
+    )
+    selected: list[dict[str, object]] = []
+    wanted = max(limit, 1)
+    while len(selected) < wanted:
+        batch = cursor.fetchmany(max(wanted * 2, 50))
+        if not batch:
+            break
+        for row in keep([dict(row) for row in batch]):
+            row.pop("pricing_hash", None)
+            selected.append(row)
+    cursor.close()
+
+    edges = []
+    edge_params: list[str] = []
+    if start:
+        edges.append("(first_seen < ? AND last_seen >= ?)")
+        edge_params.extend([start, start])
+    if end:
+        edges.append("(first_seen <= ? AND last_seen > ?)")
+        edge_params.extend([end, end])
+    if edges:
+        straddling = store.conn.execute(
+            f"""
+            SELECT session_id, first_seen, last_seen
+            FROM session_summary
+            WHERE {' OR '.join(edges)}
+            """,
+            edge_params,
+        ).fetchall()
+        # Each session only has rows inside its own first/last span, so the
+        # live scan can be narrowed to the part of the range they cover.
+        at_start = [row for row in straddling if start and row["first_seen"] < start]
+        at_end = [row for row in straddling if not (start and row["first_seen"] < start)]
+        windows = []
+        if at_start:
+            last_seen = max(row["last_seen"] for row in at_start)
+            windows.append((at_start, start, min(end, last_seen) if end else last_seen))
+        if at_end:
+            first_seen = min(row["first_seen"] for row in at_end)
+            windows.append((at_end, max(start, first_seen) if start else first_seen, end))
+        for group, window_start, window_end in windows:
+            live = _base_session_rows(
+                store,
+                window_start,
+                window_end,
+                pricing,
+                session_ids=[row["session_id"] for row in group],
+            )
+            selected.extend(_with_scores(keep(live)))
+
+    if interesting:
+        selected.sort(key=_interesting_key, reverse=True)
+    else:
+        for row in selected:
+            row["interesting_score"] = 0.0
+        selected.sort(key=lambda item: str(item.get("last_seen") or ""), reverse=True)
+    return selected[:wanted]
+
+
 def session_insights(
     store: UsageStore,
     start: Optional[str],
@@ -389,18 +552,24 @@ def session_insights(
     model: Optional[str] = None,
     search: Optional[str] = None,
 ) -> list[dict[str, object]]:
+    summary_rows = _summary_session_rows(
+        store,
+        start,
+        end,
+        pricing,
+        limit=limit,
+        interesting=interesting,
+        cwd=cwd,
+        model=model,
+        search=search,
+    )
+    if summary_rows is not None:
+        return summary_rows
     rows = _base_session_rows(store, start, end, pricing)
     rows = _apply_session_filters(store, rows, cwd, model, search)
     if interesting:
         rows = _with_scores(rows)
-        rows.sort(
-            key=lambda item: (
-                float(item.get("interesting_score") or 0.0),
-                float(item.get("estimated_cost") or 0.0),
-                int(item.get("total_tokens") or 0),
-            ),
-            reverse=True,
-        )
+        rows.sort(key=_interesting_key, reverse=True)
     else:
         for row in rows:
             row["interesting_score"] = 0.0
@@ -416,7 +585,7 @@ def _group_usage(
     pricing: PricingConfig,
     limit: int,
 ) -> list[dict[str, object]]:
-    range_suffix, range_params = _range_clause("captured_at_utc", start, end)
+    range_suffix, range_params = _table_range_clause(store, "events", start, end)
     rows = store.conn.execute(
         f"""
         SELECT COALESCE({field}, '(unknown)') AS name,
@@ -456,7 +625,7 @@ def _top_tools(
     end: Optional[str],
     limit: int,
 ) -> list[dict[str, object]]:
-    range_suffix, range_params = _range_clause("captured_at_utc", start, end)
+    range_suffix, range_params = _table_range_clause(store, "tool_calls", start, end)
     issue_sql = _tool_issue_sql()
     status_params = [status for status in sorted(SUCCESS_STATUSES)]
     rows = store.conn.execute(
@@ -478,8 +647,8 @@ def _top_tools(
 
 
 def _compaction_count(store: UsageStore, start: Optional[str], end: Optional[str]) -> int:
-    event_range, event_params = _range_clause("captured_at_utc", start, end)
-    activity_range, activity_params = _range_clause("captured_at_utc", start, end)
+    event_range, event_params = _table_range_clause(store, "events", start, end)
+    activity_range, activity_params = _table_range_clause(store, "activity_counts", start, end)
     event_row = store.conn.execute(
         f"""
         SELECT COUNT(*) AS count
@@ -491,8 +660,8 @@ def _compaction_count(store: UsageStore, start: Optional[str], end: Optional[str
     ).fetchone()
     activity_row = store.conn.execute(
         f"""
-        SELECT COUNT(*) AS count
-        FROM activity_events
+        SELECT SUM(count) AS count
+        FROM activity_counts
         WHERE event_name = 'compaction'
           {activity_range}
         """,
@@ -503,14 +672,9 @@ def _compaction_count(store: UsageStore, start: Optional[str], end: Optional[str
 
 def _distinct_session_count(store: UsageStore, start: Optional[str], end: Optional[str]) -> int:
     parts = []
-    params: list[str] = []
-    for table, column in (
-        ("events", "captured_at_utc"),
-        ("turns", "captured_at_utc"),
-        ("messages", "captured_at_utc"),
-        ("tool_calls", "captured_at_utc"),
-    ):
-        range_suffix, range_params = _range_clause(column, start, end)
+    params: list[object] = []
+    for table in ("events", "turns", "messages", "tool_calls"):
+        range_suffix, range_params = _table_range_clause(store, table, start, end)
         parts.append(
             f"""
             SELECT session_id
@@ -545,7 +709,8 @@ def period_summary(
     end: Optional[str],
     pricing: PricingConfig,
 ) -> dict[str, object]:
-    range_suffix, range_params = _range_clause("captured_at_utc", start, end)
+    tool_suffix, tool_params = _table_range_clause(store, "tool_calls", start, end)
+    event_suffix, event_params = _table_range_clause(store, "events", start, end)
     token_row = store.conn.execute(
         f"""
         SELECT COUNT(*) AS usage_events,
@@ -557,9 +722,9 @@ def period_summary(
                MIN(context_percent_left) AS min_context_percent_left
         FROM events
         WHERE event_type IN ('usage_line', 'token_count')
-          {range_suffix}
+          {event_suffix}
         """,
-        range_params,
+        event_params,
     ).fetchone()
     total_cost = 0.0
     for row in store.conn.execute(
@@ -570,10 +735,10 @@ def period_summary(
                SUM(output_tokens) AS output_tokens
         FROM events
         WHERE event_type IN ('usage_line', 'token_count')
-          {range_suffix}
+          {event_suffix}
         GROUP BY model
         """,
-        range_params,
+        event_params,
     ).fetchall():
         total_cost += _cost_from_row(row, pricing)
 
@@ -584,9 +749,9 @@ def period_summary(
         SELECT SUM(CASE WHEN {issue_sql} THEN 1 ELSE 0 END) AS issue_signals
         FROM tool_calls
         WHERE 1 = 1
-          {range_suffix}
+          {tool_suffix}
         """,
-        status_params + range_params,
+        status_params + tool_params,
     ).fetchone()
     app_issue_extra, app_issue_params = _range_clause("completed_at", start, end)
     app_issue_row = store.conn.execute(
@@ -611,8 +776,8 @@ def period_summary(
         "reasoning_output_tokens": int(token_row["reasoning_output_tokens"] or 0),
         "estimated_cost": total_cost,
         "sessions": _distinct_session_count(store, start, end),
-        "messages": _fetch_count(store, "messages", "captured_at_utc", start, end),
-        "tool_calls": _fetch_count(store, "tool_calls", "captured_at_utc", start, end),
+        "messages": _fetch_count(store, "messages", start, end),
+        "tool_calls": _fetch_count(store, "tool_calls", start, end),
         "tool_issue_signals": int(tool_issue_row["issue_signals"] or 0)
         + int(app_issue_row["count"] or 0),
         "compactions": _compaction_count(store, start, end),
@@ -702,7 +867,12 @@ def compare_payload(
     }
 
 
-def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> dict[str, object]:
+def doctor_payload(
+    store: UsageStore,
+    *,
+    quick_sample_query: str = "codex",
+    query_plans: bool = False,
+) -> dict[str, object]:
     checks = []
 
     def add_check(name: str, status: str, detail: str, **extra: object) -> None:
@@ -742,6 +912,7 @@ def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> d
         "messages",
         "tool_calls",
         "activity_events",
+        "activity_counts",
         "ingestion_files",
     ):
         try:
@@ -751,14 +922,9 @@ def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> d
             add_check(f"table:{table}", "FAIL", str(exc))
     add_check("row_counts", "PASS", "Core table counts collected", counts=row_counts)
 
-    indexes = {
-        row["name"]
-        for row in store.conn.execute(
-            "SELECT name FROM sqlite_master WHERE type = 'index'"
-        ).fetchall()
-    }
+    indexes = store.schema_object_names("index")
     required_indexes = {
-        "events_event_type_captured_at_utc_idx",
+        "events_type_ms_covering_idx",
         "messages_session_idx",
         "messages_captured_at_utc_idx",
         "tool_calls_session_idx",
@@ -773,19 +939,19 @@ def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> d
     )
 
     try:
-        trigger_count = store.conn.execute(
-            """
-            SELECT COUNT(*) AS count
-            FROM sqlite_master
-            WHERE type = 'trigger'
-              AND name IN ('messages_ai', 'messages_ad', 'messages_au')
-            """
-        ).fetchone()["count"]
+        expected_triggers = store.fts_trigger_names()
+        trigger_count = len(expected_triggers & store.schema_object_names("trigger"))
         message_count = row_counts.get("messages", 0)
         fts_count = store.conn.execute(
             "SELECT COUNT(*) AS count FROM messages_fts"
         ).fetchone()["count"]
-        status = "PASS" if int(trigger_count or 0) == 3 and int(fts_count or 0) == message_count else "WARN"
+        status = (
+            "PASS"
+            if expected_triggers
+            and int(trigger_count or 0) == len(expected_triggers)
+            and int(fts_count or 0) == message_count
+            else "WARN"
+        )
         add_check(
             "fts5",
             status,
@@ -797,6 +963,49 @@ def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> d
     except sqlite3.Error as exc:
         add_check("fts5", "WARN", f"messages_fts unavailable: {exc}")
 
+    try:
+        tool_fts_rows = store.conn.execute(
+            "SELECT COUNT(*) AS count FROM tool_calls_fts"
+        ).fetchone()["count"]
+        add_check(
+            "tool_calls_fts",
+            "PASS" if int(tool_fts_rows or 0) == row_counts.get("tool_calls", 0) else "WARN",
+            "tool_calls_fts available for `codex-track search --tools`",
+            tool_calls=row_counts.get("tool_calls", 0),
+            fts_rows=int(tool_fts_rows or 0),
+        )
+    except sqlite3.Error as exc:
+        add_check("tool_calls_fts", "WARN", f"tool_calls_fts unavailable: {exc}")
+
+    fts_mode = store.fts_maintenance_mode()
+    pending = store.fts_pending_count()
+    if pending >= FTS_SYNC_BATCH:
+        add_check(
+            "fts_pending",
+            "WARN",
+            f"{pending} row changes waiting for the search indexes; "
+            "run `codex-track fts sync`",
+            mode=fts_mode,
+            pending=pending,
+        )
+    else:
+        add_check(
+            "fts_pending",
+            "PASS",
+            f"{pending} row changes queued ({fts_mode} FTS maintenance)",
+            mode=fts_mode,
+            pending=pending,
+        )
+
+    if store.substring_index_enabled():
+        add_check("substring_index", "PASS", "messages_trigram available for substring search")
+    else:
+        add_check(
+            "substring_index",
+            "PASS",
+            "messages_trigram not built (optional; `codex-track fts enable-substring`)",
+        )
+
     missing_hashes = store.conn.execute(
         """
         SELECT COUNT(*) AS count
@@ -810,11 +1019,45 @@ def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> d
         f"{int(missing_hashes or 0)} ingestion files missing content_hash",
     )
 
+    layout = store.content_layout()
+    if layout == "split":
+        attached = store.content_schema != "main"
+        add_check(
+            "content_layout",
+            "PASS" if attached else "WARN",
+            "messages and tool calls live in the attached content DB"
+            if attached
+            else "content DB is not attached",
+            layout=layout,
+        )
+    else:
+        add_check(
+            "content_layout",
+            "PASS",
+            "messages and tool calls live in the main DB (`codex-track content split` to separate)",
+            layout=layout,
+        )
+
+    try:
+        refcount_errors = store.payload_blob_refcount_errors()
+        blobs = store.payload_blob_profile()
+        add_check(
+            "payload_blobs",
+            "PASS" if refcount_errors == 0 else "WARN",
+            f"{blobs['blobs']} shared tool payloads, {blobs['references']} references"
+            if refcount_errors == 0
+            else f"{refcount_errors} payload blobs with a wrong refcount",
+            refcount_errors=refcount_errors,
+            dedup_ratio=blobs["dedup_ratio"],
+        )
+    except sqlite3.Error as exc:
+        add_check("payload_blobs", "WARN", f"payload_blobs unavailable: {exc}")
+
     timings: Dict[str, float] = {}
     for name, sql, params in (
         (
             "latest_status",
-            "SELECT * FROM events WHERE event_type IN ('status_snapshot', 'token_count') ORDER BY captured_at DESC LIMIT 1",
+            "SELECT events.* FROM latest_status JOIN events ON events.id = latest_status.event_id WHERE latest_status.scope = 'all'",
             (),
         ),
         (
@@ -842,6 +1085,20 @@ def doctor_payload(store: UsageStore, *, quick_sample_query: str = "codex") -> d
             timings[name] = -1.0
     add_check("query_timings", "PASS", "Quick read timings collected", milliseconds=timings)
 
+    if query_plans:
+        from .query_plans import query_plan_report
+
+        report = query_plan_report(store.conn)
+        issues = report["issues"]
+        add_check(
+            "query_plans",
+            "PASS" if not issues else "WARN",
+            f"{report['queries']} query shapes planned without a full scan of a large table"
+            if not issues
+            else f"{len(issues)} of {report['queries']} query shapes scan a large table",
+            issues=issues,
+        )
+
     return {
         "path": str(db_path),
         "checks": checks,
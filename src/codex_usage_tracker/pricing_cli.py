@@ -129,14 +129,8 @@ def _usage_by_model(
     end: Optional[str],
     pricing: PricingConfig,
 ) -> dict[str, dict[str, object]]:
-    clauses = ["event_type IN ('usage_line', 'token_count')"]
-    params: list[str] = []
-    if start:
-        clauses.append("captured_at_utc >= ?")
-        params.append(start)
-    if end:
-        clauses.append("captured_at_utc <= ?")
-        params.append(end)
+    range_clauses, params = store.range_sql("events", start, end)
+    clauses = ["event_type IN ('usage_line', 'token_count')", *range_clauses]
     rows = store.conn.execute(
         f"""
         SELECT COALESCE(model, '(unknown)') AS model,
@@ -0,0 +1,522 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from .store import (
+    EXPORT_TABLES,
+    ActivityEvent,
+    MessageEvent,
+    SessionMeta,
+    ToolCallEvent,
+    TurnContext,
+    UsageEvent,
+    UsageStore,
+)
+
+# Tables that grow with every rollout. A plain SCAN of one of these reads the
+# whole history; the small dimension, meta and summary-of-summary tables are
+# cheap to scan and are not checked.
+LARGE_TABLES = frozenset(
+    {
+        "events_data",
+        "activity_events_data",
+        "activity_counts_data",
+        "turns",
+        "messages",
+        "tool_calls",
+        "sessions",
+        "session_summary",
+        "session_source_summary",
+        "payload_blobs",
+        "app_items",
+        "app_turns",
+    }
+)
+
+# Indexes some readers walk in order on purpose, stopping once they have
+# enough rows (``_summary_session_rows`` ranks sessions this way). A SCAN
+# through one of them is a bounded top-N read, not a regression.
+ORDERED_SCAN_INDEXES = frozenset({"session_summary_score_idx", "session_summary_last_seen_idx"})
+
+SAMPLE_START = datetime(2026, 3, 2, 8, tzinfo=timezone.utc)
+SAMPLE_DAYS = 14
+SAMPLE_RANGE = ("2026-03-05T00:00:00Z", "2026-03-12T00:00:00Z")
+BASELINE_RANGE = ("2026-02-26T00:00:00Z", "2026-03-05T00:00:00Z")
+SAMPLE_MODEL = "gpt-5-codex"
+SAMPLE_DIRECTORY = "/home/user/projects/app"
+SAMPLE_SOURCE = "/home/user/.codex/sessions/rollout-0.jsonl"
+
+_ALIAS_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?",
+    re.IGNORECASE,
+)
+_SCAN_PATTERN = re.compile(r"^SCAN (\S+)(.*)$")
+_NOT_ALIASES = {"where", "on", "join", "left", "inner", "cross", "group", "order", "limit", "using"}
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    name: str
+    sql: str
+    params: tuple = ()
+
+
+@dataclass(frozen=True)
+class PlanIssue:
+    name: str
+    detail: str
+    sql: str
+
+
+def _ui_events_where(alias: str = "", filtered: bool = False) -> tuple[str, tuple]:
+    """Mirror ``buildWhere`` + ``applyEventType`` for the events routes."""
+    prefix = f"{alias}." if alias else ""
+    start = int(datetime.fromisoformat(SAMPLE_RANGE[0].replace("Z", "+00:00")).timestamp() * 1000)
+    end = int(datetime.fromisoformat(SAMPLE_RANGE[1].replace("Z", "+00:00")).timestamp() * 1000)
+    clauses = [f"{prefix}captured_at_ms >= ?", f"{prefix}captured_at_ms <= ?"]
+    params: list[object] = [start, end]
+    if filtered:
+        clauses.append(f"{prefix}model IN (?)")
+        clauses.append(
+            f"{prefix}directory_key IN (SELECT descendant_id FROM directory_tree "
+            "WHERE ancestor_id IN (SELECT id FROM dim_directory WHERE value IN (?)))"
+        )
+        clauses.append(f"{prefix}source IN (?)")
+        params.extend([SAMPLE_MODEL, SAMPLE_DIRECTORY, SAMPLE_SOURCE])
+    clauses.append("event_type = ?")
+    params.append("token_count")
+    return "WHERE " + " AND ".join(clauses), tuple(params)
+
+
+def _ui_tool_where(filtered: bool = False) -> tuple[str, str, tuple]:
+    """Mirror ``buildToolJoin``."""
+    clauses = ["tc.captured_at_utc >= ?", "tc.captured_at_utc <= ?"]
+    params: list[object] = list(SAMPLE_RANGE)
+    join = ""
+    if filtered:
+        join = "LEFT JOIN turns t ON t.session_id = tc.session_id AND t.turn_index = tc.turn_index"
+        clauses.extend(["t.model IN (?)", "(t.cwd LIKE ?)", "tc.source IN (?)"])
+        params.extend([SAMPLE_MODEL, f"{SAMPLE_DIRECTORY}%", SAMPLE_SOURCE])
+    return join, "WHERE " + " AND ".join(clauses), tuple(params)
+
+
+_HOUR = "strftime('%Y-%m-%dT%H:00:00', local_hour * 3600, 'unixepoch')"
+_TOOL_ERRORS = (
+    "SUM(CASE WHEN status IS NOT NULL AND (lower(status) LIKE '%error%' "
+    "OR lower(status) = 'failed') THEN 1 ELSE 0 END)"
+)
+# Hand-kept copy of the SQL the ui/app/api routes prepare, with ``buildWhere``
+# and ``buildToolJoin`` expanded. Keep in step with the routes when they change.
+_UI_EVENT_ROUTES = {
+    "overview/kpis": "SELECT SUM(total_tokens), SUM(input_tokens), SUM(output_tokens), "
+    "SUM(reasoning_output_tokens), SUM(cached_input_tokens), "
+    "SUM(COALESCE(input_tokens, 0) + COALESCE(cached_input_tokens, 0)) FROM events_keyed {where}",
+    "overview/kpis:cost": "SELECT model, SUM(input_tokens), SUM(cached_input_tokens), "
+    "SUM(output_tokens), SUM(total_tokens) FROM events_keyed {where} GROUP BY model",
+    "overview/volume_timeseries": f"SELECT {_HOUR} AS bucket, SUM(total_tokens), COUNT(*), "
+    "COUNT(DISTINCT session_id) FROM events_keyed {where} GROUP BY local_hour ORDER BY bucket",
+    "overview/token_mix_timeseries": f"SELECT {_HOUR} AS bucket, SUM(input_tokens), "
+    "SUM(cached_input_tokens), SUM(output_tokens), SUM(reasoning_output_tokens) "
+    "FROM events_keyed {where} GROUP BY local_hour ORDER BY bucket",
+    "overview/cost_timeseries": f"SELECT {_HOUR} AS bucket, model, SUM(input_tokens), "
+    "SUM(cached_input_tokens), SUM(output_tokens) FROM events_keyed {where} "
+    "GROUP BY local_hour, model ORDER BY bucket",
+    "overview/rate_limit_headroom": f"SELECT {_HOUR} AS bucket, MIN(limit_5h_percent_left), "
+    "MIN(limit_weekly_percent_left) FROM events_keyed {where} GROUP BY local_hour ORDER BY bucket",
+    "overview/context_pressure": "SELECT CAST(context_percent_left / 5 AS INTEGER) * 5 AS bin, "
+    "COUNT(*) FROM events_keyed {where} AND context_percent_left IS NOT NULL GROUP BY bin",
+    "overview/directory_top": "SELECT COALESCE(directory, '<unknown>') AS label, "
+    "SUM(total_tokens) AS total_tokens FROM events_keyed {where} GROUP BY label "
+    "ORDER BY total_tokens DESC LIMIT 10",
+    "context/histogram": "SELECT CAST(context_percent_left / 5 AS INTEGER) * 5 AS bin, COUNT(*) "
+    "FROM events_keyed {where} AND context_percent_left IS NOT NULL GROUP BY bin ORDER BY bin",
+    "hotspots/model_dir_matrix": "SELECT model, directory, SUM(total_tokens) FROM events_keyed {where} "
+    "GROUP BY model, directory",
+    "hotspots/tokens_per_turn_distribution": "SELECT CAST(total_tokens / 1000 AS INTEGER) AS bin, "
+    "COUNT(*) FROM events_keyed {where} GROUP BY bin ORDER BY bin",
+    "filters/options:model": "SELECT model AS value, COUNT(*) AS count FROM events_keyed {where} "
+    "AND model IS NOT NULL GROUP BY model ORDER BY count DESC LIMIT 200",
+    "filters/options:source": "SELECT source AS value, COUNT(*) AS count FROM events_keyed {where} "
+    "AND source IS NOT NULL GROUP BY source ORDER BY count DESC LIMIT 200",
+}
+_UI_JOINED_EVENT_ROUTES = {
+    "overview/branch_top": "SELECT COALESCE(s.git_branch, '<unknown>') AS label, "
+    "SUM(e.total_tokens) AS total_tokens FROM events_keyed e "
+    "LEFT JOIN sessions s ON s.session_id = e.session_id {where} GROUP BY label "
+    "ORDER BY total_tokens DESC LIMIT 10",
+    "hotspots/top_sessions": "SELECT e.session_id, s.cwd, SUM(e.total_tokens) AS total_tokens "
+    "FROM events_keyed e LEFT JOIN sessions s ON s.session_id = e.session_id {where} "
+    "GROUP BY e.session_id ORDER BY total_tokens DESC LIMIT 10",
+    "sessions/list": "SELECT e.session_id, s.cwd, s.cli_version, MAX(e.captured_at_utc), "
+    "SUM(e.total_tokens) AS total_tokens, COUNT(*), (SELECT group_concat(tag, ',') "
+    "FROM session_tags st WHERE st.session_id = e.session_id) FROM events_keyed e "
+    "LEFT JOIN sessions s ON s.session_id = e.session_id {where} "
+    "AND e.session_id IS NOT NULL GROUP BY e.session_id ORDER BY total_tokens DESC "
+    "LIMIT 50 OFFSET 0",
+}
+_UI_TOOL_ROUTES = {
+    "overview/kpis:tools": f"SELECT COUNT(*), {_TOOL_ERRORS} FROM tool_calls tc {{join}} {{where}}",
+    "tools/error_rates": f"SELECT COALESCE(tool_name, tool_type) AS tool, COUNT(*) AS total, "
+    f"{_TOOL_ERRORS} FROM tool_calls tc {{join}} {{where}} GROUP BY tool "
+    "ORDER BY total DESC LIMIT 10",
+    "tools/trend_top_tools": "SELECT substr(tc.captured_at_utc, 1, 13) || ':00:00' AS bucket, "
+    "COALESCE(tc.tool_name, tc.tool_type, '<unknown>') AS tool, COUNT(*) "
+    "FROM tool_calls tc {join} {where} GROUP BY bucket, tool ORDER BY bucket",
+    "tool_calls/list": "SELECT tc.captured_at_utc, tc.tool_type, tc.tool_name, tc.status, "
+    "tc.command, tc.session_id, tc.turn_index FROM tool_calls tc {join} {where} "
+    "ORDER BY tc.captured_at_utc DESC LIMIT 50 OFFSET 0",
+}
+_UI_FIXED_ROUTES = (
+    QueryShape(
+        "turns/list",
+        "SELECT captured_at_utc, session_id, turn_index, model, cwd FROM turns "
+        "WHERE captured_at_utc >= ? AND captured_at_utc <= ? AND model IN (?) "
+        "AND (cwd LIKE ?) AND source IN (?) ORDER BY captured_at_utc DESC LIMIT 50 OFFSET 0",
+        (*SAMPLE_RANGE, SAMPLE_MODEL, f"{SAMPLE_DIRECTORY}%", SAMPLE_SOURCE),
+    ),
+    QueryShape(
+        "sessions/detail",
+        "SELECT model, SUM(total_tokens) AS total_tokens FROM events "
+        "WHERE session_id = ? AND event_type = 'token_count' GROUP BY model "
+        "ORDER BY total_tokens DESC",
+        ("session-0",),
+    ),
+    QueryShape(
+        "sessions/messages",
+        "SELECT id, role, message_type, captured_at_utc FROM messages WHERE session_id = ? "
+        "ORDER BY ordinal ASC, captured_at_utc ASC, id ASC LIMIT 200",
+        ("session-0",),
+    ),
+    QueryShape(
+        "meta:range",
+        "SELECT (SELECT captured_at_utc FROM events ORDER BY captured_at_ms LIMIT 1), "
+        "(SELECT captured_at_utc FROM events ORDER BY captured_at_ms DESC LIMIT 1)",
+    ),
+    QueryShape("meta:events", "SELECT COUNT(*) AS count FROM events"),
+    QueryShape(
+        "meta:distinct",
+        "SELECT COUNT(DISTINCT model), COUNT(DISTINCT directory), COUNT(DISTINCT source) "
+        "FROM events",
+    ),
+    QueryShape("overview/weekly_quota", "SELECT * FROM weekly_quota_history ORDER BY id DESC LIMIT 12"),
+)
+
+
+def ui_route_queries() -> list[QueryShape]:
+    """The dashboard's query shapes, each with and without every filter set."""
+    shapes = list(_UI_FIXED_ROUTES)
+    for filtered in (False, True):
+        suffix = " (filtered)" if filtered else ""
+        where, params = _ui_events_where(filtered=filtered)
+        for name, template in _UI_EVENT_ROUTES.items():
+            shapes.append(QueryShape(name + suffix, template.format(where=where), params))
+        where, params = _ui_events_where("e", filtered=filtered)
+        for name, template in _UI_JOINED_EVENT_ROUTES.items():
+            shapes.append(QueryShape(name + suffix, template.format(where=where), params))
+        join, where, params = _ui_tool_where(filtered=filtered)
+        for name, template in _UI_TOOL_ROUTES.items():
+            shapes.append(QueryShape(name + suffix, template.format(join=join, where=where), params))
+    return shapes
+
+
+def populate_sample_store(store: UsageStore) -> None:
+    """
+    Fill ``store`` with a few sessions per day over two weeks through the
+    regular insert APIs, so every read path has rows to plan against.
+    """
+    from .insights import price_session_summary
+    from .report import default_pricing
+
+    events, turns, messages, tools, activity = [], [], [], [], []
+    for index in range(SAMPLE_DAYS * 3):
+        moment = SAMPLE_START + timedelta(hours=8 * index)
+        stamp = moment.isoformat().replace("+00:00", "Z")
+        session_id = f"session-{index % 9}"
+        source = f"/home/user/.codex/sessions/rollout-{index % 9}.jsonl"
+        directory = f"{SAMPLE_DIRECTORY}/pkg-{index % 3}" if index % 2 else SAMPLE_DIRECTORY
+        model = SAMPLE_MODEL if index % 3 else "gpt-5"
+        store.upsert_session(
+            SessionMeta(
+                session_id=session_id,
+                session_timestamp=stamp,
+                session_timestamp_utc=stamp,
+                cwd=directory,
+                originator="codex_cli_rs",
+                cli_version="0.50.0",
+                source="cli",
+                model_provider="openai",
+                git_commit_hash=None,
+                git_branch="main",
+                git_repository_url=None,
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                rollout_source=source,
+            ),
+            commit=False,
+        )
+        turns.append(
+            TurnContext(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                session_id=session_id,
+                turn_index=index,
+                model=model,
+                cwd=directory,
+                approval_policy="on-request",
+                sandbox_policy_type="workspace-write",
+                sandbox_network_access=False,
+                sandbox_writable_roots=None,
+                sandbox_exclude_tmpdir_env_var=False,
+                sandbox_exclude_slash_tmp=False,
+                truncation_policy_mode=None,
+                truncation_policy_limit=None,
+                reasoning_effort="medium",
+                reasoning_summary=None,
+                has_base_instructions=True,
+                has_user_instructions=False,
+                has_developer_instructions=False,
+                has_final_output_json_schema=False,
+                source=source,
+            )
+        )
+        for event_type in ("token_count", "status_snapshot", "context_compacted"):
+            events.append(
+                UsageEvent(
+                    captured_at=stamp,
+                    captured_at_utc=stamp,
+                    event_type=event_type,
+                    total_tokens=1000 + index,
+                    input_tokens=700 + index,
+                    cached_input_tokens=200,
+                    output_tokens=100,
+                    reasoning_output_tokens=50,
+                    context_used=1000 * index,
+                    context_total=272000,
+                    context_percent_left=float(100 - index),
+                    limit_5h_percent_left=80.0,
+                    limit_weekly_percent_left=60.0,
+                    rate_limit_plan_type="plus",
+                    model=model,
+                    directory=directory,
+                    session_id=session_id,
+                    codex_version="0.50.0",
+                    source=source,
+                )
+            )
+        messages.append(
+            MessageEvent(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                role="user",
+                message_type="user_message",
+                message=f"please look at the codex build {index}",
+                session_id=session_id,
+                turn_index=index,
+                source=source,
+                ordinal=index,
+            )
+        )
+        tools.append(
+            ToolCallEvent(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                tool_type="function_call",
+                tool_name="exec_command",
+                call_id=f"call-{index}",
+                status="failed" if index % 5 == 0 else "completed",
+                input_text='{"cmd":"make test"}',
+                output_text="ok",
+                command="make test",
+                session_id=session_id,
+                turn_index=index,
+                source=source,
+            )
+        )
+        activity.append(
+            ActivityEvent(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                event_type="tool_call",
+                event_name="function",
+                session_id=session_id,
+                turn_index=index,
+                source=source,
+            )
+        )
+    store.insert_events_bulk(events, commit=False)
+    store.insert_turns_bulk(turns, commit=False)
+    store.insert_messages_bulk(messages, commit=False)
+    store.insert_tool_calls_bulk(tools, commit=False)
+    store.insert_activity_events_bulk(activity, commit=False)
+    for index in range(9):
+        store.mark_file_ingested(
+            f"/home/user/.codex/sessions/rollout-{index}.jsonl", index, 1024, commit=False
+        )
+    store.upsert_weekly_quota(
+        "2026-03-02T00:00:00Z", "2026-03-09T00:00:00Z", 1_000_000, 10.0, 25.0, 250_000, 2.5,
+        "2026-03-09T00:00:00Z",
+    )
+    store.rebuild_session_summary(commit=False)
+    price_session_summary(store, default_pricing())
+
+
+def _read_probes(store: UsageStore) -> list[tuple[str, Callable[[], object]]]:
+    from .insights import compare_payload, insight_payload, session_insights
+    from .pricing_cli import _usage_by_model
+    from .report import default_pricing
+
+    pricing = default_pricing()
+    start, end = SAMPLE_RANGE
+
+    def drain(rows: Iterable[object]) -> list[object]:
+        return list(rows)
+
+    probes: list[tuple[str, Callable[[], object]]] = [
+        ("insight_payload", lambda: insight_payload(store, start, end, pricing)),
+        (
+            "compare_payload",
+            lambda: compare_payload(store, start, end, *BASELINE_RANGE, pricing),
+        ),
+        (
+            "session_insights",
+            lambda: session_insights(
+                store, start, end, pricing, cwd=SAMPLE_DIRECTORY, model=SAMPLE_MODEL
+            ),
+        ),
+        (
+            "session_insights:search",
+            lambda: session_insights(store, start, end, pricing, search="codex"),
+        ),
+        ("_usage_by_model", lambda: _usage_by_model(store, start, end, pricing)),
+        ("iter_events", lambda: drain(store.iter_events("token_count", start, end))),
+        ("iter_usage_events", lambda: drain(store.iter_usage_events(start, end))),
+        ("latest_status", lambda: store.latest_status()),
+        ("latest_status_scopes", lambda: store.latest_status_scopes()),
+        ("latest_weekly_quota", lambda: store.latest_weekly_quota()),
+        ("weekly_quota_history", lambda: store.weekly_quota_history("2026-03-02T00:00:00Z")),
+        ("events_watermark", lambda: store.events_watermark(start, end)),
+        ("directory_subtree", lambda: store.directory_subtree(SAMPLE_DIRECTORY)),
+        ("file_needs_ingest", lambda: store.file_needs_ingest(SAMPLE_SOURCE, 0, 1024)),
+    ]
+    for table in EXPORT_TABLES:
+        probes.append(
+            (
+                f"iter_export_rows:{table}",
+                lambda table=table: drain(
+                    store.iter_export_rows(table, start, end, model=SAMPLE_MODEL)
+                ),
+            )
+        )
+    return probes
+
+
+def collect_query_shapes(store: UsageStore) -> list[QueryShape]:
+    """
+    Run the Python read paths against ``store`` with a trace callback and
+    return every distinct SELECT they issued, followed by the UI catalog.
+    """
+    shapes: list[QueryShape] = []
+    seen: set[str] = set()
+    current = [""]
+
+    def trace(statement: str) -> None:
+        sql = " ".join(statement.split())
+        head = sql[:4].upper()
+        if head not in ("SELE", "WITH") or sql in seen:
+            return
+        seen.add(sql)
+        shapes.append(QueryShape(current[0], sql))
+
+    store.conn.set_trace_callback(trace)
+    try:
+        for name, probe in _read_probes(store):
+            current[0] = name
+            probe()
+    finally:
+        store.conn.set_trace_callback(None)
+    return shapes + ui_route_queries()
+
+
+def sample_query_shapes() -> list[QueryShape]:
+    """Collect the query shapes from a throwaway populated store."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = UsageStore(Path(tmp) / "plans.sqlite")
+        try:
+            populate_sample_store(store)
+            return collect_query_shapes(store)
+        finally:
+            store.close()
+
+
+def _table_aliases(sql: str) -> dict[str, str]:
+    aliases = {}
+    for table, alias in _ALIAS_PATTERN.findall(sql):
+        table = table.split(".")[-1]
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def _view_tables(conn: sqlite3.Connection) -> dict[str, str]:
+    """Map each view to the table its rows come from (``events`` -> ``events_data``)."""
+    views = {}
+    for row in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'"):
+        match = _ALIAS_PATTERN.search(row[1] or "")
+        if match:
+            views[row[0]] = match.group(1).split(".")[-1]
+    return views
+
+
+def plan_issues(
+    conn: sqlite3.Connection,
+    shapes: Iterable[QueryShape],
+    tables: Iterable[str] = LARGE_TABLES,
+) -> list[PlanIssue]:
+    """
+    ``EXPLAIN QUERY PLAN`` each shape on ``conn`` and report the ones that
+    SCAN a large table: every row, whether in table order or walked through
+    a non-covering index. A scan of a covering index still touches every
+    entry but reads far fewer pages, and is accepted. Shapes that fail to
+    prepare are reported too.
+    """
+    large = set(tables)
+    views = _view_tables(conn)
+    issues = []
+    for shape in shapes:
+        try:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + shape.sql, shape.params).fetchall()
+        except sqlite3.Error as exc:
+            issues.append(PlanIssue(shape.name, f"error: {exc}", shape.sql))
+            continue
+        aliases = _table_aliases(shape.sql)
+        for row in plan:
+            match = _SCAN_PATTERN.match(str(row[3]))
+            if not match or "COVERING INDEX" in match.group(2):
+                continue
+            if any(f"USING INDEX {index}" in match.group(2) for index in ORDERED_SCAN_INDEXES):
+                continue
+            name = match.group(1)
+            table = aliases.get(name, name)
+            table = views.get(table, table)
+            if table in large:
+                issues.append(PlanIssue(shape.name, str(row[3]), shape.sql))
+    return issues
+
+
+def query_plan_report(conn: sqlite3.Connection, shapes: Optional[list[QueryShape]] = None) -> dict:
+    """Plan the sample shapes on ``conn`` for ``codex-track doctor --query-plans``."""
+    shapes = sample_query_shapes() if shapes is None else shapes
+    issues = plan_issues(conn, shapes)
+    return {
+        "queries": len(shapes),
+        "issues": [
+            {"name": issue.name, "detail": issue.detail, "sql": issue.sql} for issue in issues
+        ],
+    }
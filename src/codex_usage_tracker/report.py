@@ -1,13 +1,14 @@
 import csv
+import hashlib
 import io
 import json
 import re
 from calendar import monthrange
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
 from zoneinfo import ZoneInfo
 
 from .config import DEFAULT_TIMEZONE
@@ -133,6 +134,11 @@ def _coerce_rate(value: object) -> Optional[float]:
     return None
 
 
+def pricing_fingerprint(pricing: PricingConfig) -> str:
+    payload = json.dumps(asdict(pricing), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
 def load_pricing_config(
     db_path: Optional[Path] = None,
 ) -> Tuple[PricingConfig, str]:
@@ -360,7 +366,13 @@ def aggregate(
     by: Optional[str] = None,
     pricing: Optional[PricingConfig] = None,
     tz: ZoneInfo = DEFAULT_TZ,
+    directories: Optional[Dict[str, str]] = None,
 ) -> List[ReportRow]:
+    """
+    Sum usage per period and ``by`` group. With ``by="directory"``,
+    ``directories`` (from :meth:`UsageStore.directory_rollup`) maps each
+    directory to the tree level it is reported under.
+    """
     buckets: Dict[Tuple[str, str], ReportRow] = {}
 
     for event in events:
@@ -373,6 +385,8 @@ def aggregate(
             group_key = event.get("model") or "<unknown>"
         elif by == "directory":
             group_key = event.get("directory") or "<unknown>"
+            if directories is not None:
+                group_key = directories.get(group_key, group_key)
         elif by == "session":
             group_key = event.get("session_id") or "<unknown>"
         else:
@@ -530,19 +544,45 @@ def render_csv(rows: List[ReportRow]) -> str:
     return buffer.getvalue().rstrip("\n")
 
 
+def write_events_json(events: Iterable[Dict[str, object]], handle: TextIO) -> int:
+    count = 0
+    for event in events:
+        handle.write("[\n" if count == 0 else ",\n")
+        encoded = json.dumps(event, indent=2, default=str)
+        handle.write("\n".join(f"  {line}" for line in encoded.splitlines()))
+        count += 1
+    handle.write("[]" if count == 0 else "\n]")
+    return count
+
+
+def write_events_csv(events: Iterable[Dict[str, object]], handle: TextIO) -> int:
+    writer: Optional[csv.DictWriter] = None
+    count = 0
+    for event in events:
+        if writer is None:
+            writer = csv.DictWriter(handle, fieldnames=list(event.keys()))
+            writer.writeheader()
+        writer.writerow(event)
+        count += 1
+    return count
+
+
+def write_events_ndjson(events: Iterable[Dict[str, object]], handle: TextIO) -> int:
+    count = 0
+    for event in events:
+        handle.write(json.dumps(event, default=str))
+        handle.write("\n")
+        count += 1
+    return count
+
+
 def export_events_json(events: Iterable[Dict[str, object]]) -> str:
-    payload = list(events)
-    return json.dumps(payload, indent=2, default=str)
+    buffer = io.StringIO()
+    write_events_json(events, buffer)
+    return buffer.getvalue()
 
 
 def export_events_csv(events: Iterable[Dict[str, object]]) -> str:
-    rows = list(events)
-    if not rows:
-        return ""
-    headers = list(rows[0].keys())
     buffer = io.StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=headers)
-    writer.writeheader()
-    for row in rows:
-        writer.writerow(row)
+    write_events_csv(events, buffer)
     return buffer.getvalue()
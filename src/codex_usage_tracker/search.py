@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+from typing import Optional
+
+from .store import UsageStore
+
+SEARCH_MODES = ("auto", "phrase", "substring")
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+TRIGRAM_MIN_CHARS = 3
+# Trigram snippets count characters rather than words, so they get the FTS5 maximum.
+SNIPPET_TOKENS = {"phrase": 24, "substring": 64}
+DEFAULT_HIGHLIGHT = ("<mark>", "</mark>")
+PENDING_SNIPPET_CHARS = 240
+TOOL_CALL_COLUMNS = ("command", "input_text", "output_text")
+_PLAIN_WORD = re.compile(r"^[^\W_]+$")
+_MIXED_CASE = re.compile(r"[a-z][A-Z]")
+
+
+class SearchError(ValueError):
+    pass
+
+
+def _quote(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+def plan_search_mode(query: str, requested: str, substring_available: bool) -> str:
+    """
+    Pick ``phrase`` (porter-stemmed word match) or ``substring`` (trigram).
+
+    ``auto`` uses substring mode only when the trigram index exists and the
+    query looks like something word tokenization would split or stem: paths,
+    ``snake_case``, dotted names, ``camelCase`` or other punctuation.
+    """
+    query = query.strip()
+    if requested not in SEARCH_MODES:
+        raise SearchError(f"Unknown search mode: {requested}")
+    if requested == "phrase":
+        return "phrase"
+    if requested == "substring":
+        if not substring_available:
+            raise SearchError(
+                "Substring search needs the trigram index; run "
+                "`codex-track fts enable-substring` first"
+            )
+        if len(query) < TRIGRAM_MIN_CHARS:
+            raise SearchError(
+                f"Substring queries need at least {TRIGRAM_MIN_CHARS} characters"
+            )
+        return "substring"
+    if not substring_available or len(query) < TRIGRAM_MIN_CHARS:
+        return "phrase"
+    for token in query.split():
+        if not _PLAIN_WORD.match(token) or _MIXED_CASE.search(token):
+            return "substring"
+    return "phrase"
+
+
+def _fts_table(mode: str) -> str:
+    return "messages_trigram" if mode == "substring" else "messages_fts"
+
+
+def _like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _pending_snippet(content: Optional[str], query: str, highlight: tuple[str, str]) -> str:
+    text = content or ""
+    position = text.lower().find(query.lower())
+    if position < 0:
+        return text[:PENDING_SNIPPET_CHARS]
+    start = max(position - PENDING_SNIPPET_CHARS // 3, 0)
+    end = position + len(query)
+    window_end = max(end, start + PENDING_SNIPPET_CHARS)
+    return "".join(
+        (
+            "..." if start else "",
+            text[start:position],
+            highlight[0],
+            text[position:end],
+            highlight[1],
+            text[end:window_end],
+            "..." if window_end < len(text) else "",
+        )
+    )
+
+
+def search_messages(
+    store: UsageStore,
+    query: str,
+    *,
+    mode: str = "auto",
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    offset: int = 0,
+    session_id: Optional[str] = None,
+    highlight: tuple[str, str] = DEFAULT_HIGHLIGHT,
+) -> dict[str, object]:
+    """
+    Return one page of messages matching ``query``, best match first, with a
+    highlighted snippet per hit. ``next_offset`` is set when more hits exist.
+
+    Messages still queued in ``messages_fts_pending`` (deferred FTS
+    maintenance) are matched by a case-insensitive substring scan of the
+    queue and listed ahead of the ranked index hits, whose stale rowids are
+    skipped, so results never lag behind ingest.
+    """
+    query = query.strip()
+    if not query:
+        raise SearchError("Search query is empty")
+    limit = min(max(int(limit), 1), MAX_SEARCH_LIMIT)
+    offset = max(int(offset), 0)
+    resolved = plan_search_mode(query, mode, store.substring_index_enabled())
+    table = _fts_table(resolved)
+    session_sql = "AND messages.session_id = ?" if session_id else ""
+    session_params = [session_id] if session_id else []
+    content = store.text_sql("messages", "content", "messages.")
+    try:
+        pending: list[dict[str, object]] = []
+        pending_sql = ""
+        if store.fts_pending_count():
+            pending_sql = (
+                f"AND {table}.rowid NOT IN (SELECT message_id FROM messages_fts_pending)"
+            )
+            for row in store.conn.execute(
+                f"""
+                SELECT messages.id,
+                       messages.session_id,
+                       messages.turn_index,
+                       messages.ordinal,
+                       messages.role,
+                       messages.message_type,
+                       messages.captured_at_utc,
+                       {content} AS content
+                FROM messages_fts_pending
+                JOIN messages ON messages.id = messages_fts_pending.message_id
+                WHERE {content} LIKE ? ESCAPE '\\'
+                  {session_sql}
+                ORDER BY messages.captured_at_utc DESC
+                """,
+                [_like_pattern(query), *session_params],
+            ).fetchall():
+                hit = dict(row)
+                hit["snippet"] = _pending_snippet(hit.pop("content"), query, highlight)
+                hit["score"] = None
+                pending.append(hit)
+        rows = pending[offset : offset + limit + 1]
+        index_offset = max(offset - len(pending), 0)
+        index_limit = limit + 1 - len(rows)
+        if index_limit > 0:
+            rows += store.conn.execute(
+                f"""
+                SELECT messages.id,
+                       messages.session_id,
+                       messages.turn_index,
+                       messages.ordinal,
+                       messages.role,
+                       messages.message_type,
+                       messages.captured_at_utc,
+                       snippet({table}, 0, ?, ?, '...', ?) AS snippet,
+                       {table}.rank AS score
+                FROM {table}
+                JOIN messages ON messages.id = {table}.rowid
+                WHERE {table} MATCH ?
+                  {pending_sql}
+                  {session_sql}
+                ORDER BY {table}.rank, messages.captured_at_utc DESC
+                LIMIT ? OFFSET ?
+                """,
+                [
+                    highlight[0],
+                    highlight[1],
+                    SNIPPET_TOKENS[resolved],
+                    _quote(query),
+                    *session_params,
+                    index_limit,
+                    index_offset,
+                ],
+            ).fetchall()
+    except sqlite3.OperationalError:
+        # No FTS5 in this SQLite build; keep search working with a scan.
+        resolved = "like"
+        rows = store.conn.execute(
+            f"""
+            SELECT id, session_id, turn_index, ordinal, role, message_type,
+                   captured_at_utc, substr({content}, 1, 240) AS snippet,
+                   NULL AS score
+            FROM messages
+            WHERE {content} LIKE ? ESCAPE '\\'
+              {session_sql}
+            ORDER BY captured_at_utc DESC
+            LIMIT ? OFFSET ?
+            """,
+            [_like_pattern(query), *session_params, limit + 1, offset],
+        ).fetchall()
+    results = [dict(row) for row in rows[:limit]]
+    return {
+        "query": query,
+        "mode": resolved,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(rows) > limit else None,
+        "rows": results,
+    }
+
+
+def _turn_context(store: UsageStore, rows: list[dict[str, object]]) -> None:
+    """Attach the model and working directory of each hit's turn (or session)."""
+    cache: dict[tuple[object, object], tuple[object, object]] = {}
+    for row in rows:
+        key = (row.get("session_id"), row.get("turn_index"))
+        if key not in cache:
+            context = store.conn.execute(
+                """
+                SELECT turns.model,
+                       COALESCE(turns.cwd, sessions.cwd) AS cwd
+                FROM (SELECT ? AS session_id, ? AS turn_index) AS hit
+                LEFT JOIN sessions ON sessions.session_id = hit.session_id
+                LEFT JOIN turns
+                  ON turns.session_id = hit.session_id
+                 AND turns.turn_index = hit.turn_index
+                ORDER BY turns.captured_at_utc DESC
+                LIMIT 1
+                """,
+                key,
+            ).fetchone()
+            cache[key] = (context["model"], context["cwd"]) if context else (None, None)
+        row["model"], row["cwd"] = cache[key]
+
+
+def search_tool_calls(
+    store: UsageStore,
+    query: str,
+    *,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    offset: int = 0,
+    session_id: Optional[str] = None,
+    highlight: tuple[str, str] = DEFAULT_HIGHLIGHT,
+) -> dict[str, object]:
+    """
+    Return one page of tool calls whose command, input or output matches
+    ``query`` as a phrase, best match first. Each hit carries its session,
+    turn index, and the turn's model and working directory.
+
+    Tool calls still queued in ``tool_calls_fts_pending`` are folded in the
+    same way as queued messages in :func:`search_messages`.
+    """
+    query = query.strip()
+    if not query:
+        raise SearchError("Search query is empty")
+    limit = min(max(int(limit), 1), MAX_SEARCH_LIMIT)
+    offset = max(int(offset), 0)
+    resolved = "phrase"
+    session_sql = "AND tool_calls.session_id = ?" if session_id else ""
+    session_params = [session_id] if session_id else []
+    texts = {
+        column: store.text_sql("tool_calls", column, "tool_calls.") for column in TOOL_CALL_COLUMNS
+    }
+    like_sql = " OR ".join(f"{text} LIKE ? ESCAPE '\\'" for text in texts.values())
+    like_params = [_like_pattern(query)] * len(TOOL_CALL_COLUMNS)
+    columns = """
+        tool_calls.id,
+        tool_calls.session_id,
+        tool_calls.turn_index,
+        tool_calls.captured_at_utc,
+        tool_calls.tool_type,
+        tool_calls.tool_name,
+        tool_calls.status,
+        tool_calls.command
+    """
+    try:
+        pending: list[dict[str, object]] = []
+        pending_sql = ""
+        if store.fts_pending_count():
+            pending_sql = (
+                "AND tool_calls_fts.rowid NOT IN (SELECT tool_call_id FROM tool_calls_fts_pending)"
+            )
+            for row in store.conn.execute(
+                f"""
+                SELECT {columns},
+                       {texts["input_text"]} AS input_text,
+                       {texts["output_text"]} AS output_text
+                FROM tool_calls_fts_pending
+                JOIN tool_calls ON tool_calls.id = tool_calls_fts_pending.tool_call_id
+                WHERE ({like_sql})
+                  {session_sql}
+                ORDER BY tool_calls.captured_at_utc DESC
+                """,
+                [*like_params, *session_params],
+            ).fetchall():
+                hit = dict(row)
+                candidates = [hit.get("command"), hit.pop("input_text"), hit.pop("output_text")]
+                matched = next(
+                    (text for text in candidates if text and query.lower() in text.lower()),
+                    None,
+                )
+                hit["snippet"] = _pending_snippet(matched, query, highlight)
+                hit["score"] = None
+                pending.append(hit)
+        rows = pending[offset : offset + limit + 1]
+        index_offset = max(offset - len(pending), 0)
+        index_limit = limit + 1 - len(rows)
+        if index_limit > 0:
+            rows += store.conn.execute(
+                f"""
+                SELECT {columns},
+                       snippet(tool_calls_fts, -1, ?, ?, '...', ?) AS snippet,
+                       tool_calls_fts.rank AS score
+                FROM tool_calls_fts
+                JOIN tool_calls ON tool_calls.id = tool_calls_fts.rowid
+                WHERE tool_calls_fts MATCH ?
+                  {pending_sql}
+                  {session_sql}
+                ORDER BY tool_calls_fts.rank, tool_calls.captured_at_utc DESC
+                LIMIT ? OFFSET ?
+                """,
+                [
+                    highlight[0],
+                    highlight[1],
+                    SNIPPET_TOKENS["phrase"],
+                    _quote(query),
+                    *session_params,
+                    index_limit,
+                    index_offset,
+                ],
+            ).fetchall()
+    except sqlite3.OperationalError:
+        # No FTS5 in this SQLite build; keep search working with a scan.
+        resolved = "like"
+        rows = store.conn.execute(
+            f"""
+            SELECT {columns},
+                   substr(COALESCE({", ".join(texts.values())}), 1, 240) AS snippet,
+                   NULL AS score
+            FROM tool_calls
+            WHERE ({like_sql})
+              {session_sql}
+            ORDER BY tool_calls.captured_at_utc DESC
+            LIMIT ? OFFSET ?
+            """,
+            [*like_params, *session_params, limit + 1, offset],
+        ).fetchall()
+    results = [dict(row) for row in rows[:limit]]
+    _turn_context(store, results)
+    return {
+        "query": query,
+        "mode": resolved,
+        "target": "tools",
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(rows) > limit else None,
+        "rows": results,
+    }
+
+
+def matching_session_ids(store: UsageStore, query: str) -> set[str]:
+    query = query.strip()
+    content = store.text_sql("messages", "content", "messages.")
+    resolved = plan_search_mode(query, "auto", store.substring_index_enabled())
+    table = _fts_table(resolved)
+    try:
+        if store.fts_pending_count():
+            rows = store.conn.execute(
+                f"""
+                SELECT messages.session_id
+                FROM {table}
+                JOIN messages ON messages.id = {table}.rowid
+                WHERE {table} MATCH ?
+                  AND {table}.rowid NOT IN (SELECT message_id FROM messages_fts_pending)
+                  AND messages.session_id IS NOT NULL
+                UNION
+                SELECT messages.session_id
+                FROM messages_fts_pending
+                JOIN messages ON messages.id = messages_fts_pending.message_id
+                WHERE {content} LIKE ? ESCAPE '\\'
+                  AND messages.session_id IS NOT NULL
+                """,
+                (_quote(query), _like_pattern(query)),
+            ).fetchall()
+        else:
+            rows = store.conn.execute(
+                f"""
+                SELECT DISTINCT messages.session_id
+                FROM {table}
+                JOIN messages ON messages.id = {table}.rowid
+                WHERE {table} MATCH ?
+                  AND messages.session_id IS NOT NULL
+                """,
+                (_quote(query),),
+            ).fetchall()
+    except sqlite3.Error:
+        rows = store.conn.execute(
+            f"""
+            SELECT DISTINCT session_id
+            FROM messages
+            WHERE {content} LIKE ? ESCAPE '\\'
+              AND session_id IS NOT NULL
+            """,
+            (_like_pattern(query),),
+        ).fetchall()
+    return {
+        str(row["session_id"])
+        for row in rows
+        if row["session_id"]
+    }
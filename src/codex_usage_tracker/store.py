@@ -1,14 +1,78 @@
+import hashlib
+import json
 import sqlite3
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Iterator, Optional
+from zoneinfo import ZoneInfo
 
-SCHEMA_VERSION = 8
-INGEST_VERSION = 5
-STORAGE_PROFILE_VERSION = 3
+from .compression import (
+    COMPRESSION_ALGORITHM,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_TRAINING_SAMPLES,
+    CompressionError,
+    compress_text,
+    decompress_value,
+    dictionary_id,
+    train_dictionary,
+)
+
+SCHEMA_VERSION = 24
+INGEST_VERSION = 6
+STORAGE_PROFILE_VERSION = 4
 TOOL_PAYLOAD_PROFILE_VERSION = 1
+# Stored in meta together with SQLite's schema cookie; when it and the version
+# keys match, opening the store skips all DDL and introspection.
+SCHEMA_FINGERPRINT = f"schema={SCHEMA_VERSION};storage={STORAGE_PROFILE_VERSION}"
+FETCH_BATCH_SIZE = 1000
+FTS_MAINTENANCE_MODES = ("immediate", "deferred")
+# Deferred FTS changes are applied in batches of this many messages; ingest
+# also flushes the queue once it grows this large.
+FTS_SYNC_BATCH = 5_000
+# Legacy events/activity_events rows are moved to the keyed tables in
+# committed batches of this many rows, so an interrupted migration resumes.
+DIMENSION_MIGRATION_BATCH = 20_000
+# events_data.local_hour is re-keyed in committed batches of this many rows
+# when the bucket timezone changes; meta records progress so it resumes.
+BUCKET_REBUILD_BATCH = 50_000
+# External-content FTS5 indexes: name -> (content table, tokenizer, trigger prefix).
+FTS_INDEXES = {
+    "messages_fts": ("messages", "porter unicode61", "messages"),
+    "messages_trigram": ("messages", "trigram", "messages_trigram"),
+    "tool_calls_fts": ("tool_calls", "porter unicode61", "tool_calls"),
+}
+# Indexes built with the schema; messages_trigram is opt-in.
+FTS_DEFAULT_INDEXES = ("messages_fts", "tool_calls_fts")
+# Content table -> (deferred-maintenance queue, queue key, indexed columns).
+FTS_CONTENT = {
+    "messages": ("messages_fts_pending", "message_id", ("content",)),
+    "tool_calls": ("tool_calls_fts_pending", "tool_call_id", ("command", "input_text", "output_text")),
+}
+FTS_TRIGGERS = tuple(
+    f"{prefix}_{suffix}"
+    for prefix in (
+        *(prefix for _content, _tokenizer, prefix in FTS_INDEXES.values()),
+        *(f"{content}_pending" for content in FTS_CONTENT),
+    )
+    for suffix in ("ai", "ad", "au")
+)
+
+USAGE_EVENT_COLUMNS = (
+    "captured_at",
+    "captured_at_utc",
+    "event_type",
+    "total_tokens",
+    "input_tokens",
+    "cached_input_tokens",
+    "output_tokens",
+    "reasoning_output_tokens",
+    "limit_weekly_percent_left",
+    "model",
+    "directory",
+    "session_id",
+)
 
 LEAN_ACTIVITY_EVENT_TYPES = (
     "assistant_message",
@@ -36,6 +100,12 @@ REDUNDANT_LOCAL_TIME_INDEXES = (
     "tool_calls_captured_at_idx",
     "content_messages_captured_at_idx",
 )
+# Prefixes of events_type_ms_covering_idx.
+REDUNDANT_EVENT_TYPE_INDEXES = (
+    "events_event_type_idx",
+    "events_event_type_captured_at_ms_idx",
+    "events_type_ms_session_idx",
+)
 REDUNDANT_SOURCE_TEXT_INDEXES = (
     "events_source_idx",
     "turns_source_idx",
@@ -45,6 +115,318 @@ REDUNDANT_SOURCE_TEXT_INDEXES = (
     "tool_calls_source_idx",
     "messages_source_idx",
 )
+# With the split content layout these tables (and their FTS indexes, queues
+# and the content_messages view) live in ``<db>.content.db``, attached as
+# CONTENT_SCHEMA; unqualified queries resolve to them transparently.
+CONTENT_TABLES = ("messages", "tool_calls", "payload_blobs")
+CONTENT_SCHEMA = "content"
+CONTENT_LAYOUTS = ("single", "split")
+# Columns that hold zlib BLOBs once payload compression is enabled. Readers
+# go through the ``codex_text()`` SQL function; FTS indexes read the
+# ``<table>_text`` views so they keep indexing plain text.
+COMPRESSED_COLUMNS = {
+    "messages": ("content",),
+    "tool_calls": ("input_text", "output_text"),
+    "payload_blobs": ("content",),
+}
+# Tool payloads of at least PAYLOAD_BLOB_MIN_CHARS are stored once in
+# payload_blobs, keyed by SHA-256, and referenced from these id columns;
+# triggers keep payload_blobs.refcount in step with the references.
+PAYLOAD_BLOB_COLUMNS = {
+    "tool_calls": {"input_text": "input_blob_id", "output_text": "output_blob_id"},
+}
+PAYLOAD_BLOB_MIN_CHARS = 64
+PAYLOAD_BLOB_TRIGGERS = ("tool_calls_blobs_ai", "tool_calls_blobs_ad", "tool_calls_blobs_au")
+# Rollouts log most user/assistant text twice, as a response_item and as an
+# event_msg. Ingest keeps one messages row per pair and records the
+# representations it saw as a bitmask in messages.representations.
+MESSAGE_REPRESENTATIONS = {"response_item": 1, "event_msg": 2}
+# Repeated text in the high-volume metric tables is stored once per value in
+# dim_<dimension> and referenced by an integer <dimension>_key column. Rows
+# live in <table>_data; <table> is a view that joins the text (and the source
+# path, via source_id) back in, so reports, exports and the UI read it as
+# before. column -> dimension, per table.
+NORMALIZED_TABLES = {
+    "events": {
+        "event_type": "event_type",
+        "model": "model",
+        "directory": "directory",
+        "session_id": "session",
+        "codex_version": "codex_version",
+    },
+    "activity_events": {
+        "event_type": "event_type",
+        "event_name": "event_name",
+        "session_id": "session",
+    },
+}
+DIMENSIONS = ("event_type", "event_name", "model", "directory", "session", "codex_version")
+# dim_directory also holds every ancestor of a stored directory, with its
+# parent_id and depth (path components below the root, "/" being 0).
+# directory_tree is the closure of that hierarchy, one row per
+# (ancestor, descendant) pair including each node with itself, so "this
+# directory and everything under it" is a lookup on ancestor_id.
+DIRECTORY_TREE_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS directory_tree (
+        ancestor_id INTEGER NOT NULL,
+        descendant_id INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        PRIMARY KEY (ancestor_id, descendant_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS directory_tree_descendant_idx ON directory_tree(descendant_id, depth)",
+)
+# zone_maps holds the capture-time bounds of each block of ZONE_MAP_BLOCK_ROWS
+# rowids in the append-only (AUTOINCREMENT) tables below. Rows arrive roughly
+# in time order, so a time range usually falls in one contiguous rowid span;
+# UsageStore.range_sql adds that span as an ``id`` bound the planner can seek
+# on, and a range no block overlaps reads nothing. meta zone_map_rowid:<table>
+# is the highest rowid folded in; a map behind its table is not used.
+ZONE_MAP_TABLES = ("events", "messages", "tool_calls")
+# events reads go through events_type_ms_covering_idx, which already walks the
+# range in one slice; a rowid bound there is only an extra test per entry, so
+# events take the span just when it proves the range empty.
+ZONE_MAP_SPAN_TABLES = ("messages", "tool_calls")
+ZONE_MAP_BLOCK_ROWS = 4096
+# When fewer than this share of the blocks in the span overlap the range, the
+# rows are interleaved with other times and the time index is used alone.
+ZONE_MAP_MIN_DENSITY = 0.5
+ZONE_MAP_DDL = """
+    CREATE TABLE IF NOT EXISTS zone_maps (
+        table_name TEXT NOT NULL,
+        block INTEGER NOT NULL,
+        min_at NOT NULL,
+        max_at NOT NULL,
+        PRIMARY KEY (table_name, block)
+    ) WITHOUT ROWID
+"""
+# activity_counts_data sums activity occurrences per (source, session, turn,
+# event type, event name, UTC minute), which is all its readers group by;
+# ingest folds each batch into it, and raw activity_events rows are only
+# written when asked for. The key is the primary key of a WITHOUT ROWID
+# table, so a missing event name, session or source is stored as 0 and a
+# missing turn as -1; the activity_counts view turns them back into NULL and
+# joins the dimension text in.
+ACTIVITY_COUNT_BUCKET_MS = 60_000
+ACTIVITY_COUNT_KEY = "minute_ms, event_type_key, event_name_key, session_key, turn_index, source_id"
+ACTIVITY_COUNTS_DDL = (
+    f"""
+    CREATE TABLE IF NOT EXISTS activity_counts_data (
+        minute_ms INTEGER NOT NULL,
+        event_type_key INTEGER NOT NULL,
+        event_name_key INTEGER NOT NULL,
+        session_key INTEGER NOT NULL,
+        turn_index INTEGER NOT NULL,
+        source_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY ({ACTIVITY_COUNT_KEY})
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS activity_counts_source_id_idx ON activity_counts_data(source_id)",
+)
+# Normalized rows keep their timestamp as integer epoch milliseconds plus the
+# local UTC offset in minutes; the views derive captured_at/captured_at_utc
+# text from them in the isoformat() form ingest used to store. events_data
+# also keeps local_hour, hours since the epoch on the wall clock of the
+# configured timezone (meta bucket_timezone); local_day is local_hour / 24.
+NORMALIZED_TABLE_DDL = {
+    "events": """
+    CREATE TABLE IF NOT EXISTS events_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        captured_at_ms INTEGER NOT NULL,
+        utc_offset_minutes INTEGER NOT NULL,
+        local_hour INTEGER,
+        event_type_key INTEGER NOT NULL,
+        total_tokens INTEGER,
+        input_tokens INTEGER,
+        cached_input_tokens INTEGER,
+        output_tokens INTEGER,
+        reasoning_output_tokens INTEGER,
+        lifetime_total_tokens INTEGER,
+        lifetime_input_tokens INTEGER,
+        lifetime_cached_input_tokens INTEGER,
+        lifetime_output_tokens INTEGER,
+        lifetime_reasoning_output_tokens INTEGER,
+        context_used INTEGER,
+        context_total INTEGER,
+        context_percent_left REAL,
+        limit_5h_percent_left REAL,
+        limit_5h_resets_at TEXT,
+        limit_weekly_percent_left REAL,
+        limit_weekly_resets_at TEXT,
+        limit_5h_used_percent REAL,
+        limit_5h_window_minutes INTEGER,
+        limit_5h_resets_at_seconds INTEGER,
+        limit_weekly_used_percent REAL,
+        limit_weekly_window_minutes INTEGER,
+        limit_weekly_resets_at_seconds INTEGER,
+        rate_limit_has_credits INTEGER,
+        rate_limit_unlimited INTEGER,
+        rate_limit_balance TEXT,
+        rate_limit_plan_type TEXT,
+        model_key INTEGER,
+        directory_key INTEGER,
+        session_key INTEGER,
+        codex_version_key INTEGER,
+        source_id INTEGER
+    )
+    """,
+    "activity_events": """
+    CREATE TABLE IF NOT EXISTS activity_events_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        captured_at_ms INTEGER NOT NULL,
+        utc_offset_minutes INTEGER NOT NULL,
+        event_type_key INTEGER NOT NULL,
+        event_name_key INTEGER,
+        count INTEGER NOT NULL,
+        session_key INTEGER,
+        turn_index INTEGER,
+        source_id INTEGER
+    )
+    """,
+}
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _storage_table(table: str) -> str:
+    """The table that holds ``table``'s rows: ``<table>_data`` for normalized ones."""
+    return f"{table}_data" if table in NORMALIZED_TABLES else table
+
+
+def epoch_ms(value: str) -> int:
+    """Epoch milliseconds of an ISO timestamp; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (parsed - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _timestamp_values(captured_at: str, captured_at_utc: str) -> tuple[int, int]:
+    """``(captured_at_ms, utc_offset_minutes)`` for a row's local and UTC text."""
+    local = datetime.fromisoformat(captured_at.replace("Z", "+00:00"))
+    offset = local.utcoffset()
+    if offset is None:
+        return epoch_ms(captured_at_utc), 0
+    return (local - _EPOCH) // timedelta(milliseconds=1), offset // timedelta(minutes=1)
+
+
+def time_range_sql(
+    table: str, start: Optional[str], end: Optional[str]
+) -> tuple[list[str], list[object]]:
+    """
+    Range predicates on ``table``'s capture time. Normalized tables compare
+    the indexed ``captured_at_ms`` key; the others their UTC text.
+    """
+    column = time_order_column(table)
+    clauses: list[str] = []
+    params: list[object] = []
+    for operator, value in ((">=", start), ("<=", end)):
+        if value:
+            clauses.append(f"{column} {operator} ?")
+            if table == "activity_counts":
+                # Counters are per minute: a range covers the minutes it starts in.
+                moment = epoch_ms(value)
+                params.append(moment - moment % ACTIVITY_COUNT_BUCKET_MS)
+            else:
+                params.append(epoch_ms(value) if table in NORMALIZED_TABLES else value)
+    return clauses, params
+
+
+def time_order_column(table: str) -> str:
+    if table == "activity_counts":
+        return "minute_ms"
+    return "captured_at_ms" if table in NORMALIZED_TABLES else "captured_at_utc"
+
+
+def directory_subtree_sql(key_column: str) -> str:
+    """
+    Predicate matching rows whose ``key_column`` (a dim_directory id) is the
+    directory bound to its one ``?`` parameter or lies anywhere under it.
+    """
+    return (
+        f"{key_column} IN (SELECT descendant_id FROM directory_tree "
+        "WHERE ancestor_id = (SELECT id FROM dim_directory WHERE value = ?))"
+    )
+
+
+def parent_directory(path: str) -> Optional[str]:
+    """The directory containing ``path``, or None for a root or a bare name."""
+    trimmed = path.rstrip("/\\")
+    cut = max(trimmed.rfind("/"), trimmed.rfind("\\"))
+    if cut < 0:
+        return None
+    return trimmed[:cut] or trimmed[: cut + 1]
+
+
+def _local_hour(ms: int, zone: Optional[ZoneInfo]) -> Optional[int]:
+    if zone is None:
+        return None
+    offset = datetime.fromtimestamp(ms / 1000, zone).utcoffset() or timedelta(0)
+    return (ms + offset // timedelta(milliseconds=1)) // 3_600_000
+
+
+def _offset_spans(zone: ZoneInfo, start_ms: int, end_ms: int) -> list[tuple[int, int]]:
+    """
+    ``(first epoch ms, UTC offset in ms)`` for each stretch of constant offset
+    in ``zone`` that overlaps ``[start_ms, end_ms]``. Transitions are found by
+    stepping an hour at a time and bisecting to the millisecond.
+    """
+
+    def offset(ms: int) -> int:
+        value = datetime.fromtimestamp(ms / 1000, zone).utcoffset() or timedelta(0)
+        return value // timedelta(milliseconds=1)
+
+    spans = [(start_ms, offset(start_ms))]
+    previous = start_ms
+    while previous < end_ms:
+        current = min(previous + 3_600_000, end_ms)
+        if offset(current) != spans[-1][1]:
+            low, high = previous, current
+            while high - low > 1:
+                middle = (low + high) // 2
+                if offset(middle) == spans[-1][1]:
+                    low = middle
+                else:
+                    high = middle
+            spans.append((high, offset(high)))
+        previous = current
+    return spans
+
+
+def _epoch_ms_sql(text: str) -> str:
+    return f"CAST(ROUND((julianday({text}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _utc_offset_sql(text: str) -> str:
+    # julianday() applies a trailing +HH:MM; the first 19 characters are the
+    # wall-clock time without it.
+    return f"CAST(ROUND((julianday(substr({text}, 1, 19)) - julianday({text})) * 1440) AS INTEGER)"
+
+
+def _iso_text_sql(ms: str, offset: Optional[str] = None) -> str:
+    """
+    SQL rendering ``ms`` the way ``datetime.isoformat()`` does, at ``offset``
+    minutes. SQLite's ``/`` and ``%`` truncate toward zero, so the split into
+    seconds and milliseconds is floored by hand to keep pre-1970 values right.
+    """
+    millis = f"(({ms} % 1000) + 1000) % 1000"
+    seconds = f"({ms} - {millis}) / 1000"
+    if offset is not None:
+        seconds = f"{seconds} + {offset} * 60"
+    suffix = (
+        "'+00:00'"
+        if offset is None
+        else f"printf('%s%02d:%02d', CASE WHEN {offset} < 0 THEN '-' ELSE '+' END, "
+        f"abs({offset}) / 60, abs({offset}) % 60)"
+    )
+    return (
+        f"strftime('%Y-%m-%dT%H:%M:%S', {seconds}, 'unixepoch')"
+        f" || CASE WHEN {millis} THEN printf('.%03d000', {millis}) ELSE '' END"
+        f" || {suffix}"
+    )
+
+
 SOURCE_TABLES = (
     "events",
     "turns",
@@ -54,12 +436,54 @@ SOURCE_TABLES = (
     "messages",
     "tool_calls",
 )
+EXPORT_TABLES = (
+    "events",
+    "turns",
+    "tool_calls",
+    "messages",
+    "sessions",
+)
+# Columns the views expose for indexes, joins and dedup rather than as data;
+# exports keep to the columns the tables had before storage was normalized.
+EXPORT_INTERNAL_COLUMNS = {
+    "events": frozenset({"captured_at_ms", "local_hour", "local_day"}),
+    "tool_calls": frozenset({"input_blob_id", "output_blob_id"}),
+    "messages": frozenset({"representations"}),
+}
+STATUS_EVENT_TYPES = ("status_snapshot", "token_count")
+TOOL_SUCCESS_STATUSES = frozenset({"completed", "complete", "success", "succeeded", "ok"})
+SESSION_SUMMARY_COUNTS = (
+    "usage_events",
+    "total_tokens",
+    "input_tokens",
+    "cached_input_tokens",
+    "output_tokens",
+    "turns",
+    "messages",
+    "tool_calls",
+    "tool_issue_signals",
+    "payload_truncated",
+    "compactions",
+)
+LATEST_STATUS_SCOPE = "all"
+_SEEN_AT_SQL = "COALESCE(sessions.session_timestamp_utc, sessions.captured_at_utc)"
+EXPORT_TYPE_COLUMNS = {
+    "events": "event_type",
+    "tool_calls": "tool_type",
+    "messages": "role",
+}
 BULK_LOAD_INDEX_DDL = {
-    "events_captured_at_utc_idx": "CREATE INDEX IF NOT EXISTS events_captured_at_utc_idx ON events(captured_at_utc)",
-    "events_event_type_idx": "CREATE INDEX IF NOT EXISTS events_event_type_idx ON events(event_type)",
-    "events_event_type_captured_at_utc_idx": (
-        "CREATE INDEX IF NOT EXISTS events_event_type_captured_at_utc_idx "
-        "ON events(event_type, captured_at_utc)"
+    "events_captured_at_ms_idx": (
+        "CREATE INDEX IF NOT EXISTS events_captured_at_ms_idx ON events_data(captured_at_ms)"
+    ),
+    # Dashboard token queries filter one event type over a time range (plus
+    # optional model/directory/source) and sum token columns; carrying all
+    # of them lets those queries read only the index.
+    "events_type_ms_covering_idx": (
+        "CREATE INDEX IF NOT EXISTS events_type_ms_covering_idx "
+        "ON events_data(event_type_key, captured_at_ms, session_key, local_hour, model_key, "
+        "directory_key, source_id, total_tokens, input_tokens, cached_input_tokens, "
+        "output_tokens, reasoning_output_tokens)"
     ),
     "turns_session_idx": "CREATE INDEX IF NOT EXISTS turns_session_idx ON turns(session_id)",
     "turns_captured_at_utc_idx": "CREATE INDEX IF NOT EXISTS turns_captured_at_utc_idx ON turns(captured_at_utc)",
@@ -71,6 +495,13 @@ BULK_LOAD_INDEX_DDL = {
     "app_turns_turn_idx": "CREATE INDEX IF NOT EXISTS app_turns_turn_idx ON app_turns(turn_id)",
     "app_items_turn_idx": "CREATE INDEX IF NOT EXISTS app_items_turn_idx ON app_items(turn_id)",
     "app_items_type_idx": "CREATE INDEX IF NOT EXISTS app_items_type_idx ON app_items(item_type)",
+    "app_items_completed_at_idx": (
+        "CREATE INDEX IF NOT EXISTS app_items_completed_at_idx ON app_items(completed_at)"
+    ),
+    "activity_events_captured_at_ms_idx": (
+        "CREATE INDEX IF NOT EXISTS activity_events_captured_at_ms_idx "
+        "ON activity_events_data(captured_at_ms)"
+    ),
     "messages_session_idx": "CREATE INDEX IF NOT EXISTS messages_session_idx ON messages(session_id)",
     "messages_captured_at_utc_idx": "CREATE INDEX IF NOT EXISTS messages_captured_at_utc_idx ON messages(captured_at_utc)",
     "messages_session_ordinal_idx": (
@@ -85,18 +516,40 @@ BULK_LOAD_INDEX_DDL = {
         "CREATE INDEX IF NOT EXISTS tool_calls_captured_at_utc_desc_idx "
         "ON tool_calls(captured_at_utc DESC)"
     ),
-    "events_type_utc_session_idx": (
-        "CREATE INDEX IF NOT EXISTS events_type_utc_session_idx "
-        "ON events(event_type, captured_at_utc, session_id)"
-    ),
     "tool_calls_session_idx": "CREATE INDEX IF NOT EXISTS tool_calls_session_idx ON tool_calls(session_id)",
     "tool_calls_type_idx": "CREATE INDEX IF NOT EXISTS tool_calls_type_idx ON tool_calls(tool_type)",
 }
 BULK_LOAD_SOURCE_INDEX_DDL = {
-    f"{table}_source_id_idx": f"CREATE INDEX IF NOT EXISTS {table}_source_id_idx ON {table}(source_id)"
+    f"{table}_source_id_idx": (
+        f"CREATE INDEX IF NOT EXISTS {table}_source_id_idx ON {_storage_table(table)}(source_id)"
+    )
     for table in SOURCE_TABLES
 }
 BULK_LOAD_INDEX_DDL.update(BULK_LOAD_SOURCE_INDEX_DDL)
+# Created once the legacy tables are migrated, since they reuse the names of
+# the indexes the legacy tables had.
+NORMALIZED_INDEX_DDL = (
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS events_dedupe_idx
+    ON events_data(
+        captured_at_ms,
+        utc_offset_minutes,
+        event_type_key,
+        total_tokens,
+        input_tokens,
+        cached_input_tokens,
+        output_tokens,
+        reasoning_output_tokens,
+        session_key,
+        source_id
+    )
+    """,
+    *(
+        ddl
+        for ddl in BULK_LOAD_INDEX_DDL.values()
+        if any(f" ON {_storage_table(table)}(" in ddl for table in NORMALIZED_TABLES)
+    ),
+)
 
 
 @dataclass
@@ -234,6 +687,7 @@ class MessageEvent:
     source: Optional[str] = None
     ordinal: Optional[int] = None
     source_line: Optional[int] = None
+    representations: Optional[int] = None
 
 
 @dataclass
@@ -255,19 +709,313 @@ class ToolCallEvent:
     payload_truncated: bool = False
 
 
+def content_db_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.name}.content.db")
+
+
+def remove_database_files(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def _message_representations(event: MessageEvent) -> int:
+    if event.representations is not None:
+        return event.representations
+    return MESSAGE_REPRESENTATIONS.get(event.message_type, 0)
+
+
 class UsageStore:
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, read_only: bool = False):
+        """
+        Open the usage database, migrating it only when its stored schema
+        fingerprint is out of date.
+
+        ``read_only`` opens a ``mode=ro`` connection with ``query_only`` set for
+        callers that never write. An outdated database is migrated once through
+        a short read-write open before the read-only connection is made.
+        """
         self.path = path
+        self.read_only = read_only
+        self._source_id_cache: dict[str, int] = {}
+        self._dimension_keys: dict[str, dict[str, int]] = {}
+        self._events_revision: Optional[int] = None
+        self.content_schema = "main"
+        self._content_inode: Optional[int] = None
+        self._dictionaries: dict[int, bytes] = {0: b""}
+        if read_only:
+            self.conn = self._connect_read_only()
+            if not self._schema_is_current() or self._content_db_missing():
+                self.conn.close()
+                UsageStore(path).close()
+                self.conn = self._connect_read_only()
+            self._attach_content_db()
+            return
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self.conn = sqlite3.connect(self.path, timeout=30.0)
         self.conn.row_factory = sqlite3.Row
-        self._source_id_cache: dict[str, int] = {}
+        self._register_functions(self.conn)
         self.conn.execute("PRAGMA busy_timeout=30000")
         self.conn.execute("PRAGMA journal_mode=WAL")
         self.conn.execute("PRAGMA synchronous=NORMAL")
         self.conn.execute("PRAGMA temp_store=MEMORY")
+        self._attach_content_db()
+        if self._schema_is_current():
+            return
         self._init_schema()
         self._ensure_storage_profile()
+        self._record_schema_fingerprint()
+
+    def _connect_read_only(self) -> sqlite3.Connection:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Database not found: {self.path}")
+        conn = sqlite3.connect(
+            f"{self.path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            timeout=30.0,
+        )
+        conn.row_factory = sqlite3.Row
+        self._register_functions(conn)
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _register_functions(self, conn: sqlite3.Connection) -> None:
+        conn.create_function("codex_text", 1, self._inflate, deterministic=True)
+
+    def _dictionary(self, dictionary: int) -> bytes:
+        if dictionary not in self._dictionaries:
+            row = self.conn.execute(
+                "SELECT dictionary FROM compression_dictionaries WHERE id = ?",
+                (dictionary,),
+            ).fetchone()
+            if row is None:
+                raise CompressionError(f"Missing compression dictionary {dictionary}")
+            self._dictionaries[dictionary] = bytes(row["dictionary"])
+        return self._dictionaries[dictionary]
+
+    def _inflate(self, value: object) -> object:
+        """``codex_text()``: decompress a stored BLOB, pass plain text through."""
+        needed = dictionary_id(value)
+        if needed is None:
+            return value
+        return decompress_value(value, self._dictionary(needed))
+
+    def content_layout(self) -> str:
+        try:
+            value = self._get_meta("content_layout")
+        except sqlite3.OperationalError:
+            return "single"
+        return "split" if value == "split" else "single"
+
+    def _content_db_missing(self) -> bool:
+        return self.content_layout() == "split" and not content_db_path(self.path).exists()
+
+    def _attach_content_db(self) -> None:
+        """
+        Attach ``<db>.content.db`` when the split layout is active. A missing
+        content file is recreated empty with the content schema, which is
+        exactly what a content purge leaves behind.
+        """
+        if self.content_layout() != "split":
+            return
+        path = content_db_path(self.path)
+        if self.read_only:
+            self.conn.execute(
+                f"ATTACH DATABASE ? AS {CONTENT_SCHEMA}",
+                (f"{path.resolve().as_uri()}?mode=ro",),
+            )
+        else:
+            fresh = not path.exists()
+            self.conn.execute(f"ATTACH DATABASE ? AS {CONTENT_SCHEMA}", (str(path),))
+            self.conn.execute(f"PRAGMA {CONTENT_SCHEMA}.journal_mode=WAL")
+            self.conn.execute(f"PRAGMA {CONTENT_SCHEMA}.synchronous=NORMAL")
+        self.content_schema = CONTENT_SCHEMA
+        self._content_inode = path.stat().st_ino
+        if not self.read_only and fresh:
+            self._init_content_schema()
+            # A new content file numbers its rows from 1 again.
+            self.reset_zone_maps(table for table in ZONE_MAP_TABLES if table in CONTENT_TABLES)
+            self.conn.commit()
+
+    def _detach_content_db(self) -> None:
+        if self.content_schema != CONTENT_SCHEMA:
+            return
+        self.conn.commit()
+        self.conn.execute(f"DETACH DATABASE {CONTENT_SCHEMA}")
+        self.content_schema = "main"
+        self._content_inode = None
+
+    def refresh_content_db(self) -> None:
+        """
+        Re-attach the content database if another process replaced it (for
+        example ``purge-content`` swapping in an empty file under ``watch``).
+        """
+        if self.content_schema != CONTENT_SCHEMA:
+            return
+        try:
+            current = content_db_path(self.path).stat().st_ino
+        except FileNotFoundError:
+            current = None
+        if current == self._content_inode:
+            return
+        self._detach_content_db()
+        self._attach_content_db()
+
+    def _schemas(self) -> tuple[str, ...]:
+        if self.content_schema == CONTENT_SCHEMA:
+            return ("main", CONTENT_SCHEMA)
+        return ("main",)
+
+    def schema_object_names(self, kind: str) -> set[str]:
+        """Names of tables/indexes/triggers/views of ``kind`` across attached schemas."""
+        names: set[str] = set()
+        for schema in self._schemas():
+            names.update(
+                row["name"]
+                for row in self.conn.execute(
+                    f"SELECT name FROM {schema}.sqlite_master WHERE type = ?",
+                    (kind,),
+                ).fetchall()
+            )
+        return names
+
+    def _content_ddl(self, ddl: str) -> str:
+        """Point ``CREATE ... IF NOT EXISTS`` DDL at the content schema."""
+        return ddl.replace("IF NOT EXISTS ", f"IF NOT EXISTS {self.content_schema}.", 1)
+
+    def _copy_content_table(self, table: str, source: str, target: str) -> None:
+        columns = ", ".join(
+            row["name"]
+            for row in self.conn.execute(f"PRAGMA {source}.table_info({table})").fetchall()
+        )
+        self.conn.execute(
+            f"INSERT INTO {target}.{table} ({columns}) SELECT {columns} FROM {source}.{table}"
+        )
+        # Keep AUTOINCREMENT from handing out ids of rows deleted before the move.
+        sequence = self.conn.execute(
+            f"SELECT seq FROM {source}.sqlite_sequence WHERE name = ?",
+            (table,),
+        ).fetchone()
+        if sequence is not None:
+            self.conn.execute(f"DELETE FROM {target}.sqlite_sequence WHERE name = ?", (table,))
+            self.conn.execute(
+                f"INSERT INTO {target}.sqlite_sequence (name, seq) VALUES (?, ?)",
+                (table, sequence["seq"]),
+            )
+
+    def _drop_content_objects(self, schema: str) -> None:
+        self.conn.execute(f"DROP VIEW IF EXISTS {schema}.content_messages")
+        for table in FTS_CONTENT:
+            self.conn.execute(f"DROP VIEW IF EXISTS {schema}.{table}_text")
+        for table in FTS_INDEXES:
+            self.conn.execute(f"DROP TABLE IF EXISTS {schema}.{table}")
+        for queue, _key, _columns in FTS_CONTENT.values():
+            self.conn.execute(f"DROP TABLE IF EXISTS {schema}.{queue}")
+        for table in CONTENT_TABLES:
+            self.conn.execute(f"DROP TABLE IF EXISTS {schema}.{table}")
+
+    def split_content(self) -> bool:
+        """
+        Move messages, tool calls and their search indexes into
+        ``<db>.content.db`` so usage tables keep a small file and page cache.
+
+        The copy is committed before anything is dropped from the main file,
+        so an interrupted split leaves the single-file layout intact. Returns
+        False when the layout is already split.
+        """
+        if self.content_layout() == "split":
+            return False
+        self.sync_fts(commit=False)
+        self.conn.commit()
+        path = content_db_path(self.path)
+        remove_database_files(path)
+        self.conn.execute(f"ATTACH DATABASE ? AS {CONTENT_SCHEMA}", (str(path),))
+        self.conn.execute(f"PRAGMA {CONTENT_SCHEMA}.journal_mode=WAL")
+        self.conn.execute(f"PRAGMA {CONTENT_SCHEMA}.synchronous=NORMAL")
+        self.content_schema = CONTENT_SCHEMA
+        self._content_inode = path.stat().st_ino
+        self._create_content_tables()
+        for table in CONTENT_TABLES:
+            self._copy_content_table(table, "main", CONTENT_SCHEMA)
+        self.conn.commit()
+        self._drop_content_objects("main")
+        self.conn.execute(
+            f"DELETE FROM main.sqlite_sequence WHERE name IN ({','.join('?' for _ in CONTENT_TABLES)})",
+            CONTENT_TABLES,
+        )
+        self.set_meta("content_layout", "split")
+        self._init_content_schema()
+        self._record_schema_fingerprint()
+        self.conn.commit()
+        return True
+
+    def merge_content(self) -> bool:
+        """
+        Move content back into the main file and delete ``<db>.content.db``.
+        The copy and the layout flag commit together in the main file.
+        Returns False when the layout is not split.
+        """
+        if self.content_layout() != "split":
+            return False
+        self.sync_fts(commit=False)
+        self.conn.commit()
+        self.content_schema = "main"
+        self._create_content_tables()
+        for table in CONTENT_TABLES:
+            self._copy_content_table(table, CONTENT_SCHEMA, "main")
+        self.set_meta("content_layout", "single")
+        self.conn.execute(f"DETACH DATABASE {CONTENT_SCHEMA}")
+        self._content_inode = None
+        remove_database_files(content_db_path(self.path))
+        self._init_content_schema()
+        self._record_schema_fingerprint()
+        self.conn.commit()
+        return True
+
+    def _init_content_schema(self) -> None:
+        self._create_content_tables()
+        for table in CONTENT_TABLES:
+            if table not in SOURCE_TABLES:
+                continue
+            self.conn.execute(
+                self._content_ddl(
+                    f"CREATE INDEX IF NOT EXISTS {table}_source_id_idx ON {table}(source_id)"
+                )
+            )
+        self._ensure_payload_blob_triggers()
+        self._ensure_content_messages_view()
+        self._ensure_text_views()
+        self._ensure_fts_pending()
+        self._ensure_fts_indexes()
+        self._ensure_substring_index()
+
+    def _schema_cookie(self) -> int:
+        return int(self.conn.execute("PRAGMA schema_version").fetchone()[0])
+
+    def _schema_is_current(self) -> bool:
+        try:
+            rows = self.conn.execute(
+                """
+                SELECT key, value
+                FROM meta
+                WHERE key IN ('schema_fingerprint', 'schema_version', 'storage_profile_version')
+                """
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return False
+        meta = {row["key"]: row["value"] for row in rows}
+        # Any DDL (including a crashed bulk load that dropped indexes) bumps the
+        # cookie, which sends the next open through the full migration path.
+        return (
+            meta.get("schema_version") == str(SCHEMA_VERSION)
+            and meta.get("storage_profile_version") == str(STORAGE_PROFILE_VERSION)
+            and meta.get("schema_fingerprint")
+            == f"{SCHEMA_FINGERPRINT}@{self._schema_cookie()}"
+        )
+
+    def _record_schema_fingerprint(self) -> None:
+        self.set_meta("schema_fingerprint", f"{SCHEMA_FINGERPRINT}@{self._schema_cookie()}")
 
     def close(self) -> None:
         self.conn.close()
@@ -279,6 +1027,9 @@ class UsageStore:
             yield
         except Exception:
             self.conn.rollback()
+            # Keys added inside the rolled-back transaction no longer exist.
+            self._dimension_keys.clear()
+            self._source_id_cache.clear()
             raise
         else:
             self.conn.commit()
@@ -308,53 +1059,24 @@ class UsageStore:
             """
             CREATE TABLE IF NOT EXISTS sources (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                path TEXT NOT NULL UNIQUE
+                path TEXT NOT NULL UNIQUE,
+                events_first_utc TEXT,
+                events_last_utc TEXT,
+                events_revision INTEGER
             )
             """
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                captured_at TEXT NOT NULL,
-                captured_at_utc TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                total_tokens INTEGER,
-                input_tokens INTEGER,
-                cached_input_tokens INTEGER,
-                output_tokens INTEGER,
-                reasoning_output_tokens INTEGER,
-                lifetime_total_tokens INTEGER,
-                lifetime_input_tokens INTEGER,
-                lifetime_cached_input_tokens INTEGER,
-                lifetime_output_tokens INTEGER,
-                lifetime_reasoning_output_tokens INTEGER,
-                context_used INTEGER,
-                context_total INTEGER,
-                context_percent_left REAL,
-                limit_5h_percent_left REAL,
-                limit_5h_resets_at TEXT,
-                limit_weekly_percent_left REAL,
-                limit_weekly_resets_at TEXT,
-                limit_5h_used_percent REAL,
-                limit_5h_window_minutes INTEGER,
-                limit_5h_resets_at_seconds INTEGER,
-                limit_weekly_used_percent REAL,
-                limit_weekly_window_minutes INTEGER,
-                limit_weekly_resets_at_seconds INTEGER,
-                rate_limit_has_credits INTEGER,
-                rate_limit_unlimited INTEGER,
-                rate_limit_balance TEXT,
-                rate_limit_plan_type TEXT,
-                model TEXT,
-                directory TEXT,
-                session_id TEXT,
-                codex_version TEXT,
-                source TEXT,
-                source_id INTEGER
+        for dimension in DIMENSIONS:
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS dim_{dimension} (
+                    id INTEGER PRIMARY KEY,
+                    value TEXT NOT NULL UNIQUE
+                )
+                """
             )
-            """
-        )
+        for ddl in NORMALIZED_TABLE_DDL.values():
+            cur.execute(ddl)
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS sessions (
@@ -375,6 +1097,20 @@ class UsageStore:
             )
             """
         )
+        # Session listings and the distinct-session count range over when a
+        # session was first seen (``_SEEN_AT_SQL``); exports over capture time.
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS sessions_seen_at_idx
+            ON sessions(COALESCE(session_timestamp_utc, captured_at_utc))
+            """
+        )
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS sessions_captured_at_utc_idx
+            ON sessions(captured_at_utc)
+            """
+        )
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS session_annotations (
@@ -435,22 +1171,6 @@ class UsageStore:
             )
             """
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS activity_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                captured_at TEXT NOT NULL,
-                captured_at_utc TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                event_name TEXT,
-                count INTEGER NOT NULL,
-                session_id TEXT,
-                turn_index INTEGER,
-                source TEXT,
-                source_id INTEGER
-            )
-            """
-        )
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS app_turns (
@@ -488,48 +1208,6 @@ class UsageStore:
             )
             """
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                captured_at TEXT NOT NULL,
-                captured_at_utc TEXT NOT NULL,
-                role TEXT NOT NULL,
-                message_type TEXT NOT NULL,
-                content TEXT NOT NULL,
-                content_length INTEGER NOT NULL DEFAULT 0,
-                session_id TEXT,
-                turn_index INTEGER,
-                ordinal INTEGER,
-                source TEXT,
-                source_id INTEGER,
-                source_line INTEGER
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tool_calls (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                captured_at TEXT NOT NULL,
-                captured_at_utc TEXT NOT NULL,
-                tool_type TEXT NOT NULL,
-                tool_name TEXT,
-                call_id TEXT,
-                status TEXT,
-                input_text TEXT,
-                output_text TEXT,
-                command TEXT,
-                input_length INTEGER,
-                output_length INTEGER,
-                payload_truncated INTEGER NOT NULL DEFAULT 0,
-                session_id TEXT,
-                turn_index INTEGER,
-                source TEXT,
-                source_id INTEGER
-            )
-            """
-        )
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS weekly_quota_estimates (
@@ -540,42 +1218,33 @@ class UsageStore:
                 used_percent REAL,
                 observed_tokens INTEGER NOT NULL,
                 observed_cost REAL NOT NULL,
-                computed_at TEXT NOT NULL
+                computed_at TEXT NOT NULL,
+                input_watermark INTEGER,
+                pricing_hash TEXT
             )
             """
         )
         cur.execute(
             """
-            CREATE UNIQUE INDEX IF NOT EXISTS events_dedupe_idx
-            ON events(
-                captured_at,
-                event_type,
-                total_tokens,
-                input_tokens,
-                cached_input_tokens,
-                output_tokens,
-                reasoning_output_tokens,
-                session_id,
-                source
+            CREATE TABLE IF NOT EXISTS weekly_quota_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                week_start TEXT NOT NULL,
+                week_end TEXT NOT NULL,
+                quota_tokens INTEGER NOT NULL,
+                quota_cost REAL NOT NULL,
+                used_percent REAL,
+                observed_tokens INTEGER NOT NULL,
+                observed_cost REAL NOT NULL,
+                computed_at TEXT NOT NULL,
+                input_watermark INTEGER,
+                pricing_hash TEXT
             )
             """
         )
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS events_captured_at_utc_idx
-            ON events(captured_at_utc)
-            """
-        )
-        cur.execute(
-            """
-            CREATE INDEX IF NOT EXISTS events_event_type_idx
-            ON events(event_type)
-            """
-        )
-        cur.execute(
-            """
-            CREATE INDEX IF NOT EXISTS events_event_type_captured_at_utc_idx
-            ON events(event_type, captured_at_utc)
+            CREATE INDEX IF NOT EXISTS weekly_quota_history_week_idx
+            ON weekly_quota_history(week_start, id)
             """
         )
         cur.execute(
@@ -616,81 +1285,172 @@ class UsageStore:
         )
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS messages_session_idx
-            ON messages(session_id)
+            CREATE INDEX IF NOT EXISTS app_items_completed_at_idx
+            ON app_items(completed_at)
             """
         )
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS messages_captured_at_utc_idx
-            ON messages(captured_at_utc)
+            CREATE INDEX IF NOT EXISTS turns_captured_at_utc_desc_idx
+            ON turns(captured_at_utc DESC)
             """
         )
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS messages_session_ordinal_idx
-            ON messages(session_id, ordinal)
+            CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                algorithm TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                sample_count INTEGER NOT NULL,
+                dictionary BLOB NOT NULL
+            )
             """
         )
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS messages_session_turn_idx
-            ON messages(session_id, turn_index, captured_at_utc)
-            """
+            INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)
+            """,
+            ("schema_version", str(SCHEMA_VERSION)),
         )
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS turns_captured_at_utc_desc_idx
-            ON turns(captured_at_utc DESC)
+            INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)
+            """,
+            ("ingest_version", str(INGEST_VERSION)),
+        )
+        self._create_content_tables()
+        self._ensure_event_columns()
+        self._ensure_ingestion_columns()
+        self._ensure_message_columns()
+        self._ensure_tool_call_columns()
+        self._ensure_payload_blobs()
+        self._ensure_source_columns()
+        self._ensure_content_messages_view()
+        self._backfill_source_ids()
+        self._ensure_normalized_tables()
+        self._ensure_directory_tree()
+        self._ensure_zone_maps()
+        self._ensure_activity_counts()
+        self._ensure_source_span_columns()
+        self._ensure_weekly_quota_columns()
+        self._ensure_latest_status()
+        self._ensure_session_summary()
+        self._ensure_source_indexes()
+        self._ensure_text_views()
+        self._ensure_fts_pending()
+        self._ensure_fts_indexes()
+        self._ensure_substring_index()
+        self._ensure_schema_version()
+        self.conn.commit()
+
+    def _create_content_tables(self) -> None:
+        """Create messages/tool_calls and their indexes in the content schema."""
+        cur = self.conn.cursor()
+        schema = self.content_schema
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                captured_at TEXT NOT NULL,
+                captured_at_utc TEXT NOT NULL,
+                role TEXT NOT NULL,
+                message_type TEXT NOT NULL,
+                content TEXT NOT NULL,
+                content_length INTEGER NOT NULL DEFAULT 0,
+                session_id TEXT,
+                turn_index INTEGER,
+                ordinal INTEGER,
+                source TEXT,
+                source_id INTEGER,
+                source_line INTEGER,
+                representations INTEGER NOT NULL DEFAULT 0
+            )
             """
         )
         cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.tool_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                captured_at TEXT NOT NULL,
+                captured_at_utc TEXT NOT NULL,
+                tool_type TEXT NOT NULL,
+                tool_name TEXT,
+                call_id TEXT,
+                status TEXT,
+                input_text TEXT,
+                output_text TEXT,
+                command TEXT,
+                input_length INTEGER,
+                output_length INTEGER,
+                payload_truncated INTEGER NOT NULL DEFAULT 0,
+                session_id TEXT,
+                turn_index INTEGER,
+                source TEXT,
+                source_id INTEGER,
+                input_blob_id INTEGER,
+                output_blob_id INTEGER
+            )
             """
-            CREATE INDEX IF NOT EXISTS tool_calls_captured_at_utc_desc_idx
-            ON tool_calls(captured_at_utc DESC)
+        )
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.payload_blobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash BLOB NOT NULL UNIQUE,
+                content TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0
+            )
             """
         )
         cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.payload_blobs_unreferenced_idx
+            ON payload_blobs(id) WHERE refcount <= 0
             """
-            CREATE INDEX IF NOT EXISTS events_type_utc_session_idx
-            ON events(event_type, captured_at_utc, session_id)
+        )
+        cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.messages_session_idx
+            ON messages(session_id)
             """
         )
         cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.messages_captured_at_utc_idx
+            ON messages(captured_at_utc)
             """
-            CREATE INDEX IF NOT EXISTS tool_calls_session_idx
-            ON tool_calls(session_id)
+        )
+        cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.messages_session_ordinal_idx
+            ON messages(session_id, ordinal)
             """
         )
         cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.messages_session_turn_idx
+            ON messages(session_id, turn_index, captured_at_utc)
             """
-            CREATE INDEX IF NOT EXISTS tool_calls_type_idx
-            ON tool_calls(tool_type)
+        )
+        cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.tool_calls_captured_at_utc_desc_idx
+            ON tool_calls(captured_at_utc DESC)
             """
         )
         cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.tool_calls_session_idx
+            ON tool_calls(session_id)
             """
-            INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)
-            """,
-            ("schema_version", str(SCHEMA_VERSION)),
         )
         cur.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {schema}.tool_calls_type_idx
+            ON tool_calls(tool_type)
             """
-            INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)
-            """,
-            ("ingest_version", str(INGEST_VERSION)),
         )
-        self._ensure_event_columns()
-        self._ensure_ingestion_columns()
-        self._ensure_message_columns()
-        self._ensure_tool_call_columns()
-        self._ensure_source_columns()
-        self._ensure_content_messages_view()
-        self._backfill_source_ids()
-        self._ensure_source_indexes()
-        self._ensure_messages_fts()
-        self._ensure_schema_version()
-        self.conn.commit()
 
     def _ensure_ingestion_columns(self) -> None:
         columns = self.conn.execute("PRAGMA table_info(ingestion_files)").fetchall()
@@ -712,12 +1472,23 @@ class UsageStore:
             "ordinal": "INTEGER",
             "source_id": "INTEGER",
             "source_line": "INTEGER",
+            "representations": "INTEGER NOT NULL DEFAULT 0",
         }
         for column, ddl in additions.items():
             if column not in existing:
                 self.conn.execute(
                     f"ALTER TABLE messages ADD COLUMN {column} {ddl}"
                 )
+        if "representations" not in existing:
+            # Rows from before ingest-time pairing saw one representation;
+            # re-ingesting their rollouts (INGEST_VERSION 6) merges the pairs.
+            self.conn.execute(
+                f"""
+                UPDATE messages
+                SET representations = {self._representation_sql("message_type")}
+                """
+            )
+            self.conn.execute(f"DROP VIEW IF EXISTS {self.content_schema}.content_messages")
         missing_lengths = self.conn.execute(
             """
             SELECT 1
@@ -744,6 +1515,8 @@ class UsageStore:
             "input_length": "INTEGER",
             "output_length": "INTEGER",
             "payload_truncated": "INTEGER NOT NULL DEFAULT 0",
+            "input_blob_id": "INTEGER",
+            "output_blob_id": "INTEGER",
         }
         for column, ddl in additions.items():
             if column not in existing:
@@ -783,8 +1556,186 @@ class UsageStore:
                 """
             )
 
+    def _ensure_payload_blob_triggers(self) -> None:
+        schema = self.content_schema
+        self.conn.executescript(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.tool_calls_blobs_ai AFTER INSERT ON tool_calls
+            WHEN new.input_blob_id IS NOT NULL OR new.output_blob_id IS NOT NULL BEGIN
+                UPDATE payload_blobs SET refcount = refcount + 1 WHERE id = new.input_blob_id;
+                UPDATE payload_blobs SET refcount = refcount + 1 WHERE id = new.output_blob_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {schema}.tool_calls_blobs_ad AFTER DELETE ON tool_calls
+            WHEN old.input_blob_id IS NOT NULL OR old.output_blob_id IS NOT NULL BEGIN
+                UPDATE payload_blobs SET refcount = refcount - 1 WHERE id = old.input_blob_id;
+                UPDATE payload_blobs SET refcount = refcount - 1 WHERE id = old.output_blob_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {schema}.tool_calls_blobs_au
+            AFTER UPDATE OF input_blob_id, output_blob_id ON tool_calls BEGIN
+                UPDATE payload_blobs SET refcount = refcount - 1 WHERE id = old.input_blob_id;
+                UPDATE payload_blobs SET refcount = refcount - 1 WHERE id = old.output_blob_id;
+                UPDATE payload_blobs SET refcount = refcount + 1 WHERE id = new.input_blob_id;
+                UPDATE payload_blobs SET refcount = refcount + 1 WHERE id = new.output_blob_id;
+            END;
+            """
+        )
+
+    def _ensure_payload_blobs(self) -> None:
+        """
+        Install the refcount triggers and, once per database, move long inline
+        tool payloads into payload_blobs. tool_calls_fts is dropped for the
+        move; the migration rebuilds it over the ``tool_calls_text`` view.
+        """
+        self._ensure_payload_blob_triggers()
+        if self._get_meta("payload_blobs") == "1":
+            return
+        if self._table_exists("tool_calls_fts"):
+            self.conn.execute("DROP TABLE tool_calls_fts")
+            self._install_fts_triggers()
+        pack = self._payload_packer()
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                """
+                SELECT id, input_text, output_text
+                FROM tool_calls
+                WHERE id > ? AND (input_text IS NOT NULL OR output_text IS NOT NULL)
+                ORDER BY id
+                LIMIT ?
+                """,
+                (last_id, FETCH_BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            payloads = self._store_payloads(
+                [
+                    self._inflate(row[column])
+                    for row in rows
+                    for column in ("input_text", "output_text")
+                ],
+                pack,
+            )
+            self.conn.executemany(
+                """
+                UPDATE tool_calls
+                SET input_text = ?, input_blob_id = ?, output_text = ?, output_blob_id = ?
+                WHERE id = ?
+                """,
+                [
+                    (*payloads[2 * position], *payloads[2 * position + 1], row["id"])
+                    for position, row in enumerate(rows)
+                    if payloads[2 * position][1] or payloads[2 * position + 1][1]
+                ],
+            )
+        self.set_meta("payload_blobs", "1")
+
+    def _store_payloads(
+        self,
+        values: list[Optional[str]],
+        pack: Callable[[Optional[str]], object],
+    ) -> list[tuple[object, Optional[int]]]:
+        """
+        Return an (inline value, blob id) pair per payload. Payloads of at
+        least PAYLOAD_BLOB_MIN_CHARS are stored once in payload_blobs, keyed by
+        SHA-256; shorter ones stay inline, where a blob row would cost more.
+        """
+        digests = {
+            value: hashlib.sha256(value.encode("utf-8")).digest()
+            for value in values
+            if value is not None and len(value) >= PAYLOAD_BLOB_MIN_CHARS
+        }
+        ids: dict[bytes, int] = {}
+        wanted = list(digests.values())
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start : start + 500]
+            for row in self.conn.execute(
+                f"SELECT id, hash FROM payload_blobs WHERE hash IN ({','.join('?' for _ in chunk)})",
+                chunk,
+            ).fetchall():
+                ids[bytes(row["hash"])] = int(row["id"])
+        for value, digest in digests.items():
+            if digest not in ids:
+                ids[digest] = int(
+                    self.conn.execute(
+                        "INSERT INTO payload_blobs (hash, content, length) VALUES (?, ?, ?)",
+                        (digest, pack(value), len(value)),
+                    ).lastrowid
+                )
+        return [
+            (None, ids[digests[value]]) if value in digests else (pack(value), None)
+            for value in values
+        ]
+
+    def collect_payload_blobs(self, commit: bool = True) -> int:
+        """Delete payload blobs that no tool call references any more."""
+        deleted = self.conn.execute("DELETE FROM payload_blobs WHERE refcount <= 0").rowcount
+        if commit:
+            self.conn.commit()
+        return int(deleted or 0)
+
+    def payload_blob_profile(self) -> dict[str, object]:
+        """How much deduplication saves: referenced versus unique payload text."""
+        row = self.conn.execute(
+            """
+            SELECT COUNT(*) AS blobs,
+                   SUM(refcount) AS references_count,
+                   SUM(length) AS unique_chars,
+                   SUM(length * refcount) AS referenced_chars,
+                   SUM(length(CAST(content AS BLOB))) AS stored_bytes
+            FROM payload_blobs
+            """
+        ).fetchone()
+        inline = self.conn.execute(
+            "SELECT COUNT(input_text) + COUNT(output_text) AS count FROM tool_calls"
+        ).fetchone()
+        unique_chars = int(row["unique_chars"] or 0)
+        referenced_chars = int(row["referenced_chars"] or 0)
+        return {
+            "blobs": int(row["blobs"] or 0),
+            "references": int(row["references_count"] or 0),
+            "inline_payloads": int(inline["count"] or 0),
+            "unique_chars": unique_chars,
+            "referenced_chars": referenced_chars,
+            "stored_bytes": int(row["stored_bytes"] or 0),
+            "dedup_ratio": round(referenced_chars / unique_chars, 2) if unique_chars else None,
+        }
+
+    def payload_blob_refcount_errors(self) -> int:
+        """Blobs whose refcount disagrees with tool_calls, plus dangling references."""
+        row = self.conn.execute(
+            """
+            WITH refs AS (
+                SELECT blob_id, COUNT(*) AS uses
+                FROM (
+                    SELECT input_blob_id AS blob_id FROM tool_calls
+                    WHERE input_blob_id IS NOT NULL
+                    UNION ALL
+                    SELECT output_blob_id FROM tool_calls
+                    WHERE output_blob_id IS NOT NULL
+                )
+                GROUP BY blob_id
+            )
+            SELECT
+                (SELECT COUNT(*)
+                 FROM payload_blobs
+                 LEFT JOIN refs ON refs.blob_id = payload_blobs.id
+                 WHERE payload_blobs.refcount != COALESCE(refs.uses, 0))
+                +
+                (SELECT COUNT(*)
+                 FROM refs
+                 LEFT JOIN payload_blobs ON payload_blobs.id = refs.blob_id
+                 WHERE payload_blobs.id IS NULL) AS errors
+            """
+        ).fetchone()
+        return int(row["errors"] or 0)
+
     def _ensure_source_columns(self) -> None:
         for table in SOURCE_TABLES:
+            if table in NORMALIZED_TABLES:
+                continue
             columns = self.conn.execute(f"PRAGMA table_info({table})").fetchall()
             existing = {row["name"] for row in columns}
             if "source_id" not in existing:
@@ -792,6 +1743,8 @@ class UsageStore:
 
     def _backfill_source_ids(self) -> None:
         for table in SOURCE_TABLES:
+            if table in NORMALIZED_TABLES:
+                continue
             missing = self.conn.execute(
                 f"""
                 SELECT 1
@@ -813,93 +1766,1458 @@ class UsageStore:
                 """
             )
             self.conn.execute(
-                f"""
-                UPDATE {table}
-                SET source_id = (
-                    SELECT id
-                    FROM sources
-                    WHERE sources.path = {table}.source
+                f"""
+                UPDATE {table}
+                SET source_id = (
+                    SELECT id
+                    FROM sources
+                    WHERE sources.path = {table}.source
+                )
+                WHERE source_id IS NULL
+                  AND source IS NOT NULL
+                  AND source != ''
+                """
+            )
+        self._source_id_cache.clear()
+
+    def _ensure_normalized_tables(self) -> None:
+        """
+        Move rows of legacy ``events``/``activity_events`` tables into their
+        keyed ``<table>_data`` tables, then (re)create the compatibility
+        views, their INSTEAD OF triggers and the indexes. Keyed tables that
+        still store text timestamps are set aside as ``<table>_data_legacy``
+        and copied into a fresh table the same way.
+        """
+        for table in NORMALIZED_TABLES:
+            data = _storage_table(table)
+            stored = {
+                row["name"] for row in self.conn.execute(f"PRAGMA table_info({data})").fetchall()
+            }
+            if "captured_at_utc" in stored:
+                self.conn.execute(f"DROP VIEW IF EXISTS {table}")
+                self.conn.execute(f"DROP VIEW IF EXISTS {table}_keyed")
+                self.conn.execute(f"ALTER TABLE {data} RENAME TO {data}_legacy")
+                self.conn.execute(NORMALIZED_TABLE_DDL[table])
+                self.conn.commit()
+            for legacy in (table, f"{data}_legacy"):
+                row = self.conn.execute(
+                    "SELECT type FROM main.sqlite_master WHERE name = ?",
+                    (legacy,),
+                ).fetchone()
+                if row is not None and row["type"] == "table":
+                    self._migrate_normalized_table(table, legacy)
+            self.conn.execute(f"DROP VIEW IF EXISTS {table}")
+            self.conn.execute(f"CREATE VIEW {table} AS {self._normalized_view_sql(table)}")
+            self.conn.execute(f"DROP VIEW IF EXISTS {table}_keyed")
+            if "directory" in NORMALIZED_TABLES[table].values():
+                self.conn.execute(
+                    f"CREATE VIEW {table}_keyed AS {self._normalized_view_sql(table, keyed=True)}"
+                )
+            self._create_normalized_triggers(table)
+        for ddl in NORMALIZED_INDEX_DDL:
+            self.conn.execute(ddl)
+
+    def _normalized_columns(self, table: str) -> list[tuple[str, Optional[str], bool]]:
+        """``(stored column, view column it keys or None, NOT NULL)`` for ``<table>_data``."""
+        keys = {
+            f"{dimension}_key": column for column, dimension in NORMALIZED_TABLES[table].items()
+        }
+        return [
+            (info["name"], keys.get(info["name"]), bool(info["notnull"]))
+            for info in self.conn.execute(
+                f"PRAGMA table_info({_storage_table(table)})"
+            ).fetchall()
+        ]
+
+    def _normalized_view_sql(self, table: str, keyed: bool = False) -> str:
+        """
+        The compatibility view over ``<table>_data``. ``keyed`` adds
+        ``directory_key`` for the ``<table>_keyed`` view that subtree filters
+        read; the public view keeps to the legacy columns.
+        """
+        data = _storage_table(table)
+        selected = []
+        joins = []
+        # NOT NULL dimensions are joined so filters on them can seek through
+        # the dimension's UNIQUE index into the key indexes. Nullable ones are
+        # scalar subqueries, which SQLite only evaluates when a query reads them.
+        for name, column, notnull in self._normalized_columns(table):
+            if column is not None:
+                dimension = NORMALIZED_TABLES[table][column]
+                if notnull:
+                    selected.append(f"dim_{dimension}.value AS {column}")
+                    joins.append(f"JOIN dim_{dimension} ON dim_{dimension}.id = {data}.{name}")
+                else:
+                    selected.append(
+                        f"(SELECT value FROM dim_{dimension} WHERE id = {data}.{name}) AS {column}"
+                    )
+                if keyed and dimension == "directory":
+                    # Subtree filters go through directory_tree on the key.
+                    selected.append(f"{data}.{name}")
+            elif name == "source_id":
+                selected.append(f"(SELECT path FROM sources WHERE id = {data}.source_id) AS source")
+                selected.append(f"{data}.source_id")
+            elif name == "captured_at_ms":
+                ms = f"{data}.captured_at_ms"
+                selected.append(
+                    f"{_iso_text_sql(ms, f'{data}.utc_offset_minutes')} AS captured_at"
+                )
+                selected.append(f"{_iso_text_sql(ms)} AS captured_at_utc")
+                selected.append(ms)
+            elif name == "local_hour":
+                selected.append(f"{data}.local_hour")
+                selected.append(f"{data}.local_hour / 24 AS local_day")
+            elif name != "utc_offset_minutes":
+                selected.append(f"{data}.{name}")
+        return f"SELECT {', '.join(selected)} FROM {data} {' '.join(joins)}"
+
+    def _create_normalized_triggers(self, table: str) -> None:
+        """Let plain INSERT and DELETE statements against the view keep working."""
+        data = _storage_table(table)
+        dimensions = NORMALIZED_TABLES[table]
+        columns = []
+        values = []
+        for name, column, _notnull in self._normalized_columns(table):
+            columns.append(name)
+            if column is not None:
+                values.append(
+                    f"(SELECT id FROM dim_{dimensions[column]} WHERE value = NEW.{column})"
+                )
+            elif name == "source_id":
+                values.append(
+                    "COALESCE(NEW.source_id, (SELECT id FROM sources WHERE path = NEW.source))"
+                )
+            elif name == "captured_at_ms":
+                values.append(
+                    f"COALESCE(NEW.captured_at_ms, {_epoch_ms_sql('NEW.captured_at_utc')})"
+                )
+            elif name == "utc_offset_minutes":
+                values.append(f"COALESCE({_utc_offset_sql('NEW.captured_at')}, 0)")
+            else:
+                values.append(f"NEW.{name}")
+        ensure = "".join(
+            f"INSERT OR IGNORE INTO dim_{dimension} (value) "
+            f"SELECT NEW.{column} WHERE NEW.{column} IS NOT NULL;\n"
+            for column, dimension in dimensions.items()
+        )
+        self.conn.executescript(
+            f"""
+            DROP TRIGGER IF EXISTS {table}_insert;
+            DROP TRIGGER IF EXISTS {table}_delete;
+            CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table} BEGIN
+                {ensure}
+                INSERT OR IGNORE INTO sources (path)
+                SELECT NEW.source WHERE NEW.source IS NOT NULL AND NEW.source != '';
+                INSERT INTO {data} ({", ".join(columns)})
+                VALUES ({", ".join(values)});
+            END;
+            CREATE TRIGGER {table}_delete INSTEAD OF DELETE ON {table} BEGIN
+                DELETE FROM {data} WHERE id = OLD.id;
+            END;
+            """
+        )
+
+    def _migrate_normalized_table(self, table: str, source: str) -> None:
+        """
+        Copy the legacy table ``source`` into ``<table>_data`` in committed
+        batches of DIMENSION_MIGRATION_BATCH rows, keeping row ids, then drop
+        it. A migration that was interrupted resumes after the last copied id.
+        """
+        data = _storage_table(table)
+        dimensions = NORMALIZED_TABLES[table]
+        legacy = {
+            row["name"] for row in self.conn.execute(f"PRAGMA table_info({source})").fetchall()
+        }
+        columns = []
+        values = []
+        for name, column, _notnull in self._normalized_columns(table):
+            columns.append(name)
+            if name in legacy and name != "source_id":
+                values.append(f"legacy.{name}")
+            elif column is not None:
+                values.append(
+                    f"(SELECT id FROM dim_{dimensions[column]} WHERE value = legacy.{column})"
+                    if column in legacy
+                    else "NULL"
+                )
+            elif name == "source_id":
+                lookup = "(SELECT id FROM sources WHERE path = legacy.source)"
+                if "source_id" in legacy:
+                    lookup = f"COALESCE(legacy.source_id, {lookup})"
+                values.append(lookup if "source" in legacy else "legacy.source_id")
+            elif name == "captured_at_ms":
+                values.append(_epoch_ms_sql("legacy.captured_at_utc"))
+            elif name == "utc_offset_minutes":
+                values.append(f"COALESCE({_utc_offset_sql('legacy.captured_at')}, 0)")
+            else:
+                values.append("NULL")
+        last_id = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {data}").fetchone()[0]
+        while True:
+            upper = self.conn.execute(
+                f"""
+                SELECT MAX(id) FROM (
+                    SELECT id FROM {source} WHERE id > ? ORDER BY id LIMIT ?
+                )
+                """,
+                (last_id, DIMENSION_MIGRATION_BATCH),
+            ).fetchone()[0]
+            if upper is None:
+                break
+            for column, dimension in dimensions.items():
+                if column in legacy:
+                    self.conn.execute(
+                        f"""
+                        INSERT OR IGNORE INTO dim_{dimension} (value)
+                        SELECT DISTINCT {column} FROM {source}
+                        WHERE id > ? AND id <= ? AND {column} IS NOT NULL
+                        """,
+                        (last_id, upper),
+                    )
+            if "source" in legacy:
+                self.conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO sources (path)
+                    SELECT DISTINCT source FROM {source}
+                    WHERE id > ? AND id <= ? AND source IS NOT NULL AND source != ''
+                    """,
+                    (last_id, upper),
+                )
+            self.conn.execute(
+                f"""
+                INSERT INTO {data} ({", ".join(columns)})
+                SELECT {", ".join(values)}
+                FROM {source} AS legacy
+                WHERE legacy.id > ? AND legacy.id <= ?
+                """,
+                (last_id, upper),
+            )
+            self.conn.commit()
+            last_id = upper
+        self.conn.execute(f"DROP TABLE {source}")
+        self._source_id_cache.clear()
+
+    def _dimension_key(self, dimension: str, value: Optional[str]) -> Optional[int]:
+        """Surrogate key of ``value`` in ``dim_<dimension>``, added on first use."""
+        if value is None:
+            return None
+        keys = self._dimension_keys.setdefault(dimension, {})
+        key = keys.get(value)
+        if key is not None:
+            return key
+        self.conn.execute(
+            f"INSERT OR IGNORE INTO dim_{dimension} (value) VALUES (?)",
+            (value,),
+        )
+        key = int(
+            self.conn.execute(
+                f"SELECT id FROM dim_{dimension} WHERE value = ?",
+                (value,),
+            ).fetchone()["id"]
+        )
+        keys[value] = key
+        if dimension == "directory":
+            self._directory_node(value)
+        return key
+
+    def _ensure_directory_tree(self) -> None:
+        columns = self.conn.execute("PRAGMA table_info(dim_directory)").fetchall()
+        existing = {row["name"] for row in columns}
+        for column in ("parent_id", "depth"):
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE dim_directory ADD COLUMN {column} INTEGER")
+        for ddl in DIRECTORY_TREE_DDL:
+            self.conn.execute(ddl)
+        self.sync_directory_tree(commit=False)
+
+    def _ensure_zone_maps(self) -> None:
+        self.conn.execute(ZONE_MAP_DDL)
+        for table in ZONE_MAP_TABLES:
+            self.extend_zone_map(table)
+
+    def _ensure_activity_counts(self) -> None:
+        exists = self._table_exists("activity_counts_data")
+        for ddl in ACTIVITY_COUNTS_DDL:
+            self.conn.execute(ddl)
+        self.conn.execute(
+            f"""
+            CREATE VIEW IF NOT EXISTS activity_counts AS
+            SELECT
+                minute_ms,
+                {_iso_text_sql("minute_ms")} AS minute_utc,
+                dim_event_type.value AS event_type,
+                (SELECT value FROM dim_event_name WHERE id = event_name_key) AS event_name,
+                (SELECT value FROM dim_session WHERE id = session_key) AS session_id,
+                NULLIF(turn_index, -1) AS turn_index,
+                (SELECT path FROM sources WHERE id = source_id) AS source,
+                count
+            FROM activity_counts_data
+            JOIN dim_event_type ON dim_event_type.id = activity_counts_data.event_type_key
+            """
+        )
+        if not exists:
+            self.rebuild_activity_counts(commit=False)
+
+    def rebuild_activity_counts(self, commit: bool = True) -> None:
+        """Recompute ``activity_counts_data`` from the raw ``activity_events`` rows."""
+        self.conn.execute("DELETE FROM activity_counts_data")
+        self.conn.execute(
+            f"""
+            INSERT INTO activity_counts_data (
+                minute_ms, event_type_key, event_name_key, session_key, turn_index,
+                source_id, count
+            )
+            SELECT captured_at_ms - captured_at_ms % {ACTIVITY_COUNT_BUCKET_MS},
+                   event_type_key, IFNULL(event_name_key, 0), IFNULL(session_key, 0),
+                   IFNULL(turn_index, -1), IFNULL(source_id, 0), SUM(count)
+            FROM activity_events_data
+            GROUP BY 1, 2, 3, 4, 5, 6
+            """
+        )
+        if commit:
+            self.conn.commit()
+
+    def extend_zone_map(self, table: str, commit: bool = True) -> None:
+        """Fold the rows added to ``table`` since the last call into its zone map."""
+        key = f"zone_map_rowid:{table}"
+        covered = int(self._get_meta(key) or 0)
+        top = int(self.conn.execute(f"SELECT MAX(id) FROM {_storage_table(table)}").fetchone()[0] or 0)
+        if top == covered:
+            return
+        if top < covered:
+            # Ids went backwards: the table was recreated (a purged content
+            # file), so its blocks can mix old and new rows. Start over.
+            self.reset_zone_maps((table,))
+            covered = 0
+        if top > covered:
+            column = time_order_column(table)
+            self.conn.execute(
+                f"""
+                INSERT INTO zone_maps (table_name, block, min_at, max_at)
+                SELECT ?, id / {ZONE_MAP_BLOCK_ROWS}, MIN({column}), MAX({column})
+                FROM {_storage_table(table)}
+                WHERE id > ?
+                GROUP BY id / {ZONE_MAP_BLOCK_ROWS}
+                ON CONFLICT(table_name, block) DO UPDATE SET
+                    min_at = MIN(min_at, excluded.min_at),
+                    max_at = MAX(max_at, excluded.max_at)
+                """,
+                (table, covered),
+            )
+        # Not set_meta(): bulk inserts call this inside the caller's transaction.
+        self.conn.execute(
+            """
+            INSERT INTO meta (key, value)
+            VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """,
+            (key, str(top)),
+        )
+        if commit:
+            self.conn.commit()
+
+    def reset_zone_maps(self, tables: Iterable[str]) -> None:
+        """Forget the zone maps of ``tables``; the next extend folds every row in."""
+        if not self._table_exists("zone_maps"):
+            return
+        for table in tables:
+            self.conn.execute("DELETE FROM zone_maps WHERE table_name = ?", (table,))
+            self.conn.execute("DELETE FROM meta WHERE key = ?", (f"zone_map_rowid:{table}",))
+
+    def zone_rowid_span(
+        self, table: str, start: Optional[str], end: Optional[str]
+    ) -> Optional[tuple[int, int]]:
+        """
+        The rowid span holding every ``table`` row captured in ``[start, end]``
+        according to its zone map; ``(1, 0)`` when no block overlaps. None
+        when there is no range, the map is behind the table, or the
+        overlapping blocks are too scattered for the span to narrow anything.
+        """
+        if not (start or end):
+            return None
+        covered = self._get_meta(f"zone_map_rowid:{table}")
+        top = self.conn.execute(f"SELECT MAX(id) FROM {_storage_table(table)}").fetchone()[0]
+        if covered is None or int(covered) != int(top or 0):
+            return None
+        clauses = ["table_name = ?"]
+        params: list[object] = [table]
+        for clause, value in (("max_at >= ?", start), ("min_at <= ?", end)):
+            if value:
+                clauses.append(clause)
+                params.append(epoch_ms(value) if table in NORMALIZED_TABLES else value)
+        first, last, blocks = self.conn.execute(
+            f"SELECT MIN(block), MAX(block), COUNT(*) FROM zone_maps WHERE {' AND '.join(clauses)}",
+            params,
+        ).fetchone()
+        if not blocks:
+            return (1, 0)
+        if blocks < (last - first + 1) * ZONE_MAP_MIN_DENSITY:
+            return None
+        return (first * ZONE_MAP_BLOCK_ROWS, (last + 1) * ZONE_MAP_BLOCK_ROWS - 1)
+
+    def range_sql(
+        self, table: str, start: Optional[str], end: Optional[str]
+    ) -> tuple[list[str], list[object]]:
+        """:func:`time_range_sql`, plus the zone map's rowid span for ``table``."""
+        clauses, params = time_range_sql(table, start, end)
+        if table in ZONE_MAP_TABLES:
+            span = self.zone_rowid_span(table, start, end)
+            if span is not None and (table in ZONE_MAP_SPAN_TABLES or span == (1, 0)):
+                clauses.append("id BETWEEN ? AND ?")
+                params.extend(span)
+        return clauses, params
+
+    def _directory_node(self, path: str) -> tuple[int, int]:
+        """``(id, depth)`` of ``path`` in dim_directory, linking it and its ancestors into directory_tree."""
+        row = self.conn.execute(
+            "SELECT id, depth FROM dim_directory WHERE value = ?",
+            (path,),
+        ).fetchone()
+        if row is not None and row["depth"] is not None:
+            return int(row["id"]), int(row["depth"])
+        if row is None:
+            node_id = int(
+                self.conn.execute(
+                    "INSERT INTO dim_directory (value) VALUES (?)",
+                    (path,),
+                ).lastrowid
+            )
+        else:
+            node_id = int(row["id"])
+        parent = parent_directory(path)
+        parent_id = None
+        depth = 0
+        if parent is not None:
+            parent_id, parent_depth = self._directory_node(parent)
+            depth = parent_depth + 1
+            self.conn.execute(
+                """
+                INSERT OR IGNORE INTO directory_tree (ancestor_id, descendant_id, depth)
+                SELECT ancestor_id, ?, depth FROM directory_tree WHERE descendant_id = ?
+                """,
+                (node_id, parent_id),
+            )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO directory_tree (ancestor_id, descendant_id, depth) VALUES (?, ?, ?)",
+            (node_id, node_id, depth),
+        )
+        self.conn.execute(
+            "UPDATE dim_directory SET parent_id = ?, depth = ? WHERE id = ?",
+            (parent_id, depth, node_id),
+        )
+        return node_id, depth
+
+    def sync_directory_tree(self, commit: bool = True) -> int:
+        """
+        Link directories added without going through ingest (plain INSERTs
+        into the ``events`` view, or rows from before the tree existed) into
+        directory_tree. Returns how many were linked.
+        """
+        pending = [
+            row["value"]
+            for row in self.conn.execute(
+                "SELECT value FROM dim_directory WHERE depth IS NULL ORDER BY id"
+            ).fetchall()
+        ]
+        for path in pending:
+            self._directory_node(path)
+        if commit and pending:
+            self.conn.commit()
+        return len(pending)
+
+    def directory_subtree(self, path: str) -> Optional[list[str]]:
+        """
+        ``path`` and every known directory under it, or None when ``path`` is
+        not a directory in the tree.
+        """
+        if not self.read_only:
+            self.sync_directory_tree()
+        rows = self.conn.execute(
+            """
+            SELECT dim_directory.value
+            FROM directory_tree
+            JOIN dim_directory ON dim_directory.id = directory_tree.descendant_id
+            WHERE directory_tree.ancestor_id = (SELECT id FROM dim_directory WHERE value = ?)
+            ORDER BY dim_directory.value
+            """,
+            (path,),
+        ).fetchall()
+        return [row["value"] for row in rows] or None
+
+    def directory_rollup(self, depth: int) -> dict[str, str]:
+        """
+        Map every directory to its ancestor ``depth`` components below the
+        root, or to itself when it is no deeper than that.
+        """
+        if not self.read_only:
+            self.sync_directory_tree()
+        # SQLite takes the bare ancestor from the row holding MAX(depth).
+        rows = self.conn.execute(
+            """
+            SELECT node.value AS directory, ancestor.value AS rollup, MAX(directory_tree.depth)
+            FROM directory_tree
+            JOIN dim_directory AS node ON node.id = directory_tree.descendant_id
+            JOIN dim_directory AS ancestor ON ancestor.id = directory_tree.ancestor_id
+            WHERE directory_tree.depth <= ?
+            GROUP BY directory_tree.descendant_id
+            """,
+            (max(depth, 0),),
+        ).fetchall()
+        return {row["directory"]: row["rollup"] for row in rows}
+
+    def _ensure_source_span_columns(self) -> None:
+        columns = self.conn.execute("PRAGMA table_info(sources)").fetchall()
+        existing = {row["name"] for row in columns}
+        additions = {
+            "events_first_utc": "TEXT",
+            "events_last_utc": "TEXT",
+            "events_revision": "INTEGER",
+        }
+        missing = [column for column in additions if column not in existing]
+        for column in missing:
+            self.conn.execute(
+                f"ALTER TABLE sources ADD COLUMN {column} {additions[column]}"
+            )
+        if missing:
+            # Backfill spans once so cached weekly estimates can be invalidated
+            # for sources ingested before spans were tracked.
+            self.conn.execute(
+                """
+                UPDATE sources
+                SET events_first_utc = (
+                        SELECT MIN(captured_at_utc) FROM events WHERE source_id = sources.id
+                    ),
+                    events_last_utc = (
+                        SELECT MAX(captured_at_utc) FROM events WHERE source_id = sources.id
+                    ),
+                    events_revision = 1
+                """
+            )
+
+    def _ensure_weekly_quota_columns(self) -> None:
+        columns = self.conn.execute("PRAGMA table_info(weekly_quota_estimates)").fetchall()
+        existing = {row["name"] for row in columns}
+        additions = {
+            "input_watermark": "INTEGER",
+            "pricing_hash": "TEXT",
+        }
+        for column, ddl in additions.items():
+            if column not in existing:
+                self.conn.execute(
+                    f"ALTER TABLE weekly_quota_estimates ADD COLUMN {column} {ddl}"
+                )
+
+    def _ensure_latest_status(self) -> None:
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'latest_status'"
+        ).fetchone()
+        if exists:
+            return
+        self.conn.execute(
+            """
+            CREATE TABLE latest_status (
+                scope TEXT PRIMARY KEY,
+                event_id INTEGER NOT NULL,
+                captured_at_utc TEXT NOT NULL,
+                plan_type TEXT,
+                session_id TEXT
+            )
+            """
+        )
+        self.rebuild_latest_status(commit=False)
+
+    def rebuild_latest_status(self, commit: bool = True) -> None:
+        """
+        Recompute every ``latest_status`` row from ``events`` in one pass.
+
+        SQLite fills bare columns from the row holding ``MAX()``, so each scope
+        points at its newest status event.
+        """
+        placeholders = ",".join("?" for _ in STATUS_EVENT_TYPES)
+        self.conn.execute("DELETE FROM latest_status")
+        for scope_sql, key_column, scope_params in (
+            ("?", None, (LATEST_STATUS_SCOPE,)),
+            ("'plan:' || rate_limit_plan_type", "rate_limit_plan_type", ()),
+            ("'session:' || session_id", "session_id", ()),
+        ):
+            key_filter = f"AND {key_column} IS NOT NULL" if key_column else ""
+            group_by = f"GROUP BY {key_column}" if key_column else ""
+            self.conn.execute(
+                f"""
+                INSERT INTO latest_status (
+                    scope, event_id, captured_at_utc, plan_type, session_id
+                )
+                SELECT scope, id, captured_at_utc, rate_limit_plan_type, session_id
+                FROM (
+                    SELECT {scope_sql} AS scope,
+                           id,
+                           MAX(captured_at_ms),
+                           captured_at_utc,
+                           rate_limit_plan_type,
+                           session_id
+                    FROM events
+                    WHERE event_type IN ({placeholders})
+                      {key_filter}
+                    {group_by}
+                )
+                WHERE id IS NOT NULL
+                """,
+                (*scope_params, *STATUS_EVENT_TYPES),
+            )
+        if commit:
+            self.conn.commit()
+
+    def _touch_latest_status(self, events: Iterable[UsageEvent]) -> None:
+        newest: dict[str, UsageEvent] = {}
+        for event in events:
+            if event.event_type not in STATUS_EVENT_TYPES or not event.captured_at_utc:
+                continue
+            scopes = [LATEST_STATUS_SCOPE]
+            if event.rate_limit_plan_type:
+                scopes.append(f"plan:{event.rate_limit_plan_type}")
+            if event.session_id:
+                scopes.append(f"session:{event.session_id}")
+            for scope in scopes:
+                current = newest.get(scope)
+                if current is None or event.captured_at_utc >= current.captured_at_utc:
+                    newest[scope] = event
+        if not newest:
+            return
+        event_ids: dict[int, Optional[int]] = {}
+        rows = []
+        for scope, event in newest.items():
+            key = id(event)
+            if key not in event_ids:
+                # The dedupe index resolves the stored row without a scan.
+                row = self.conn.execute(
+                    """
+                    SELECT id FROM events
+                    WHERE captured_at_ms = ?
+                      AND event_type = ?
+                      AND total_tokens IS ?
+                      AND input_tokens IS ?
+                      AND cached_input_tokens IS ?
+                      AND output_tokens IS ?
+                      AND reasoning_output_tokens IS ?
+                      AND session_id IS ?
+                      AND source IS ?
+                    LIMIT 1
+                    """,
+                    (
+                        _timestamp_values(event.captured_at, event.captured_at_utc)[0],
+                        event.event_type,
+                        event.total_tokens,
+                        event.input_tokens,
+                        event.cached_input_tokens,
+                        event.output_tokens,
+                        event.reasoning_output_tokens,
+                        event.session_id,
+                        event.source,
+                    ),
+                ).fetchone()
+                event_ids[key] = int(row["id"]) if row else None
+            event_id = event_ids[key]
+            if event_id is None:
+                continue
+            rows.append(
+                (
+                    scope,
+                    event_id,
+                    event.captured_at_utc,
+                    event.rate_limit_plan_type,
+                    event.session_id,
+                )
+            )
+        self.conn.executemany(
+            """
+            INSERT INTO latest_status (
+                scope, event_id, captured_at_utc, plan_type, session_id
+            ) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(scope) DO UPDATE SET
+                event_id = excluded.event_id,
+                captured_at_utc = excluded.captured_at_utc,
+                plan_type = excluded.plan_type,
+                session_id = excluded.session_id
+            WHERE excluded.captured_at_utc >= latest_status.captured_at_utc
+            """,
+            rows,
+        )
+
+    def _latest_status_for_source(self, source_id: int) -> list[sqlite3.Row]:
+        """Scopes pointing at an event of ``source_id``, read before its events go."""
+        return self.conn.execute(
+            """
+            SELECT scope, plan_type
+            FROM latest_status
+            WHERE event_id IN (SELECT id FROM events_data WHERE source_id = ?)
+            """,
+            (source_id,),
+        ).fetchall()
+
+    def _repair_latest_status(self, orphaned: list[sqlite3.Row]) -> None:
+        """
+        Re-point ``orphaned`` scopes, whose event was deleted. Global and plan
+        scopes are re-resolved through the ``(event_type, captured_at_ms)``
+        index; session scopes are dropped and come back when the session's
+        rollout is re-inserted.
+        """
+        # SELECT then DELETE rather than DELETE ... RETURNING, which needs
+        # SQLite 3.35.
+        self.conn.executemany(
+            "DELETE FROM latest_status WHERE scope = ?",
+            [(row["scope"],) for row in orphaned],
+        )
+        rows = []
+        for row in orphaned:
+            scope = row["scope"]
+            if scope == LATEST_STATUS_SCOPE:
+                plan_filter, params = "", ()
+            elif scope.startswith("plan:"):
+                plan_filter, params = "AND rate_limit_plan_type = ?", (row["plan_type"],)
+            else:
+                continue
+            candidates = []
+            for event_type in STATUS_EVENT_TYPES:
+                found = self.conn.execute(
+                    f"""
+                    SELECT id, captured_at_utc, rate_limit_plan_type, session_id
+                    FROM events
+                    WHERE event_type = ?
+                      {plan_filter}
+                    ORDER BY captured_at_ms DESC
+                    LIMIT 1
+                    """,
+                    (event_type, *params),
+                ).fetchone()
+                if found is not None:
+                    candidates.append(found)
+            if not candidates:
+                continue
+            best = max(candidates, key=lambda item: item["captured_at_utc"])
+            rows.append(
+                (
+                    scope,
+                    best["id"],
+                    best["captured_at_utc"],
+                    best["rate_limit_plan_type"],
+                    best["session_id"],
+                )
+            )
+        self.conn.executemany(
+            """
+            INSERT OR REPLACE INTO latest_status (
+                scope, event_id, captured_at_utc, plan_type, session_id
+            ) VALUES (?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+    def _ensure_session_summary(self) -> None:
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'session_summary'"
+        ).fetchone()
+        if exists:
+            return
+        counts = "".join(
+            f"{column} INTEGER NOT NULL DEFAULT 0,\n" for column in SESSION_SUMMARY_COUNTS
+        )
+        self.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS session_source_summary (
+                session_id TEXT NOT NULL,
+                source_id INTEGER NOT NULL,
+                first_seen TEXT,
+                last_seen TEXT,
+                event_model TEXT,
+                turn_model TEXT,
+                directory TEXT,
+                turn_cwd TEXT,
+                {counts}
+                min_context_percent_left REAL,
+                PRIMARY KEY (session_id, source_id)
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS session_source_summary_source_idx
+            ON session_source_summary(source_id)
+            """
+        )
+        self.conn.execute(
+            f"""
+            CREATE TABLE session_summary (
+                session_id TEXT PRIMARY KEY,
+                cwd TEXT,
+                model TEXT,
+                first_seen TEXT,
+                last_seen TEXT,
+                {counts}
+                min_context_percent_left REAL,
+                duration_minutes REAL,
+                estimated_cost REAL,
+                interesting_score REAL,
+                pricing_hash TEXT
+            )
+            """
+        )
+        for name, columns in (
+            ("session_summary_score_idx", "interesting_score, estimated_cost, total_tokens"),
+            ("session_summary_last_seen_idx", "last_seen"),
+            ("session_summary_first_seen_idx", "first_seen"),
+            ("session_summary_pricing_idx", "pricing_hash"),
+        ):
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON session_summary({columns})"
+            )
+        self.rebuild_session_summary(commit=False)
+
+    def _insert_session_partials(self, source_id: Optional[int] = None) -> None:
+        """
+        Aggregate events, turns, messages and tool calls into one
+        ``session_source_summary`` row per session and source. With
+        ``source_id`` only that source is aggregated, through the
+        ``source_id`` indexes.
+        """
+        source_filter = "AND source_id = ?" if source_id is not None else ""
+        source_params = [source_id] if source_id is not None else []
+        statuses = sorted(TOOL_SUCCESS_STATUSES)
+        issue_sql = (
+            "status IS NOT NULL AND trim(status) != '' "
+            f"AND lower(status) NOT IN ({','.join('?' for _ in statuses)})"
+        )
+        self.conn.execute(
+            f"""
+            INSERT INTO session_source_summary (
+                session_id, source_id, first_seen, last_seen,
+                event_model, turn_model, directory, turn_cwd,
+                {", ".join(SESSION_SUMMARY_COUNTS)},
+                min_context_percent_left
+            )
+            SELECT session_id,
+                   source_id,
+                   MIN(first_seen),
+                   MAX(last_seen),
+                   MAX(event_model),
+                   MAX(turn_model),
+                   MAX(directory),
+                   MAX(turn_cwd),
+                   {", ".join(f"COALESCE(SUM({column}), 0)" for column in SESSION_SUMMARY_COUNTS)},
+                   MIN(min_context_percent_left)
+            FROM (
+                SELECT session_id,
+                       COALESCE(source_id, 0) AS source_id,
+                       MIN(captured_at_utc) AS first_seen,
+                       MAX(captured_at_utc) AS last_seen,
+                       MAX(model) AS event_model,
+                       NULL AS turn_model,
+                       MAX(directory) AS directory,
+                       NULL AS turn_cwd,
+                       COUNT(*) AS usage_events,
+                       SUM(total_tokens) AS total_tokens,
+                       SUM(input_tokens) AS input_tokens,
+                       SUM(cached_input_tokens) AS cached_input_tokens,
+                       SUM(output_tokens) AS output_tokens,
+                       0 AS turns, 0 AS messages, 0 AS tool_calls,
+                       0 AS tool_issue_signals, 0 AS payload_truncated, 0 AS compactions,
+                       MIN(context_percent_left) AS min_context_percent_left
+                FROM events
+                WHERE event_type IN ('usage_line', 'token_count')
+                  AND session_id IS NOT NULL
+                  {source_filter}
+                GROUP BY session_id, COALESCE(source_id, 0)
+                UNION ALL
+                SELECT session_id, COALESCE(source_id, 0),
+                       MIN(captured_at_utc), MAX(captured_at_utc),
+                       NULL, MAX(model), NULL, MAX(cwd),
+                       0, 0, 0, 0, 0,
+                       COUNT(*), 0, 0, 0, 0, 0,
+                       NULL
+                FROM turns
+                WHERE session_id IS NOT NULL
+                  {source_filter}
+                GROUP BY session_id, COALESCE(source_id, 0)
+                UNION ALL
+                SELECT session_id, COALESCE(source_id, 0),
+                       MIN(captured_at_utc), MAX(captured_at_utc),
+                       NULL, NULL, NULL, NULL,
+                       0, 0, 0, 0, 0,
+                       0, COUNT(*), 0, 0, 0, 0,
+                       NULL
+                FROM messages
+                WHERE session_id IS NOT NULL
+                  {source_filter}
+                GROUP BY session_id, COALESCE(source_id, 0)
+                UNION ALL
+                SELECT session_id, COALESCE(source_id, 0),
+                       MIN(captured_at_utc), MAX(captured_at_utc),
+                       NULL, NULL, NULL, NULL,
+                       0, 0, 0, 0, 0,
+                       0, 0, COUNT(*),
+                       SUM(CASE WHEN {issue_sql} THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN payload_truncated THEN 1 ELSE 0 END),
+                       0,
+                       NULL
+                FROM tool_calls
+                WHERE session_id IS NOT NULL
+                  {source_filter}
+                GROUP BY session_id, COALESCE(source_id, 0)
+                UNION ALL
+                SELECT session_id, COALESCE(source_id, 0),
+                       NULL, NULL,
+                       NULL, NULL, NULL, NULL,
+                       0, 0, 0, 0, 0,
+                       0, 0, 0, 0, 0, COUNT(*),
+                       NULL
+                FROM events
+                WHERE event_type = 'context_compacted'
+                  AND session_id IS NOT NULL
+                  {source_filter}
+                GROUP BY session_id, COALESCE(source_id, 0)
+            )
+            GROUP BY session_id, source_id
+            """,
+            [
+                *source_params,
+                *source_params,
+                *source_params,
+                *statuses,
+                *source_params,
+                *source_params,
+            ],
+        )
+
+    def _summarize_sessions(self, session_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Roll ``session_source_summary`` and ``sessions`` up into
+        ``session_summary``. Rewritten rows have no ``pricing_hash`` so the
+        next read prices and scores them.
+        """
+        if session_ids is None:
+            self.conn.execute("DELETE FROM session_summary")
+            id_sql = """
+                SELECT session_id FROM session_source_summary
+                UNION
+                SELECT session_id FROM sessions WHERE session_id IS NOT NULL
+            """
+            params: list[object] = []
+        else:
+            ids = sorted({session_id for session_id in session_ids if session_id})
+            if not ids:
+                return
+            payload = json.dumps(ids)
+            self.conn.execute(
+                """
+                DELETE FROM session_summary
+                WHERE session_id IN (SELECT value FROM json_each(?))
+                """,
+                (payload,),
+            )
+            id_sql = "SELECT value AS session_id FROM json_each(?)"
+            params = [payload]
+        self.conn.execute(
+            f"""
+            INSERT INTO session_summary (
+                session_id, cwd, model, first_seen, last_seen,
+                {", ".join(SESSION_SUMMARY_COUNTS)},
+                min_context_percent_left
+            )
+            SELECT ids.session_id,
+                   COALESCE(parts.directory, parts.turn_cwd, sessions.cwd),
+                   COALESCE(parts.event_model, parts.turn_model),
+                   MIN(
+                       COALESCE(parts.first_seen, {_SEEN_AT_SQL}),
+                       COALESCE({_SEEN_AT_SQL}, parts.first_seen)
+                   ),
+                   MAX(
+                       COALESCE(parts.last_seen, {_SEEN_AT_SQL}),
+                       COALESCE({_SEEN_AT_SQL}, parts.last_seen)
+                   ),
+                   {", ".join(f"COALESCE(parts.{column}, 0)" for column in SESSION_SUMMARY_COUNTS)},
+                   parts.min_context_percent_left
+            FROM ({id_sql}) AS ids
+            LEFT JOIN (
+                SELECT session_id,
+                       MIN(first_seen) AS first_seen,
+                       MAX(last_seen) AS last_seen,
+                       MAX(event_model) AS event_model,
+                       MAX(turn_model) AS turn_model,
+                       MAX(directory) AS directory,
+                       MAX(turn_cwd) AS turn_cwd,
+                       {", ".join(f"SUM({column}) AS {column}" for column in SESSION_SUMMARY_COUNTS)},
+                       MIN(min_context_percent_left) AS min_context_percent_left
+                FROM session_source_summary
+                WHERE session_id IN ({id_sql})
+                GROUP BY session_id
+            ) AS parts ON parts.session_id = ids.session_id
+            LEFT JOIN sessions ON sessions.session_id = ids.session_id
+            WHERE parts.session_id IS NOT NULL OR sessions.session_id IS NOT NULL
+            """,
+            [*params, *params],
+        )
+
+    def rebuild_session_summary(self, commit: bool = True) -> None:
+        self.conn.execute("DELETE FROM session_source_summary")
+        self._insert_session_partials()
+        self._summarize_sessions()
+        if commit:
+            self.conn.commit()
+
+    def refresh_session_summary_for_source(
+        self,
+        source: str,
+        session_ids: Iterable[str] = (),
+        commit: bool = True,
+    ) -> None:
+        """
+        Recompute the summary rows touched by re-ingesting ``source``: the
+        sessions it contributed before, the ones it contributes now, and any
+        ``session_ids`` whose metadata it upserted.
+        """
+        affected = set(session_ids)
+        source_id = self._source_id(source, create=False)
+        if source_id is not None:
+            affected.update(
+                row["session_id"]
+                for row in self.conn.execute(
+                    "SELECT session_id FROM session_source_summary WHERE source_id = ?",
+                    (source_id,),
+                )
+            )
+            self.conn.execute(
+                "DELETE FROM session_source_summary WHERE source_id = ?",
+                (source_id,),
+            )
+            self._insert_session_partials(source_id)
+            affected.update(
+                row["session_id"]
+                for row in self.conn.execute(
+                    "SELECT session_id FROM session_source_summary WHERE source_id = ?",
+                    (source_id,),
                 )
-                WHERE source_id IS NULL
-                  AND source IS NOT NULL
-                  AND source != ''
-                """
             )
-        self._source_id_cache.clear()
+        self._summarize_sessions(affected)
+        if commit:
+            self.conn.commit()
+
+    def session_summary_pricing_hash(self) -> Optional[str]:
+        return self._get_meta("session_summary_pricing_hash")
+
+    def reset_session_summary_pricing(self, pricing_hash: str) -> None:
+        self.conn.execute("UPDATE session_summary SET pricing_hash = NULL")
+        self.set_meta("session_summary_pricing_hash", pricing_hash)
+
+    def session_summary_is_priced(self, pricing_hash: str) -> bool:
+        """Whether every ``session_summary`` row carries cost and score for ``pricing_hash``."""
+        if self.session_summary_pricing_hash() != pricing_hash:
+            return False
+        return (
+            self.conn.execute(
+                "SELECT 1 FROM session_summary WHERE pricing_hash IS NULL LIMIT 1"
+            ).fetchone()
+            is None
+        )
+
+    def unpriced_session_summaries(self) -> list[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM session_summary WHERE pricing_hash IS NULL"
+        ).fetchall()
+
+    def update_session_scores(
+        self,
+        rows: Iterable[tuple[float, float, float, str, str]],
+    ) -> None:
+        """Store ``(duration_minutes, estimated_cost, score, pricing_hash, session_id)``."""
+        self.conn.executemany(
+            """
+            UPDATE session_summary
+            SET duration_minutes = ?,
+                estimated_cost = ?,
+                interesting_score = ?,
+                pricing_hash = ?
+            WHERE session_id = ?
+            """,
+            rows,
+        )
+        self.conn.commit()
 
     def _ensure_source_indexes(self) -> None:
         for table in SOURCE_TABLES:
-            self.conn.execute(
-                f"CREATE INDEX IF NOT EXISTS {table}_source_id_idx ON {table}(source_id)"
+            ddl = (
+                f"CREATE INDEX IF NOT EXISTS {table}_source_id_idx "
+                f"ON {_storage_table(table)}(source_id)"
             )
+            if table in CONTENT_TABLES:
+                ddl = self._content_ddl(ddl)
+            self.conn.execute(ddl)
 
-    def _ensure_messages_fts(self) -> None:
-        try:
+    def _table_exists(self, name: str) -> bool:
+        for schema in self._schemas():
             row = self.conn.execute(
-                """
-                SELECT name
-                FROM sqlite_master
-                WHERE type = 'table' AND name = 'messages_fts'
-                """
+                f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+                (name,),
             ).fetchone()
-            had_fts = row is not None
-            if had_fts:
-                trigger_count = self.conn.execute(
-                    """
-                    SELECT COUNT(*) AS count
-                    FROM sqlite_master
-                    WHERE type = 'trigger'
-                      AND name IN ('messages_ai', 'messages_ad', 'messages_au')
-                    """
-                ).fetchone()["count"]
-                if int(trigger_count or 0) == 3:
-                    return
+            if row is not None:
+                return True
+        return False
+
+    def fts_maintenance_mode(self) -> str:
+        if self._get_meta("fts_maintenance") == "deferred":
+            return "deferred"
+        return "immediate"
+
+    def _fts_indexes(self, content: Optional[str] = None) -> list[str]:
+        return [
+            name
+            for name, (source, _tokenizer, _prefix) in FTS_INDEXES.items()
+            if (content is None or source == content) and self._table_exists(name)
+        ]
+
+    def fts_trigger_names(self) -> set[str]:
+        """Triggers that should exist for the current FTS indexes and mode."""
+        deferred = self.fts_maintenance_mode() == "deferred"
+        names: set[str] = set()
+        for name in self._fts_indexes():
+            content, _tokenizer, prefix = FTS_INDEXES[name]
+            if deferred:
+                prefix = f"{content}_pending"
+            names |= {f"{prefix}_ai", f"{prefix}_ad", f"{prefix}_au"}
+        return names
+
+    def _fts_update_columns(self, content: str) -> str:
+        columns = FTS_CONTENT[content][2]
+        blobs = PAYLOAD_BLOB_COLUMNS.get(content, {})
+        return ", ".join((*columns, *(blobs[column] for column in columns if column in blobs)))
+
+    def _install_fts_triggers(self) -> None:
+        """
+        Replace the FTS triggers with the set for the current maintenance
+        mode: per-row index updates (``immediate``) or one queue row per
+        changed row in the content table's pending queue (``deferred``).
+        """
+        for name in FTS_TRIGGERS:
+            self.conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        wanted = self.fts_trigger_names()
+        schema = self.content_schema
+        for content, (queue, key, columns) in FTS_CONTENT.items():
+            if f"{content}_pending_ai" not in wanted:
+                continue
+            indexed = ", ".join(f"indexed_{column}" for column in columns)
+            nulls = ", ".join("NULL" for _ in columns)
+            old_values = ", ".join(
+                self._payload_expr(content, column, "old.") for column in columns
+            )
+            # Only the first change to a row since the last sync is kept: it
+            # records what the indexes currently hold for that rowid.
             self.conn.executescript(
+                f"""
+                CREATE TRIGGER {schema}.{content}_pending_ai AFTER INSERT ON {content} BEGIN
+                    INSERT OR IGNORE INTO {queue}({key}, indexed, {indexed})
+                    VALUES (new.id, 0, {nulls});
+                END;
+
+                CREATE TRIGGER {schema}.{content}_pending_ad AFTER DELETE ON {content} BEGIN
+                    INSERT OR IGNORE INTO {queue}({key}, indexed, {indexed})
+                    VALUES (old.id, 1, {old_values});
+                END;
+
+                CREATE TRIGGER {schema}.{content}_pending_au
+                AFTER UPDATE OF {self._fts_update_columns(content)} ON {content} BEGIN
+                    INSERT OR IGNORE INTO {queue}({key}, indexed, {indexed})
+                    VALUES (old.id, 1, {old_values});
+                    INSERT OR IGNORE INTO {queue}({key}, indexed, {indexed})
+                    VALUES (new.id, 0, {nulls});
+                END;
                 """
-                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
-                    content,
-                    content='messages',
-                    content_rowid='id',
-                    tokenize='porter unicode61'
-                );
-
-                CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
-                    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+            )
+        for table, (content, _tokenizer, prefix) in FTS_INDEXES.items():
+            if f"{prefix}_ai" not in wanted:
+                continue
+            columns = FTS_CONTENT[content][2]
+            names = ", ".join(columns)
+            new_values = ", ".join(self.text_sql(content, column, "new.") for column in columns)
+            old_values = ", ".join(self.text_sql(content, column, "old.") for column in columns)
+            self.conn.executescript(
+                f"""
+                CREATE TRIGGER {schema}.{prefix}_ai AFTER INSERT ON {content} BEGIN
+                    INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});
                 END;
 
-                CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
-                    INSERT INTO messages_fts(messages_fts, rowid, content)
-                    VALUES('delete', old.id, old.content);
+                CREATE TRIGGER {schema}.{prefix}_ad AFTER DELETE ON {content} BEGIN
+                    INSERT INTO {table}({table}, rowid, {names})
+                    VALUES('delete', old.id, {old_values});
                 END;
 
-                CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
-                    INSERT INTO messages_fts(messages_fts, rowid, content)
-                    VALUES('delete', old.id, old.content);
-                    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+                CREATE TRIGGER {schema}.{prefix}_au
+                AFTER UPDATE OF {self._fts_update_columns(content)} ON {content} BEGIN
+                    INSERT INTO {table}({table}, rowid, {names})
+                    VALUES('delete', old.id, {old_values});
+                    INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});
                 END;
                 """
             )
-            if not had_fts:
-                self.conn.execute("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')")
+
+    def payload_compression_enabled(self) -> bool:
+        return self._get_meta("payload_compression") == COMPRESSION_ALGORITHM
+
+    def _payload_expr(self, table: str, column: str, prefix: str = "") -> str:
+        """SQL for the stored value of ``column``, following payload_blobs references."""
+        blob = PAYLOAD_BLOB_COLUMNS.get(table, {}).get(column)
+        if blob is None:
+            return f"{prefix}{column}"
+        return (
+            f"COALESCE({prefix}{column}, "
+            f"(SELECT content FROM payload_blobs WHERE id = {prefix}{blob}))"
+        )
+
+    def text_sql(self, table: str, column: str, prefix: str = "") -> str:
+        """
+        SQL for the plain text of ``column``: follows payload_blobs references
+        and decompresses when payload compression is on. ``prefix`` qualifies
+        the columns, e.g. ``"tool_calls."`` or ``"new."`` inside a trigger.
+        """
+        value = self._payload_expr(table, column, prefix)
+        if column in COMPRESSED_COLUMNS.get(table, ()) and self.payload_compression_enabled():
+            return f"codex_text({value})"
+        return value
+
+    def _fts_source(self, content: str) -> str:
+        """External content of the FTS indexes over ``content``."""
+        if content in PAYLOAD_BLOB_COLUMNS or (
+            content in COMPRESSED_COLUMNS and self.payload_compression_enabled()
+        ):
+            return f"{content}_text"
+        return content
+
+    def _ensure_text_views(self) -> None:
+        """
+        (Re)create the ``<table>_text`` views that FTS indexes read when the
+        table has deduplicated or compressed text, and drop unneeded ones.
+        """
+        schema = self.content_schema
+        for content in FTS_CONTENT:
+            self.conn.execute(f"DROP VIEW IF EXISTS {schema}.{content}_text")
+            if self._fts_source(content) == content:
+                continue
+            columns = ", ".join(
+                f"{self.text_sql(content, column)} AS {column}"
+                for column in FTS_CONTENT[content][2]
+            )
+            self.conn.execute(
+                f"CREATE VIEW {schema}.{content}_text AS SELECT id, {columns} FROM {content}"
+            )
+
+    def _ensure_fts_pending(self) -> None:
+        for content, (queue, key, columns) in FTS_CONTENT.items():
+            indexed = ",\n".join(f"                indexed_{column} TEXT" for column in columns)
+            self.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.content_schema}.{queue} (
+                    {key} INTEGER PRIMARY KEY,
+                    indexed INTEGER NOT NULL,
+{indexed}
+                )
+                """
+            )
+
+    def _create_fts_index(self, table: str) -> None:
+        """
+        Create one external-content FTS index and fill it from its content
+        table. Queued changes are applied to the other indexes first so the
+        shared queue stays exact for all of them.
+        """
+        content, tokenizer, _prefix = FTS_INDEXES[table]
+        columns = ",\n".join(f"                    {column}" for column in FTS_CONTENT[content][2])
+        self.sync_fts(commit=False)
+        self.conn.execute(
+            f"""
+            CREATE VIRTUAL TABLE {self.content_schema}.{table} USING fts5(
+{columns},
+                content='{self._fts_source(content)}',
+                content_rowid='id',
+                tokenize='{tokenizer}'
+            )
+            """
+        )
+        self._install_fts_triggers()
+        self.conn.execute(f"INSERT INTO {table}({table}) VALUES('rebuild')")
+
+    def _ensure_fts_indexes(self) -> None:
+        try:
+            for table in FTS_DEFAULT_INDEXES:
+                if not self._table_exists(table):
+                    self._create_fts_index(table)
+            self._install_fts_triggers()
         except sqlite3.OperationalError:
             # FTS5 is available in normal Python/SQLite builds, but keeping the
             # core DB usable is more important than failing startup on a minimal
             # SQLite build.
             return
 
-    def drop_messages_fts(self) -> None:
-        self.conn.executescript(
-            """
-            DROP TRIGGER IF EXISTS messages_ai;
-            DROP TRIGGER IF EXISTS messages_ad;
-            DROP TRIGGER IF EXISTS messages_au;
-            DROP TABLE IF EXISTS messages_fts;
-            """
-        )
+    def drop_fts_index(self, table: str) -> None:
+        self.sync_fts(commit=False)
+        self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self._install_fts_triggers()
+
+    def fts_pending_count(self) -> int:
+        total = 0
+        for queue, _key, _columns in FTS_CONTENT.values():
+            try:
+                row = self.conn.execute(f"SELECT COUNT(*) AS count FROM {queue}").fetchone()
+            except sqlite3.OperationalError:
+                continue
+            total += int(row["count"] or 0)
+        return total
+
+    def sync_fts(self, batch_size: int = FTS_SYNC_BATCH, commit: bool = True) -> int:
+        """
+        Apply queued row changes to every FTS index, ``batch_size`` rows at a
+        time, and return how many queue rows were applied.
+
+        Deletes use the text the index was built from, as external-content
+        FTS5 tables require; re-inserts read the current content row. Both
+        pass through ``codex_text()`` in case the rows are compressed.
+        """
+        applied = 0
+        batch_size = max(int(batch_size), 1)
+        for content, (queue, key, columns) in FTS_CONTENT.items():
+            tables = self._fts_indexes(content)
+            names = ", ".join(columns)
+            indexed = ", ".join(f"indexed_{column}" for column in columns)
+            while True:
+                rows = self.conn.execute(
+                    f"""
+                    SELECT {key} AS id, indexed, {indexed}
+                    FROM {queue}
+                    ORDER BY {key}
+                    LIMIT ?
+                    """,
+                    (batch_size,),
+                ).fetchall()
+                if not rows:
+                    break
+                first = rows[0]["id"]
+                last = rows[-1]["id"]
+                removed = [
+                    (row["id"], *(row[f"indexed_{column}"] for column in columns))
+                    for row in rows
+                    if row["indexed"]
+                ]
+                placeholders = ", ".join(
+                    "codex_text(?)" if column in COMPRESSED_COLUMNS[content] else "?"
+                    for column in columns
+                )
+                current = ", ".join(
+                    f"codex_text({self._payload_expr(content, column, f'{content}.')})"
+                    if column in COMPRESSED_COLUMNS[content]
+                    else f"{content}.{column}"
+                    for column in columns
+                )
+                for table in tables:
+                    self.conn.executemany(
+                        f"""
+                        INSERT INTO {table}({table}, rowid, {names})
+                        VALUES('delete', ?, {placeholders})
+                        """,
+                        removed,
+                    )
+                    self.conn.execute(
+                        f"""
+                        INSERT INTO {table}(rowid, {names})
+                        SELECT {content}.id, {current}
+                        FROM {queue}
+                        JOIN {content} ON {content}.id = {queue}.{key}
+                        WHERE {queue}.{key} BETWEEN ? AND ?
+                        """,
+                        (first, last),
+                    )
+                self.conn.execute(
+                    f"DELETE FROM {queue} WHERE {key} BETWEEN ? AND ?",
+                    (first, last),
+                )
+                applied += len(rows)
+        if commit:
+            self.conn.commit()
+        return applied
+
+    def set_fts_maintenance(self, mode: str) -> None:
+        """
+        Switch between per-row FTS triggers and the deferred queue. Leaving
+        deferred mode applies the queue first so the indexes are current.
+        """
+        if mode not in FTS_MAINTENANCE_MODES:
+            raise ValueError(f"Unknown FTS maintenance mode: {mode}")
+        if mode == "immediate":
+            self.sync_fts(commit=False)
+        self.set_meta("fts_maintenance", mode)
+        self._install_fts_triggers()
+        self.conn.commit()
+
+    def trigram_tokenizer_available(self) -> bool:
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            return False
+        self.conn.execute("DROP TABLE temp.trigram_probe")
+        return True
+
+    def substring_index_enabled(self) -> bool:
+        return self._table_exists("messages_trigram")
+
+    def _ensure_substring_index(self) -> None:
+        """
+        Create the optional trigram index when it has been enabled but is
+        missing, e.g. after a bulk load dropped it.
+        """
+        if self._get_meta("substring_index") != "1" or self.substring_index_enabled():
+            return
+        try:
+            self._create_fts_index("messages_trigram")
+        except sqlite3.OperationalError:
+            # SQLite older than 3.34 has no trigram tokenizer; substring search
+            # then falls back to the phrase index.
+            return
+
+    def fts_status(self) -> dict[str, object]:
+        def count(table: str) -> Optional[int]:
+            try:
+                row = self.conn.execute(f"SELECT COUNT(*) AS count FROM {table}").fetchone()
+            except sqlite3.OperationalError:
+                return None
+            return int(row["count"] or 0)
+
+        return {
+            "messages": count("messages"),
+            "phrase_index_rows": count("messages_fts"),
+            "substring_index": self.substring_index_enabled(),
+            "substring_index_rows": count("messages_trigram"),
+            "trigram_tokenizer": self.trigram_tokenizer_available(),
+            "tool_calls": count("tool_calls"),
+            "tool_call_index_rows": count("tool_calls_fts"),
+            "maintenance": self.fts_maintenance_mode(),
+            "pending": self.fts_pending_count(),
+        }
+
+    def drop_substring_index(self) -> None:
+        self.drop_fts_index("messages_trigram")
 
-    def rebuild_messages_fts(self) -> None:
-        self.drop_messages_fts()
-        self._ensure_messages_fts()
+    def enable_substring_index(self) -> bool:
+        """
+        Build the trigram-tokenized ``messages_trigram`` index used for
+        substring and identifier search. Returns False when this SQLite build
+        has no trigram tokenizer.
+        """
+        if not self.trigram_tokenizer_available():
+            return False
+        self.set_meta("substring_index", "1")
+        self._ensure_substring_index()
+        self.conn.commit()
+        return self.substring_index_enabled()
+
+    def disable_substring_index(self) -> None:
+        self.drop_substring_index()
+        self.set_meta("substring_index", "0")
 
     def drop_bulk_load_indexes(self) -> None:
         for index_name in BULK_LOAD_INDEX_DDL:
@@ -907,26 +3225,34 @@ class UsageStore:
 
     def recreate_bulk_load_indexes(self) -> None:
         for ddl in BULK_LOAD_INDEX_DDL.values():
+            table = ddl.split(" ON ", 1)[1].split("(", 1)[0].strip()
+            if table in CONTENT_TABLES:
+                ddl = self._content_ddl(ddl)
             self.conn.execute(ddl)
 
     def prepare_bulk_load(self, include_messages: bool) -> None:
         if include_messages:
-            self.drop_messages_fts()
+            self.drop_substring_index()
+            self.drop_fts_index("messages_fts")
+        self.drop_fts_index("tool_calls_fts")
         self.drop_bulk_load_indexes()
         self.conn.commit()
 
     def finish_bulk_load(self, include_messages: bool) -> None:
         self._backfill_source_ids()
         self.recreate_bulk_load_indexes()
+        self.rebuild_session_summary(commit=False)
+        self._ensure_fts_indexes()
         if include_messages:
-            self.rebuild_messages_fts()
+            self._ensure_substring_index()
+        self._record_schema_fingerprint()
         self.conn.commit()
 
     def _ensure_content_messages_view(self) -> None:
         row = self.conn.execute(
-            """
+            f"""
             SELECT type
-            FROM sqlite_master
+            FROM {self.content_schema}.sqlite_master
             WHERE name = 'content_messages'
               AND type IN ('table', 'view')
             """
@@ -969,27 +3295,57 @@ class UsageStore:
             row = None
 
         if not row:
+            # One row per representation, as before ingest merged the pairs:
+            # a message seen both ways is listed again under its other type.
+            message = self.text_sql("messages", "content")
+            both = sum(MESSAGE_REPRESENTATIONS.values())
+            other_type = " ".join(
+                f"WHEN '{name}' THEN '{other}'"
+                for name, other in zip(MESSAGE_REPRESENTATIONS, reversed(MESSAGE_REPRESENTATIONS))
+            )
             self.conn.execute(
-                """
-                CREATE VIEW IF NOT EXISTS content_messages AS
+                f"""
+                CREATE VIEW IF NOT EXISTS {self.content_schema}.content_messages AS
                 SELECT
                     id,
                     captured_at,
                     captured_at_utc,
                     role,
                     message_type,
-                    content AS message,
+                    {message} AS message,
+                    session_id,
+                    turn_index,
+                    source
+                FROM messages
+                UNION ALL
+                SELECT
+                    id,
+                    captured_at,
+                    captured_at_utc,
+                    role,
+                    CASE message_type {other_type} END,
+                    {message},
                     session_id,
                     turn_index,
                     source
                 FROM messages
+                WHERE representations = {both}
                 """
             )
 
+    @staticmethod
+    def _representation_sql(column: str) -> str:
+        """SQL mapping a message_type column to its MESSAGE_REPRESENTATIONS bit."""
+        cases = " ".join(
+            f"WHEN '{name}' THEN {bit}" for name, bit in MESSAGE_REPRESENTATIONS.items()
+        )
+        return f"CASE {column} {cases} ELSE 0 END"
+
     def _ensure_event_columns(self) -> None:
-        columns = self.conn.execute("PRAGMA table_info(events)").fetchall()
+        columns = self.conn.execute("PRAGMA table_info(events_data)").fetchall()
         existing = {row["name"] for row in columns}
         additions = {
+            "local_hour": "INTEGER",
             "lifetime_total_tokens": "INTEGER",
             "lifetime_input_tokens": "INTEGER",
             "lifetime_cached_input_tokens": "INTEGER",
@@ -1009,7 +3365,7 @@ class UsageStore:
         for column, ddl in additions.items():
             if column not in existing:
                 self.conn.execute(
-                    f"ALTER TABLE events ADD COLUMN {column} {ddl}"
+                    f"ALTER TABLE events_data ADD COLUMN {column} {ddl}"
                 )
 
     def _ensure_schema_version(self) -> None:
@@ -1033,18 +3389,19 @@ class UsageStore:
         return row["value"] if row else None
 
     def _drop_index_if_exists(self, name: str) -> bool:
-        row = self.conn.execute(
-            """
-            SELECT name
-            FROM sqlite_master
-            WHERE type = 'index' AND name = ?
-            """,
-            (name,),
-        ).fetchone()
-        if row is None:
-            return False
-        self.conn.execute(f"DROP INDEX IF EXISTS {name}")
-        return True
+        for schema in self._schemas():
+            row = self.conn.execute(
+                f"""
+                SELECT name
+                FROM {schema}.sqlite_master
+                WHERE type = 'index' AND name = ?
+                """,
+                (name,),
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(f"DROP INDEX IF EXISTS {schema}.{name}")
+                return True
+        return False
 
     def _ensure_storage_profile(self) -> None:
         current = self._get_meta("storage_profile_version")
@@ -1057,6 +3414,7 @@ class UsageStore:
             *REDUNDANT_TOOL_CALL_INDEXES,
             *REDUNDANT_LOCAL_TIME_INDEXES,
             *REDUNDANT_SOURCE_TEXT_INDEXES,
+            *REDUNDANT_EVENT_TYPE_INDEXES,
         ):
             changed = self._drop_index_if_exists(index_name) or changed
 
@@ -1073,20 +3431,40 @@ class UsageStore:
             SET call_id = NULL,
                 input_text = NULL,
                 output_text = NULL,
+                input_blob_id = NULL,
+                output_blob_id = NULL,
                 command = NULL
             WHERE call_id IS NOT NULL
                OR input_text IS NOT NULL
                OR output_text IS NOT NULL
+               OR input_blob_id IS NOT NULL
+               OR output_blob_id IS NOT NULL
                OR command IS NOT NULL
             """
         ).rowcount
+        self.collect_payload_blobs(commit=False)
         activity_deleted = self.conn.execute(
             f"""
-            DELETE FROM activity_events
-            WHERE event_type IN ({",".join("?" for _ in LEAN_ACTIVITY_EVENT_TYPES)})
+            DELETE FROM activity_events_data
+            WHERE event_type_key IN (
+                SELECT id FROM dim_event_type
+                WHERE value IN ({",".join("?" for _ in LEAN_ACTIVITY_EVENT_TYPES)})
+            )
+            """,
+            LEAN_ACTIVITY_EVENT_TYPES,
+        ).rowcount
+        activity_deleted += self.conn.execute(
+            f"""
+            DELETE FROM activity_counts_data
+            WHERE event_type_key IN (
+                SELECT id FROM dim_event_type
+                WHERE value IN ({",".join("?" for _ in LEAN_ACTIVITY_EVENT_TYPES)})
+            )
             """,
             LEAN_ACTIVITY_EVENT_TYPES,
         ).rowcount
+        if tool_outputs_deleted:
+            self.rebuild_session_summary(commit=False)
 
         changed = any(
             count > 0
@@ -1120,6 +3498,101 @@ class UsageStore:
         )
         self.conn.commit()
 
+    def bucket_zone(self) -> Optional[ZoneInfo]:
+        """
+        The timezone events_data.local_hour is keyed in, or None before one is
+        set. Read from meta on every call, never cached: another process may
+        have re-keyed the table since this store opened.
+        """
+        name = self._get_meta("bucket_timezone")
+        return ZoneInfo(name) if name else None
+
+    def bucket_keys_current(self, name: str) -> bool:
+        """True when every local_hour is keyed in ``name`` and no rebuild is pending."""
+        return (
+            self._get_meta("bucket_timezone") == name
+            and self._get_meta("bucket_rebuild_after") is None
+        )
+
+    def set_bucket_timezone(self, name: str) -> int:
+        """
+        Key events_data.local_hour in timezone ``name``. When the zone changes
+        (or an earlier rebuild was interrupted) existing rows are re-keyed in
+        committed batches of BUCKET_REBUILD_BATCH by id; meta
+        ``bucket_rebuild_after`` records the last finished id so the next call
+        resumes there. Returns the number of rows re-keyed. Callers hold the
+        ingest lock so the re-key never races an ingest.
+        """
+        if self.bucket_keys_current(name):
+            return 0
+        zone = ZoneInfo(name)
+        after = 0
+        if self._get_meta("bucket_timezone") == name:
+            after = int(self._get_meta("bucket_rebuild_after") or 0)
+        cur = self.conn.cursor()
+        cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('bucket_timezone', ?)", (name,))
+        cur.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('bucket_rebuild_after', ?)",
+            (str(after),),
+        )
+        self.conn.commit()
+        bounds = cur.execute(
+            "SELECT MIN(captured_at_ms), MAX(captured_at_ms), MAX(id) FROM events_data"
+        ).fetchone()
+        updated = 0
+        if bounds[0] is not None:
+            cur.execute("DROP TABLE IF EXISTS temp.bucket_offsets")
+            cur.execute(
+                "CREATE TEMP TABLE bucket_offsets (start_ms INTEGER PRIMARY KEY, offset_ms INTEGER NOT NULL)"
+            )
+            cur.executemany(
+                "INSERT INTO temp.bucket_offsets (start_ms, offset_ms) VALUES (?, ?)",
+                _offset_spans(zone, bounds[0], bounds[1]),
+            )
+            while after < bounds[2]:
+                upper = after + BUCKET_REBUILD_BATCH
+                updated += cur.execute(
+                    """
+                    UPDATE events_data
+                    SET local_hour = (
+                        captured_at_ms + (
+                            SELECT offset_ms FROM temp.bucket_offsets
+                            WHERE start_ms <= captured_at_ms
+                            ORDER BY start_ms DESC
+                            LIMIT 1
+                        )
+                    ) / 3600000
+                    WHERE id > ? AND id <= ?
+                    """,
+                    (after, upper),
+                ).rowcount
+                after = upper
+                cur.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'bucket_rebuild_after'",
+                    (str(after),),
+                )
+                self.conn.commit()
+            cur.execute("DROP TABLE temp.bucket_offsets")
+        cur.execute("DELETE FROM meta WHERE key = 'bucket_rebuild_after'")
+        self.conn.commit()
+        return updated
+
+    def last_rollout_scan(self) -> Optional[dict]:
+        value = self._get_meta("last_rollout_scan")
+        if not value:
+            return None
+        try:
+            payload = json.loads(value)
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    def record_rollout_scan(self, payload: dict) -> None:
+        self.set_meta("last_rollout_scan", json.dumps(payload, ensure_ascii=True))
+
+    def ingest_version_current(self) -> bool:
+        return self._get_meta("ingest_version") == str(INGEST_VERSION)
+
     def upsert_weekly_quota(
         self,
         week_start: str,
@@ -1130,41 +3603,160 @@ class UsageStore:
         observed_tokens: int,
         observed_cost: float,
         computed_at: str,
+        input_watermark: Optional[int] = None,
+        pricing_hash: Optional[str] = None,
     ) -> None:
+        values = (
+            week_start,
+            week_end,
+            quota_tokens,
+            quota_cost,
+            used_percent,
+            observed_tokens,
+            observed_cost,
+            computed_at,
+            input_watermark,
+            pricing_hash,
+        )
         cur = self.conn.cursor()
         cur.execute(
             """
-            INSERT INTO weekly_quota_estimates (
-                week_start,
-                week_end,
-                quota_tokens,
-                quota_cost,
-                used_percent,
-                observed_tokens,
-                observed_cost,
-                computed_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(week_start) DO UPDATE SET
-                week_end = excluded.week_end,
-                quota_tokens = excluded.quota_tokens,
-                quota_cost = excluded.quota_cost,
-                used_percent = excluded.used_percent,
-                observed_tokens = excluded.observed_tokens,
-                observed_cost = excluded.observed_cost,
-                computed_at = excluded.computed_at
+            INSERT INTO weekly_quota_estimates (
+                week_start,
+                week_end,
+                quota_tokens,
+                quota_cost,
+                used_percent,
+                observed_tokens,
+                observed_cost,
+                computed_at,
+                input_watermark,
+                pricing_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(week_start) DO UPDATE SET
+                week_end = excluded.week_end,
+                quota_tokens = excluded.quota_tokens,
+                quota_cost = excluded.quota_cost,
+                used_percent = excluded.used_percent,
+                observed_tokens = excluded.observed_tokens,
+                observed_cost = excluded.observed_cost,
+                computed_at = excluded.computed_at,
+                input_watermark = excluded.input_watermark,
+                pricing_hash = excluded.pricing_hash
+            """,
+            values,
+        )
+        cur.execute(
+            """
+            INSERT INTO weekly_quota_history (
+                week_start,
+                week_end,
+                quota_tokens,
+                quota_cost,
+                used_percent,
+                observed_tokens,
+                observed_cost,
+                computed_at,
+                input_watermark,
+                pricing_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            values,
+        )
+        self.conn.commit()
+
+    def weekly_quota_for_week(self, week_start: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM weekly_quota_estimates WHERE week_start = ?",
+            (week_start,),
+        ).fetchone()
+
+    def weekly_quota_history(
+        self, week_start: Optional[str] = None, limit: int = 20
+    ) -> list[sqlite3.Row]:
+        if week_start is None:
+            return self.conn.execute(
+                "SELECT * FROM weekly_quota_history ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return self.conn.execute(
+            """
+            SELECT *
+            FROM weekly_quota_history
+            WHERE week_start = ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (week_start, limit),
+        ).fetchall()
+
+    def events_watermark(self, start: str, end: str) -> int:
+        """
+        Return the newest events revision among sources whose events overlap
+        ``[start, end)``. It only moves when such a source is re-ingested.
+        """
+        row = self.conn.execute(
+            """
+            SELECT COALESCE(MAX(events_revision), 0) AS revision
+            FROM sources
+            WHERE events_first_utc < ? AND events_last_utc >= ?
+            """,
+            (end, start),
+        ).fetchone()
+        return int(row["revision"] or 0)
+
+    @contextmanager
+    def events_revision_scope(self):
+        """
+        Stamp every source touched inside the block with one events revision,
+        instead of scanning ``sources`` for a new one on each write.
+        """
+        self._events_revision = self._next_events_revision()
+        try:
+            yield
+        finally:
+            self._events_revision = None
+
+    def _next_events_revision(self) -> int:
+        if self._events_revision is not None:
+            return self._events_revision
+        row = self.conn.execute(
+            "SELECT COALESCE(MAX(events_revision), 0) + 1 AS revision FROM sources"
+        ).fetchone()
+        return int(row["revision"])
+
+    def _touch_event_spans(self, events: Iterable[UsageEvent]) -> None:
+        spans: dict[int, list[str]] = {}
+        for event in events:
+            if not event.captured_at_utc:
+                continue
+            source_id = self._source_id(event.source)
+            if source_id is None:
+                continue
+            span = spans.get(source_id)
+            if span is None:
+                spans[source_id] = [event.captured_at_utc, event.captured_at_utc]
+            elif event.captured_at_utc < span[0]:
+                span[0] = event.captured_at_utc
+            elif event.captured_at_utc > span[1]:
+                span[1] = event.captured_at_utc
+        if not spans:
+            return
+        revision = self._next_events_revision()
+        # Spans only widen, so a week stays linked to a source that once touched it.
+        self.conn.executemany(
+            """
+            UPDATE sources
+            SET events_first_utc = MIN(COALESCE(events_first_utc, ?), ?),
+                events_last_utc = MAX(COALESCE(events_last_utc, ?), ?),
+                events_revision = ?
+            WHERE id = ?
             """,
-            (
-                week_start,
-                week_end,
-                quota_tokens,
-                quota_cost,
-                used_percent,
-                observed_tokens,
-                observed_cost,
-                computed_at,
-            ),
+            [
+                (first, first, last, last, revision, source_id)
+                for source_id, (first, last) in spans.items()
+            ],
         )
-        self.conn.commit()
 
     def latest_weekly_quota(self) -> Optional[sqlite3.Row]:
         cur = self.conn.cursor()
@@ -1202,96 +3794,16 @@ class UsageStore:
     def _delete_from_table_for_source(self, table: str, source: str) -> None:
         source_id = self._source_id(source, create=False)
         if source_id is not None:
-            self.conn.execute(f"DELETE FROM {table} WHERE source_id = ?", (source_id,))
+            self.conn.execute(
+                f"DELETE FROM {_storage_table(table)} WHERE source_id = ?",
+                (source_id,),
+            )
             return
-        self.conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+        if table not in NORMALIZED_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
 
     def insert_event(self, event: UsageEvent) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO events (
-                captured_at,
-                captured_at_utc,
-                event_type,
-                total_tokens,
-                input_tokens,
-                cached_input_tokens,
-                output_tokens,
-                reasoning_output_tokens,
-                lifetime_total_tokens,
-                lifetime_input_tokens,
-                lifetime_cached_input_tokens,
-                lifetime_output_tokens,
-                lifetime_reasoning_output_tokens,
-                context_used,
-                context_total,
-                context_percent_left,
-                limit_5h_percent_left,
-                limit_5h_resets_at,
-                limit_weekly_percent_left,
-                limit_weekly_resets_at,
-                limit_5h_used_percent,
-                limit_5h_window_minutes,
-                limit_5h_resets_at_seconds,
-                limit_weekly_used_percent,
-                limit_weekly_window_minutes,
-                limit_weekly_resets_at_seconds,
-                rate_limit_has_credits,
-                rate_limit_unlimited,
-                rate_limit_balance,
-                rate_limit_plan_type,
-                model,
-                directory,
-	                session_id,
-	                codex_version,
-	                source,
-	                source_id
-	            ) VALUES (
-	                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-	                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-	            )
-            """,
-            (
-                event.captured_at,
-                event.captured_at_utc,
-                event.event_type,
-                event.total_tokens,
-                event.input_tokens,
-                event.cached_input_tokens,
-                event.output_tokens,
-                event.reasoning_output_tokens,
-                event.lifetime_total_tokens,
-                event.lifetime_input_tokens,
-                event.lifetime_cached_input_tokens,
-                event.lifetime_output_tokens,
-                event.lifetime_reasoning_output_tokens,
-                event.context_used,
-                event.context_total,
-                event.context_percent_left,
-                event.limit_5h_percent_left,
-                event.limit_5h_resets_at,
-                event.limit_weekly_percent_left,
-                event.limit_weekly_resets_at,
-                event.limit_5h_used_percent,
-                event.limit_5h_window_minutes,
-                event.limit_5h_resets_at_seconds,
-                event.limit_weekly_used_percent,
-                event.limit_weekly_window_minutes,
-                event.limit_weekly_resets_at_seconds,
-                event.rate_limit_has_credits,
-                event.rate_limit_unlimited,
-                event.rate_limit_balance,
-                event.rate_limit_plan_type,
-                event.model,
-                event.directory,
-	                event.session_id,
-	                event.codex_version,
-	                event.source,
-	                self._source_id(event.source),
-	            ),
-	        )
-        self.conn.commit()
+        self.insert_events_bulk([event])
 
     def insert_events_bulk(
         self,
@@ -1301,13 +3813,17 @@ class UsageStore:
         batch = list(events)
         if not batch:
             return 0
+        key = self._dimension_key
+        zone = self.bucket_zone()
+        stamps = [_timestamp_values(event.captured_at, event.captured_at_utc) for event in batch]
         cur = self.conn.cursor()
         cur.executemany(
             """
-            INSERT OR IGNORE INTO events (
-                captured_at,
-                captured_at_utc,
-                event_type,
+            INSERT OR IGNORE INTO events_data (
+                captured_at_ms,
+                utc_offset_minutes,
+                local_hour,
+                event_type_key,
                 total_tokens,
                 input_tokens,
                 cached_input_tokens,
@@ -1335,22 +3851,22 @@ class UsageStore:
                 rate_limit_unlimited,
                 rate_limit_balance,
                 rate_limit_plan_type,
-                model,
-                directory,
-	                session_id,
-	                codex_version,
-	                source,
-	                source_id
-	            ) VALUES (
-	                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-	                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-	            )
+                model_key,
+                directory_key,
+                session_key,
+                codex_version_key,
+                source_id
+            ) VALUES (
+                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+            )
             """,
             [
                 (
-                    event.captured_at,
-                    event.captured_at_utc,
-                    event.event_type,
+                    ms,
+                    offset,
+                    _local_hour(ms, zone),
+                    key("event_type", event.event_type),
                     event.total_tokens,
                     event.input_tokens,
                     event.cached_input_tokens,
@@ -1378,16 +3894,18 @@ class UsageStore:
                     event.rate_limit_unlimited,
                     event.rate_limit_balance,
                     event.rate_limit_plan_type,
-                    event.model,
-                    event.directory,
-	                    event.session_id,
-	                    event.codex_version,
-	                    event.source,
-	                    self._source_id(event.source),
-	                )
-                for event in batch
+                    key("model", event.model),
+                    key("directory", event.directory),
+                    key("session", event.session_id),
+                    key("codex_version", event.codex_version),
+                    self._source_id(event.source),
+                )
+                for event, (ms, offset) in zip(batch, stamps)
             ],
         )
+        self._touch_event_spans(batch)
+        self._touch_latest_status(batch)
+        self.extend_zone_map("events", commit=False)
         if commit:
             self.conn.commit()
         return len(batch)
@@ -1581,69 +4099,73 @@ class UsageStore:
         return len(batch)
 
     def insert_activity_event(self, event: ActivityEvent) -> None:
-        self.conn.execute(
-            """
-            INSERT INTO activity_events (
-                captured_at,
-                captured_at_utc,
-                event_type,
-                event_name,
-	                count,
-	                session_id,
-	                turn_index,
-	                source,
-	                source_id
-	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                event.captured_at,
-                event.captured_at_utc,
-                event.event_type,
-                event.event_name,
-                event.count,
-	                event.session_id,
-	                event.turn_index,
-	                event.source,
-	                self._source_id(event.source),
-	            ),
-	        )
-        self.conn.commit()
+        self.insert_activity_events_bulk([event])
 
     def insert_activity_events_bulk(
         self,
         events: Iterable[ActivityEvent],
         commit: bool = True,
+        occurrences: bool = False,
     ) -> int:
+        """
+        Add ``events`` to the per-minute ``activity_counts``; ``occurrences``
+        also keeps one ``activity_events`` row per event.
+        """
         batch = list(events)
         if not batch:
             return 0
+        key = self._dimension_key
+        stamps = [_timestamp_values(event.captured_at, event.captured_at_utc) for event in batch]
+        counts: dict[tuple[object, ...], int] = {}
+        for event, (captured_at_ms, _) in zip(batch, stamps):
+            count_key = (
+                captured_at_ms - captured_at_ms % ACTIVITY_COUNT_BUCKET_MS,
+                key("event_type", event.event_type),
+                key("event_name", event.event_name) or 0,
+                key("session", event.session_id) or 0,
+                -1 if event.turn_index is None else event.turn_index,
+                self._source_id(event.source) or 0,
+            )
+            counts[count_key] = counts.get(count_key, 0) + event.count
+        self.conn.executemany(
+            f"""
+            INSERT INTO activity_counts_data (
+                minute_ms, event_type_key, event_name_key, session_key, turn_index,
+                source_id, count
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT({ACTIVITY_COUNT_KEY}) DO UPDATE SET
+                count = count + excluded.count
+            """,
+            [(*count_key, count) for count_key, count in counts.items()],
+        )
+        if not occurrences:
+            if commit:
+                self.conn.commit()
+            return len(batch)
         self.conn.executemany(
             """
-            INSERT INTO activity_events (
-                captured_at,
-                captured_at_utc,
-                event_type,
-                event_name,
-	                count,
-	                session_id,
-	                turn_index,
-	                source,
-	                source_id
-	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO activity_events_data (
+                captured_at_ms,
+                utc_offset_minutes,
+                event_type_key,
+                event_name_key,
+                count,
+                session_key,
+                turn_index,
+                source_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
             [
                 (
-                    event.captured_at,
-                    event.captured_at_utc,
-                    event.event_type,
-                    event.event_name,
+                    *stamp,
+                    key("event_type", event.event_type),
+                    key("event_name", event.event_name),
                     event.count,
-	                    event.session_id,
-	                    event.turn_index,
-	                    event.source,
-	                    self._source_id(event.source),
-	                )
-                for event in batch
+                    key("session", event.session_id),
+                    event.turn_index,
+                    self._source_id(event.source),
+                )
+                for event, stamp in zip(batch, stamps)
             ],
         )
         if commit:
@@ -1800,7 +4322,17 @@ class UsageStore:
         self.conn.commit()
         return len(batch)
 
+    def _payload_packer(self) -> Callable[[Optional[str]], object]:
+        """Compress new message/payload text the way existing rows are stored."""
+        if not self.payload_compression_enabled():
+            return lambda value: value
+        dictionary = int(self._get_meta("payload_compression_dictionary") or 0)
+        level = int(self._get_meta("payload_compression_level") or DEFAULT_COMPRESSION_LEVEL)
+        zdict = self._dictionary(dictionary)
+        return lambda value: compress_text(value, dictionary, zdict, level)
+
     def insert_message(self, event: MessageEvent) -> None:
+        pack = self._payload_packer()
         self.conn.execute(
             """
             INSERT INTO messages (
@@ -1815,15 +4347,16 @@ class UsageStore:
 	                ordinal,
 	                source,
 	                source_id,
-	                source_line
-	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+	                source_line,
+	                representations
+	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 event.captured_at,
                 event.captured_at_utc,
                 event.role,
                 event.message_type,
-                event.message,
+                pack(event.message),
                 len(event.message),
                 event.session_id,
 	                event.turn_index,
@@ -1831,6 +4364,7 @@ class UsageStore:
 	                event.source,
 	                self._source_id(event.source),
 	                event.source_line,
+	                _message_representations(event),
 	            ),
 	        )
         self.conn.commit()
@@ -1843,6 +4377,7 @@ class UsageStore:
         batch = list(events)
         if not batch:
             return 0
+        pack = self._payload_packer()
         self.conn.executemany(
             """
             INSERT INTO messages (
@@ -1857,8 +4392,9 @@ class UsageStore:
 	                ordinal,
 	                source,
 	                source_id,
-	                source_line
-	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+	                source_line,
+	                representations
+	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             [
                 (
@@ -1866,7 +4402,7 @@ class UsageStore:
                     event.captured_at_utc,
                     event.role,
                     event.message_type,
-                    event.message,
+                    pack(event.message),
                     len(event.message),
                     event.session_id,
 	                    event.turn_index,
@@ -1874,56 +4410,18 @@ class UsageStore:
 	                    event.source,
 	                    self._source_id(event.source),
 	                    event.source_line,
+	                    _message_representations(event),
 	                )
                 for event in batch
             ],
         )
+        self.extend_zone_map("messages", commit=False)
         if commit:
             self.conn.commit()
         return len(batch)
 
     def insert_tool_call(self, event: ToolCallEvent) -> None:
-        self.conn.execute(
-            """
-            INSERT INTO tool_calls (
-                captured_at,
-                captured_at_utc,
-                tool_type,
-                tool_name,
-                call_id,
-                status,
-	                input_text,
-	                output_text,
-	                command,
-	                input_length,
-	                output_length,
-	                payload_truncated,
-	                session_id,
-	                turn_index,
-	                source,
-	                source_id
-	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                event.captured_at,
-                event.captured_at_utc,
-                event.tool_type,
-                event.tool_name,
-                event.call_id,
-                event.status,
-	                event.input_text,
-	                event.output_text,
-	                event.command,
-	                event.input_length,
-	                event.output_length,
-	                1 if event.payload_truncated else 0,
-	                event.session_id,
-	                event.turn_index,
-	                event.source,
-	                self._source_id(event.source),
-	            ),
-	        )
-        self.conn.commit()
+        self.insert_tool_calls_bulk([event])
 
     def insert_tool_calls_bulk(
         self,
@@ -1933,6 +4431,10 @@ class UsageStore:
         batch = list(events)
         if not batch:
             return 0
+        payloads = self._store_payloads(
+            [text for event in batch for text in (event.input_text, event.output_text)],
+            self._payload_packer(),
+        )
         self.conn.executemany(
             """
             INSERT INTO tool_calls (
@@ -1942,17 +4444,19 @@ class UsageStore:
                 tool_name,
                 call_id,
                 status,
-	                input_text,
-	                output_text,
-	                command,
-	                input_length,
-	                output_length,
-	                payload_truncated,
-	                session_id,
-	                turn_index,
-	                source,
-	                source_id
-	            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                input_text,
+                input_blob_id,
+                output_text,
+                output_blob_id,
+                command,
+                input_length,
+                output_length,
+                payload_truncated,
+                session_id,
+                turn_index,
+                source,
+                source_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             [
                 (
@@ -1962,79 +4466,211 @@ class UsageStore:
                     event.tool_name,
                     event.call_id,
                     event.status,
-	                    event.input_text,
-	                    event.output_text,
-	                    event.command,
-	                    event.input_length,
-	                    event.output_length,
-	                    1 if event.payload_truncated else 0,
-	                    event.session_id,
-	                    event.turn_index,
-	                    event.source,
-	                    self._source_id(event.source),
-	                )
-                for event in batch
+                    *payloads[2 * position],
+                    *payloads[2 * position + 1],
+                    event.command,
+                    event.input_length,
+                    event.output_length,
+                    1 if event.payload_truncated else 0,
+                    event.session_id,
+                    event.turn_index,
+                    event.source,
+                    self._source_id(event.source),
+                )
+                for position, event in enumerate(batch)
             ],
         )
+        self.extend_zone_map("tool_calls", commit=False)
         if commit:
             self.conn.commit()
         return len(batch)
 
+    def _iter_rows(
+        self,
+        query: str,
+        params: Iterable[object] = (),
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> Iterator[sqlite3.Row]:
+        cur = self.conn.execute(query, tuple(params))
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cur.close()
+
     def iter_events(
         self,
         event_type: Optional[str] = None,
         start: Optional[str] = None,
         end: Optional[str] = None,
-    ) -> Iterable[sqlite3.Row]:
+        columns: Optional[Iterable[str]] = None,
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> Iterator[sqlite3.Row]:
         clauses = []
         params = []
         if event_type:
             clauses.append("event_type = ?")
             params.append(event_type)
-        if start:
-            clauses.append("captured_at_utc >= ?")
-            params.append(start)
-        if end:
-            clauses.append("captured_at_utc <= ?")
-            params.append(end)
+        range_clauses, range_params = self.range_sql("events", start, end)
+        clauses.extend(range_clauses)
+        params.extend(range_params)
         where = ""
         if clauses:
             where = " WHERE " + " AND ".join(clauses)
-        query = f"SELECT * FROM events{where} ORDER BY captured_at_utc"
-        cur = self.conn.execute(query, params)
-        return cur.fetchall()
+        selected = ", ".join(columns) if columns else "*"
+        query = f"SELECT {selected} FROM events{where} ORDER BY captured_at_ms"
+        return self._iter_rows(query, params, batch_size)
 
     def iter_usage_events(
         self,
         start: Optional[str] = None,
         end: Optional[str] = None,
-    ) -> Iterable[sqlite3.Row]:
-        clauses = ["event_type IN ('usage_line', 'token_count')"]
-        params = []
-        if start:
-            clauses.append("captured_at_utc >= ?")
-            params.append(start)
-        if end:
-            clauses.append("captured_at_utc <= ?")
-            params.append(end)
+        columns: Iterable[str] = USAGE_EVENT_COLUMNS,
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> Iterator[sqlite3.Row]:
+        range_clauses, params = self.range_sql("events", start, end)
+        clauses = ["event_type IN ('usage_line', 'token_count')", *range_clauses]
         where = " WHERE " + " AND ".join(clauses)
-        cur = self.conn.execute(
-            f"SELECT * FROM events{where} ORDER BY captured_at_utc",
+        return self._iter_rows(
+            f"SELECT {', '.join(columns)} FROM events{where} ORDER BY captured_at_ms",
+            params,
+            batch_size,
+        )
+
+    def _export_where(
+        self,
+        table: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        event_type: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> tuple[str, list[object]]:
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unsupported export table: {table}")
+        clauses, params = self.range_sql(table, start, end)
+        if event_type:
+            type_column = EXPORT_TYPE_COLUMNS.get(table)
+            if type_column is None:
+                raise ValueError(f"--event-type is not supported for {table}")
+            clauses.append(f"{type_column} = ?")
+            params.append(event_type)
+        if model:
+            if table in ("events", "turns"):
+                clauses.append("model = ?")
+            elif table == "sessions":
+                clauses.append(
+                    """
+                    EXISTS (
+                        SELECT 1
+                        FROM turns
+                        WHERE turns.session_id = sessions.session_id
+                          AND turns.model = ?
+                    )
+                    """
+                )
+            else:
+                clauses.append(
+                    f"""
+                    EXISTS (
+                        SELECT 1
+                        FROM turns
+                        WHERE turns.session_id = {table}.session_id
+                          AND turns.turn_index = {table}.turn_index
+                          AND turns.model = ?
+                    )
+                    """
+                )
+            params.append(model)
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def iter_export_rows(
+        self,
+        table: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        event_type: Optional[str] = None,
+        model: Optional[str] = None,
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> Iterator[sqlite3.Row]:
+        """
+        Stream rows of one exportable table in capture order.
+
+        Filters are applied in SQL. ``event_type`` matches ``events.event_type``,
+        ``tool_calls.tool_type`` or ``messages.role``; ``model`` matches the row's
+        own model column, or the owning turn for tool calls, messages and sessions.
+        Deduplicated and compressed text is returned as plain text.
+        """
+        where, params = self._export_where(table, start, end, event_type, model)
+        compressed = COMPRESSED_COLUMNS.get(table, ())
+        selected = ", ".join(
+            f"{self.text_sql(table, name, f'{table}.')} AS {name}" if name in compressed else name
+            for name, _declared in self.export_columns(table)
+        )
+        return self._iter_rows(
+            f"SELECT {selected} FROM {table}{where} ORDER BY {time_order_column(table)}",
             params,
+            batch_size,
         )
-        return cur.fetchall()
 
-    def latest_status(self) -> Optional[sqlite3.Row]:
+    def export_distinct_values(
+        self,
+        table: str,
+        column: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        event_type: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> list[object]:
+        where, params = self._export_where(table, start, end, event_type, model)
+        not_null = f"{column} IS NOT NULL"
+        where = f"{where} AND {not_null}" if where else f" WHERE {not_null}"
+        rows = self.conn.execute(
+            f"SELECT DISTINCT {column} AS value FROM {table}{where} ORDER BY value",
+            params,
+        ).fetchall()
+        return [row["value"] for row in rows]
+
+    def table_columns(self, table: str) -> list[tuple[str, str]]:
+        rows = self.conn.execute(f"PRAGMA table_info({table})").fetchall()
+        return [(row["name"], str(row["type"] or "").upper()) for row in rows]
+
+    def export_columns(self, table: str) -> list[tuple[str, str]]:
+        """``table_columns`` without the storage-internal ones exports leave out."""
+        internal = EXPORT_INTERNAL_COLUMNS.get(table, frozenset())
+        return [column for column in self.table_columns(table) if column[0] not in internal]
+
+    def latest_status(self, scope: str = LATEST_STATUS_SCOPE) -> Optional[sqlite3.Row]:
+        """
+        Return the newest status event for ``scope`` (``"all"``,
+        ``"plan:<type>"`` or ``"session:<id>"``) via the maintained
+        ``latest_status`` row instead of sorting ``events``.
+        """
         cur = self.conn.execute(
             """
-            SELECT * FROM events
-            WHERE event_type IN ('status_snapshot', 'token_count')
-            ORDER BY captured_at DESC
-            LIMIT 1
-            """
+            SELECT events.*
+            FROM latest_status
+            JOIN events ON events.id = latest_status.event_id
+            WHERE latest_status.scope = ?
+            """,
+            (scope,),
         )
         return cur.fetchone()
 
+    def latest_status_scopes(self) -> list[sqlite3.Row]:
+        return self.conn.execute(
+            """
+            SELECT scope, event_id, captured_at_utc, plan_type, session_id
+            FROM latest_status
+            WHERE scope NOT LIKE 'session:%'
+            ORDER BY scope
+            """
+        ).fetchall()
+
     def ensure_ingest_version(self) -> None:
         cur = self.conn.execute("SELECT value FROM meta WHERE key = ?", ("ingest_version",))
         row = cur.fetchone()
@@ -2042,6 +4678,7 @@ class UsageStore:
         if current == str(INGEST_VERSION):
             return
         self.conn.execute("DELETE FROM ingestion_files")
+        self.conn.execute("DELETE FROM meta WHERE key = 'last_rollout_scan'")
         self.conn.execute(
             """
             INSERT INTO meta (key, value)
@@ -2061,6 +4698,19 @@ class UsageStore:
         ).fetchone()
         return int(row["count"] or 0)
 
+    def has_unmarked_rollout_rows(self) -> bool:
+        """
+        With the split layout, whether event or content rows exist although no
+        rollout is marked ingested: a first load interrupted between its row
+        commit and its mark. A cold bulk load would duplicate them.
+        """
+        if self.content_schema == "main" or self.ingestion_file_count():
+            return False
+        return any(
+            self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+            for table in ("events_data", "messages", "tool_calls")
+        )
+
     def file_needs_ingest_with_hash(
         self, path: str, mtime_ns: int, size: int, content_hash: Optional[str]
     ) -> bool:
@@ -2121,7 +4771,16 @@ class UsageStore:
             self.conn.commit()
 
     def delete_events_for_source(self, source: str, commit: bool = True) -> None:
+        source_id = self._source_id(source, create=False)
+        orphaned = self._latest_status_for_source(source_id) if source_id is not None else []
         self._delete_from_table_for_source("events", source)
+        if source_id is not None:
+            self.conn.execute(
+                "UPDATE sources SET events_revision = ? WHERE id = ?",
+                (self._next_events_revision(), source_id),
+            )
+        if orphaned:
+            self._repair_latest_status(orphaned)
         if commit:
             self.conn.commit()
 
@@ -2132,6 +4791,9 @@ class UsageStore:
 
     def delete_activity_events_for_source(self, source: str, commit: bool = True) -> None:
         self._delete_from_table_for_source("activity_events", source)
+        source_id = self._source_id(source, create=False)
+        if source_id is not None:
+            self.conn.execute("DELETE FROM activity_counts_data WHERE source_id = ?", (source_id,))
         if commit:
             self.conn.commit()
 
@@ -2147,7 +4809,15 @@ class UsageStore:
         if commit:
             self.conn.commit()
 
-    def purge_content(self, commit: bool = True) -> tuple[int, int]:
+    def purge_content(
+        self, commit: bool = True, replace_file: bool = False
+    ) -> tuple[int, int]:
+        """
+        Delete every content message and tool call. With ``replace_file`` and
+        the split layout the content file is swapped for an empty one instead;
+        the caller holds the ingest lock and the exclusive read lock, since
+        other processes still have the old file attached.
+        """
         cur = self.conn.cursor()
         messages = cur.execute(
             "SELECT COUNT(*) AS count FROM messages"
@@ -2155,8 +4825,20 @@ class UsageStore:
         tool_calls = cur.execute(
             "SELECT COUNT(*) AS count FROM tool_calls"
         ).fetchone()["count"]
-        self.conn.execute("DELETE FROM messages")
-        self.conn.execute("DELETE FROM tool_calls")
+        if replace_file and self.content_schema == CONTENT_SCHEMA and (messages or tool_calls):
+            # Split layout: swap in an empty content file instead of deleting
+            # row by row through the FTS triggers.
+            self._detach_content_db()
+            remove_database_files(content_db_path(self.path))
+            self._attach_content_db()
+        else:
+            self.conn.execute("DELETE FROM messages")
+            self.conn.execute("DELETE FROM tool_calls")
+            self.collect_payload_blobs(commit=False)
+        if messages or tool_calls:
+            self.rebuild_session_summary(commit=False)
+        if self.fts_maintenance_mode() == "deferred":
+            self.sync_fts(commit=False)
         if commit:
             self.conn.commit()
         return int(messages or 0), int(tool_calls or 0)
@@ -2178,6 +4860,8 @@ class UsageStore:
             WHERE call_id IS NOT NULL
                OR input_text IS NOT NULL
                OR output_text IS NOT NULL
+               OR input_blob_id IS NOT NULL
+               OR output_blob_id IS NOT NULL
                OR command IS NOT NULL
             """
         ).fetchone()["count"]
@@ -2188,22 +4872,205 @@ class UsageStore:
             SET call_id = NULL,
                 input_text = NULL,
                 output_text = NULL,
+                input_blob_id = NULL,
+                output_blob_id = NULL,
                 command = NULL
             WHERE call_id IS NOT NULL
                OR input_text IS NOT NULL
                OR output_text IS NOT NULL
+               OR input_blob_id IS NOT NULL
+               OR output_blob_id IS NOT NULL
                OR command IS NOT NULL
             """
         )
+        self.collect_payload_blobs(commit=False)
+        if messages:
+            self.rebuild_session_summary(commit=False)
+        if self.fts_maintenance_mode() == "deferred":
+            self.sync_fts(commit=False)
         if commit:
             self.conn.commit()
         return int(messages or 0), int(tool_rows or 0)
 
+    def compression_profile(self) -> dict[str, object]:
+        """Uncompressed versus stored bytes of every compressible column."""
+        columns: dict[str, dict[str, int]] = {}
+        raw_total = 0
+        stored_total = 0
+        for table, names in COMPRESSED_COLUMNS.items():
+            for column in names:
+                row = self.conn.execute(
+                    f"""
+                    SELECT COUNT({column}) AS rows,
+                           SUM(typeof({column}) = 'blob') AS compressed_rows,
+                           SUM(length(CAST(codex_text({column}) AS BLOB))) AS raw_bytes,
+                           SUM(length(CAST({column} AS BLOB))) AS stored_bytes
+                    FROM {table}
+                    """
+                ).fetchone()
+                stats = {key: int(row[key] or 0) for key in row.keys()}
+                columns[f"{table}.{column}"] = stats
+                raw_total += stats["raw_bytes"]
+                stored_total += stats["stored_bytes"]
+        dictionary = self.conn.execute(
+            """
+            SELECT id, length(dictionary) AS bytes
+            FROM compression_dictionaries
+            WHERE id = ?
+            """,
+            (int(self._get_meta("payload_compression_dictionary") or 0),),
+        ).fetchone()
+        return {
+            "enabled": self.payload_compression_enabled(),
+            "algorithm": COMPRESSION_ALGORITHM,
+            "level": int(self._get_meta("payload_compression_level") or DEFAULT_COMPRESSION_LEVEL),
+            "dictionary_id": dictionary["id"] if dictionary else None,
+            "dictionary_bytes": int(dictionary["bytes"]) if dictionary else 0,
+            "columns": columns,
+            "raw_bytes": raw_total,
+            "stored_bytes": stored_total,
+            "saved_bytes": raw_total - stored_total,
+            "ratio": round(raw_total / stored_total, 2) if stored_total else None,
+        }
+
+    def _training_samples(self, limit: int) -> list[str]:
+        samples = []
+        for table, names in COMPRESSED_COLUMNS.items():
+            for column in names:
+                samples.extend(
+                    row["value"]
+                    for row in self.conn.execute(
+                        f"""
+                        SELECT codex_text({column}) AS value
+                        FROM {table}
+                        WHERE {column} IS NOT NULL
+                        ORDER BY id DESC
+                        LIMIT ?
+                        """,
+                        (limit,),
+                    ).fetchall()
+                )
+        return samples
+
+    def compress_payloads(
+        self,
+        level: int = DEFAULT_COMPRESSION_LEVEL,
+        samples: int = DEFAULT_TRAINING_SAMPLES,
+        retrain: bool = False,
+    ) -> dict[str, object]:
+        """
+        Compress stored message text and tool payloads with zlib and a preset
+        dictionary trained on the newest ``samples`` values of each column.
+
+        The FTS indexes are dropped while rows are rewritten and rebuilt over
+        the ``<table>_text`` views, so they keep indexing plain text. A
+        dictionary is reused unless ``retrain`` is set; rows compressed with
+        an older dictionary are recompressed. Returns :meth:`compression_profile`.
+        """
+        if not 0 <= int(level) <= 9:
+            raise ValueError("Compression level must be between 0 and 9")
+        dictionary = int(self._get_meta("payload_compression_dictionary") or 0)
+        if retrain or not dictionary:
+            zdict = train_dictionary(self._training_samples(max(int(samples), 1)))
+            dictionary = int(
+                self.conn.execute(
+                    """
+                    INSERT INTO compression_dictionaries (
+                        algorithm, created_at, sample_count, dictionary
+                    ) VALUES (?, ?, ?, ?)
+                    """,
+                    (
+                        COMPRESSION_ALGORITHM,
+                        datetime.now().astimezone().isoformat(),
+                        int(samples),
+                        zdict,
+                    ),
+                ).lastrowid
+            )
+            self._dictionaries[dictionary] = zdict
+        zdict = self._dictionary(dictionary)
+        indexes = self._fts_indexes()
+        for table in indexes:
+            self.drop_fts_index(table)
+        for table, names in COMPRESSED_COLUMNS.items():
+            for column in names:
+                last_id = 0
+                while True:
+                    rows = self.conn.execute(
+                        f"""
+                        SELECT id, {column} AS value
+                        FROM {table}
+                        WHERE id > ? AND {column} IS NOT NULL
+                        ORDER BY id
+                        LIMIT ?
+                        """,
+                        (last_id, FETCH_BATCH_SIZE),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1]["id"]
+                    updates = []
+                    for row in rows:
+                        if dictionary_id(row["value"]) == dictionary:
+                            continue
+                        packed = compress_text(
+                            self._inflate(row["value"]), dictionary, zdict, int(level)
+                        )
+                        if packed != row["value"]:
+                            updates.append((packed, row["id"]))
+                    self.conn.executemany(
+                        f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                        updates,
+                    )
+        self.set_meta("payload_compression_dictionary", str(dictionary))
+        self.set_meta("payload_compression_level", str(int(level)))
+        self.set_meta("payload_compression", COMPRESSION_ALGORITHM)
+        self._reinstall_text_sources(indexes)
+        return self.compression_profile()
+
+    def decompress_payloads(self) -> int:
+        """
+        Store every compressed value as plain text again, drop the dictionaries
+        and point the FTS indexes back at the tables. Returns rows rewritten.
+        """
+        indexes = self._fts_indexes()
+        for table in indexes:
+            self.drop_fts_index(table)
+        rewritten = 0
+        for table, names in COMPRESSED_COLUMNS.items():
+            for column in names:
+                rewritten += self.conn.execute(
+                    f"""
+                    UPDATE {table}
+                    SET {column} = codex_text({column})
+                    WHERE typeof({column}) = 'blob'
+                    """
+                ).rowcount
+        self.set_meta("payload_compression", "off")
+        self.conn.execute("DELETE FROM meta WHERE key = 'payload_compression_dictionary'")
+        self.conn.execute("DELETE FROM compression_dictionaries")
+        self._dictionaries = {0: b""}
+        self._reinstall_text_sources(indexes)
+        return rewritten
+
+    def _reinstall_text_sources(self, indexes: list[str]) -> None:
+        """Rebuild views and FTS indexes after the compression flag changed."""
+        self.conn.execute(f"DROP VIEW IF EXISTS {self.content_schema}.content_messages")
+        self._ensure_content_messages_view()
+        self._ensure_text_views()
+        for table in indexes:
+            self._create_fts_index(table)
+        self._install_fts_triggers()
+        self._record_schema_fingerprint()
+        self.conn.commit()
+
     def vacuum(self) -> None:
         # VACUUM cannot run inside a transaction.
         previous = self.conn.isolation_level
         self.conn.isolation_level = None
         try:
             self.conn.execute("VACUUM")
+            if self.content_schema == CONTENT_SCHEMA:
+                self.conn.execute(f"VACUUM {CONTENT_SCHEMA}")
         finally:
             self.conn.isolation_level = previous
@@ -1,14 +1,23 @@
+import ast
+import gzip
 import json
 import os
 import sqlite3
+import struct
 import subprocess
 import sys
 import tempfile
 import unittest
+import zipfile
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows fallback
+    fcntl = None
+
 ROOT = Path(__file__).resolve().parents[1]
 SRC_PATH = str(ROOT / "src")
 DEFAULT_TIMEZONE = "Europe/Stockholm"
@@ -208,6 +217,203 @@ class CliIntegrationTests(unittest.TestCase):
             self.assertIn("event_type", content)
             self.assertIn("token_count", content)
 
+    def test_cli_export_streams_filtered_ndjson_gzip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            rollouts_dir = root / "rollouts"
+            _write_rollout_for_today(rollouts_dir)
+            db_path = root / "usage.sqlite"
+            out_path = root / "tool_calls.ndjson.gz"
+
+            _run_cli(
+                [
+                    "export",
+                    "--db",
+                    str(db_path),
+                    "--rollouts",
+                    str(rollouts_dir),
+                    "--table",
+                    "tool_calls",
+                    "--format",
+                    "ndjson",
+                    "--event-type",
+                    "function_call",
+                    "--model",
+                    "gpt-5.1-codex",
+                    "--out",
+                    str(out_path),
+                ]
+            )
+            with gzip.open(out_path, "rt", encoding="utf-8") as handle:
+                rows = [json.loads(line) for line in handle]
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0]["tool_type"], "function_call")
+            self.assertEqual(rows[0]["tool_name"], "exec_command")
+
+            events_path = root / "events.ndjson"
+            _run_cli(
+                [
+                    "export",
+                    "--db",
+                    str(db_path),
+                    "--rollouts",
+                    str(rollouts_dir),
+                    "--format",
+                    "ndjson",
+                    "--event-type",
+                    "token_count",
+                    "--model",
+                    "missing-model",
+                    "--out",
+                    str(events_path),
+                ]
+            )
+            self.assertEqual(events_path.read_text(encoding="utf-8"), "")
+
+    def test_cli_export_npz_writes_typed_row_groups(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            rollouts_dir = root / "rollouts"
+            _write_rollout_for_today(rollouts_dir)
+            db_path = root / "usage.sqlite"
+            out_path = root / "events.npz"
+
+            _run_cli(
+                [
+                    "export",
+                    "--db",
+                    str(db_path),
+                    "--rollouts",
+                    str(rollouts_dir),
+                    "--format",
+                    "npz",
+                    "--row-group-size",
+                    "1",
+                    "--out",
+                    str(out_path),
+                ]
+            )
+
+            def load_array(archive, name):
+                raw = archive.read(f"{name}.npy")
+                self.assertEqual(raw[:8], b"\x93NUMPY\x01\x00")
+                header_len = struct.unpack("<H", raw[8:10])[0]
+                self.assertEqual((10 + header_len) % 64, 0)
+                header = ast.literal_eval(raw[10 : 10 + header_len].decode("latin1"))
+                return header, raw[10 + header_len :]
+
+            with zipfile.ZipFile(out_path) as archive:
+                _, schema_bytes = load_array(archive, "schema")
+                schema = json.loads(schema_bytes.decode("ascii"))
+                self.assertEqual(schema["table"], "events")
+                self.assertGreaterEqual(schema["rows"], 1)
+                self.assertEqual(schema["row_groups"], schema["rows"])
+                kinds = {column["name"]: column["type"] for column in schema["columns"]}
+                self.assertEqual(kinds["total_tokens"], "int64")
+                self.assertEqual(kinds["model"], "dictionary")
+
+                header, payload = load_array(archive, "rg00000/total_tokens.values")
+                self.assertEqual(header["descr"], "<i8")
+                self.assertEqual(header["shape"], (1,))
+                self.assertEqual(len(payload), 8)
+
+                header, codes = load_array(archive, "rg00000/model.codes")
+                self.assertEqual(header["descr"], "<i4")
+                _, data = load_array(archive, "dict/model.data")
+                _, offsets = load_array(archive, "dict/model.offsets")
+                bounds = struct.unpack(f"<{len(offsets) // 8}q", offsets)
+                models = [
+                    data[bounds[i] : bounds[i + 1]].decode("utf-8")
+                    for i in range(len(bounds) - 1)
+                ]
+                code = struct.unpack("<i", codes)[0]
+                self.assertEqual(models[code], "gpt-5.1-codex")
+
+    def test_cli_read_commands_skip_fresh_rollout_scans(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            rollouts_dir = root / "rollouts"
+            rollouts_dir.mkdir()
+            db_path = root / "usage.sqlite"
+            out_path = root / "events.ndjson"
+
+            def export(*extra: str) -> list[dict]:
+                _run_cli(
+                    [
+                        "export",
+                        "--db",
+                        str(db_path),
+                        "--rollouts",
+                        str(rollouts_dir),
+                        "--format",
+                        "ndjson",
+                        "--out",
+                        str(out_path),
+                        *extra,
+                    ]
+                )
+                text = out_path.read_text(encoding="utf-8")
+                return [json.loads(line) for line in text.splitlines()]
+
+            self.assertEqual(export(), [])
+            _write_rollout_for_today(rollouts_dir)
+
+            self.assertEqual(export(), [])
+            self.assertEqual(export("--max-staleness", "1h", "--no-sync"), [])
+            self.assertGreater(len(export("--max-staleness", "0")), 0)
+
+            with sqlite3.connect(db_path) as conn:
+                row = conn.execute(
+                    "SELECT value FROM meta WHERE key = 'last_rollout_scan'"
+                ).fetchone()
+            scan = json.loads(row[0])
+            self.assertEqual(scan["rollouts"], str(rollouts_dir.resolve()))
+            self.assertIsNone(scan["covered_from"])
+
+    @unittest.skipIf(fcntl is None, "flock is not available on this platform")
+    def test_cli_readers_do_not_wait_for_running_ingest(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            rollouts_dir = root / "rollouts"
+            _write_rollout_for_today(rollouts_dir)
+            db_path = root / "usage.sqlite"
+            _run_cli(["status", "--db", str(db_path), "--rollouts", str(rollouts_dir)])
+
+            lock_path = db_path.with_name(f"{db_path.name}.ingest.lock")
+            with lock_path.open("a+") as handle:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                handle.write(
+                    json.dumps(
+                        {"pid": 4242, "command": "codex-track watch", "started_at": 0}
+                    )
+                )
+                handle.flush()
+                env = os.environ.copy()
+                env["PYTHONPATH"] = f"{SRC_PATH}{os.pathsep}{env.get('PYTHONPATH', '')}"
+                result = subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "codex_usage_tracker.cli",
+                        "status",
+                        "--db",
+                        str(db_path),
+                        "--rollouts",
+                        str(rollouts_dir),
+                        "--max-staleness",
+                        "0",
+                    ],
+                    check=True,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    timeout=60,
+                )
+
+            self.assertIn("Model: gpt-5.1-codex", result.stdout)
+            self.assertIn("Ingest in progress (codex-track watch, pid 4242", result.stderr)
+            self.assertIn("data as of last scan", result.stderr)
+
     def test_cli_insight_json_includes_summary_and_sessions(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             root = Path(tmpdir)
@@ -388,6 +594,36 @@ class CliIntegrationTests(unittest.TestCase):
             remove_payload = json.loads(remove_result.stdout)
             self.assertTrue(remove_payload["removed"])
 
+    def test_cli_import_defers_subcommand_dependencies(self):
+        env = os.environ.copy()
+        env["PYTHONPATH"] = f"{SRC_PATH}{os.pathsep}{env.get('PYTHONPATH', '')}"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import codex_usage_tracker.cli"],
+            check=True,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        imported = {
+            line.rsplit("|", 1)[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+        self.assertIn("codex_usage_tracker.cli", imported)
+        for module in (
+            "codex_usage_tracker.report",
+            "codex_usage_tracker.insights",
+            "codex_usage_tracker.rollout",
+            "codex_usage_tracker.parser",
+            "codex_usage_tracker.pricing_cli",
+            "codex_usage_tracker.columnar",
+            "codex_usage_tracker.app_server",
+            "concurrent.futures",
+            "subprocess",
+            "gzip",
+        ):
+            self.assertNotIn(module, imported)
+
     def test_cli_status_uses_latest_snapshot_fields(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             root = Path(tmpdir)
@@ -410,11 +646,15 @@ class CliIntegrationTests(unittest.TestCase):
                 "\u2570\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u256f",
             ]
             log_path.write_text("\n".join(log_lines))
+            (root / "config.json").write_text(json.dumps({"status_snapshot": True}))
 
             ingest = _run_cli(
                 ["ingest-cli", "--db", str(db_path), "--log", str(log_path)]
             )
             self.assertIn("status snapshots", ingest.stdout)
+            snapshot = json.loads((root / "usage.sqlite.status.json").read_text())
+            self.assertEqual(snapshot["latest"]["session_id"], "session-1")
+            self.assertEqual(snapshot["latest"]["limit_5h_percent_left"], 80)
 
             status = _run_cli(
                 [
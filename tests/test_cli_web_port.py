@@ -11,6 +11,14 @@ from codex_usage_tracker import cli
 
 
 class CliWebPortTests(unittest.TestCase):
+    def test_build_parser_only_registers_requested_command(self):
+        parser = cli.build_parser(["web", "--port", "3000"])
+        subparsers = next(action for action in parser._actions if action.dest == "command")
+        self.assertEqual(list(subparsers.choices), ["web"])
+        full = cli.build_parser([])
+        subparsers = next(action for action in full._actions if action.dest == "command")
+        self.assertIn("report", subparsers.choices)
+
     def test_resolve_web_port_skips_unavailable_ports(self):
         checked_ports: list[int] = []
 
@@ -35,7 +43,7 @@ class CliWebPortTests(unittest.TestCase):
                 mock.patch.object(cli, "_resolve_web_port", return_value=3001),
                 mock.patch.object(cli, "_resolve_ui_dist", return_value=None),
                 mock.patch.object(cli, "_open_browser") as open_browser,
-                mock.patch.object(cli.subprocess, "run", return_value=process) as run_mock,
+                mock.patch("subprocess.run", return_value=process) as run_mock,
                 mock.patch("sys.stderr", new=stderr),
             ):
                 with self.assertRaises(SystemExit) as exit_ctx:
@@ -66,7 +74,7 @@ class CliWebPortTests(unittest.TestCase):
                 mock.patch.object(cli, "_resolve_web_port", return_value=3001),
                 mock.patch.object(cli, "_resolve_ui_dist", return_value=dist_root),
                 mock.patch.object(cli, "_open_browser"),
-                mock.patch.object(cli.subprocess, "run", return_value=process) as run_mock,
+                mock.patch("subprocess.run", return_value=process) as run_mock,
                 mock.patch("sys.stderr", new=stderr),
             ):
                 with self.assertRaises(SystemExit) as exit_ctx:
@@ -2,6 +2,7 @@ import json
 import os
 import tempfile
 import unittest
+from unittest import mock
 from pathlib import Path
 import sys
 import sqlite3
@@ -13,7 +14,36 @@ SRC_PATH = str(ROOT / "src")
 sys.path.insert(0, SRC_PATH)
 
 from codex_usage_tracker.cli import DEFAULT_INGEST_WORKERS
-from codex_usage_tracker.store import ActivityEvent, MessageEvent, ToolCallEvent, UsageStore
+from codex_usage_tracker.insights import (
+    doctor_payload,
+    period_summary,
+    price_session_summary,
+    session_insights,
+)
+from codex_usage_tracker.query_plans import collect_query_shapes, plan_issues, populate_sample_store
+from codex_usage_tracker.report import default_pricing, pricing_fingerprint
+from codex_usage_tracker.search import (
+    SearchError,
+    matching_session_ids,
+    plan_search_mode,
+    search_messages,
+    search_tool_calls,
+)
+from codex_usage_tracker.store import (
+    ActivityEvent,
+    MessageEvent,
+    ToolCallEvent,
+    UsageEvent,
+    UsageStore,
+    content_db_path,
+)
+
+
+def _run_cli(*args: str) -> None:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = f"{SRC_PATH}{os.pathsep}{env.get('PYTHONPATH', '')}"
+    command = [sys.executable, "-m", "codex_usage_tracker.cli", *args]
+    subprocess.run(command, check=True, env=env, capture_output=True, text=True)
 
 
 def _run_export(
@@ -21,13 +51,8 @@ def _run_export(
     db_path: Path,
     extra_args: Optional[list[str]] = None,
 ) -> None:
-    env = os.environ.copy()
-    env["PYTHONPATH"] = f"{SRC_PATH}{os.pathsep}{env.get('PYTHONPATH', '')}"
     out_path = db_path.parent / "export.json"
     command = [
-        sys.executable,
-        "-m",
-        "codex_usage_tracker.cli",
         "export",
         "--db",
         str(db_path),
@@ -40,7 +65,7 @@ def _run_export(
     ]
     if extra_args:
         command.extend(extra_args)
-    subprocess.run(command, check=True, env=env, capture_output=True, text=True)
+    _run_cli(*command)
 
 
 def _write_rollout_file(root: Path) -> Path:
@@ -188,6 +213,12 @@ class RolloutIngestTests(unittest.TestCase):
             db_path = root / "usage.sqlite"
             _run_export(rollouts_dir, db_path, extra_args=["--with-payloads"])
 
+            exported = json.loads((root / "export.json").read_text())
+            self.assertIn("captured_at_utc", exported[0])
+            self.assertFalse(
+                {"captured_at_ms", "local_hour", "local_day", "directory_key"} & set(exported[0])
+            )
+
             conn = sqlite3.connect(db_path)
             try:
                 self.assertEqual(
@@ -217,7 +248,7 @@ class RolloutIngestTests(unittest.TestCase):
                 activity_types = {
                     row[0]
                     for row in conn.execute(
-                        "SELECT DISTINCT event_type FROM activity_events"
+                        "SELECT DISTINCT event_type FROM activity_counts"
                     ).fetchall()
                 }
                 self.assertEqual(activity_types, {"user_image", "user_local_image"})
@@ -266,14 +297,83 @@ class RolloutIngestTests(unittest.TestCase):
             try:
                 row = conn.execute(
                     """
-                    SELECT length(output_text), output_length, payload_truncated
+                    SELECT length(payload_blobs.content), output_length, payload_truncated,
+                           payload_blobs.refcount, tool_calls.output_text
                     FROM tool_calls
+                    JOIN payload_blobs ON payload_blobs.id = tool_calls.output_blob_id
                     WHERE tool_type = 'function_call_output'
                     """
                 ).fetchone()
                 self.assertEqual(row[0], 4096)
                 self.assertGreater(row[1], row[0])
                 self.assertEqual(row[2], 1)
+                self.assertEqual(row[3], 1)
+                self.assertIsNone(row[4])
+            finally:
+                conn.close()
+
+    def test_ingest_merges_event_msg_and_response_item_message_twins(self):
+        def response_item(timestamp: str, role: str, text: str) -> dict:
+            kind = "input_text" if role == "user" else "output_text"
+            return {
+                "timestamp": timestamp,
+                "type": "response_item",
+                "payload": {
+                    "type": "message",
+                    "role": role,
+                    "content": [{"type": kind, "text": text}],
+                },
+            }
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            rollouts_dir = root / "rollouts"
+            rollout_path = _write_rollout_file(rollouts_dir)
+            lines = [json.loads(line) for line in rollout_path.read_text().splitlines()]
+            lines[5:5] = [response_item("2025-01-01T10:00:04.100Z", "user", "hi")]
+            lines += [
+                response_item("2025-01-01T10:00:08.000Z", "assistant", "All done."),
+                {
+                    "timestamp": "2025-01-01T10:00:08.050Z",
+                    "type": "event_msg",
+                    "payload": {"type": "agent_message", "message": "All done."},
+                },
+                {
+                    "timestamp": "2025-01-01T10:07:00.000Z",
+                    "type": "event_msg",
+                    "payload": {"type": "user_message", "message": "hi"},
+                },
+            ]
+            rollout_path.write_text("\n".join(json.dumps(line) for line in lines))
+            os.utime(rollout_path, None)
+
+            db_path = root / "usage.sqlite"
+            _run_export(rollouts_dir, db_path, extra_args=["--with-payloads"])
+
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = conn.execute(
+                    "SELECT role, message_type, content, representations, ordinal "
+                    "FROM messages ORDER BY id"
+                ).fetchall()
+                self.assertEqual(
+                    rows,
+                    [
+                        ("user", "event_msg", "hi", 3, 0),
+                        ("assistant", "response_item", "All done.", 3, 1),
+                        ("user", "event_msg", "hi", 2, 2),
+                    ],
+                )
+                self.assertEqual(
+                    conn.execute("SELECT COUNT(*) FROM messages_fts").fetchone()[0], 3
+                )
+                self.assertEqual(
+                    conn.execute(
+                        "SELECT message_type, COUNT(*) FROM content_messages "
+                        "GROUP BY message_type ORDER BY message_type"
+                    ).fetchall(),
+                    [("event_msg", 3), ("response_item", 2)],
+                )
             finally:
                 conn.close()
 
@@ -315,7 +415,7 @@ class RolloutIngestTests(unittest.TestCase):
                 activity_types = {
                     row[0]
                     for row in conn.execute(
-                        "SELECT DISTINCT event_type FROM activity_events"
+                        "SELECT DISTINCT event_type FROM activity_counts"
                     ).fetchall()
                 }
                 self.assertGreater(events, 0)
@@ -374,7 +474,7 @@ class RolloutIngestTests(unittest.TestCase):
                 activity_types = {
                     row[0]
                     for row in conn.execute(
-                        "SELECT DISTINCT event_type FROM activity_events"
+                        "SELECT DISTINCT event_type FROM activity_counts"
                     ).fetchall()
                 }
                 self.assertGreater(events, 0)
@@ -462,7 +562,7 @@ class RolloutIngestTests(unittest.TestCase):
 
             store.insert_messages_bulk(message_rows)
             store.insert_tool_calls_bulk(tool_rows)
-            store.insert_activity_events_bulk(activity_rows)
+            store.insert_activity_events_bulk(activity_rows, occurrences=True)
             store.set_meta("storage_profile_version", "0")
             store.close()
 
@@ -504,14 +604,1295 @@ class RolloutIngestTests(unittest.TestCase):
                     ).fetchall()
                 ]
                 self.assertEqual(activity_counts, [("user_image", 1500)])
+                self.assertEqual(
+                    [
+                        tuple(row)
+                        for row in conn.execute(
+                            "SELECT event_type, SUM(count) FROM activity_counts GROUP BY event_type"
+                        )
+                    ],
+                    [("user_image", 1500)],
+                )
                 storage_version = conn.execute(
                     "SELECT value FROM meta WHERE key = 'storage_profile_version'"
                 ).fetchone()[0]
-                self.assertEqual(storage_version, "3")
+                self.assertEqual(storage_version, "4")
 
             after_size = db_path.stat().st_size
             self.assertLess(after_size, before_size)
 
+    def test_store_open_skips_migrations_when_fingerprint_is_current(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            UsageStore(db_path).close()
+
+            with sqlite3.connect(db_path) as conn:
+                fingerprint = conn.execute(
+                    "SELECT value FROM meta WHERE key = 'schema_fingerprint'"
+                ).fetchone()[0]
+                conn.execute("DROP INDEX events_captured_at_ms_idx")
+
+            reopened = UsageStore(db_path, read_only=True)
+            try:
+                index = reopened.conn.execute(
+                    "SELECT name FROM sqlite_master WHERE name = 'events_captured_at_ms_idx'"
+                ).fetchone()
+                self.assertIsNotNone(index)
+                with self.assertRaises(sqlite3.OperationalError):
+                    reopened.set_meta("probe", "1")
+            finally:
+                reopened.close()
+
+            store = UsageStore(db_path)
+            current = store.conn.execute(
+                "SELECT value FROM meta WHERE key = 'schema_fingerprint'"
+            ).fetchone()[0]
+            store.close()
+            self.assertNotEqual(current, fingerprint)
+            self.assertEqual(current.split("@")[0], fingerprint.split("@")[0])
+
+    def test_bulk_load_leaves_the_schema_fingerprint_current(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            store = UsageStore(db_path)
+            store.prepare_bulk_load(include_messages=True)
+            store.finish_bulk_load(include_messages=True)
+            self.assertTrue(store._schema_is_current())
+            store.close()
+
+    def test_dashboard_token_queries_read_only_the_covering_index(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            UsageStore(db_path).close()
+            with sqlite3.connect(db_path) as conn:
+                conn.execute(
+                    "CREATE INDEX events_type_ms_session_idx "
+                    "ON events_data(event_type_key, captured_at_ms, session_key)"
+                )
+                conn.execute(
+                    "UPDATE meta SET value = '3' WHERE key = 'storage_profile_version'"
+                )
+
+            store = UsageStore(db_path)
+            indexes = store.schema_object_names("index")
+            self.assertIn("events_type_ms_covering_idx", indexes)
+            self.assertNotIn("events_type_ms_session_idx", indexes)
+            plan = " ".join(
+                row[3]
+                for row in store.conn.execute(
+                    """
+                    EXPLAIN QUERY PLAN
+                    SELECT model, SUM(input_tokens), SUM(cached_input_tokens),
+                           SUM(output_tokens), SUM(total_tokens), COUNT(DISTINCT session_id)
+                    FROM events_keyed
+                    WHERE event_type = 'token_count'
+                      AND captured_at_ms >= ? AND captured_at_ms <= ?
+                      AND model IN (?) AND source IN (?)
+                      AND directory_key IN (SELECT descendant_id FROM directory_tree WHERE ancestor_id = ?)
+                    GROUP BY local_hour, model
+                    """,
+                    (0, 1, "gpt-5", "a.jsonl", 1),
+                )
+            )
+            self.assertIn("USING COVERING INDEX events_type_ms_covering_idx", plan)
+            store.close()
+
+    def test_query_shapes_never_scan_a_large_table(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            store = UsageStore(db_path)
+            populate_sample_store(store)
+            shapes = collect_query_shapes(store)
+            names = {shape.name for shape in shapes}
+            for name in (
+                "insight_payload",
+                "_usage_by_model",
+                "iter_export_rows:sessions",
+                "sessions/list (filtered)",
+            ):
+                self.assertIn(name, names)
+            self.assertEqual(plan_issues(store.conn, shapes), [])
+            payload = doctor_payload(store, query_plans=True)
+            check = next(item for item in payload["checks"] if item["name"] == "query_plans")
+            self.assertEqual((check["status"], check["issues"]), ("PASS", []))
+            store.close()
+
+            # A fresh connection: cached EXPLAIN statements keep their old plan.
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("DROP INDEX app_items_completed_at_idx")
+                issues = plan_issues(conn, shapes)
+            self.assertEqual({issue.detail for issue in issues}, {"SCAN app_items"})
+            self.assertIn("insight_payload", {issue.name for issue in issues})
+
+    def test_failed_transaction_leaves_no_rows_behind(self):
+        stamp = "2026-03-01T10:00:00+00:00"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            with self.assertRaises(RuntimeError):
+                with store.transaction():
+                    store.insert_events_bulk(
+                        [UsageEvent(stamp, stamp, "token_count", 5, source="a.jsonl")],
+                        commit=False,
+                    )
+                    raise RuntimeError("parse failed")
+            self.assertEqual(store.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0], 0)
+            self.assertIsNone(store._get_meta("zone_map_rowid:events"))
+            store.close()
+
+    def test_rolled_back_transaction_forgets_new_dimension_keys(self):
+        stamp = "2026-03-02T08:00:00+00:00"
+        event = UsageEvent(stamp, stamp, "token_count", 5, model="gpt-new", source="a.jsonl")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            with self.assertRaises(RuntimeError):
+                with store.transaction():
+                    store.insert_events_bulk([event], commit=False)
+                    raise RuntimeError("abort")
+
+            store.insert_events_bulk([event])
+            self.assertEqual(
+                [tuple(row) for row in store.conn.execute("SELECT model, source FROM events")],
+                [("gpt-new", "a.jsonl")],
+            )
+            store.close()
+
+    def test_zone_maps_narrow_time_ranges_to_a_rowid_span(self):
+        def usage_event(hour: int, minute: int = 0) -> UsageEvent:
+            stamp = f"2026-03-01T{hour:02d}:{minute:02d}:00+00:00"
+            return UsageEvent(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                event_type="token_count",
+                total_tokens=hour,
+                session_id="session-a",
+                source="a.jsonl",
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch(
+            "codex_usage_tracker.store.ZONE_MAP_BLOCK_ROWS", 4
+        ):
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            for first in range(0, 12, 4):
+                store.insert_events_bulk([usage_event(hour) for hour in range(first, first + 4)])
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT COUNT(*) FROM zone_maps WHERE table_name = 'events'"
+                ).fetchone()[0],
+                4,
+            )
+
+            start, end = "2026-03-01T04:00:00Z", "2026-03-01T06:00:00Z"
+            self.assertEqual(store.zone_rowid_span("events", start, end), (4, 7))
+            self.assertEqual(
+                [row["total_tokens"] for row in store.iter_usage_events(start, end)], [4, 5, 6]
+            )
+            self.assertEqual(store.zone_rowid_span("events", "2026-04-01T00:00:00Z", None), (1, 0))
+            self.assertEqual(list(store.iter_usage_events("2026-04-01T00:00:00Z", None)), [])
+
+            # A late row widens the span; the time predicates still filter it.
+            store.insert_events_bulk([usage_event(5, 30)])
+            self.assertEqual(store.zone_rowid_span("events", start, end), (4, 15))
+            self.assertEqual(
+                sorted(row["total_tokens"] for row in store.iter_usage_events(start, end)),
+                [4, 5, 5, 6],
+            )
+            # Too few overlapping blocks in the span: the time index is used alone.
+            with mock.patch("codex_usage_tracker.store.ZONE_MAP_MIN_DENSITY", 1.0):
+                self.assertIsNone(store.zone_rowid_span("events", start, end))
+
+            store.delete_events_for_source("a.jsonl")
+            self.assertIsNone(store.zone_rowid_span("events", start, end))
+            store.extend_zone_map("events")
+            self.assertEqual(store.zone_rowid_span("events", start, end), (1, 0))
+            store.close()
+
+    def test_purges_and_log_ingests_keep_the_summary_priced(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            rollouts_dir = root / "rollouts"
+            _write_rollout_file(rollouts_dir)
+            db_path = root / "usage.sqlite"
+            log_path = root / "codex.log"
+            log_path.write_text("Token usage: total=120 input=100 output=20\n")
+            _run_export(rollouts_dir, db_path, extra_args=["--with-payloads"])
+            pricing_hash = pricing_fingerprint(default_pricing())
+
+            for command in (
+                ["purge-payloads", "--yes"],
+                ["purge-content", "--yes"],
+                ["ingest-cli", "--log", str(log_path)],
+            ):
+                _run_cli(*command, "--db", str(db_path))
+                store = UsageStore(db_path, read_only=True)
+                try:
+                    self.assertTrue(store.session_summary_is_priced(pricing_hash), command)
+                finally:
+                    store.close()
+
+    def test_session_reads_never_write_the_summary(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            store = UsageStore(db_path)
+            store.insert_events_bulk(
+                [
+                    UsageEvent(
+                        captured_at=f"2026-03-01T10:0{index}:00+00:00",
+                        captured_at_utc=f"2026-03-01T10:0{index}:00+00:00",
+                        event_type="token_count",
+                        total_tokens=100 * index,
+                        input_tokens=80 * index,
+                        output_tokens=20 * index,
+                        model="gpt-5",
+                        session_id=f"session-{index % 2}",
+                        source="a.jsonl",
+                    )
+                    for index in range(1, 5)
+                ]
+            )
+            store.rebuild_session_summary()
+            pricing = default_pricing()
+            store.conn.execute("PRAGMA busy_timeout=100")
+
+            writer = sqlite3.connect(db_path)
+            writer.execute("BEGIN IMMEDIATE")
+            try:
+                live = session_insights(store, None, None, pricing)
+                self.assertFalse(store.conn.in_transaction)
+                self.assertEqual(len(live), 2)
+            finally:
+                writer.rollback()
+                writer.close()
+            self.assertFalse(store.session_summary_is_priced(pricing_fingerprint(pricing)))
+
+            price_session_summary(store, pricing)
+            self.assertTrue(store.session_summary_is_priced(pricing_fingerprint(pricing)))
+            summarized = session_insights(store, None, None, pricing)
+            self.assertEqual(
+                [(row["session_id"], row["total_tokens"]) for row in summarized],
+                [(row["session_id"], row["total_tokens"]) for row in live],
+            )
+            store.close()
+
+    def test_zone_maps_restart_when_a_purge_renumbers_content_rows(self):
+        def messages(day: int, count: int) -> list[MessageEvent]:
+            return [
+                MessageEvent(
+                    captured_at=f"2026-03-{day:02d}T10:{index:02d}:00+00:00",
+                    captured_at_utc=f"2026-03-{day:02d}T10:{index:02d}:00+00:00",
+                    role="user",
+                    message_type="event_msg",
+                    message=f"message {index}",
+                    session_id="session-a",
+                    turn_index=1,
+                    source=f"day-{day}.jsonl",
+                )
+                for index in range(count)
+            ]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            self.assertTrue(store.split_content())
+            store.insert_messages_bulk(messages(1, 50))
+            store.purge_content(replace_file=True)
+            store.insert_messages_bulk(messages(20, 10))
+            start, end = "2026-03-19T00:00:00Z", "2026-03-21T00:00:00Z"
+            self.assertEqual(store.zone_rowid_span("messages", start, end), (0, 4095))
+            self.assertEqual(len(list(store.iter_export_rows("messages", start, end))), 10)
+
+            # A watermark left above the table's ids is rebuilt, not trusted.
+            store.set_meta("zone_map_rowid:messages", "500")
+            store.extend_zone_map("messages")
+            self.assertEqual(len(list(store.iter_export_rows("messages", start, end))), 10)
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT min_at FROM zone_maps WHERE table_name = 'messages'"
+                ).fetchone()[0],
+                "2026-03-20T10:00:00+00:00",
+            )
+            store.close()
+
+    def test_activity_is_counted_per_minute_with_optional_occurrences(self):
+        def activity(second: int, event_type: str, source: str, count: int = 1) -> ActivityEvent:
+            stamp = f"2026-03-01T10:00:{second:02d}+00:00"
+            name = "compaction" if event_type == "context" else None
+            return ActivityEvent(stamp, stamp, event_type, name, count, "session-a", 1, source)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            store = UsageStore(db_path)
+            store.insert_activity_events_bulk(
+                [activity(1, "user_image", "a.jsonl", 2), activity(30, "user_image", "a.jsonl")]
+            )
+            store.insert_activity_events_bulk(
+                [activity(59, "user_image", "a.jsonl"), activity(5, "context", "b.jsonl")]
+            )
+            self.assertEqual(
+                [
+                    tuple(row)
+                    for row in store.conn.execute(
+                        "SELECT minute_utc, event_type, event_name, session_id, turn_index, "
+                        "source, count FROM activity_counts ORDER BY event_type"
+                    )
+                ],
+                [
+                    ("2026-03-01T10:00:00+00:00", "context", "compaction", "session-a", 1, "b.jsonl", 1),
+                    ("2026-03-01T10:00:00+00:00", "user_image", None, "session-a", 1, "a.jsonl", 4),
+                ],
+            )
+            self.assertEqual(
+                store.conn.execute("SELECT COUNT(*) FROM activity_events").fetchone()[0], 0
+            )
+            pricing = default_pricing()
+            summary = period_summary(store, "2026-03-01T10:00:30Z", "2026-03-01T10:01:00Z", pricing)
+            self.assertEqual(summary["compactions"], 1)
+            summary = period_summary(store, "2026-03-01T10:01:00Z", None, pricing)
+            self.assertEqual(summary["compactions"], 0)
+
+            store.insert_activity_events_bulk([activity(9, "user_image", "c.jsonl")], occurrences=True)
+            store.delete_activity_events_for_source("a.jsonl")
+            self.assertEqual(
+                [
+                    tuple(row)
+                    for row in store.conn.execute(
+                        "SELECT source, count FROM activity_counts ORDER BY source"
+                    )
+                ],
+                [("b.jsonl", 1), ("c.jsonl", 1)],
+            )
+            store.close()
+
+            # Databases from before the counters are backfilled from raw rows.
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("DROP VIEW activity_counts")
+                conn.execute("DROP TABLE activity_counts_data")
+                conn.execute("UPDATE meta SET value = '0' WHERE key = 'schema_version'")
+            store = UsageStore(db_path)
+            self.assertEqual(
+                [tuple(row) for row in store.conn.execute("SELECT source, count FROM activity_counts")],
+                [("c.jsonl", 1)],
+            )
+            store.close()
+
+    def test_latest_status_is_maintained_at_ingest_and_after_deletes(self):
+        def status_event(minute: int, session: str, plan: str, source: str) -> UsageEvent:
+            stamp = f"2026-03-01T10:{minute:02d}:00+00:00"
+            return UsageEvent(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                event_type="token_count",
+                total_tokens=minute,
+                session_id=session,
+                rate_limit_plan_type=plan,
+                source=source,
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_events_bulk(
+                [
+                    status_event(5, "session-a", "plus", "a.jsonl"),
+                    status_event(1, "session-a", "plus", "a.jsonl"),
+                ]
+            )
+            store.insert_events_bulk([status_event(9, "session-b", "pro", "b.jsonl")])
+            store.insert_events_bulk([status_event(3, "session-c", "pro", "c.jsonl")])
+
+            self.assertEqual(store.latest_status()["session_id"], "session-b")
+            self.assertEqual(store.latest_status("plan:plus")["total_tokens"], 5)
+            self.assertEqual(store.latest_status("session:session-c")["total_tokens"], 3)
+            self.assertEqual(
+                [row["scope"] for row in store.latest_status_scopes()],
+                ["all", "plan:plus", "plan:pro"],
+            )
+
+            store.delete_events_for_source("b.jsonl")
+            self.assertEqual(store.latest_status()["session_id"], "session-a")
+            self.assertEqual(store.latest_status("plan:pro")["session_id"], "session-c")
+            self.assertIsNone(store.latest_status("session:session-b"))
+
+            maintained = store.conn.execute(
+                "SELECT * FROM latest_status ORDER BY scope"
+            ).fetchall()
+            store.rebuild_latest_status()
+            rebuilt = store.conn.execute(
+                "SELECT * FROM latest_status ORDER BY scope"
+            ).fetchall()
+            self.assertEqual([tuple(row) for row in maintained], [tuple(row) for row in rebuilt])
+
+            # A source no scope points at leaves latest_status alone, without
+            # scanning it for orphans.
+            store.insert_events_bulk([status_event(0, "session-a", "plus", "d.jsonl")])
+            statements: list[str] = []
+            store.conn.set_trace_callback(statements.append)
+            store.delete_events_for_source("d.jsonl")
+            store.conn.set_trace_callback(None)
+            self.assertFalse(
+                [statement for statement in statements if "NOT EXISTS" in statement]
+            )
+            self.assertEqual(
+                [tuple(row) for row in store.conn.execute("SELECT * FROM latest_status ORDER BY scope")],
+                [tuple(row) for row in rebuilt],
+            )
+            store.close()
+
+    def test_substring_index_serves_identifier_search_with_pagination(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_messages_bulk(
+                [
+                    MessageEvent(
+                        captured_at=f"2026-03-01T10:{index:02d}:00+00:00",
+                        captured_at_utc=f"2026-03-01T10:{index:02d}:00+00:00",
+                        role="user",
+                        message_type="user_message",
+                        message=text,
+                        session_id=f"session-{index % 2}",
+                        source="a.jsonl",
+                    )
+                    for index, text in enumerate(
+                        [
+                            "edit src/store_utils.py next",
+                            "store_utils again and store_utils twice",
+                            "call ingestRollouts from the watcher",
+                            "running the tracker tests",
+                        ]
+                    )
+                ]
+            )
+            self.assertEqual(plan_search_mode("store_utils", "auto", False), "phrase")
+            with self.assertRaises(SearchError):
+                search_messages(store, "store_utils", mode="substring")
+
+            if not store.enable_substring_index():
+                self.skipTest("SQLite build lacks the trigram tokenizer")
+            self.assertEqual(plan_search_mode("store_utils", "auto", True), "substring")
+            self.assertEqual(plan_search_mode("tracker tests", "auto", True), "phrase")
+
+            first = search_messages(store, "store_utils", limit=1)
+            self.assertEqual(first["mode"], "substring")
+            self.assertEqual(first["rows"][0]["id"], 2)
+            self.assertIn("<mark>store_utils</mark>", first["rows"][0]["snippet"])
+            self.assertEqual(first["next_offset"], 1)
+            second = search_messages(store, "store_utils", limit=1, offset=1)
+            self.assertEqual(second["rows"][0]["id"], 1)
+            self.assertIsNone(second["next_offset"])
+
+            partial = search_messages(store, "gestRoll", mode="substring")
+            self.assertEqual([row["id"] for row in partial["rows"]], [3])
+            self.assertEqual(search_messages(store, "track")["rows"], [])
+            scoped = search_messages(store, "track", mode="substring", session_id="session-0")
+            self.assertEqual(scoped["rows"], [])
+
+            plan = " ".join(
+                row[3]
+                for row in store.conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT messages.id FROM messages_trigram "
+                    "JOIN messages ON messages.id = messages_trigram.rowid "
+                    "WHERE messages_trigram MATCH ?",
+                    ('"store_utils"',),
+                )
+            )
+            self.assertIn("VIRTUAL TABLE INDEX", plan)
+            self.assertIn("SEARCH messages USING INTEGER PRIMARY KEY", plan)
+
+            store.conn.execute("DELETE FROM messages WHERE id = 3")
+            store.conn.commit()
+            self.assertEqual(search_messages(store, "gestRoll", mode="substring")["rows"], [])
+            store.disable_substring_index()
+            self.assertFalse(store.substring_index_enabled())
+            store.close()
+
+    def test_deferred_fts_queues_changes_and_folds_them_into_search(self):
+        def message(index: int, text: str, source: str) -> MessageEvent:
+            return MessageEvent(
+                captured_at=f"2026-03-02T10:{index:02d}:00+00:00",
+                captured_at_utc=f"2026-03-02T10:{index:02d}:00+00:00",
+                role="user",
+                message_type="user_message",
+                message=text,
+                session_id=f"session-{source}",
+                source=source,
+            )
+
+        def integrity_ok(store: UsageStore, table: str) -> None:
+            store.conn.execute(
+                f"INSERT INTO {table}({table}, rank) VALUES('integrity-check', 1)"
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_messages_bulk([message(0, "indexed retry logic", "a.jsonl")])
+            has_trigram = store.enable_substring_index()
+            store.set_fts_maintenance("deferred")
+            self.assertTrue(
+                {"messages_pending_ai", "messages_pending_ad", "messages_pending_au"}
+                <= store.fts_trigger_names()
+            )
+            self.assertNotIn("messages_ai", store.fts_trigger_names())
+
+            store.delete_content_for_source("a.jsonl")
+            store.insert_messages_bulk(
+                [
+                    message(1, "rewritten retry logic", "a.jsonl"),
+                    message(2, "fresh retry logic here", "b.jsonl"),
+                ]
+            )
+            self.assertEqual(store.fts_pending_count(), 3)
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT COUNT(*) AS count FROM messages_fts WHERE messages_fts MATCH 'indexed'"
+                ).fetchone()["count"],
+                1,
+            )
+
+            folded = search_messages(store, "retry logic", mode="phrase", limit=1)
+            self.assertEqual(folded["rows"][0]["id"], 3)
+            self.assertIn("<mark>retry logic</mark>", folded["rows"][0]["snippet"])
+            self.assertEqual(folded["next_offset"], 1)
+            rest = search_messages(store, "retry logic", mode="phrase", offset=1)
+            self.assertEqual([row["id"] for row in rest["rows"]], [2])
+            self.assertEqual(search_messages(store, "indexed", mode="phrase")["rows"], [])
+            self.assertEqual(
+                matching_session_ids(store, "retry logic"),
+                {"session-a.jsonl", "session-b.jsonl"},
+            )
+
+            self.assertEqual(store.sync_fts(batch_size=2), 3)
+            self.assertEqual(store.fts_pending_count(), 0)
+            integrity_ok(store, "messages_fts")
+            if has_trigram:
+                integrity_ok(store, "messages_trigram")
+            synced = search_messages(store, "retry logic", mode="phrase")
+            self.assertEqual(sorted(row["id"] for row in synced["rows"]), [2, 3])
+            self.assertTrue(all(row["score"] is not None for row in synced["rows"]))
+
+            store.delete_content_for_source("b.jsonl")
+            store.set_fts_maintenance("immediate")
+            self.assertEqual(store.fts_pending_count(), 0)
+            self.assertIn("messages_ai", store.fts_trigger_names())
+            integrity_ok(store, "messages_fts")
+            status = store.fts_status()
+            self.assertEqual(status["maintenance"], "immediate")
+            self.assertEqual(status["pending"], 0)
+            store.close()
+
+    def test_tool_call_search_follows_purge_and_deferred_queue(self):
+        def tool_call(index: int, command: str, output: str) -> ToolCallEvent:
+            return ToolCallEvent(
+                captured_at=f"2026-03-03T10:{index:02d}:00+00:00",
+                captured_at_utc=f"2026-03-03T10:{index:02d}:00+00:00",
+                tool_type="function_call",
+                tool_name="shell",
+                call_id=f"call-{index}",
+                status="completed",
+                input_text=None,
+                output_text=output,
+                command=command,
+                session_id="session-tools",
+                turn_index=index,
+                source="tools.jsonl",
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.conn.execute(
+                """
+                INSERT INTO turns (session_id, turn_index, captured_at, captured_at_utc, model, cwd)
+                VALUES ('session-tools', 1, '2026-03-03T10:01:00+00:00',
+                        '2026-03-03T10:01:00+00:00', 'gpt-5', '/work/repo')
+                """
+            )
+            store.insert_tool_calls_bulk(
+                [
+                    tool_call(0, "ls -la", "total 8"),
+                    tool_call(1, "rm -rf build/", "removed build"),
+                    tool_call(2, "pytest -q", "FileNotFoundError: config.json"),
+                ]
+            )
+
+            hits = search_tool_calls(store, "rm -rf")
+            self.assertEqual([row["id"] for row in hits["rows"]], [2])
+            self.assertEqual(hits["rows"][0]["session_id"], "session-tools")
+            self.assertEqual(hits["rows"][0]["turn_index"], 1)
+            self.assertEqual(hits["rows"][0]["model"], "gpt-5")
+            self.assertEqual(hits["rows"][0]["cwd"], "/work/repo")
+            self.assertIn("<mark>rm -rf</mark>", hits["rows"][0]["snippet"])
+            error = search_tool_calls(store, "FileNotFoundError")
+            self.assertEqual([row["id"] for row in error["rows"]], [3])
+            plan = " ".join(
+                row[3]
+                for row in store.conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT tool_calls.id FROM tool_calls_fts "
+                    "JOIN tool_calls ON tool_calls.id = tool_calls_fts.rowid "
+                    "WHERE tool_calls_fts MATCH ?",
+                    ('"rm -rf"',),
+                )
+            )
+            self.assertIn("VIRTUAL TABLE INDEX", plan)
+            self.assertIn("SEARCH tool_calls USING INTEGER PRIMARY KEY", plan)
+
+            store.set_fts_maintenance("deferred")
+            store.insert_tool_calls_bulk([tool_call(3, "rm -rf dist/", "removed dist")])
+            folded = search_tool_calls(store, "rm -rf", limit=1)
+            self.assertEqual(folded["rows"][0]["id"], 4)
+            self.assertIn("<mark>rm -rf</mark>", folded["rows"][0]["snippet"])
+            self.assertEqual(folded["next_offset"], 1)
+
+            store.purge_payloads()
+            self.assertEqual(store.fts_pending_count(), 0)
+            self.assertEqual(search_tool_calls(store, "rm -rf")["rows"], [])
+            self.assertEqual(search_tool_calls(store, "FileNotFoundError")["rows"], [])
+            store.conn.execute(
+                "INSERT INTO tool_calls_fts(tool_calls_fts, rank) VALUES('integrity-check', 1)"
+            )
+            store.close()
+
+    def test_tool_call_search_falls_back_to_a_scan_with_pending_rows(self):
+        def tool_call(index: int, command: str) -> ToolCallEvent:
+            stamp = f"2026-03-03T10:{index:02d}:00+00:00"
+            return ToolCallEvent(
+                captured_at=stamp,
+                captured_at_utc=stamp,
+                tool_type="function_call",
+                tool_name="shell",
+                call_id=f"call-{index}",
+                status="completed",
+                input_text=None,
+                output_text=None,
+                command=command,
+                session_id="session-tools",
+                turn_index=index,
+                source="tools.jsonl",
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.set_fts_maintenance("deferred")
+            store.insert_tool_calls_bulk([tool_call(0, "rm -rf build/"), tool_call(1, "rm -rf dist/")])
+            self.assertEqual(store.fts_pending_count(), 2)
+            # The MATCH query fails once the index is gone, as without FTS5.
+            store.conn.execute("DROP TABLE tool_calls_fts")
+            hits = search_tool_calls(store, "rm -rf")
+            self.assertEqual(hits["mode"], "like")
+            self.assertEqual([row["id"] for row in hits["rows"]], [2, 1])
+            store.close()
+
+    def test_split_content_layout_moves_payload_tables_to_attached_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            content_path = content_db_path(db_path)
+            store = UsageStore(db_path)
+            store.insert_messages_bulk(
+                [
+                    MessageEvent(
+                        captured_at="2026-03-04T10:00:00+00:00",
+                        captured_at_utc="2026-03-04T10:00:00+00:00",
+                        role="user",
+                        message_type="event_msg",
+                        message="please rotate the signing keys",
+                        session_id="session-split",
+                        turn_index=1,
+                        source="split.jsonl",
+                    )
+                ]
+            )
+            self.assertTrue(store.split_content())
+            self.assertFalse(store.split_content())
+            self.assertEqual(store.content_layout(), "split")
+            self.assertTrue(content_path.exists())
+            main_tables = {
+                row[0]
+                for row in store.conn.execute(
+                    "SELECT name FROM main.sqlite_master WHERE type = 'table'"
+                )
+            }
+            self.assertNotIn("messages", main_tables)
+            self.assertNotIn("tool_calls", main_tables)
+            self.assertNotIn("messages_fts", main_tables)
+            hits = search_messages(store, "signing keys")
+            self.assertEqual([row["session_id"] for row in hits["rows"]], ["session-split"])
+            store.close()
+
+            reader = UsageStore(db_path, read_only=True)
+            self.assertEqual(reader.content_schema, "content")
+            self.assertEqual(len(search_messages(reader, "rotate")["rows"]), 1)
+            reader.close()
+
+            # Without replace_file the purge deletes rows in place, so other
+            # processes can keep the content file attached.
+            store = UsageStore(db_path)
+            inode = content_path.stat().st_ino
+            store.insert_messages_bulk(
+                [
+                    MessageEvent(
+                        captured_at="2026-03-04T11:00:00+00:00",
+                        captured_at_utc="2026-03-04T11:00:00+00:00",
+                        role="user",
+                        message_type="event_msg",
+                        message="rotate again",
+                        session_id="session-split",
+                        turn_index=2,
+                        source="split.jsonl",
+                    )
+                ]
+            )
+            self.assertEqual(store.purge_content(), (2, 0))
+            self.assertEqual(content_path.stat().st_ino, inode)
+            self.assertEqual(search_messages(store, "rotate")["rows"], [])
+            store.insert_messages_bulk(
+                [
+                    MessageEvent(
+                        captured_at="2026-03-04T12:00:00+00:00",
+                        captured_at_utc="2026-03-04T12:00:00+00:00",
+                        role="user",
+                        message_type="event_msg",
+                        message="rotate once more",
+                        session_id="session-split",
+                        turn_index=3,
+                        source="split.jsonl",
+                    )
+                ]
+            )
+            self.assertEqual(store.purge_content(replace_file=True), (1, 0))
+            self.assertEqual(search_messages(store, "rotate")["rows"], [])
+            self.assertEqual(store.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0], 0)
+
+            self.assertTrue(store.merge_content())
+            self.assertEqual(store.content_layout(), "single")
+            self.assertFalse(content_path.exists())
+            self.assertEqual(store.content_schema, "main")
+            store.conn.execute(
+                "INSERT INTO messages_fts(messages_fts, rank) VALUES('integrity-check', 1)"
+            )
+            store.close()
+
+    def test_split_layout_reingests_a_file_whose_mark_was_lost(self):
+        from zoneinfo import ZoneInfo
+
+        from codex_usage_tracker.cli import ingest_rollouts
+
+        def counts(store):
+            return [
+                store.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("events", "messages", "tool_calls")
+            ]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rollouts = Path(tmpdir) / "rollouts"
+            _write_rollout_file(rollouts)
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            self.assertTrue(store.split_content())
+            ingest_rollouts(rollouts, store, None, None, ZoneInfo("UTC"))
+            expected = counts(store)
+            self.assertGreater(expected[1], 0)
+
+            # The rows committed but the process died before the mark did.
+            store.conn.execute("DELETE FROM ingestion_files")
+            store.conn.commit()
+            self.assertTrue(store.has_unmarked_rollout_rows())
+            ingest_rollouts(rollouts, store, None, None, ZoneInfo("UTC"))
+            self.assertEqual(counts(store), expected)
+            self.assertEqual(store.ingestion_file_count(), 1)
+            store.close()
+
+    def test_fresh_scan_is_skipped_only_in_the_same_ingest_mode(self):
+        import argparse
+        from zoneinfo import ZoneInfo
+
+        from codex_usage_tracker.cli import _sync_skip_reason, ingest_rollouts
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rollouts = Path(tmpdir) / "rollouts"
+            _write_rollout_file(rollouts)
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            args = argparse.Namespace(no_sync=False, max_staleness=None)
+            ingest_rollouts(rollouts, store, None, None, ZoneInfo("UTC"), ingest_mode="full")
+            self.assertIsNotNone(_sync_skip_reason(args, store, rollouts, None, "full"))
+            self.assertIsNone(_sync_skip_reason(args, store, rollouts, None, "none"))
+            self.assertIsNone(_sync_skip_reason(args, store, rollouts, None, "redact_payloads"))
+
+            ingest_rollouts(rollouts, store, None, None, ZoneInfo("UTC"), ingest_mode="none")
+            self.assertIsNotNone(_sync_skip_reason(args, store, rollouts, None, "none"))
+            self.assertIsNone(_sync_skip_reason(args, store, rollouts, None, "full"))
+            store.close()
+
+    def test_payload_compression_keeps_search_and_readers_on_plain_text(self):
+        def message(index: int, text: str) -> MessageEvent:
+            captured = f"2026-03-05T10:{index:02d}:00+00:00"
+            return MessageEvent(
+                captured_at=captured,
+                captured_at_utc=captured,
+                role="assistant",
+                message_type="agent_message",
+                message=text,
+                session_id="session-zip",
+                turn_index=1,
+                source="zip.jsonl",
+            )
+
+        boilerplate = "Running the test suite with pytest -q in the workspace repository.\n" * 3
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_messages_bulk(
+                [message(index, f"{boilerplate}step {index}") for index in range(20)]
+                + [message(20, f"{boilerplate}found a stray zebracorn fixture")]
+            )
+            profile = store.compress_payloads()
+            self.assertTrue(store.payload_compression_enabled())
+            self.assertEqual(profile["columns"]["messages.content"]["compressed_rows"], 21)
+            self.assertGreater(profile["ratio"], 2)
+            self.assertGreater(profile["dictionary_bytes"], 0)
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT COUNT(*) FROM messages WHERE typeof(content) = 'text'"
+                ).fetchone()[0],
+                0,
+            )
+
+            hits = search_messages(store, "zebracorn")
+            self.assertEqual(len(hits["rows"]), 1)
+            self.assertIn("<mark>zebracorn</mark>", hits["rows"][0]["snippet"])
+            store.insert_messages_bulk([message(21, f"{boilerplate}a quokkafish appears")])
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT typeof(content) FROM messages ORDER BY id DESC LIMIT 1"
+                ).fetchone()[0],
+                "blob",
+            )
+            self.assertEqual(len(search_messages(store, "quokkafish")["rows"]), 1)
+            exported = [row["content"] for row in store.iter_export_rows("messages")]
+            self.assertTrue(exported[-1].endswith("a quokkafish appears"))
+            store.conn.execute(
+                "INSERT INTO messages_fts(messages_fts, rank) VALUES('integrity-check', 1)"
+            )
+
+            self.assertEqual(store.decompress_payloads(), 22)
+            self.assertFalse(store.payload_compression_enabled())
+            self.assertEqual(
+                store.conn.execute("SELECT content FROM messages WHERE id = 21").fetchone()[0],
+                f"{boilerplate}found a stray zebracorn fixture",
+            )
+            self.assertEqual(len(search_messages(store, "zebracorn")["rows"]), 1)
+            store.conn.execute(
+                "INSERT INTO messages_fts(messages_fts, rank) VALUES('integrity-check', 1)"
+            )
+            store.close()
+
+    def test_repeated_tool_payloads_share_one_refcounted_blob(self):
+        def tool_call(index: int, source: str, output: str) -> ToolCallEvent:
+            captured = f"2026-03-06T10:{index:02d}:00+00:00"
+            return ToolCallEvent(
+                captured_at=captured,
+                captured_at_utc=captured,
+                tool_type="function_call_output",
+                tool_name="shell",
+                call_id=f"call-{index}",
+                status="completed",
+                input_text="short input",
+                output_text=output,
+                command="git status",
+                session_id="session-blobs",
+                turn_index=index,
+                source=source,
+            )
+
+        listing = "\n".join(f"modified: src/module_{index}.py" for index in range(40))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_tool_calls_bulk(
+                [
+                    tool_call(0, "a.jsonl", listing),
+                    tool_call(1, "a.jsonl", listing),
+                    tool_call(2, "b.jsonl", listing),
+                    tool_call(3, "b.jsonl", listing + "\nuntracked: wombat.txt"),
+                ]
+            )
+            rows = store.conn.execute(
+                "SELECT input_text, input_blob_id, output_text, output_blob_id "
+                "FROM tool_calls ORDER BY id"
+            ).fetchall()
+            self.assertEqual({row["input_text"] for row in rows}, {"short input"})
+            self.assertEqual({row["input_blob_id"] for row in rows}, {None})
+            self.assertEqual({row["output_text"] for row in rows}, {None})
+            self.assertEqual(len({row["output_blob_id"] for row in rows[:3]}), 1)
+            profile = store.payload_blob_profile()
+            self.assertEqual(profile["blobs"], 2)
+            self.assertEqual(profile["references"], 4)
+            self.assertGreater(profile["dedup_ratio"], 1.5)
+
+            hits = search_tool_calls(store, "wombat")
+            self.assertEqual([row["id"] for row in hits["rows"]], [4])
+            exported = [row["output_text"] for row in store.iter_export_rows("tool_calls")]
+            self.assertEqual(exported[0], listing)
+            store.conn.execute(
+                "INSERT INTO tool_calls_fts(tool_calls_fts, rank) VALUES('integrity-check', 1)"
+            )
+
+            store.delete_content_for_source("a.jsonl")
+            self.assertEqual(store.payload_blob_refcount_errors(), 0)
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT refcount FROM payload_blobs ORDER BY id"
+                ).fetchall()[0][0],
+                1,
+            )
+
+            store.compress_payloads()
+            self.assertEqual(
+                store.conn.execute(
+                    "SELECT COUNT(*) FROM payload_blobs WHERE typeof(content) = 'blob'"
+                ).fetchone()[0],
+                2,
+            )
+            self.assertEqual(len(search_tool_calls(store, "wombat")["rows"]), 1)
+            store.insert_tool_calls_bulk([tool_call(4, "c.jsonl", listing)])
+            self.assertEqual(store.payload_blob_profile()["blobs"], 2)
+
+            store.purge_payloads()
+            self.assertEqual(store.payload_blob_refcount_errors(), 0)
+            self.assertEqual(store.payload_blob_profile()["blobs"], 0)
+            self.assertEqual(search_tool_calls(store, "wombat")["rows"], [])
+            store.conn.execute(
+                "INSERT INTO tool_calls_fts(tool_calls_fts, rank) VALUES('integrity-check', 1)"
+            )
+            store.close()
+
+    def test_events_are_keyed_by_dimension_tables_behind_compatibility_views(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            legacy = sqlite3.connect(db_path)
+            legacy.executescript(
+                """
+                CREATE TABLE events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    captured_at TEXT NOT NULL,
+                    captured_at_utc TEXT NOT NULL,
+                    event_type TEXT NOT NULL,
+                    total_tokens INTEGER,
+                    model TEXT,
+                    session_id TEXT,
+                    source TEXT
+                );
+                CREATE INDEX events_event_type_idx ON events(event_type);
+                """
+            )
+            legacy.executemany(
+                "INSERT INTO events (captured_at, captured_at_utc, event_type, total_tokens, "
+                "model, session_id, source) VALUES (?, ?, 'token_count', ?, ?, 'session-a', ?)",
+                [
+                    (
+                        f"2026-03-07T10:{index:02d}:00+00:00",
+                        f"2026-03-07T10:{index:02d}:00+00:00",
+                        index,
+                        "gpt-5" if index % 2 else None,
+                        "a.jsonl",
+                    )
+                    for index in range(1, 6)
+                ],
+            )
+            legacy.commit()
+            legacy.close()
+
+            with mock.patch("codex_usage_tracker.store.DIMENSION_MIGRATION_BATCH", 2):
+                store = UsageStore(db_path)
+            kinds = dict(
+                store.conn.execute(
+                    "SELECT name, type FROM sqlite_master "
+                    "WHERE name IN ('events', 'events_data', 'activity_events')"
+                ).fetchall()
+            )
+            self.assertEqual(
+                kinds, {"events": "view", "events_data": "table", "activity_events": "view"}
+            )
+            rows = store.conn.execute(
+                "SELECT id, event_type, total_tokens, model, session_id, source "
+                "FROM events ORDER BY id"
+            ).fetchall()
+            self.assertEqual(
+                [tuple(row) for row in rows][:2],
+                [
+                    (1, "token_count", 1, "gpt-5", "session-a", "a.jsonl"),
+                    (2, "token_count", 2, None, "session-a", "a.jsonl"),
+                ],
+            )
+            self.assertEqual(len(rows), 5)
+
+            captured = "2026-03-07T11:00:00+00:00"
+            store.insert_events_bulk(
+                [
+                    UsageEvent(
+                        captured, captured, "token_count", 9, 6, 0, 3, 0,
+                        model="gpt-5", session_id="session-b", source="b.jsonl",
+                    )
+                ]
+                * 2
+            )
+            store.insert_activity_events_bulk(
+                [ActivityEvent(captured, captured, "tool_call", "exec", 1, "session-b", 1, "b.jsonl")],
+                occurrences=True,
+            )
+            store.conn.execute(
+                "INSERT INTO events (captured_at, captured_at_utc, event_type, model, source) "
+                "VALUES (?, ?, 'turn_context', 'gpt-5', 'c.jsonl')",
+                (captured, captured),
+            )
+            self.assertEqual(
+                store.conn.execute("SELECT COUNT(*) FROM events_data").fetchone()[0], 7
+            )
+            self.assertEqual(
+                store.conn.execute("SELECT COUNT(DISTINCT model_key) FROM events_data").fetchone()[0],
+                1,
+            )
+            self.assertEqual(
+                [row[0] for row in store.conn.execute("SELECT value FROM dim_session ORDER BY id")],
+                ["session-a", "session-b"],
+            )
+            self.assertEqual(
+                tuple(
+                    store.conn.execute(
+                        "SELECT event_type, event_name, session_id, source FROM activity_events"
+                    ).fetchone()
+                ),
+                ("tool_call", "exec", "session-b", "b.jsonl"),
+            )
+            plan = " ".join(
+                row[3]
+                for row in store.conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT SUM(total_tokens) FROM events "
+                    "WHERE event_type = 'token_count' AND captured_at_utc >= ?",
+                    (captured,),
+                )
+            )
+            self.assertIn("USING COVERING INDEX events_", plan)
+
+            store.delete_events_for_source("b.jsonl")
+            store.delete_activity_events_for_source("b.jsonl")
+            store.conn.execute("DELETE FROM events WHERE source = 'c.jsonl'")
+            self.assertEqual(
+                store.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0], 5
+            )
+            self.assertEqual(
+                store.conn.execute("SELECT COUNT(*) FROM activity_events").fetchone()[0], 0
+            )
+            store.close()
+
+    def test_event_timestamps_are_stored_as_epoch_ms_behind_views(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "usage.sqlite"
+            legacy = sqlite3.connect(db_path)
+            legacy.executescript(
+                """
+                CREATE TABLE dim_event_type (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);
+                INSERT INTO dim_event_type (id, value) VALUES (1, 'token_count');
+                CREATE TABLE events_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    captured_at TEXT NOT NULL,
+                    captured_at_utc TEXT NOT NULL,
+                    event_type_key INTEGER NOT NULL,
+                    total_tokens INTEGER,
+                    source_id INTEGER
+                );
+                CREATE INDEX events_captured_at_utc_idx ON events_data(captured_at_utc);
+                """
+            )
+            stamps = [
+                ("2026-03-07T02:15:00.250000-08:00", "2026-03-07T10:15:00.250000+00:00"),
+                ("2026-03-07T16:15:00+05:30", "2026-03-07T10:45:00+00:00"),
+            ]
+            legacy.executemany(
+                "INSERT INTO events_data (captured_at, captured_at_utc, event_type_key, total_tokens) "
+                "VALUES (?, ?, 1, ?)",
+                [(*stamp, index) for index, stamp in enumerate(stamps, start=1)],
+            )
+            legacy.commit()
+            legacy.close()
+
+            store = UsageStore(db_path)
+            stored = {name for name, _declared in store.table_columns("events_data")}
+            self.assertFalse({"captured_at", "captured_at_utc"} & stored)
+            self.assertIn("captured_at_ms", stored)
+            self.assertIsNone(
+                store.conn.execute(
+                    "SELECT name FROM sqlite_master WHERE name = 'events_data_legacy'"
+                ).fetchone()
+            )
+            store.insert_events_bulk(
+                [
+                    UsageEvent(
+                        "2026-03-07T12:00:00.001000+01:00",
+                        "2026-03-07T11:00:00.001000+00:00",
+                        "token_count",
+                        3,
+                    ),
+                    # Before the epoch, where SQLite's integer division truncates.
+                    UsageEvent(
+                        "1969-12-31T15:59:59.750000-08:00",
+                        "1969-12-31T23:59:59.750000+00:00",
+                        "token_count",
+                        4,
+                    ),
+                ]
+            )
+            stamps.append(("2026-03-07T12:00:00.001000+01:00", "2026-03-07T11:00:00.001000+00:00"))
+            stamps.append(("1969-12-31T15:59:59.750000-08:00", "1969-12-31T23:59:59.750000+00:00"))
+            self.assertEqual(
+                [
+                    tuple(row)
+                    for row in store.conn.execute(
+                        "SELECT captured_at, captured_at_utc FROM events ORDER BY id"
+                    )
+                ],
+                stamps,
+            )
+            self.assertEqual(
+                [
+                    row["total_tokens"]
+                    for row in store.iter_events(
+                        start="2026-03-07T10:30:00+00:00", end="2026-03-07T12:00:00+01:00"
+                    )
+                ],
+                [2],
+            )
+            plan = " ".join(
+                row[3]
+                for row in store.conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT SUM(total_tokens) FROM events "
+                    "WHERE event_type = 'token_count' AND captured_at_ms >= ?",
+                    (0,),
+                )
+            )
+            self.assertIn("captured_at_ms>?", plan)
+            store.close()
+
+    def test_local_bucket_keys_follow_the_configured_timezone(self):
+        from datetime import datetime, timezone
+        from zoneinfo import ZoneInfo
+
+        from codex_usage_tracker.report import period_key
+
+        def expected(rows, name):
+            zone = ZoneInfo(name)
+            return [
+                (
+                    datetime.fromisoformat(utc).astimezone(zone).strftime("%Y-%m-%dT%H"),
+                    period_key(datetime.fromisoformat(utc), "day", zone),
+                )
+                for utc in rows
+            ]
+
+        def keyed(store):
+            return [
+                (
+                    datetime.fromtimestamp(row["local_hour"] * 3600, timezone.utc).strftime("%Y-%m-%dT%H"),
+                    datetime.fromtimestamp(row["local_day"] * 86400, timezone.utc).strftime("%Y-%m-%d"),
+                )
+                for row in store.conn.execute("SELECT local_hour, local_day FROM events ORDER BY id")
+            ]
+
+        # Either side of the America/Los_Angeles spring-forward at 10:00 UTC.
+        stamps = [
+            "2026-03-08T07:30:00+00:00",
+            "2026-03-08T09:59:59.999000+00:00",
+            "2026-03-08T10:00:00+00:00",
+            "2026-03-09T06:30:00+00:00",
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_events_bulk(
+                [UsageEvent(stamp, stamp, "token_count", 1) for stamp in stamps[:3]]
+            )
+            self.assertEqual(
+                [row[0] for row in store.conn.execute("SELECT local_hour FROM events")],
+                [None, None, None],
+            )
+
+            with mock.patch("codex_usage_tracker.store.BUCKET_REBUILD_BATCH", 2):
+                self.assertEqual(store.set_bucket_timezone("America/Los_Angeles"), 3)
+            store.insert_events_bulk([UsageEvent(stamps[3], stamps[3], "token_count", 1)])
+            self.assertEqual(keyed(store), expected(stamps, "America/Los_Angeles"))
+            self.assertTrue(store.bucket_keys_current("America/Los_Angeles"))
+            self.assertEqual(store.set_bucket_timezone("America/Los_Angeles"), 0)
+
+            # An interrupted re-key resumes after the last committed id.
+            store.set_meta("bucket_timezone", "Asia/Kolkata")
+            store.set_meta("bucket_rebuild_after", "2")
+            self.assertFalse(store.bucket_keys_current("Asia/Kolkata"))
+            self.assertEqual(store.set_bucket_timezone("Asia/Kolkata"), 2)
+            self.assertEqual(
+                keyed(store),
+                expected(stamps[:2], "America/Los_Angeles") + expected(stamps[2:], "Asia/Kolkata"),
+            )
+
+            self.assertEqual(store.set_bucket_timezone("Europe/Stockholm"), 4)
+            self.assertEqual(keyed(store), expected(stamps, "Europe/Stockholm"))
+            self.assertIsNone(store._get_meta("bucket_rebuild_after"))
+
+            # A re-key by another connection applies to this store's next insert.
+            other = UsageStore(store.path)
+            self.assertEqual(other.set_bucket_timezone("America/Los_Angeles"), 4)
+            other.close()
+            store.insert_events_bulk([UsageEvent(stamps[0], stamps[0], "token_count", 1)])
+            self.assertEqual(keyed(store), expected(stamps + stamps[:1], "America/Los_Angeles"))
+            store.close()
+
+    def test_directory_tree_serves_subtree_filters_and_depth_rollups(self):
+        from codex_usage_tracker.report import aggregate
+        from codex_usage_tracker.store import directory_subtree_sql
+
+        stamp = "2026-03-07T10:00:00+00:00"
+        directories = ["/work/app", "/work/app/api", "/work/apple", "/home/me"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_events_bulk(
+                [
+                    UsageEvent(stamp, stamp, "token_count", tokens, directory=directory)
+                    for tokens, directory in enumerate(directories, start=1)
+                ]
+            )
+            # Rows added through the view are linked on the next tree lookup.
+            store.conn.execute(
+                "INSERT INTO events (captured_at, captured_at_utc, event_type, total_tokens, directory) "
+                "VALUES (?, ?, 'token_count', 10, '/work/app/web/src')",
+                (stamp, stamp),
+            )
+            store.conn.commit()
+
+            self.assertEqual(
+                store.directory_subtree("/work/app"),
+                ["/work/app", "/work/app/api", "/work/app/web", "/work/app/web/src"],
+            )
+            self.assertIsNone(store.directory_subtree("/work/ap"))
+            self.assertEqual(
+                store.conn.execute(
+                    f"SELECT SUM(total_tokens) FROM events_keyed WHERE {directory_subtree_sql('directory_key')}",
+                    ("/work/app",),
+                ).fetchone()[0],
+                13,
+            )
+            self.assertNotIn("directory_key", {name for name, _ in store.table_columns("events")})
+            self.assertEqual(
+                dict(
+                    store.conn.execute(
+                        "SELECT value, depth FROM dim_directory WHERE value IN ('/', '/work', '/work/app/api')"
+                    ).fetchall()
+                ),
+                {"/": 0, "/work": 1, "/work/app/api": 3},
+            )
+
+            rollup = store.directory_rollup(2)
+            self.assertEqual(rollup["/work/app/web/src"], "/work/app")
+            self.assertEqual(rollup["/work"], "/work")
+            rows = aggregate(
+                [dict(row) for row in store.iter_usage_events()],
+                "day",
+                "directory",
+                directories=store.directory_rollup(1),
+            )
+            self.assertEqual(
+                {row.group: row.total_tokens for row in rows},
+                {"/work": 16, "/home": 4},
+            )
+            store.close()
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,42 @@
+import io
+import json
+import tempfile
 import unittest
 from datetime import datetime, timedelta
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
-from codex_usage_tracker.report import ReportRow, parse_last, render_table
+from codex_usage_tracker.cli import (
+    _acquire_ingestion_lock,
+    _estimate_weekly_quota,
+    _last_completed_week,
+    _release_ingestion_lock,
+)
+from codex_usage_tracker.insights import _base_session_rows, _with_scores, session_insights
+
+from codex_usage_tracker.report import (
+    ReportRow,
+    default_pricing,
+    parse_last,
+    render_table,
+    write_events_csv,
+    write_events_json,
+)
+from codex_usage_tracker.store import MessageEvent, ToolCallEvent, UsageEvent, UsageStore
+
+
+def _usage_event(captured: datetime, source: str, tokens: int) -> UsageEvent:
+    utc = captured.astimezone(ZoneInfo("UTC"))
+    return UsageEvent(
+        captured_at=captured.isoformat(),
+        captured_at_utc=utc.isoformat(),
+        event_type="token_count",
+        total_tokens=tokens,
+        input_tokens=tokens,
+        limit_weekly_percent_left=75.0,
+        model="gpt-5.1-codex",
+        source=source,
+    )
 
 
 class ReportTests(unittest.TestCase):
@@ -89,6 +123,216 @@ class ReportTests(unittest.TestCase):
         self.assertIn("12", total_line)
         self.assertIn("$3.75", total_line)
 
+    def test_streaming_event_writers_consume_generators(self):
+        events = [
+            {"id": 1, "event_type": "token_count", "total_tokens": 10},
+            {"id": 2, "event_type": "token_count", "total_tokens": 20},
+        ]
+
+        json_buffer = io.StringIO()
+        written = write_events_json((dict(event) for event in events), json_buffer)
+        self.assertEqual(written, 2)
+        self.assertEqual(json_buffer.getvalue(), json.dumps(events, indent=2))
+
+        empty_buffer = io.StringIO()
+        self.assertEqual(write_events_json(iter(()), empty_buffer), 0)
+        self.assertEqual(empty_buffer.getvalue(), "[]")
+
+        csv_buffer = io.StringIO()
+        self.assertEqual(write_events_csv(iter(events), csv_buffer), 2)
+        lines = csv_buffer.getvalue().splitlines()
+        self.assertEqual(lines[0], "id,event_type,total_tokens")
+        self.assertEqual(len(lines), 3)
+
+    def test_weekly_quota_is_cached_until_week_sources_change(self):
+        tz = ZoneInfo("Europe/Stockholm")
+        now = datetime(2026, 3, 30, 12, 0, tzinfo=tz)
+        week_start, week_end = _last_completed_week(now)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            lock_handle = _acquire_ingestion_lock(store.path)
+            self.addCleanup(_release_ingestion_lock, lock_handle)
+            store.insert_events_bulk(
+                [_usage_event(week_start + timedelta(hours=1), "week.jsonl", 100)]
+            )
+
+            first = _estimate_weekly_quota(store, now, tz=tz)
+            self.assertEqual(first["quota_tokens"], 400)
+            again = _estimate_weekly_quota(store, now + timedelta(minutes=5), tz=tz)
+            self.assertEqual(again["computed_at"], first["computed_at"])
+
+            store.insert_events_bulk(
+                [_usage_event(week_end + timedelta(hours=1), "later.jsonl", 50)]
+            )
+            untouched = _estimate_weekly_quota(store, now + timedelta(minutes=10), tz=tz)
+            self.assertEqual(untouched["computed_at"], first["computed_at"])
+            self.assertEqual(len(store.weekly_quota_history(first["week_start"])), 1)
+
+            store.delete_events_for_source("week.jsonl")
+            store.insert_events_bulk(
+                [_usage_event(week_start + timedelta(hours=2), "week.jsonl", 200)]
+            )
+            refreshed = _estimate_weekly_quota(store, now + timedelta(minutes=15), tz=tz)
+            self.assertEqual(refreshed["quota_tokens"], 800)
+            history = store.weekly_quota_history(first["week_start"])
+            self.assertEqual([row["observed_tokens"] for row in history], [200, 100])
+            store.close()
+
+    def test_events_revision_scope_stamps_one_revision_per_run(self):
+        tz = ZoneInfo("Europe/Stockholm")
+        now = datetime(2026, 3, 30, 12, 0, tzinfo=tz)
+        week_start, week_end = _last_completed_week(now)
+        start = week_start.astimezone(ZoneInfo("UTC")).isoformat()
+        end = week_end.astimezone(ZoneInfo("UTC")).isoformat()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_events_bulk(
+                [_usage_event(week_start + timedelta(hours=1), "old.jsonl", 100)]
+            )
+            before = store.events_watermark(start, end)
+
+            statements: list[str] = []
+            store.conn.set_trace_callback(statements.append)
+            with store.events_revision_scope():
+                for index in range(3):
+                    source = f"week-{index}.jsonl"
+                    store.delete_events_for_source(source, commit=False)
+                    store.insert_events_bulk(
+                        [_usage_event(week_start + timedelta(hours=2), source, 10)],
+                        commit=False,
+                    )
+                store.conn.commit()
+            store.conn.set_trace_callback(None)
+
+            self.assertEqual(
+                sum("MAX(events_revision)" in statement for statement in statements), 1
+            )
+            self.assertEqual(store.events_watermark(start, end), before + 1)
+            store.close()
+
+    def test_weekly_quota_is_not_cached_without_the_ingest_lock(self):
+        tz = ZoneInfo("Europe/Stockholm")
+        now = datetime(2026, 3, 30, 12, 0, tzinfo=tz)
+        week_start, _ = _last_completed_week(now)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            store.insert_events_bulk(
+                [_usage_event(week_start + timedelta(hours=1), "week.jsonl", 100)]
+            )
+
+            quota = _estimate_weekly_quota(store, now, tz=tz)
+            self.assertEqual(quota["quota_tokens"], 400)
+            self.assertIsNone(store.weekly_quota_for_week(quota["week_start"]))
+            store.close()
+
+    def test_session_summary_ranking_matches_live_aggregation(self):
+        base = datetime(2026, 3, 2, 8, 0, tzinfo=ZoneInfo("UTC"))
+
+        def stamp(minutes: int) -> str:
+            return (base + timedelta(minutes=minutes)).isoformat()
+
+        def write_source(store: UsageStore, source: str, session: str, offsets, tokens: int):
+            store.delete_events_for_source(source, commit=False)
+            store.delete_content_for_source(source, commit=False)
+            store.insert_events_bulk(
+                [
+                    UsageEvent(
+                        captured_at=stamp(offset),
+                        captured_at_utc=stamp(offset),
+                        event_type="token_count",
+                        total_tokens=tokens,
+                        input_tokens=tokens,
+                        output_tokens=tokens // 10,
+                        context_percent_left=40.0 - offset / 10,
+                        model="gpt-5.1-codex",
+                        session_id=session,
+                        source=source,
+                    )
+                    for offset in offsets
+                ],
+                commit=False,
+            )
+            store.insert_messages_bulk(
+                [
+                    MessageEvent(
+                        captured_at=stamp(offset),
+                        captured_at_utc=stamp(offset),
+                        role="user",
+                        message_type="user_message",
+                        message=f"message {offset}",
+                        session_id=session,
+                        source=source,
+                    )
+                    for offset in offsets
+                ],
+                commit=False,
+            )
+            store.insert_tool_calls_bulk(
+                [
+                    ToolCallEvent(
+                        captured_at=stamp(offsets[-1]),
+                        captured_at_utc=stamp(offsets[-1]),
+                        tool_type="function_call",
+                        tool_name="exec_command",
+                        call_id=None,
+                        status="failed",
+                        input_text=None,
+                        output_text=None,
+                        command=None,
+                        session_id=session,
+                        source=source,
+                    )
+                ],
+                commit=False,
+            )
+            store.refresh_session_summary_for_source(source)
+
+        pricing = default_pricing()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = UsageStore(Path(tmpdir) / "usage.sqlite")
+            write_source(store, "a.jsonl", "session-a", [0, 30, 90], 50_000)
+            write_source(store, "b.jsonl", "session-b", [100, 110], 400_000)
+            write_source(store, "c.jsonl", "session-c", [200, 400, 600], 20_000)
+            write_source(store, "c2.jsonl", "session-c", [700], 5_000)
+            write_source(store, "b.jsonl", "session-b", [100, 120, 130], 300_000)
+
+            for start, end in (
+                (None, None),
+                (stamp(20), stamp(500)),
+                (stamp(95), stamp(650)),
+            ):
+                live = _with_scores(_base_session_rows(store, start, end, pricing))
+                expected = {row["session_id"]: row for row in live}
+                ranked = session_insights(
+                    store, start, end, pricing, limit=10, interesting=True
+                )
+                self.assertEqual(
+                    sorted(row["session_id"] for row in ranked), sorted(expected)
+                )
+                for row in ranked:
+                    reference = expected[row["session_id"]]
+                    for key in (
+                        "total_tokens",
+                        "messages",
+                        "tool_calls",
+                        "tool_issue_signals",
+                        "first_seen",
+                        "last_seen",
+                        "interesting_score",
+                    ):
+                        self.assertEqual(row[key], reference[key], (start, end, key))
+                scores = [row["interesting_score"] for row in ranked]
+                self.assertEqual(scores, sorted(scores, reverse=True))
+
+            top = session_insights(store, None, None, pricing, limit=1, interesting=True)
+            self.assertEqual(top[0]["session_id"], "session-b")
+            plan = store.conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM session_summary "
+                "ORDER BY interesting_score DESC, estimated_cost DESC, total_tokens DESC"
+            ).fetchall()
+            self.assertIn("session_summary_score_idx", " ".join(row[3] for row in plan))
+            store.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -2,7 +2,13 @@ import { NextRequest } from "next/server";
 
 import { getDb } from "@/lib/server/db";
 import { parseFilters } from "@/lib/server/filters";
-import { bucketExpression, buildWhere, limitBuckets } from "@/lib/server/query";
+import {
+  bucketExpression,
+  bucketGroupExpression,
+  buildWhere,
+  eventBucketColumn,
+  limitBuckets
+} from "@/lib/server/query";
 import { errorResponse, jsonResponse } from "@/lib/server/response";
 
 export const runtime = "nodejs";
@@ -19,9 +25,11 @@ export const GET = (request: NextRequest) => {
   try {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
-    const bucketExpr = bucketExpression(filters.resolvedBucket);
+    const bucketColumn = eventBucketColumn(db, request.nextUrl.searchParams);
+    const bucketExpr = bucketExpression(filters.resolvedBucket, bucketColumn);
+    const bucketGroup = bucketGroupExpression(filters.resolvedBucket, bucketColumn);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -30,10 +38,10 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT ${bucketExpr} as bucket, event_type, COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${base.sql}
         AND event_type IN (${EVENT_TYPES.map(() => "?").join(",")})
-        GROUP BY bucket, event_type
+        GROUP BY ${bucketGroup}, event_type
         ORDER BY bucket ASC`
       )
       .all([...base.params, ...EVENT_TYPES]) as Array<Record<string, unknown>>;
@@ -13,7 +13,7 @@ export const GET = (request: NextRequest) => {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -23,7 +23,7 @@ export const GET = (request: NextRequest) => {
     const maxRow = db
       .prepare(
         `SELECT MAX(total_tokens) as max_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND total_tokens IS NOT NULL`
       )
@@ -42,7 +42,7 @@ export const GET = (request: NextRequest) => {
           END as context_bin,
           CAST(total_tokens / ${tokenBinSize} AS INTEGER) * ${tokenBinSize} as token_bin,
           COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND context_percent_left IS NOT NULL
         AND total_tokens IS NOT NULL
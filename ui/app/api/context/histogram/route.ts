@@ -13,7 +13,7 @@ export const GET = (request: NextRequest) => {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -29,7 +29,7 @@ export const GET = (request: NextRequest) => {
             ELSE CAST(context_percent_left / 5 AS INTEGER) * 5
           END as bin,
           COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND context_percent_left IS NOT NULL
         GROUP BY bin
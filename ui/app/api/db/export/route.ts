@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from "next/server";
 
-import { getDb } from "@/lib/server/db";
+import { getDb, toolPayloadSql } from "@/lib/server/db";
 import { parseFilters } from "@/lib/server/filters";
 import { buildToolJoin, buildWhere } from "@/lib/server/query";
 import { errorResponse, jsonResponse } from "@/lib/server/response";
@@ -77,18 +77,24 @@ export const GET = (request: NextRequest) => {
 
     if (dataset === "events") {
       const base = buildWhere(filters, {
-        timeColumn: "captured_at_utc",
+        timeColumn: "captured_at_ms",
         modelColumn: "model",
         dirColumn: "directory",
         sourceColumn: "source"
       });
+      // Filter on events_keyed; export the public view's columns.
       rows = db
         .prepare(
           `SELECT *
           FROM events
-          ${base.sql}
-          ORDER BY captured_at_utc DESC
-          LIMIT ${limit}`
+          WHERE id IN (
+            SELECT id
+            FROM events_keyed
+            ${base.sql}
+            ORDER BY captured_at_ms DESC
+            LIMIT ${limit}
+          )
+          ORDER BY captured_at_ms DESC`
         )
         .all(base.params) as Array<Record<string, unknown>>;
     }
@@ -118,7 +124,8 @@ export const GET = (request: NextRequest) => {
         : "LEFT JOIN turns t ON t.session_id = tc.session_id AND t.turn_index = tc.turn_index";
       rows = db
         .prepare(
-          `SELECT tc.*, t.model as turn_model, t.cwd as turn_cwd
+          `SELECT tc.*, ${toolPayloadSql("tc", "input_text")} as input_text,
+            ${toolPayloadSql("tc", "output_text")} as output_text, t.model as turn_model, t.cwd as turn_cwd
           FROM tool_calls tc
           ${join}
           ${tool.where}
@@ -117,7 +117,9 @@ export const GET = (request: NextRequest) => {
         turns: getCount("SELECT COUNT(*) as count FROM turns"),
         tool_calls: getCount("SELECT COUNT(*) as count FROM tool_calls"),
         messages: getCount("SELECT COUNT(*) as count FROM messages"),
-        activity_events: getCount("SELECT COUNT(*) as count FROM activity_events"),
+        activity_events: getCount(
+          "SELECT COALESCE(SUM(count), 0) as count FROM activity_counts_data"
+        ),
         app_turns: getCount("SELECT COUNT(*) as count FROM app_turns"),
         app_items: getCount("SELECT COUNT(*) as count FROM app_items"),
         weekly_quota_estimates: getCount(
@@ -128,7 +130,9 @@ export const GET = (request: NextRequest) => {
 
       const ingestedRange = db
         .prepare(
-          "SELECT MIN(captured_at_utc) as min_ts, MAX(captured_at_utc) as max_ts FROM events"
+          `SELECT
+            (SELECT captured_at_utc FROM events ORDER BY captured_at_ms LIMIT 1) as min_ts,
+            (SELECT captured_at_utc FROM events ORDER BY captured_at_ms DESC LIMIT 1) as max_ts`
         )
         .get() as { min_ts: string | null; max_ts: string | null };
       const ingestionFiles = db
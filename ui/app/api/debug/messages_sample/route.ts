@@ -38,7 +38,7 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT captured_at_utc, role, message_type,
-          substr(content, 1, ${DEBUG_TEXT_LIMIT}) as message,
+          substr(codex_text(content), 1, ${DEBUG_TEXT_LIMIT}) as message,
           session_id, turn_index
         FROM messages
         ${whereSql}
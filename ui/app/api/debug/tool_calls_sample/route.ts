@@ -2,7 +2,7 @@ import { NextRequest } from "next/server";
 
 import { DEBUG_ROW_LIMIT, DEBUG_TEXT_LIMIT } from "@/lib/server/constants";
 import { getRangeHours, parseFilters } from "@/lib/server/filters";
-import { getDb } from "@/lib/server/db";
+import { getDb, toolPayloadSql } from "@/lib/server/db";
 import { buildToolJoin } from "@/lib/server/query";
 import { errorResponse, jsonResponse } from "@/lib/server/response";
 
@@ -38,8 +38,8 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT tc.captured_at_utc, tc.tool_type, tc.tool_name, tc.status, tc.call_id,
-          substr(tc.input_text, 1, ${DEBUG_TEXT_LIMIT}) as input_text,
-          substr(tc.output_text, 1, ${DEBUG_TEXT_LIMIT}) as output_text,
+          substr(${toolPayloadSql("tc", "input_text")}, 1, ${DEBUG_TEXT_LIMIT}) as input_text,
+          substr(${toolPayloadSql("tc", "output_text")}, 1, ${DEBUG_TEXT_LIMIT}) as output_text,
           tc.command, tc.session_id, tc.turn_index
         FROM tool_calls tc
         ${tool.join}
@@ -18,7 +18,7 @@ export const GET = (request: NextRequest) => {
     const modelFilters = { ...filters, models: [] };
     const modelWhere = applyEventType(
       buildWhere(modelFilters, {
-        timeColumn: "captured_at_utc",
+        timeColumn: "captured_at_ms",
         modelColumn: "model",
         dirColumn: "directory",
         sourceColumn: "source"
@@ -28,7 +28,7 @@ export const GET = (request: NextRequest) => {
     const models = db
       .prepare(
         `SELECT model as value, COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${modelWhere.sql}
         AND model IS NOT NULL
         GROUP BY model
@@ -40,7 +40,7 @@ export const GET = (request: NextRequest) => {
     const dirFilters = { ...filters, dirs: [] };
     const dirWhere = applyEventType(
       buildWhere(dirFilters, {
-        timeColumn: "captured_at_utc",
+        timeColumn: "captured_at_ms",
         modelColumn: "model",
         dirColumn: "directory",
         sourceColumn: "source"
@@ -50,7 +50,7 @@ export const GET = (request: NextRequest) => {
     const directories = db
       .prepare(
         `SELECT directory as value, COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${dirWhere.sql}
         AND directory IS NOT NULL
         GROUP BY directory
@@ -62,7 +62,7 @@ export const GET = (request: NextRequest) => {
     const sourceFilters = { ...filters, source: [] };
     const sourceWhere = applyEventType(
       buildWhere(sourceFilters, {
-        timeColumn: "captured_at_utc",
+        timeColumn: "captured_at_ms",
         modelColumn: "model",
         dirColumn: "directory",
         sourceColumn: "source"
@@ -72,7 +72,7 @@ export const GET = (request: NextRequest) => {
     const sources = db
       .prepare(
         `SELECT source as value, COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${sourceWhere.sql}
         AND source IS NOT NULL
         GROUP BY source
@@ -18,7 +18,7 @@ const selectTop = (
   return db
     .prepare(
       `SELECT ${column} as label, SUM(total_tokens) as total
-      FROM events
+      FROM events_keyed
       ${sql}
       GROUP BY ${column}
       ORDER BY total DESC
@@ -32,7 +32,7 @@ export const GET = (request: NextRequest) => {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -58,14 +58,14 @@ export const GET = (request: NextRequest) => {
     const modelCount = db
       .prepare(
         `SELECT COUNT(DISTINCT model) as total
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}`
       )
       .get(eventsWhere.params) as { total: number } | undefined;
     const dirCount = db
       .prepare(
         `SELECT COUNT(DISTINCT directory) as total
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}`
       )
       .get(eventsWhere.params) as { total: number } | undefined;
@@ -82,7 +82,7 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT model, directory, SUM(total_tokens) as total_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND model IN (${modelList.map(() => "?").join(",")})
         AND directory IN (${dirList.map(() => "?").join(",")})
@@ -109,7 +109,7 @@ export const GET = (request: NextRequest) => {
       const otherModelRows = db
         .prepare(
           `SELECT directory, SUM(total_tokens) as total_tokens
-          FROM events
+          FROM events_keyed
           ${eventsWhere.sql}
           AND model NOT IN (${modelList.map(() => "?").join(",")})
           AND directory IN (${dirList.map(() => "?").join(",")})
@@ -132,7 +132,7 @@ export const GET = (request: NextRequest) => {
       const otherDirRows = db
         .prepare(
           `SELECT model, SUM(total_tokens) as total_tokens
-          FROM events
+          FROM events_keyed
           ${eventsWhere.sql}
           AND directory NOT IN (${dirList.map(() => "?").join(",")})
           AND model IN (${modelList.map(() => "?").join(",")})
@@ -155,7 +155,7 @@ export const GET = (request: NextRequest) => {
       const otherCell = db
         .prepare(
           `SELECT SUM(total_tokens) as total_tokens
-          FROM events
+          FROM events_keyed
           ${eventsWhere.sql}
           AND model NOT IN (${modelList.map(() => "?").join(",")})
           AND directory NOT IN (${dirList.map(() => "?").join(",")})`
@@ -13,7 +13,7 @@ export const GET = (request: NextRequest) => {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -23,7 +23,7 @@ export const GET = (request: NextRequest) => {
     const maxRow = db
       .prepare(
         `SELECT MAX(total_tokens) as max_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND total_tokens IS NOT NULL`
       )
@@ -37,7 +37,7 @@ export const GET = (request: NextRequest) => {
       .prepare(
         `SELECT CAST(total_tokens / ${binSize} AS INTEGER) * ${binSize} as bin,
           COUNT(*) as count
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND total_tokens IS NOT NULL
         GROUP BY bin
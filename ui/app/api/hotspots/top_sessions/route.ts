@@ -13,7 +13,7 @@ export const GET = (request: NextRequest) => {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "e.captured_at_utc",
+      timeColumn: "e.captured_at_ms",
       modelColumn: "e.model",
       dirColumn: "e.directory",
       sourceColumn: "e.source"
@@ -23,7 +23,7 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT e.session_id, s.cwd, SUM(e.total_tokens) as total_tokens, COUNT(*) as turns
-        FROM events e
+        FROM events_keyed e
         LEFT JOIN sessions s ON s.session_id = e.session_id
         ${eventsWhere.sql}
         AND e.session_id IS NOT NULL
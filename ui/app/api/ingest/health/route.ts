@@ -96,7 +96,9 @@ export const GET = (request: NextRequest) => {
 
     const ingestedRange = db
       .prepare(
-        "SELECT MIN(captured_at_utc) as min_ts, MAX(captured_at_utc) as max_ts FROM events"
+        `SELECT
+          (SELECT captured_at_utc FROM events ORDER BY captured_at_ms LIMIT 1) as min_ts,
+          (SELECT captured_at_utc FROM events ORDER BY captured_at_ms DESC LIMIT 1) as max_ts`
       )
       .get() as { min_ts: string | null; max_ts: string | null };
     const lastIngested = db
@@ -108,7 +110,7 @@ export const GET = (request: NextRequest) => {
     const lastStats = parseLastIngestStats(lastStatsRow?.value ?? null);
 
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -119,7 +121,7 @@ export const GET = (request: NextRequest) => {
       .prepare(
         `SELECT
           SUM(total_tokens) as total_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}`
       )
       .get(eventsWhere.params) as {
@@ -133,7 +135,7 @@ export const GET = (request: NextRequest) => {
           SUM(cached_input_tokens) as cached_input_tokens,
           SUM(output_tokens) as output_tokens,
           SUM(total_tokens) as total_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         GROUP BY model`
       )
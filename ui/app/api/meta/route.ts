@@ -22,7 +22,7 @@ export const GET = (request: NextRequest) => {
       .prepare("SELECT COUNT(*) as count FROM tool_calls")
       .get() as { count: number };
     const activityCount = db
-      .prepare("SELECT COUNT(*) as count FROM activity_events")
+      .prepare("SELECT COALESCE(SUM(count), 0) as count FROM activity_counts_data")
       .get() as { count: number };
 
     const rowCounts = {
@@ -35,7 +35,9 @@ export const GET = (request: NextRequest) => {
 
     const timestamps = db
       .prepare(
-        "SELECT MIN(captured_at_utc) as min_ts, MAX(captured_at_utc) as max_ts FROM events"
+        `SELECT
+          (SELECT captured_at_utc FROM events ORDER BY captured_at_ms LIMIT 1) as min_ts,
+          (SELECT captured_at_utc FROM events ORDER BY captured_at_ms DESC LIMIT 1) as max_ts`
       )
       .get() as { min_ts: string | null; max_ts: string | null };
 
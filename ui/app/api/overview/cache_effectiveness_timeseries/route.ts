@@ -2,7 +2,14 @@ import { NextRequest } from "next/server";
 
 import { getDb } from "@/lib/server/db";
 import { parseFilters } from "@/lib/server/filters";
-import { applyEventType, bucketExpression, buildWhere, clampBuckets } from "@/lib/server/query";
+import {
+  applyEventType,
+  bucketExpression,
+  bucketGroupExpression,
+  buildWhere,
+  clampBuckets,
+  eventBucketColumn
+} from "@/lib/server/query";
 import { errorResponse, jsonResponse } from "@/lib/server/response";
 import { loadPricingSettings } from "@/lib/server/pricing";
 
@@ -20,9 +27,11 @@ export const GET = (request: NextRequest) => {
   try {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
-    const bucketExpr = bucketExpression(filters.resolvedBucket);
+    const bucketColumn = eventBucketColumn(db, request.nextUrl.searchParams);
+    const bucketExpr = bucketExpression(filters.resolvedBucket, bucketColumn);
+    const bucketGroup = bucketGroupExpression(filters.resolvedBucket, bucketColumn);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -36,9 +45,9 @@ export const GET = (request: NextRequest) => {
           model,
           SUM(input_tokens) as input_tokens,
           SUM(cached_input_tokens) as cached_input_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
-        GROUP BY bucket, model
+        GROUP BY ${bucketGroup}, model
         ORDER BY bucket ASC`
       )
       .all(eventsWhere.params) as Array<{
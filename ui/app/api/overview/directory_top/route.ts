@@ -44,7 +44,7 @@ export const GET = (request: NextRequest) => {
     const depth = Number(request.nextUrl.searchParams.get("depth") ?? 0);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -55,7 +55,7 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT ${labelExpr} as label, SUM(total_tokens) as total_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         GROUP BY label
         ORDER BY total_tokens DESC
@@ -68,7 +68,7 @@ export const GET = (request: NextRequest) => {
       const otherRow = db
         .prepare(
           `SELECT SUM(total_tokens) as total_tokens
-          FROM events
+          FROM events_keyed
           ${eventsWhere.sql}
           AND ${labelExpr} NOT IN (${rows
             .map(() => "?")
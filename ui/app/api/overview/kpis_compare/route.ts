@@ -23,7 +23,7 @@ const loadKpis = (
   pricing: PricingConfig
 ) => {
   const base = buildWhere(filters, {
-    timeColumn: "captured_at_utc",
+    timeColumn: "captured_at_ms",
     modelColumn: "model",
     dirColumn: "directory",
     sourceColumn: "source"
@@ -39,7 +39,7 @@ const loadKpis = (
         SUM(reasoning_output_tokens) as reasoning_tokens,
         SUM(cached_input_tokens) as cached_input_tokens,
         SUM(COALESCE(input_tokens, 0) + COALESCE(cached_input_tokens, 0)) as input_total
-      FROM events
+      FROM events_keyed
       ${eventsWhere.sql}`
     )
     .get(eventsWhere.params) as {
@@ -68,7 +68,7 @@ const loadKpis = (
         SUM(cached_input_tokens) as cached_input_tokens,
         SUM(output_tokens) as output_tokens,
         SUM(total_tokens) as total_tokens
-      FROM events
+      FROM events_keyed
       ${eventsWhere.sql}
       GROUP BY model`
     )
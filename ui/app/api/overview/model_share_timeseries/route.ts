@@ -5,7 +5,9 @@ import { parseFilters } from "@/lib/server/filters";
 import {
   applyEventType,
   bucketExpression,
+  bucketGroupExpression,
   buildWhere,
+  eventBucketColumn,
   limitBuckets
 } from "@/lib/server/query";
 import { errorResponse, jsonResponse } from "@/lib/server/response";
@@ -22,7 +24,7 @@ const resolveTopModels = (
   const rows = db
     .prepare(
       `SELECT model, SUM(total_tokens) as total
-      FROM events
+      FROM events_keyed
       ${whereSql}
       GROUP BY model
       ORDER BY total DESC
@@ -36,9 +38,11 @@ export const GET = (request: NextRequest) => {
   try {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
-    const bucketExpr = bucketExpression(filters.resolvedBucket);
+    const bucketColumn = eventBucketColumn(db, request.nextUrl.searchParams);
+    const bucketExpr = bucketExpression(filters.resolvedBucket, bucketColumn);
+    const bucketGroup = bucketGroupExpression(filters.resolvedBucket, bucketColumn);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -60,7 +64,7 @@ export const GET = (request: NextRequest) => {
     const totalsRow = db
       .prepare(
         `SELECT SUM(total_tokens) as total_tokens, COUNT(*) as turns
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}`
       )
       .get(eventsWhere.params) as { total_tokens: number | null; turns: number } | undefined;
@@ -68,7 +72,7 @@ export const GET = (request: NextRequest) => {
     const summaryRows = db
       .prepare(
         `SELECT model, SUM(total_tokens) as total_tokens, COUNT(*) as turns
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND model IN (${topModels.map(() => "?").join(",")})
         GROUP BY model
@@ -83,10 +87,10 @@ export const GET = (request: NextRequest) => {
     const seriesRows = db
       .prepare(
         `SELECT ${bucketExpr} as bucket, model, SUM(total_tokens) as total_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND model IN (${topModels.map(() => "?").join(",")})
-        GROUP BY bucket, model
+        GROUP BY ${bucketGroup}, model
         ORDER BY bucket ASC`
       )
       .all([...eventsWhere.params, ...topModels]) as Array<{
@@ -98,10 +102,10 @@ export const GET = (request: NextRequest) => {
     const otherRows = db
       .prepare(
         `SELECT ${bucketExpr} as bucket, SUM(total_tokens) as total_tokens
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
         AND model NOT IN (${topModels.map(() => "?").join(",")})
-        GROUP BY bucket
+        GROUP BY ${bucketGroup}
         ORDER BY bucket ASC`
       )
       .all([...eventsWhere.params, ...topModels]) as Array<{
@@ -2,7 +2,14 @@ import { NextRequest } from "next/server";
 
 import { getDb } from "@/lib/server/db";
 import { parseFilters } from "@/lib/server/filters";
-import { applyEventType, bucketExpression, buildWhere, clampBuckets } from "@/lib/server/query";
+import {
+  applyEventType,
+  bucketExpression,
+  bucketGroupExpression,
+  buildWhere,
+  clampBuckets,
+  eventBucketColumn
+} from "@/lib/server/query";
 import { errorResponse, jsonResponse } from "@/lib/server/response";
 
 export const runtime = "nodejs";
@@ -12,9 +19,11 @@ export const GET = (request: NextRequest) => {
   try {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
-    const bucketExpr = bucketExpression(filters.resolvedBucket);
+    const bucketColumn = eventBucketColumn(db, request.nextUrl.searchParams);
+    const bucketExpr = bucketExpression(filters.resolvedBucket, bucketColumn);
+    const bucketGroup = bucketGroupExpression(filters.resolvedBucket, bucketColumn);
     const base = buildWhere(filters, {
-      timeColumn: "captured_at_utc",
+      timeColumn: "captured_at_ms",
       modelColumn: "model",
       dirColumn: "directory",
       sourceColumn: "source"
@@ -26,9 +35,9 @@ export const GET = (request: NextRequest) => {
         `SELECT ${bucketExpr} as bucket,
           MIN(limit_5h_percent_left) as min_5h_left,
           MIN(limit_weekly_percent_left) as min_weekly_left
-        FROM events
+        FROM events_keyed
         ${eventsWhere.sql}
-        GROUP BY bucket
+        GROUP BY ${bucketGroup}
         ORDER BY bucket ASC`
       )
       .all(eventsWhere.params) as Array<Record<string, unknown>>;
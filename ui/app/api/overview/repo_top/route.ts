@@ -15,7 +15,7 @@ export const GET = (request: NextRequest) => {
     const filters = parseFilters(request.nextUrl.searchParams);
     const db = getDb(request.nextUrl.searchParams);
     const base = buildWhere(filters, {
-      timeColumn: "e.captured_at_utc",
+      timeColumn: "e.captured_at_ms",
       modelColumn: "e.model",
       dirColumn: "e.directory",
       sourceColumn: "e.source"
@@ -25,7 +25,7 @@ export const GET = (request: NextRequest) => {
     const rows = db
       .prepare(
         `SELECT ${repoLabel} as label, SUM(e.total_tokens) as total_tokens
-        FROM events e
+        FROM events_keyed e
         LEFT JOIN sessions s ON s.session_id = e.session_id
         ${eventsWhere.sql}
         GROUP BY label
@@ -39,7 +39,7 @@ export const GET = (request: NextRequest) => {
       const otherRow = db
         .prepare(
           `SELECT SUM(e.total_tokens) as total_tokens
-          FROM events e
+          FROM events_keyed e
           LEFT JOIN sessions s ON s.session_id = e.session_id
           ${eventsWhere.sql}
           AND ${repoLabel} NOT IN (${rows.map(() => "?").join(",")})`
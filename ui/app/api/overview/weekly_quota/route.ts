@@ -6,6 +6,8 @@ import { errorResponse, jsonResponse } from "@/lib/server/response";
 export const runtime = "nodejs";
 export const dynamic = "force-dynamic";
 
+const HISTORY_LIMIT = 12;
+
 export const GET = (request: NextRequest) => {
   try {
     const db = getDb(request.nextUrl.searchParams);
@@ -17,8 +19,23 @@ export const GET = (request: NextRequest) => {
         LIMIT 1`
       )
       .get();
+    const hasHistory = db
+      .prepare(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'weekly_quota_history'"
+      )
+      .get();
+    const history = hasHistory
+      ? db
+          .prepare(
+            `SELECT *
+            FROM weekly_quota_history
+            ORDER BY id DESC
+            LIMIT ?`
+          )
+          .all(HISTORY_LIMIT)
+      : [];
 
-    return jsonResponse({ row: row ?? null });
+    return jsonResponse({ row: row ?? null, history });
   } catch (error) {
     return errorResponse(
       error instanceof Error ? error.message : "Failed to load weekly quota",
@@ -34,7 +34,7 @@ export const GET = (request: NextRequest) => {
     const offset = (page - 1) * pageSize;
 
     const base = buildWhere(filters, {
-      timeColumn: "e.captured_at_utc",
+      timeColumn: "e.captured_at_ms",
       modelColumn: "e.model",
       dirColumn: "e.directory",
       sourceColumn: "e.source"
@@ -72,7 +72,7 @@ export const GET = (request: NextRequest) => {
       .prepare(
         `SELECT COUNT(*) as total FROM (
           SELECT e.session_id
-          FROM events e
+          FROM events_keyed e
           LEFT JOIN sessions s ON s.session_id = e.session_id
           ${whereSql}
           AND e.session_id IS NOT NULL
@@ -91,7 +91,7 @@ export const GET = (request: NextRequest) => {
             FROM session_tags st
             WHERE st.session_id = e.session_id
           ) as tags
-        FROM events e
+        FROM events_keyed e
         LEFT JOIN sessions s ON s.session_id = e.session_id
         ${whereSql}
         AND e.session_id IS NOT NULL
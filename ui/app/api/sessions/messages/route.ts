@@ -35,7 +35,7 @@ export const GET = (request: NextRequest) => {
 
     const rows = db
       .prepare(
-        `SELECT id, captured_at_utc, role, message_type, content, content_length,
+        `SELECT id, captured_at_utc, role, message_type, codex_text(content) AS content, content_length,
           session_id, turn_index, ordinal, source_line
         FROM messages
         WHERE session_id = ?
@@ -15,13 +15,69 @@ const clampLimit = (value: string | null) => {
   return Math.min(Math.floor(parsed), MAX_LIMIT);
 };
 
-const quoteFts = (query: string) =>
-  query
-    .trim()
+const TRIGRAM_MIN_CHARS = 3;
+
+const quoteFts = (query: string) => `"${query.trim().replace(/"/g, '""')}"`;
+
+const clampOffset = (value: string | null) => {
+  const parsed = Number(value);
+  if (!Number.isFinite(parsed) || parsed <= 0) return 0;
+  return Math.floor(parsed);
+};
+
+const hasSubstringIndex = (db: ReturnType<typeof getDb>) =>
+  Boolean(
+    db
+      .prepare(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_trigram'"
+      )
+      .get()
+  );
+
+const pendingCount = (db: ReturnType<typeof getDb>) => {
+  try {
+    const row = db
+      .prepare("SELECT COUNT(*) AS count FROM messages_fts_pending")
+      .get() as { count: number } | undefined;
+    return row?.count ?? 0;
+  } catch {
+    return 0;
+  }
+};
+
+const likePattern = (query: string) =>
+  `%${query.replace(/[\\%_]/g, (char) => `\\${char}`)}%`;
+
+const PENDING_SNIPPET_CHARS = 240;
+
+const pendingSnippet = (content: string | null, query: string) => {
+  const text = content ?? "";
+  const position = text.toLowerCase().indexOf(query.toLowerCase());
+  if (position < 0) return text.slice(0, PENDING_SNIPPET_CHARS);
+  const start = Math.max(position - Math.floor(PENDING_SNIPPET_CHARS / 3), 0);
+  const end = position + query.length;
+  const windowEnd = Math.max(end, start + PENDING_SNIPPET_CHARS);
+  return [
+    start ? "..." : "",
+    text.slice(start, position),
+    "<mark>",
+    text.slice(position, end),
+    "</mark>",
+    text.slice(end, windowEnd),
+    windowEnd < text.length ? "..." : "",
+  ].join("");
+};
+
+// Mirrors codex_usage_tracker.search.plan_search_mode.
+const planMode = (query: string, requested: string | null, substring: boolean) => {
+  if (requested === "phrase") return "phrase";
+  if (!substring || query.length < TRIGRAM_MIN_CHARS) return "phrase";
+  if (requested === "substring") return "substring";
+  const identifierLike = query
     .split(/\s+/)
-    .filter(Boolean)
-    .map((part) => `"${part.replace(/"/g, '""')}"`)
-    .join(" ");
+    .some((token) => !/^[\p{L}\p{N}]+$/u.test(token) || /[a-z][A-Z]/.test(token));
+  return identifierLike ? "substring" : "phrase";
+};
 
 export const GET = (request: NextRequest) => {
   try {
@@ -31,48 +87,88 @@ export const GET = (request: NextRequest) => {
     }
     const sessionId = request.nextUrl.searchParams.get("session_id");
     const limit = clampLimit(request.nextUrl.searchParams.get("limit"));
+    const offset = clampOffset(request.nextUrl.searchParams.get("offset"));
     const db = getDb(request.nextUrl.searchParams);
+    const mode = planMode(
+      q,
+      request.nextUrl.searchParams.get("mode"),
+      hasSubstringIndex(db)
+    );
+    const table = mode === "substring" ? "messages_trigram" : "messages_fts";
+    const snippetTokens = mode === "substring" ? 64 : 32;
 
-    const params: Array<string | number> = [quoteFts(q)];
-    let sessionSql = "";
-    if (sessionId) {
-      sessionSql = "AND m.session_id = ?";
-      params.push(sessionId);
-    }
-    params.push(limit);
+    const sessionParams: string[] = sessionId ? [sessionId] : [];
+    const sessionSql = sessionId ? "AND m.session_id = ?" : "";
 
     try {
-      const rows = db
-        .prepare(
-          `SELECT m.id, m.session_id, m.turn_index, m.ordinal, m.role,
-            m.message_type, m.captured_at_utc,
-            snippet(messages_fts, 0, '<mark>', '</mark>', '...', 32) AS snippet
-          FROM messages_fts
-          JOIN messages m ON messages_fts.rowid = m.id
-          WHERE messages_fts MATCH ?
-            ${sessionSql}
-          ORDER BY rank, m.captured_at_utc DESC
-          LIMIT ?`
-        )
-        .all(...params);
-      return jsonResponse({ rows });
+      // Deferred FTS maintenance: queued messages are matched by substring and
+      // listed first; their stale index entries are skipped.
+      let pending: Array<Record<string, unknown>> = [];
+      let pendingSql = "";
+      if (pendingCount(db) > 0) {
+        pendingSql = `AND ${table}.rowid NOT IN (SELECT message_id FROM messages_fts_pending)`;
+        pending = (
+          db
+            .prepare(
+              `SELECT m.id, m.session_id, m.turn_index, m.ordinal, m.role,
+                m.message_type, m.captured_at_utc, codex_text(m.content) AS content
+              FROM messages_fts_pending p
+              JOIN messages m ON m.id = p.message_id
+              WHERE codex_text(m.content) LIKE ? ESCAPE '\\'
+                ${sessionSql}
+              ORDER BY m.captured_at_utc DESC`
+            )
+            .all(likePattern(q), ...sessionParams) as Array<Record<string, unknown>>
+        ).map(({ content, ...row }) => ({
+          ...row,
+          snippet: pendingSnippet(content as string | null, q),
+        }));
+      }
+      const matches: unknown[] = pending.slice(offset, offset + limit + 1);
+      const indexLimit = limit + 1 - matches.length;
+      if (indexLimit > 0) {
+        matches.push(
+          ...db
+            .prepare(
+              `SELECT m.id, m.session_id, m.turn_index, m.ordinal, m.role,
+                m.message_type, m.captured_at_utc,
+                snippet(${table}, 0, '<mark>', '</mark>', '...', ${snippetTokens}) AS snippet
+              FROM ${table}
+              JOIN messages m ON ${table}.rowid = m.id
+              WHERE ${table} MATCH ?
+                ${pendingSql}
+                ${sessionSql}
+              ORDER BY ${table}.rank, m.captured_at_utc DESC
+              LIMIT ? OFFSET ?`
+            )
+            .all(
+              quoteFts(q),
+              ...sessionParams,
+              indexLimit,
+              Math.max(offset - pending.length, 0)
+            )
+        );
+      }
+      const rows = matches.slice(0, limit);
+      const nextOffset = matches.length > limit ? offset + limit : null;
+      return jsonResponse({ rows, mode, next_offset: nextOffset });
     } catch {
-      const likeParams: Array<string | number> = [`%${q}%`];
+      const likeParams: Array<string | number> = [likePattern(q)];
       let likeSessionSql = "";
       if (sessionId) {
         likeSessionSql = "AND session_id = ?";
         likeParams.push(sessionId);
       }
-      likeParams.push(limit);
+      likeParams.push(limit, offset);
       const rows = db
         .prepare(
           `SELECT id, session_id, turn_index, ordinal, role, message_type,
-            captured_at_utc, substr(content, 1, 240) AS snippet
+            captured_at_utc, substr(codex_text(content), 1, 240) AS snippet
           FROM messages
-          WHERE content LIKE ?
+          WHERE codex_text(content) LIKE ? ESCAPE '\\'
             ${likeSessionSql}
           ORDER BY captured_at_utc DESC
-          LIMIT ?`
+          LIMIT ? OFFSET ?`
         )
         .all(...likeParams);
       return jsonResponse({ rows, fallback: "like" });
@@ -15,7 +15,9 @@ export const GET = (request: NextRequest) => {
 
     const ingested = db
       .prepare(
-        "SELECT MIN(captured_at_utc) as min_ts, MAX(captured_at_utc) as max_ts FROM events"
+        `SELECT
+          (SELECT captured_at_utc FROM events ORDER BY captured_at_ms LIMIT 1) as min_ts,
+          (SELECT captured_at_utc FROM events ORDER BY captured_at_ms DESC LIMIT 1) as max_ts`
       )
       .get() as { min_ts: string | null; max_ts: string | null };
     const lastIngested = db
@@ -282,7 +282,10 @@ export default function OverviewPage() {
   const ingestHealth = useEndpoint<IngestHealth>("/api/ingest/health", filters, {
     ttl: 30_000
   });
-  const weeklyQuota = useEndpoint<{ row: Record<string, unknown> | null }>(
+  const weeklyQuota = useEndpoint<{
+    row: Record<string, unknown> | null;
+    history?: Record<string, unknown>[];
+  }>(
     "/api/overview/weekly_quota",
     undefined,
     { ttl: 60_000, disabled: !showCost }
@@ -1,6 +1,7 @@
 import { execFileSync } from "child_process";
 import fs from "fs";
 import path from "path";
+import zlib from "zlib";
 
 import { resolveDbPath } from "@/lib/server/paths";
 
@@ -91,6 +92,83 @@ export const resolveDbPathFromParams = (params?: URLSearchParams | null) => {
   return override ?? resolveDbPath();
 };
 
+const contentInodes = new Map<string, number>();
+
+const contentDbPath = (dbPath: string) => `${dbPath}.content.db`;
+
+// Mirrors UsageStore._attach_content_db: with the split layout, messages and
+// tool calls live in <db>.content.db. Re-attach when a purge swapped the file.
+const attachContentDb = (db: DbInstance, dbPath: string) => {
+  let layout: string | undefined;
+  try {
+    const row = db
+      .prepare("SELECT value FROM meta WHERE key = 'content_layout'")
+      .get() as { value: string } | undefined;
+    layout = row?.value;
+  } catch {
+    layout = undefined;
+  }
+  const contentPath = contentDbPath(dbPath);
+  if (layout !== "split" || !fs.existsSync(contentPath)) return;
+  const inode = fs.statSync(contentPath).ino;
+  const attached = contentInodes.get(dbPath);
+  if (attached === inode) return;
+  if (attached !== undefined) {
+    db.exec("DETACH DATABASE content");
+  }
+  db.prepare("ATTACH DATABASE ? AS content").run(contentPath);
+  contentInodes.set(dbPath, inode);
+};
+
+const dictionaries = new Map<string, Map<number, Buffer>>();
+
+// Mirrors codex_usage_tracker.compression: compressed values are BLOBs of
+// "Z", a little-endian dictionary id and a zlib stream; text passes through.
+const inflateValue = (dbPath: string, value: unknown) => {
+  if (!Buffer.isBuffer(value) || value.length < 5 || value[0] !== 0x5a) {
+    return value;
+  }
+  const id = value.readUInt32LE(1);
+  const dictionary = id ? dictionaries.get(dbPath)?.get(id) : undefined;
+  if (id && !dictionary) {
+    throw new Error(`Missing compression dictionary ${id}`);
+  }
+  return zlib
+    .inflateSync(value.subarray(5), dictionary ? { dictionary } : {})
+    .toString("utf8");
+};
+
+// Register codex_text() once per connection and pick up dictionaries trained
+// since the last request; user functions cannot query the DB themselves.
+const registerCompression = (db: DbInstance, dbPath: string) => {
+  let loaded = dictionaries.get(dbPath);
+  if (!loaded) {
+    loaded = new Map();
+    dictionaries.set(dbPath, loaded);
+    db.function("codex_text", { deterministic: true }, (value: unknown) =>
+      inflateValue(dbPath, value),
+    );
+  }
+  let rows: Array<{ id: number; dictionary: Buffer }> = [];
+  try {
+    rows = db
+      .prepare("SELECT id, dictionary FROM compression_dictionaries WHERE id > ?")
+      .all(Math.max(0, ...loaded.keys())) as Array<{ id: number; dictionary: Buffer }>;
+  } catch {
+    rows = [];
+  }
+  for (const row of rows) {
+    loaded.set(row.id, row.dictionary);
+  }
+};
+
+// Long tool payloads live once in payload_blobs and tool_calls points at them;
+// mirrors UsageStore.text_sql("tool_calls", column).
+export const toolPayloadSql = (alias: string, column: "input_text" | "output_text") => {
+  const blob = column === "input_text" ? "input_blob_id" : "output_blob_id";
+  return `codex_text(COALESCE(${alias}.${column}, (SELECT content FROM payload_blobs WHERE id = ${alias}.${blob})))`;
+};
+
 export const getDb = (dbPathOrParams?: string | URLSearchParams | null) => {
   loadDatabase();
   if (!Database) {
@@ -111,5 +189,8 @@ export const getDb = (dbPathOrParams?: string | URLSearchParams | null) => {
       }),
     );
   }
-  return dbCache.get(dbPath)!;
+  const db = dbCache.get(dbPath)!;
+  attachContentDb(db, dbPath);
+  registerCompression(db, dbPath);
+  return db;
 };
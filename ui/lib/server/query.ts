@@ -1,5 +1,7 @@
 import { MAX_BUCKETS } from "@/lib/server/constants";
+import type { getDb } from "@/lib/server/db";
 import type { NormalizedFilters } from "@/lib/server/filters";
+import { loadTimezoneSettings } from "@/lib/server/timezone";
 
 export type WhereClause = {
   sql: string;
@@ -13,16 +15,78 @@ type WhereOptions = {
   sourceColumn?: string;
 };
 
+// events and activity_events are keyed by integer epoch milliseconds; their
+// captured_at_utc text is derived in the view, so range filters and buckets
+// go through captured_at_ms to stay on the index.
+const isEpochColumn = (column: string) => column.endsWith("captured_at_ms");
+
+const bucketMs = (bucket: "hour" | "day") =>
+  bucket === "hour" ? 3_600_000 : 86_400_000;
+
+// events.local_hour counts hours since the epoch on the wall clock of the
+// zone in meta.bucket_timezone, so it buckets by local hour/day on an index.
+const isLocalHourColumn = (column: string) => column.endsWith("local_hour");
+
+export const eventBucketColumn = (
+  db: ReturnType<typeof getDb>,
+  params?: URLSearchParams | null
+) => {
+  try {
+    const rows = db
+      .prepare(
+        "SELECT key, value FROM meta WHERE key IN ('bucket_timezone', 'bucket_rebuild_after')"
+      )
+      .all() as Array<{ key: string; value: string }>;
+    const meta = new Map(rows.map((row) => [row.key, row.value]));
+    if (
+      !meta.has("bucket_rebuild_after") &&
+      meta.get("bucket_timezone") === loadTimezoneSettings(params).timezone
+    ) {
+      return "local_hour";
+    }
+  } catch {
+    // Databases written before bucket keys existed fall back to UTC buckets.
+  }
+  return "captured_at_ms";
+};
+
 export const bucketExpression = (
   bucket: "hour" | "day",
-  column = "captured_at_utc"
+  column = "captured_at_ms"
 ) => {
+  if (isLocalHourColumn(column)) {
+    return bucket === "hour"
+      ? `strftime('%Y-%m-%dT%H:00:00', ${column} * 3600, 'unixepoch')`
+      : `strftime('%Y-%m-%dT00:00:00', ${column} / 24 * 86400, 'unixepoch')`;
+  }
+  if (isEpochColumn(column)) {
+    const format = bucket === "hour" ? "%Y-%m-%dT%H:00:00" : "%Y-%m-%dT00:00:00";
+    const size = bucketMs(bucket);
+    return `strftime('${format}', ${column} / ${size} * ${size / 1000}, 'unixepoch')`;
+  }
   if (bucket === "hour") {
     return `substr(${column}, 1, 13) || ':00:00'`;
   }
   return `substr(${column}, 1, 10) || 'T00:00:00'`;
 };
 
+// Grouping on the integer bucket formats each bucket once instead of per row.
+export const bucketGroupExpression = (
+  bucket: "hour" | "day",
+  column = "captured_at_ms"
+) => {
+  if (isLocalHourColumn(column)) {
+    return bucket === "hour" ? column : `${column} / 24`;
+  }
+  return isEpochColumn(column) ? `${column} / ${bucketMs(bucket)}` : "bucket";
+};
+
+// events.directory is keyed into dim_directory; directory_tree lists every
+// directory under each one, so "this directory and below" is a key lookup
+// rather than a LIKE over the joined text. The key is only on events_keyed,
+// which routes filtering by directory read instead of events.
+const isDirectoryColumn = (column: string) => column.endsWith("directory");
+
 export const buildWhere = (
   filters: NormalizedFilters,
   options: WhereOptions = {}
@@ -32,9 +96,12 @@ export const buildWhere = (
   const params: Array<string | number> = [];
 
   clauses.push(`${timeColumn} >= ?`);
-  params.push(filters.from);
   clauses.push(`${timeColumn} <= ?`);
-  params.push(filters.to);
+  if (isEpochColumn(timeColumn)) {
+    params.push(Date.parse(filters.from), Date.parse(filters.to));
+  } else {
+    params.push(filters.from, filters.to);
+  }
 
   if (options.modelColumn && filters.models.length) {
     clauses.push(
@@ -45,7 +112,15 @@ export const buildWhere = (
     params.push(...filters.models);
   }
 
-  if (options.dirColumn && filters.dirs.length) {
+  if (options.dirColumn && filters.dirs.length && isDirectoryColumn(options.dirColumn)) {
+    clauses.push(
+      `${options.dirColumn}_key IN (SELECT descendant_id FROM directory_tree
+        WHERE ancestor_id IN (SELECT id FROM dim_directory WHERE value IN (${filters.dirs
+          .map(() => "?")
+          .join(",")})))`
+    );
+    params.push(...filters.dirs);
+  } else if (options.dirColumn && filters.dirs.length) {
     const dirClauses = filters.dirs.map(() => `${options.dirColumn} LIKE ?`);
     clauses.push(`(${dirClauses.join(" OR ")})`);
     params.push(...filters.dirs.map((dir) => `${dir}%`));
@@ -77,6 +77,7 @@ test("api overview endpoints return expected shapes", async ({ request }) => {
 
   const weeklyQuota = await getJson(request, "/api/overview/weekly_quota");
   expect(weeklyQuota.row).not.toBeNull();
+  expect(Array.isArray(weeklyQuota.history)).toBeTruthy();
 });
 
 test("api tools endpoints return expected shapes", async ({ request }) => {